@@ -7,13 +7,15 @@ Run as:
 
 import streamlit as st
 from climbingdb.services import ClimbingService
+from climbingdb.services.logbook_cache import CachedClimbingService
 from climbingdb.ui import (
     CUSTOM_CSS,
     render_navigation_buttons,
     render_sidebar_filters,
     render_filter_summary,
     render_dashboard,
-    render_routes_table,
+    render_timeline,
+    render_paged_routes_table,
     convert_grades,
     render_add_route_form,
     render_edit_delete_form,
@@ -26,24 +28,41 @@ from climbingdb.ui.auth import (
     render_settings_page
 )
 from climbingdb.config import REQUIRE_AUTH, SHOW_DEMO
+from climbingdb.models.migrations import run_migrations, MigrationError
+
+
+@st.cache_resource
+def migrate_database():
+    """Bring the database schema up to date once per server process."""
+    return run_migrations()
 
 
 #@st.cache_resource
 def load_database(_user_id):
+    if not REQUIRE_AUTH:
+        # Demo logbook: reads served from the memory-mapped logbook cache
+        return CachedClimbingService(user_id=_user_id)
     return ClimbingService(user_id=_user_id)
 
 
+def query_filters(filters):
+    """Service query arguments for the current view and sidebar filters."""
+    if st.session_state.view == "Projects":
+        return {'area': filters['area'], 'is_project': True}
+    return {
+        'discipline': st.session_state.view,
+        'area': filters['area'],
+        'grade': filters['grade'],
+        'stars': filters['stars'],
+        'operation': filters['grade_operation']
+    }
+
+
 def fetch_routes(db, filters):
     """Fetch routes based on current view and filters."""
     if st.session_state.view == "Projects":
         return db.get_projects(area=filters['area'])
-    return db.get_filtered_routes(
-        discipline=st.session_state.view,
-        area=filters['area'],
-        grade=filters['grade'],
-        stars=filters['stars'],
-        operation=filters['grade_operation']
-    )
+    return db.get_filtered_routes(**query_filters(filters))
 
 
 def main():
@@ -53,6 +72,11 @@ def main():
         page_icon=":material/mountain_flag:",
         layout="wide"
     )
+    try:
+        migrate_database()
+    except MigrationError as e:
+        st.error(f":material/database: Database needs maintenance: {e}")
+        st.stop()
 
     # Handle shared route link BEFORE authentication
     route_id = st.query_params.get('route_id')
@@ -98,11 +122,14 @@ def main():
 
     if len(routes) > 0:
         routes = convert_grades(routes, filters['grade_system'])
-        render_dashboard(routes)
+        pitches = db.get_pitch_ascents(routes['id']) if st.session_state.view == "Multipitch" else None
+        render_dashboard(routes, pitches)
+        if st.session_state.view in ("Sportclimb", "Boulder", "Multipitch"):
+            render_timeline(db, st.session_state.view, filters['grade_system'])
         if REQUIRE_AUTH:
             render_add_route_form(db, st.session_state.view)
             render_edit_delete_form(db, routes)
-        render_routes_table(routes)
+        render_paged_routes_table(db, query_filters(filters), filters['grade_system'])
     else:
         st.warning("No routes match your filters. Try adjusting the filter criteria or add a route.")
         render_add_route_form(db, st.session_state.view)
@@ -0,0 +1,27 @@
+"""
+Performance benchmarks for the service-layer hot paths.
+
+Run as:
+    python3 -m climbingdb.benchmarks --output bench.json
+"""
+
+from .synthetic import generate_logbook, generate_8anu_csv
+from .runner import (
+    SCENARIOS,
+    QueryCounter,
+    bind_sessions,
+    create_benchmark_engine,
+    run_benchmarks,
+    compare_results
+)
+
+__all__ = [
+    'generate_logbook',
+    'generate_8anu_csv',
+    'SCENARIOS',
+    'QueryCounter',
+    'bind_sessions',
+    'create_benchmark_engine',
+    'run_benchmarks',
+    'compare_results'
+]
@@ -0,0 +1,95 @@
+"""
+Run the service-layer benchmarks against a scratch database.
+
+Run as:
+    python3 -m climbingdb.benchmarks --output bench.json
+    python3 -m climbingdb.benchmarks --database-url postgresql://user:pw@localhost/bench --reset --output bench_pg.json
+    python3 -m climbingdb.benchmarks --compare bench.json --output bench_new.json
+
+Without --database-url a temporary SQLite file is used. The benchmark writes a
+synthetic logbook into the database, so never point it at production data.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from climbingdb.models import Base
+from climbingdb.benchmarks.runner import (
+    DEFAULT_SCALE,
+    SCENARIOS,
+    create_benchmark_engine,
+    database_is_empty,
+    run_benchmarks,
+    compare_results,
+    print_results,
+    print_comparison,
+    load_results,
+    save_results
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark service-layer hot paths on a synthetic logbook')
+    parser.add_argument('--database-url', help='Scratch database (default: temporary SQLite file)')
+    parser.add_argument('--reset', action='store_true', help='Drop all tables of a non-empty --database-url first')
+    parser.add_argument('--users', type=int, default=DEFAULT_SCALE['n_users'])
+    parser.add_argument('--crags', type=int, default=DEFAULT_SCALE['n_crags'])
+    parser.add_argument('--routes', type=int, default=DEFAULT_SCALE['n_routes'])
+    parser.add_argument('--ascents-per-user', type=int, default=DEFAULT_SCALE['ascents_per_user'])
+    parser.add_argument('--main-user-ascents', type=int, default=DEFAULT_SCALE['main_user_ascents'])
+    parser.add_argument('--import-rows', type=int, default=500, help='Rows of the synthetic 8a.nu CSV')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='Run only this scenario (can be given multiple times)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative p50 slowdown before flagging a regression')
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    bind = create_benchmark_engine(database_url)
+    if not database_is_empty(bind):
+        if not args.reset:
+            sys.exit(f"Database {bind.url.render_as_string(hide_password=True)} is not empty. "
+                     f"Use --reset to drop all tables first.")
+        Base.metadata.drop_all(bind=bind)
+
+    results = run_benchmarks(
+        bind,
+        scale={
+            'n_users': args.users,
+            'n_crags': args.crags,
+            'n_routes': args.routes,
+            'ascents_per_user': args.ascents_per_user,
+            'main_user_ascents': args.main_user_ascents,
+        },
+        scenarios=args.scenario,
+        repeat=args.repeat,
+        warmup=args.warmup,
+        import_rows=args.import_rows,
+        seed=args.seed,
+        verbose=True
+    )
+    print_results(results)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        comparison = compare_results(load_results(args.compare), results, threshold=args.threshold)
+        print_comparison(comparison)
+        if any(row['regressed'] for row in comparison):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Capture the SQL emitted by a function and inspect its query plans.
+
+SQLite plans come from EXPLAIN QUERY PLAN, PostgreSQL plans from EXPLAIN with
+sequential scans disabled, so that a "Seq Scan" only shows up if no index can
+serve the query at all (on small test tables Postgres would otherwise always
+prefer a sequential scan).
+"""
+
+import re
+
+from climbingdb.benchmarks.runner import QueryCounter
+
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+_ALIAS_SUFFIX = re.compile(r"_\d+$")
+
+
+def capture_statements(bind, fn):
+    """Run fn and return the (statement, parameters) of every SELECT it executed."""
+    with QueryCounter(bind) as counter:
+        fn()
+    return [(statement, parameters) for statement, parameters in counter.statements
+            if statement.lstrip().upper().startswith(("SELECT", "WITH"))]
+
+
+def explain(bind, statement, parameters):
+    """Return the query plan of a statement as a list of lines."""
+    with bind.connect() as connection:
+        if bind.dialect.name == 'sqlite':
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            return [row[-1] for row in rows]
+
+        if bind.dialect.name == 'postgresql':
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).fetchall()
+            connection.rollback()
+            return [row[0] for row in rows]
+
+    raise ValueError(f"Unsupported database dialect: {bind.dialect.name}")
+
+
+def full_table_scans(plan, tables=('ascents', 'routes'), dialect='sqlite'):
+    """
+    Tables out of tables that a plan reads completely.
+
+    In SQLite every SCAN step visits all rows of the table (also when it walks
+    a non-covering index to avoid sorting), whereas SEARCH steps use an index
+    lookup. Aliases like routes_1 are mapped back to their table name.
+    """
+    pattern = _POSTGRES_SCAN if dialect == 'postgresql' else _SQLITE_SCAN
+    scanned = set()
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match:
+            table = _ALIAS_SUFFIX.sub("", match.group(1))
+            if table in tables:
+                scanned.add(table)
+    return scanned
+
+
+def find_full_scans(bind, fn, tables=('ascents', 'routes')):
+    """
+    Run fn and explain every SELECT it issued.
+
+    Returns:
+        list of (statement, plan, scanned_tables) for statements that read one
+        of tables completely
+    """
+    offenders = []
+    for statement, parameters in capture_statements(bind, fn):
+        plan = explain(bind, statement, parameters)
+        scanned = full_table_scans(plan, tables, dialect=bind.dialect.name)
+        if scanned:
+            offenders.append((statement, plan, scanned))
+    return offenders
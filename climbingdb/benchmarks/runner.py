@@ -0,0 +1,360 @@
+"""
+Timed benchmark scenarios for the service-layer hot paths.
+
+Every scenario is run against a synthetic logbook (see synthetic.py) and
+reports latency percentiles and the number of SQL statements per run.
+"""
+
+import io
+import json
+import platform
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import matplotlib
+matplotlib.use("Agg")  # Benchmarks run headless
+import matplotlib.pyplot as plt
+import sqlalchemy
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.pool import StaticPool
+
+from climbingdb.models import Base, SessionLocal, User
+from climbingdb.services import ClimbingService
+from climbingdb.benchmarks.synthetic import generate_logbook, generate_8anu_csv
+
+
+DEFAULT_SCALE = {
+    'n_users': 20,
+    'n_crags': 200,
+    'n_routes': 5000,
+    'ascents_per_user': 500,
+    'main_user_ascents': 2000,
+}
+
+
+def create_benchmark_engine(database_url):
+    """Create an engine for the benchmark database (in-memory SQLite needs a shared connection)."""
+    if database_url in ('sqlite://', 'sqlite:///:memory:'):
+        return create_engine(database_url, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    connect_args = {'check_same_thread': False} if database_url.startswith('sqlite') else {}
+    return create_engine(database_url, connect_args=connect_args)
+
+
+@contextmanager
+def bind_sessions(bind):
+    """Temporarily point SessionLocal (and therefore all services and scripts) at another engine."""
+    previous = SessionLocal.kw.get('bind')
+    SessionLocal.configure(bind=bind)
+    try:
+        yield
+    finally:
+        SessionLocal.configure(bind=previous)
+
+
+class QueryCounter:
+    """Context manager recording every SQL statement executed on an engine."""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.bind, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, 'before_cursor_execute', self._on_execute)
+
+
+def _percentile(sorted_values, q):
+    """Percentile with linear interpolation between closest ranks."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def time_scenario(fn, bind, repeat=10, warmup=1):
+    """Run fn repeatedly and return latency percentiles [ms] and queries per run."""
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        with QueryCounter(bind) as counter:
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+
+    timings.sort()
+    return {
+        'runs': repeat,
+        'p50_ms': round(_percentile(timings, 50), 3),
+        'p90_ms': round(_percentile(timings, 90), 3),
+        'p99_ms': round(_percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': max(queries),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Scenarios: each factory gets the dataset context and returns a callable
+# ---------------------------------------------------------------------------
+
+def _filtered_routes(context):
+    def run():
+        ClimbingService(user_id=context['main_user_id']).get_filtered_routes(discipline="Sportclimb")
+    return run
+
+
+def _filtered_routes_area(context):
+    def run():
+        ClimbingService(user_id=context['main_user_id']).get_filtered_routes(
+            discipline="Sportclimb", area=context['busiest_area'])
+    return run
+
+
+def _filtered_routes_grade(context):
+    def run():
+        ClimbingService(user_id=context['main_user_id']).get_filtered_routes(
+            discipline="Sportclimb", grade="7a", operation=">=")
+    return run
+
+
+def _statistics(context):
+    def run():
+        ClimbingService(user_id=context['main_user_id']).get_statistics()
+    return run
+
+
+def _earned_badges(context):
+    from climbingdb.ui.achievements import get_earned_badges
+
+    def run():
+        get_earned_badges(ClimbingService(user_id=context['main_user_id']))
+    return run
+
+
+def _search_routes(context):
+    from climbingdb.ui.search import _search_routes
+
+    def run():
+        _search_routes(ClimbingService(user_id=context['main_user_id']), context['search_term'])
+    return run
+
+
+def _import_8a_csv(context):
+    from climbingdb.scripts.import_8anu import import_8a_csv
+
+    counter = iter(range(1_000_000))
+
+    def run():
+        # A fresh user per run so that no ascent is skipped as duplicate
+        session = SessionLocal()
+        user = User(username=f"bench_import_{next(counter)}", password_hash="x")
+        session.add(user)
+        session.commit()
+        user_id = user.id
+        session.close()
+
+        import_8a_csv(io.StringIO(context['eightanu_csv']), user_id)
+    return run
+
+
+def _add_ascent(context):
+    counter = iter(range(1_000_000))
+
+    def run():
+        ClimbingService(user_id=context['main_user_id']).add_ascent(
+            name=f"Benchmark Route {next(counter)}", grade="7a", discipline="Sportclimb",
+            crag_name="Benchmark Crag", area_name=context['busiest_area'], country_name="Germany",
+            style="o.s.", date="2024-06-01", stars=3)
+    return run
+
+
+def _grade_pyramid(context):
+    from climbingdb.visualizations import plot_grade_pyramid
+    from climbingdb.ui.constants import GRADE_OPTIONS_ROUTES
+
+    routes = ClimbingService(user_id=context['main_user_id']).get_filtered_routes(discipline="Sportclimb")
+
+    def run():
+        fig = plot_grade_pyramid(routes, grades=GRADE_OPTIONS_ROUTES[1:])
+        plt.close(fig)
+    return run
+
+
+def _format_routes_table(context):
+    from climbingdb.ui.display import format_routes_for_display
+
+    routes = ClimbingService(user_id=context['main_user_id']).get_filtered_routes(discipline=None)
+    # A 10k-row logbook regardless of the scale; the multipitch view exercises every column
+    routes = routes.sample(n=10_000, replace=True, random_state=0)
+
+    def run():
+        format_routes_for_display(routes, "Multipitch")
+    return run
+
+
+def _import_app(context):
+    from climbingdb.benchmarks.startup import probe_import
+
+    def run():
+        # Cold start: a fresh interpreter per run
+        probe_import('app')
+    return run
+
+
+SCENARIOS = {
+    'get_filtered_routes': _filtered_routes,
+    'get_filtered_routes_area': _filtered_routes_area,
+    'get_filtered_routes_grade': _filtered_routes_grade,
+    'get_statistics': _statistics,
+    'get_earned_badges': _earned_badges,
+    'search_routes': _search_routes,
+    'import_8a_csv': _import_8a_csv,
+    'add_ascent': _add_ascent,
+    'plot_grade_pyramid': _grade_pyramid,
+    'format_routes_table': _format_routes_table,
+    'import_app': _import_app,
+}
+
+
+def database_is_empty(bind):
+    """True if none of the model tables exist or all of them are empty."""
+    existing = set(inspect(bind).get_table_names())
+    with bind.connect() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name in existing and connection.execute(
+                    sqlalchemy.select(sqlalchemy.func.count()).select_from(table)).scalar():
+                return False
+    return True
+
+
+def run_benchmarks(bind, scale=None, scenarios=None, repeat=10, warmup=1,
+                   import_rows=500, seed=42, verbose=False):
+    """
+    Generate a synthetic logbook in the (empty) database behind bind and time all scenarios.
+
+    Returns:
+        dict with metadata, the generated dataset sizes and per-scenario results,
+        ready to be dumped as JSON.
+    """
+    scale = {**DEFAULT_SCALE, **(scale or {})}
+    names = scenarios or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with bind_sessions(bind):
+        Base.metadata.create_all(bind=bind)
+
+        if verbose:
+            print("Generating synthetic logbook...")
+        start = time.perf_counter()
+        session = SessionLocal()
+        try:
+            context = generate_logbook(session, seed=seed, **scale)
+        finally:
+            session.close()
+        generation_seconds = time.perf_counter() - start
+        context['eightanu_csv'] = generate_8anu_csv(n_rows=import_rows, seed=seed)
+
+        results = {}
+        for name in names:
+            if verbose:
+                print(f"  {name}...")
+            results[name] = time_scenario(SCENARIOS[name](context), bind, repeat=repeat, warmup=warmup)
+
+    dataset = {key: value for key, value in context.items()
+               if key in ('countries', 'areas', 'crags', 'routes', 'pitches', 'users', 'ascents', 'pitch_ascents')}
+
+    return {
+        'metadata': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'dialect': bind.dialect.name,
+            'database': bind.url.render_as_string(hide_password=True),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'seed': seed,
+            'repeat': repeat,
+            'warmup': warmup,
+            'scale': {**scale, 'import_rows': import_rows},
+            'generation_seconds': round(generation_seconds, 2),
+        },
+        'dataset': dataset,
+        'scenarios': results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Compare two benchmark result dicts by median latency and query count.
+
+    Returns:
+        list of dicts, one per scenario present in both results; 'regressed' is
+        True if p50 got slower by more than threshold or more queries are issued.
+    """
+    comparison = []
+    for name, result in current['scenarios'].items():
+        if name not in baseline['scenarios']:
+            continue
+        before = baseline['scenarios'][name]
+        ratio = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('inf')
+        comparison.append({
+            'scenario': name,
+            'baseline_p50_ms': before['p50_ms'],
+            'current_p50_ms': result['p50_ms'],
+            'ratio': round(ratio, 3),
+            'baseline_queries': before['queries'],
+            'current_queries': result['queries'],
+            'regressed': ratio > 1 + threshold or result['queries'] > before['queries'],
+        })
+    return comparison
+
+
+def print_results(results):
+    """Print a table of scenario results."""
+    meta = results['metadata']
+    print("=" * 80)
+    print(f"Benchmarks on {meta['dialect']} ({meta['database']})")
+    print("Dataset: " + ", ".join(f"{k}={v}" for k, v in results['dataset'].items()))
+    print("=" * 80)
+    print(f"{'Scenario':28} {'p50 [ms]':>10} {'p90 [ms]':>10} {'p99 [ms]':>10} {'Queries':>8}")
+    for name, result in results['scenarios'].items():
+        print(f"{name:28} {result['p50_ms']:10.2f} {result['p90_ms']:10.2f} "
+              f"{result['p99_ms']:10.2f} {result['queries']:8}")
+
+
+def print_comparison(comparison):
+    """Print a comparison table and flag regressions."""
+    print(f"\n{'Scenario':28} {'Base p50':>10} {'Now p50':>10} {'Ratio':>7} {'Queries':>12}")
+    for row in comparison:
+        flag = "  <-- REGRESSION" if row['regressed'] else ""
+        queries = f"{row['baseline_queries']}->{row['current_queries']}"
+        print(f"{row['scenario']:28} {row['baseline_p50_ms']:10.2f} {row['current_p50_ms']:10.2f} "
+              f"{row['ratio']:7.2f} {queries:>12}{flag}")
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
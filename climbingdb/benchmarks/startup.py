@@ -0,0 +1,96 @@
+"""
+Cold start of the Streamlit app: import time of app.py in a fresh interpreter.
+
+Modules needed only by some pages (charts, the 8a.nu importer, snapshots) are
+imported on first use. A module of LAZY_MODULES that is loaded by 'import app'
+is a regression, as is a median import time above the budget.
+
+Run as:
+    python3 -m climbingdb.benchmarks.startup
+    python3 -m climbingdb.benchmarks.startup --repeat 10 --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from climbingdb.benchmarks.runner import _percentile
+
+LAZY_MODULES = [
+    'matplotlib',
+    'mpl_toolkits',
+    'country_converter',
+    'climbingdb.visualizations',
+    'climbingdb.scripts.import_8anu',
+    'climbingdb.services.snapshot',
+]
+
+# Directory of app.py
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+import_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{'import_ms': import_ms, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def probe_import(module='app'):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        tuple: (import time [ms], set of all modules loaded afterwards)
+    """
+    result = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)],
+                            cwd=APP_DIR, capture_output=True, text=True, check=True)
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe['import_ms'], set(probe['modules'])
+
+
+def eagerly_loaded(modules, lazy_modules=LAZY_MODULES):
+    """The lazy modules (or their submodules) among the loaded ones."""
+    return sorted(name for name in lazy_modules
+                  if name in modules or any(module.startswith(f"{name}.") for module in modules))
+
+
+def measure_startup(repeat=5, module='app'):
+    """Median/max import time [ms] over repeat cold starts and the eagerly loaded lazy modules."""
+    timings, loaded = [], set()
+    for _ in range(repeat):
+        import_ms, modules = probe_import(module)
+        timings.append(import_ms)
+        loaded |= modules
+    timings.sort()
+    return {
+        'runs': repeat,
+        'p50_ms': round(_percentile(timings, 50), 1),
+        'max_ms': round(timings[-1], 1),
+        'eager_modules': eagerly_loaded(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the Streamlit app")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, help='Fail if the median import time exceeds this')
+    args = parser.parse_args()
+
+    result = measure_startup(repeat=args.repeat)
+    print(f"import app: p50 {result['p50_ms']:.0f} ms, max {result['max_ms']:.0f} ms ({result['runs']} runs)")
+
+    failures = []
+    if result['eager_modules']:
+        failures.append(f"imported at startup: {', '.join(result['eager_modules'])}")
+    if args.budget_ms and result['p50_ms'] > args.budget_ms:
+        failures.append(f"p50 above budget of {args.budget_ms:.0f} ms")
+    if failures:
+        sys.exit("REGRESSION: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
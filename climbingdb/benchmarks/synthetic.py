@@ -0,0 +1,260 @@
+"""
+Deterministic synthetic logbooks for benchmarking.
+
+The same seed always produces the same countries, areas, crags, routes,
+pitches, users and ascents, so timings from different runs (and different
+database backends) are comparable.
+"""
+
+import csv
+import io
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+from climbingdb.models import Country, Area, Crag, Route, Pitch, User, Ascent, PitchAscent
+
+
+COUNTRIES = [
+    ("Germany", "DE"), ("France", "FR"), ("Spain", "ES"), ("Italy", "IT"),
+    ("Austria", "AT"), ("Switzerland", "CH"), ("Greece", "GR"), ("Norway", "NO"),
+    ("Czech Republic", "CZ"), ("United States", "US"), ("Slovenia", "SI"), ("Croatia", "HR")
+]
+
+# Grades without slash grades, ordered from easy to hard
+SPORT_GRADES = ["5a", "5b", "5c", "6a", "6a+", "6b", "6b+", "6c", "6c+", "7a", "7a+",
+                "7b", "7b+", "7c", "7c+", "8a", "8a+", "8b", "8b+", "8c", "8c+", "9a"]
+BOULDER_GRADES = ["4A", "4B", "4C", "5A", "5B", "5C", "6A", "6A+", "6B", "6B+", "6C", "6C+",
+                  "7A", "7A+", "7B", "7B+", "7C", "7C+", "8A", "8A+", "8B", "8B+", "8C"]
+
+_PREFIXES = ["Schwarze", "Grauer", "Hohe", "Wilde", "Rote", "Blaue", "Kleine", "Grosse",
+             "Alte", "Neue", "Sonnige", "Verlorene", "Stille", "Goldene", "Dunkle", "Helle"]
+_NOUNS = ["Wand", "Pfeiler", "Kante", "Platte", "Verschneidung", "Riss", "Dach", "Turm",
+          "Nadel", "Grotte", "Schlucht", "Zinne", "Kamin", "Rampe", "Bastion", "Mauer"]
+_ROUTE_WORDS = ["Atlantis", "Zombie", "Sonnenuhr", "Silbergeier", "Vertigo", "Odyssee",
+                "Nirvana", "Eclipse", "Phantom", "Zauberberg", "Mistral", "Tramontana",
+                "Kryptonit", "Fledermaus", "Orakel", "Labyrinth", "Chimaera", "Hydra"]
+
+SPORT_STYLES = [("", 0.6), ("o.s.", 0.2), ("F", 0.15), ("2. Go", 0.05)]
+BOULDER_STYLES = [("", 0.75), ("F", 0.25)]
+MULTIPITCH_STYLES = [("", 0.4), ("o.s.", 0.3), ("F", 0.1), ("followed", 0.2)]
+
+EIGHTANU_COLUMNS = ["name", "route_boulder", "difficulty", "type", "date", "rating",
+                    "perceived_hardness", "sits", "tries", "comment", "country_code",
+                    "area_name", "location_name", "sector_name"]
+
+
+def _weighted_choice(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def _pyramid_grade(rng, grades, max_index):
+    """Draw a grade below a climber's limit; each step down is more likely (grade pyramid)."""
+    offset = min(int(rng.expovariate(0.45)), max_index)
+    return grades[max_index - offset]
+
+
+def _random_date(rng, start=date(2010, 1, 1), days=5500):
+    return start + timedelta(days=rng.randrange(days))
+
+
+def _location_name(rng, used):
+    while True:
+        name = f"{rng.choice(_PREFIXES)} {rng.choice(_NOUNS)}"
+        if name not in used:
+            used.add(name)
+            return name
+        name = f"{name} {len(used)}"
+        if name not in used:
+            used.add(name)
+            return name
+
+
+def _route_name(rng, index):
+    return f"{rng.choice(_ROUTE_WORDS)} {rng.choice(_NOUNS)} {index}"
+
+
+def generate_logbook(session, n_users=20, n_crags=200, n_routes=5000,
+                     ascents_per_user=500, main_user_ascents=2000,
+                     multipitch_share=0.1, boulder_share=0.3, seed=42):
+    """
+    Populate an empty database with a synthetic climbing catalog and logbooks.
+
+    User 1 ("bench_main") gets a larger logbook, mirroring the demo user whose
+    logbook is served to most visitors.
+
+    Returns:
+        dict with the created row counts and a few handles used by the benchmark
+        scenarios (main user id, a search term, an area with many ascents).
+    """
+    rng = random.Random(seed)
+
+    countries = [Country(name=name, code=code) for name, code in COUNTRIES]
+    session.add_all(countries)
+
+    used_names = set()
+    n_areas = max(1, n_crags // 5)
+    areas = [Area(name=_location_name(rng, used_names), country=rng.choice(countries))
+             for _ in range(n_areas)]
+    session.add_all(areas)
+
+    crags = [Crag(name=_location_name(rng, used_names), area=rng.choice(areas))
+             for _ in range(n_crags)]
+    # Own generator: the catalog and logbooks stay the same as without coordinates
+    geo_rng = random.Random(seed + 1)
+    for crag in crags:
+        crag.parking_latitude = round(geo_rng.uniform(36.0, 62.0), 6)
+        crag.parking_longitude = round(geo_rng.uniform(-5.0, 25.0), 6)
+    session.add_all(crags)
+    session.flush()
+
+    routes = []
+    n_pitches = 0
+    for ii in range(n_routes):
+        roll = rng.random()
+        if roll < multipitch_share:
+            discipline, grades = "Multipitch", SPORT_GRADES
+        elif roll < multipitch_share + boulder_share:
+            discipline, grades = "Boulder", BOULDER_GRADES
+        else:
+            discipline, grades = "Sportclimb", SPORT_GRADES
+
+        grade_index = min(int(rng.triangular(0, len(grades), len(grades) * 0.35)), len(grades) - 1)
+        route = Route(
+            name=_route_name(rng, ii),
+            crag=rng.choice(crags),
+            discipline=discipline,
+            consensus_grade=grades[grade_index]
+        )
+
+        if rng.random() < 0.3:
+            # Within about 2 km of the crag's parking
+            route.latitude = round(route.crag.parking_latitude + rng.uniform(-0.02, 0.02), 6)
+            route.longitude = round(route.crag.parking_longitude + rng.uniform(-0.02, 0.02), 6)
+
+        if discipline == "Multipitch":
+            route.length = float(rng.randrange(100, 800, 10))
+            route.ernsthaftigkeit = rng.choice([None, None, "R", "X"])
+            for number in range(1, rng.randint(3, 12) + 1):
+                pitch_index = max(0, grade_index - rng.randint(0, 4))
+                route.pitches.append(Pitch(pitch_number=number, consensus_grade=grades[pitch_index],
+                                           length=route.length / 10))
+                n_pitches += 1
+
+        routes.append(route)
+
+    session.add_all(routes)
+    session.flush()
+
+    users = [User(username="bench_main", password_hash="x", email="bench_main@example.com")]
+    users += [User(username=f"bench_user_{ii}", password_hash="x") for ii in range(1, n_users)]
+    session.add_all(users)
+    session.flush()
+
+    area_index = {area.id: index for index, area in enumerate(areas)}
+    routes_by_area = defaultdict(list)
+    for route in routes:
+        routes_by_area[area_index[route.crag.area_id]].append(route)
+
+    n_ascents = 0
+    n_pitch_ascents = 0
+    for user_index, user in enumerate(users):
+        n = main_user_ascents if user_index == 0 else ascents_per_user
+        sport_limit = rng.randint(8, len(SPORT_GRADES) - 1)
+        boulder_limit = rng.randint(8, len(BOULDER_GRADES) - 1)
+
+        # Most climbers frequent a handful of home areas
+        home_areas = rng.sample(range(n_areas), k=min(n_areas, 4))
+        candidates = [r for index in home_areas for r in routes_by_area[index]]
+        if len(candidates) < n:
+            candidates = routes
+        picked = rng.sample(candidates, k=min(n, len(candidates)))
+
+        for route in picked:
+            if route.discipline == "Boulder":
+                grade = _pyramid_grade(rng, BOULDER_GRADES, boulder_limit)
+                style = _weighted_choice(rng, BOULDER_STYLES)
+            elif route.discipline == "Multipitch":
+                grade = _pyramid_grade(rng, SPORT_GRADES, max(0, sport_limit - 3))
+                style = _weighted_choice(rng, MULTIPITCH_STYLES)
+            else:
+                grade = _pyramid_grade(rng, SPORT_GRADES, sport_limit)
+                style = _weighted_choice(rng, SPORT_STYLES)
+
+            is_project = rng.random() < 0.05
+            ascent = Ascent(
+                user=user,
+                route=route,
+                grade=grade,
+                style=None if is_project else (style or None),
+                date=None if is_project else _random_date(rng),
+                stars=rng.randint(0, 5),
+                shortnote=rng.choice([None] * 8 + ["soft", "hard"]),
+                notes="Great moves, a bit polished at the start." if rng.random() < 0.3 else None,
+                is_project=is_project,
+                is_milestone=rng.random() < 0.01,
+                ascent_time=round(rng.uniform(2, 20), 1) if route.discipline == "Multipitch" else None
+            )
+
+            for pitch in route.pitches:
+                ascent.pitch_ascents.append(PitchAscent(pitch=pitch, grade=pitch.consensus_grade,
+                                                        led=rng.random() < 0.6))
+                n_pitch_ascents += 1
+
+            session.add(ascent)
+            n_ascents += 1
+
+        session.flush()
+
+    session.commit()
+
+    busiest_area = areas[max(range(n_areas), key=lambda index: len(routes_by_area[index]))]
+    return {
+        'countries': len(countries),
+        'areas': len(areas),
+        'crags': len(crags),
+        'routes': len(routes),
+        'pitches': n_pitches,
+        'users': len(users),
+        'ascents': n_ascents,
+        'pitch_ascents': n_pitch_ascents,
+        'main_user_id': users[0].id,
+        'busiest_area': busiest_area.name,
+        'search_term': _ROUTE_WORDS[0],
+    }
+
+
+def generate_8anu_csv(n_rows=500, seed=42):
+    """Return the content of a synthetic 8a.nu CSV export with n_rows ascents."""
+    rng = random.Random(seed)
+    used_names = set()
+    locations = [(_location_name(rng, used_names), rng.choice(COUNTRIES)[1]) for _ in range(max(1, n_rows // 20))]
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EIGHTANU_COLUMNS)
+    writer.writeheader()
+
+    for ii in range(n_rows):
+        is_boulder = rng.random() < 0.4
+        grades = BOULDER_GRADES if is_boulder else SPORT_GRADES
+        location, country_code = rng.choice(locations)
+        ascent_type = rng.choice(["rp", "rp", "rp", "f", "os", "go"])
+        writer.writerow({
+            'name': _route_name(rng, ii),
+            'route_boulder': "BOULDER" if is_boulder else "ROUTE",
+            'difficulty': _pyramid_grade(rng, grades, len(grades) - 4),
+            'type': ascent_type,
+            'date': f"{_random_date(rng).isoformat()}T00:00:00",
+            'rating': str(rng.randint(0, 5)),
+            'perceived_hardness': rng.choice(["", "", "", "soft", "hard"]),
+            'sits': "null",
+            'tries': str(rng.randint(1, 9)) if ascent_type == "rp" else "null",
+            'comment': rng.choice(["null", "null", "Nice one"]),
+            'country_code': country_code,
+            'area_name': "null",
+            'location_name': location,
+            'sector_name': "Unknown Sector"
+        })
+
+    return output.getvalue()
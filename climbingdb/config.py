@@ -7,6 +7,10 @@ DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{DATADIR}climbing.db')
 APP_BASE_URL = os.getenv('APP_BASE_URL', "http://localhost:8501/")
 REQUIRE_AUTH = os.getenv('REQUIRE_AUTH', 'true').lower() == 'true'
 SHOW_DEMO = os.getenv('SHOW_DEMO', 'false').lower() == 'true'
+LOGBOOK_CACHE_DIR = os.getenv('LOGBOOK_CACHE_DIR', DATADIR + "cache/")
+STRICT_LOADING = os.getenv('STRICT_LOADING', 'false').lower() == 'true'
+PARSE_CACHE_DIR = os.getenv('PARSE_CACHE_DIR') or None  # Parquet files of parsed uploads (off if unset)
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '2'))  # Concurrent background imports (one on SQLite)
 
 EIGHTANU_EXPORT_URL = "https://www.8a.nu/api/unification/ascent/v1/web/ascents/export-csv"
 
@@ -0,0 +1,157 @@
+"""
+Geohashes and distances for the route and crag coordinates.
+
+Routes and crags store the geohash of their coordinates in an indexed string
+column (see models/geo_sync.py). Points inside a bounding box share few geohash
+prefixes, so a box is covered by a handful of prefix ranges, each of which is a
+range scan on the B-tree index; the exact coordinates then refine the candidates.
+This works the same on SQLite and PostgreSQL and needs no spatial extension.
+"""
+
+import math
+
+GEOHASH_PRECISION = 9  # Stored geohash length, cells of about 5 m x 5 m
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+
+# A bounding box is covered by at most this many geohash cells (before merging adjacent ones)
+MAX_COVER_CELLS = 32
+
+# Levels (geohash precisions) of the map cluster pyramid, the finest cells are about 150 m wide
+CLUSTER_LEVELS = range(1, 8)
+
+
+def _bits(precision):
+    """Number of longitude and latitude bits of a geohash with precision characters."""
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+
+def _cell_index(lat, lon, precision):
+    """Column and row of the geohash cell containing (lat, lon)."""
+    lon_bits, lat_bits = _bits(precision)
+    x = min(int((lon + 180.0) / 360.0 * (1 << lon_bits)), (1 << lon_bits) - 1)
+    y = min(int((lat + 90.0) / 180.0 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    return x, y
+
+
+def _interleave(x, y, precision):
+    """Geohash bits of cell (x, y): longitude and latitude bits alternating, longitude first."""
+    lon_bits, lat_bits = _bits(precision)
+    value = 0
+    for i in range(5 * precision):
+        if i % 2 == 0:
+            lon_bits -= 1
+            bit = (x >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (y >> lat_bits) & 1
+        value = (value << 1) | bit
+    return value
+
+
+def _to_base32(value, precision):
+    return ''.join(BASE32[(value >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def encode(lat, lon, precision=GEOHASH_PRECISION):
+    """
+    Geohash of a coordinate.
+
+    Returns:
+        str of length precision, or None if a coordinate is missing
+    """
+    if lat is None or lon is None:
+        return None
+    x, y = _cell_index(lat, lon, precision)
+    return _to_base32(_interleave(x, y, precision), precision)
+
+
+def _cover_precision(south, west, north, east, max_cells, max_precision):
+    """Longest geohash precision (up to max_precision) at which the box spans at most max_cells cells."""
+    for precision in range(max_precision, 0, -1):
+        x0, y0 = _cell_index(south, west, precision)
+        x1, y1 = _cell_index(north, east, precision)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_cells:
+            return precision
+    return 1
+
+
+def cover(south, west, north, east, max_cells=MAX_COVER_CELLS, max_precision=GEOHASH_PRECISION):
+    """
+    Geohash prefix ranges covering a bounding box.
+
+    A box crossing the antimeridian (west > east) is covered in two parts.
+    Adjacent cells are merged into one range. With max_precision the ranges
+    also hold the geohash prefixes of that length in the box (cells of a level
+    of the map cluster pyramid).
+
+    Returns:
+        list of (low, high) strings: every geohash in the box has low <= geohash < high
+    """
+    if west > east:
+        return cover(south, west, north, 180.0, max_cells, max_precision) + \
+            cover(south, -180.0, north, east, max_cells, max_precision)
+
+    precision = _cover_precision(south, west, north, east, max_cells, max_precision)
+    x0, y0 = _cell_index(south, west, precision)
+    x1, y1 = _cell_index(north, east, precision)
+    cells = sorted(_interleave(x, y, precision) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = cell + 1
+        else:
+            ranges.append([cell, cell + 1])
+    # '~' sorts after every base32 character: the end of the last cell's prefix range
+    return [(_to_base32(low, precision), _to_base32(high - 1, precision) + '~') for low, high in ranges]
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    (south, west, north, east) of a box containing the circle around (lat, lon).
+
+    Longitudes wrap around the antimeridian (west > east); near the poles the box
+    covers all longitudes.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+    if delta_lon >= 180.0:
+        return south, -180.0, north, 180.0
+    west, east = lon - delta_lon, lon + delta_lon
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return south, west, north, east
+
+
+def cluster_level(zoom, tiles_across=4):
+    """
+    Cluster level for a web map zoom level (0: whole world in one 256 px tile).
+
+    The finest level at which a viewport of tiles_across tiles spans at most
+    32 cells of the level horizontally, so that a map shows a few hundred
+    clusters at most.
+    """
+    level = CLUSTER_LEVELS[0]
+    for candidate in CLUSTER_LEVELS:
+        lon_bits, _ = _bits(candidate)
+        if (1 << lon_bits) * tiles_across <= 32 * (1 << max(zoom, 0)):
+            level = candidate
+    return level
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances in km from (lat, lon) to arrays of coordinates."""
+    import numpy as np
+
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
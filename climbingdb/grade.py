@@ -1,3 +1,5 @@
+import bisect
+import math
 import re
 
 # The scale is transformed to an arbitrary scale which is based on the Australian scale
@@ -250,6 +252,21 @@ ALL_GRADE_SYSTEMS = {
 }
 
 
+
+def _bucket_bounds(grades):
+    """Sorted ole_grades of the full grades of a scale (not slash grades, nor sharing a value with one)."""
+    slash_grades = {ole_grade for name, ole_grade in grades.items() if '/' in name}
+    return sorted({ole_grade for name, ole_grade in grades.items() if '/' not in name} - slash_grades)
+
+
+# Filter buckets: the bucket of a grade reaches from its ole_grade up to the next
+# full grade, so it includes the slash grades and other intermediate values
+# (traverses) in between.
+GRADE_BUCKETS = {system: _bucket_bounds(grades) for system, grades in ALL_GRADE_SYSTEMS.items()}
+
+GRADE_OPERATIONS = ("==", "<=", ">=", "between")
+
+
 class Grade:
     def __init__(self, value):
         self.value = str(value)
@@ -364,3 +381,60 @@ class Grade:
                     return reverse_dict[available_grades[i]]
 
         return None
+
+    @staticmethod
+    def bucket_range(grade, system=None):
+        """
+        Half-open ole_grade interval [low, high) of a grade in a grading system.
+
+        E.g. French 6a covers 6a and 6a/6a+, but not 6a+. The top grade of a
+        system has no upper end (high is inf).
+
+        Args:
+            grade: Grade string
+            system: Grading system of the buckets (default: the scale of grade)
+
+        Returns:
+            tuple: (low, high)
+
+        Raises:
+            ValueError: for unknown grades or systems
+        """
+        grade = Grade(grade)
+        system = system or grade.get_scale()
+        if system not in GRADE_BUCKETS:
+            raise ValueError(f"Unknown grading system of grade {grade}")
+
+        low = grade.conv_grade()
+        if low == 0 and grade.value not in ALL_GRADE_SYSTEMS.get(grade.get_scale(), {}):
+            raise ValueError(f"Unknown grade {grade}")
+
+        bounds = GRADE_BUCKETS[system]
+        index = bisect.bisect_right(bounds, low)
+        return low, bounds[index] if index < len(bounds) else math.inf
+
+
+def grade_filter_range(grade, operation="=="):
+    """
+    ole_grade interval [low, high) of a grade filter, None for an open end.
+
+    Args:
+        grade: Grade string, for "between" a pair of grades (both included, in either order)
+        operation: One of GRADE_OPERATIONS
+
+    Returns:
+        tuple: (low, high)
+    """
+    if operation == "between":
+        lows, highs = zip(*(Grade.bucket_range(bound) for bound in grade))
+        low, high = min(lows), max(highs)
+    elif operation in GRADE_OPERATIONS:
+        low, high = Grade.bucket_range(grade)
+        if operation == "<=":
+            low = None
+        elif operation == ">=":
+            high = None
+    else:
+        raise ValueError(f"Unknown grade operation {operation}, use one of {GRADE_OPERATIONS}")
+
+    return low, None if high == math.inf else high
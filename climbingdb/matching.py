@@ -0,0 +1,136 @@
+"""
+Normalized names and fuzzy matching of route and location names.
+
+normalize_name() folds the spellings of a name that people (and 8a.nu) mix
+up: case, accents, punctuation and whitespace. Countries, areas, crags and
+routes store it in an indexed normalized_name column (see models/name_sync.py),
+so "Atrésie", "atresie" and "Atresie " are one route for every lookup.
+
+FuzzyMatcher resolves names that still differ, e.g. typos, in bulk: the
+candidates are split into blocks (the routes of one crag and discipline), an
+inverted trigram index picks the few candidates of a block that share most
+trigrams with a name, and only those are scored by edit distance. Resolving
+thousands of import rows never compares all pairs.
+"""
+
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Letters that don't decompose into a base letter and accents
+_TRANSLITERATIONS = str.maketrans({'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th',
+                                   'ı': 'i'})
+_APOSTROPHES = re.compile(r"['’`´]")
+_SEPARATORS = re.compile(r"[\W_]+")
+_NUMBERS = re.compile(r"\d+")
+
+MIN_SIMILARITY = 0.85  # Edit distance similarity of a fuzzy match
+MIN_FUZZY_LENGTH = 6  # Shorter normalized names only match exactly
+MAX_CANDIDATES = 5  # Candidates per name scored by edit distance
+
+
+def normalize_name(name):
+    """
+    Casefolded name without accents, apostrophes and punctuation, single-spaced.
+
+    Returns:
+        str, or None for None. A name of punctuation only is just casefolded.
+    """
+    if name is None:
+        return None
+    folded = name.casefold().translate(_TRANSLITERATIONS)
+    unaccented = ''.join(char for char in unicodedata.normalize('NFKD', folded) if not unicodedata.combining(char))
+    normalized = ' '.join(_SEPARATORS.sub(' ', _APOSTROPHES.sub('', unaccented)).split())
+    return normalized or name.casefold().strip()
+
+
+def trigrams(normalized):
+    """Trigrams of the words of a normalized name, padded like PostgreSQL's pg_trgm."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def edit_distance(a, b, max_distance=None):
+    """
+    Levenshtein distance of two strings.
+
+    With max_distance the computation stops as soon as the distance exceeds
+    it and returns max_distance + 1.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(a, b, max_distance=None):
+    """1 - edit distance / length of the longer string (1 for equal strings)."""
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    return 1.0 - edit_distance(a, b, max_distance) / longest
+
+
+class FuzzyMatcher:
+    """
+    Names (and a value each, e.g. a Route) grouped into blocks, matched exactly
+    by normalized name and otherwise by trigram candidates and edit distance.
+
+    Names with different numbers never match ("Projekt 1" and "Projekt 2").
+    """
+
+    def __init__(self, min_similarity=MIN_SIMILARITY, max_candidates=MAX_CANDIDATES):
+        self.min_similarity = min_similarity
+        self.max_candidates = max_candidates
+        self._exact = defaultdict(dict)  # block -> normalized name -> value
+        self._entries = defaultdict(list)  # block -> [(normalized name, value)]
+        self._postings = defaultdict(lambda: defaultdict(list))  # block -> trigram -> entry indices
+
+    def add(self, block, name, value):
+        """Add a name; the first value of a normalized name is kept."""
+        normalized = normalize_name(name)
+        if normalized in self._exact[block]:
+            return
+        self._exact[block][normalized] = value
+        entries = self._entries[block]
+        for gram in trigrams(normalized):
+            self._postings[block][gram].append(len(entries))
+        entries.append((normalized, value))
+
+    def match(self, block, name):
+        """The value of the same or the most similar name of a block, None if there is none."""
+        normalized = normalize_name(name)
+        exact = self._exact.get(block, {})
+        if normalized in exact:
+            return exact[normalized]
+        if len(normalized) < MIN_FUZZY_LENGTH or block not in self._entries:
+            return None
+
+        # Candidates sharing the most trigrams, found through the inverted index
+        postings = self._postings[block]
+        shared = Counter(index for gram in trigrams(normalized) for index in postings.get(gram, ()))
+        numbers = _NUMBERS.findall(normalized)
+
+        best, best_similarity = None, self.min_similarity
+        for index, _ in shared.most_common(self.max_candidates):
+            candidate, value = self._entries[block][index]
+            if _NUMBERS.findall(candidate) != numbers:
+                continue
+            max_distance = int((1 - best_similarity) * max(len(normalized), len(candidate)))
+            score = similarity(normalized, candidate, max_distance)
+            if score > best_similarity or (score == best_similarity and best is None):
+                best, best_similarity = value, score
+        return best
@@ -1,3 +1,16 @@
+"""
+Models of the climbing database.
+
+The *_sync modules and data_version keep derived columns and tables in sync
+from ORM events (imported below to register them). Core statements that bypass
+the ORM (upserts, bulk imports, merges) do not fire these events and keep the
+derived data in sync themselves: inserts set location_values(),
+geohash_values() and normalized_values(), and afterwards the statements call
+refresh_route_stats(), refresh_monthly_stats(), refresh_map_clusters() and
+bump_data_version() for the rows they touched (or the rebuild_*() functions
+after a large change).
+"""
+
 from .base import Base, engine, SessionLocal, get_session, init_db, drop_all
 from .country import Country
 from .area import Area
@@ -7,6 +20,17 @@ from .route import Route
 from .user import User
 from .ascent import Ascent
 from .pitchascent import PitchAscent
+from .route_stats import RouteStats
+from .monthly_stats import UserMonthStats
+from .map_cluster import MapCluster
+from .import_job import ImportJob
+from . import location_sync  # registers the Route location sync events
+from . import geo_sync  # registers the Route/Crag geohash sync events
+from . import name_sync  # registers the normalized name sync events
+from . import data_version  # registers the per-user data version bumps
+from . import route_stats_sync  # registers the route statistics refresh
+from . import monthly_stats_sync  # registers the monthly rollup refresh
+from . import map_cluster_sync  # registers the map cluster refresh
 
 __all__ = [
     'Base',
@@ -22,5 +46,9 @@ __all__ = [
     'User',
     'Pitch',
     'Ascent',
-    'PitchAscent'
+    'PitchAscent',
+    'RouteStats',
+    'UserMonthStats',
+    'MapCluster',
+    'ImportJob'
 ]
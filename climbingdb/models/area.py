@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -8,12 +8,20 @@ class Area(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(200), nullable=False, index=True)
+    normalized_name = Column(String(200))  # Of name (synced in name_sync.py)
     country_id = Column(Integer, ForeignKey('countries.id'), nullable=True, index=True)
     area_notes = Column(Text, nullable=True)
 
     country = relationship("Country", back_populates="areas")
     crags = relationship("Crag", back_populates="area", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Implied by the natural key below, kept from before the normalized names
+        Index('ix_areas_name_country', 'name', 'country_id', unique=True),
+        # Natural key of an area (upsert target in crud.get_or_create_area)
+        Index('ix_areas_normalized_country', 'normalized_name', 'country_id', unique=True),
+    )
+
     def __repr__(self):
         return f"<Area(id={self.id}, name='{self.name}')>"
 
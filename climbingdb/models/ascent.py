@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, Date, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date, Boolean, JSON, Index, case, func
+from sqlalchemy.orm import relationship, column_property
 
 from climbingdb.models.base import Base
 from climbingdb.models.mixins import AscentMixin, UpdateableMixin
@@ -20,8 +20,37 @@ class Ascent(Base, AscentMixin, UpdateableMixin):
     # Multipitch fields
     ascent_time = Column(Float, nullable=True)  # [hours]
 
+    # Hash of the 8a.nu export row the ascent was imported from (scripts/import_8anu.py)
+    source_fingerprint = Column(String(32))
+
     user = relationship("User", back_populates="ascents")
     route = relationship("Route", back_populates="ascents")
     pitch_ascents = relationship("PitchAscent", back_populates="ascent", cascade="all, delete-orphan")
 
-    _excluded_fields = {'id', 'user_id', 'route_id'}
+    _excluded_fields = {'id', 'user_id', 'route_id', 'sort_grade', 'source_fingerprint'}
+
+    __table_args__ = (
+        # Logbook lists: user's ascents/projects ordered or filtered by grade
+        Index('ix_ascents_user_project_grade', 'user_id', 'is_project', 'ole_grade'),
+        # Timelines and per-day aggregates (achievements)
+        Index('ix_ascents_user_date', 'user_id', 'date'),
+        # Duplicate check when logging an ascent
+        Index('ix_ascents_user_route', 'user_id', 'route_id'),
+        # Consensus grade/stars of a route
+        Index('ix_ascents_route_project', 'route_id', 'is_project'),
+        # Rows of a re-synced 8a.nu export that are imported already
+        Index('ix_ascents_user_fingerprint', 'user_id', 'source_fingerprint'),
+    )
+
+
+# Sort key of the logbook tables, computed in the query: soft ascents sort just below
+# their grade, hard ones just above
+SOFT_HARD_OFFSET = 1e-6
+
+Ascent.sort_grade = column_property(
+    Ascent.ole_grade + case(
+        (func.lower(Ascent.shortnote).contains('soft'), -SOFT_HARD_OFFSET),
+        (func.lower(Ascent.shortnote).contains('hard'), SOFT_HARD_OFFSET),
+        else_=0.0
+    )
+)
@@ -10,6 +10,8 @@ class Country(Base):
     id = Column(Integer, primary_key=True)
 
     name = Column(String(100), unique=True, nullable=False, index=True)
+    # Of name (synced in name_sync.py); natural key (upsert target in crud.get_or_create_country)
+    normalized_name = Column(String(100), unique=True, index=True)
     code = Column(String(2), unique=True, nullable=True)  # ISO country code (e.g., "DE", "US")
 
     # Relationships
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text, Index
 from sqlalchemy.orm import relationship
 from .base import Base
+from climbingdb.geo import GEOHASH_PRECISION
 
 
 class Crag(Base):
@@ -11,16 +12,25 @@ class Crag(Base):
 
     # Fields
     name = Column(String(200), nullable=False, index=True)
+    normalized_name = Column(String(200))  # Of name (synced in name_sync.py)
     area_id = Column(Integer, ForeignKey('areas.id'), nullable=False, index=True)
 
     crag_notes = Column(Text, nullable=True)
     parking_latitude = Column(Float, nullable=True)
     parking_longitude = Column(Float, nullable=True)
+    geohash = Column(String(GEOHASH_PRECISION), index=True)  # Of the parking coordinates (synced in geo_sync.py)
 
     # Relationships
     area = relationship("Area", back_populates="crags")
     routes = relationship("Route", back_populates="crag", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Implied by the natural key below, kept from before the normalized names
+        Index('ix_crags_name_area', 'name', 'area_id', unique=True),
+        # Natural key of a crag (upsert target in crud.get_or_create_crag)
+        Index('ix_crags_normalized_area', 'normalized_name', 'area_id', unique=True),
+    )
+
     def __repr__(self):
         return f"<Crag(id={self.id}, name='{self.name}', area='{self.area.name if self.area else None}')>"
 
@@ -0,0 +1,77 @@
+"""
+Per-user data version, bumped whenever what the user's logbook shows changes.
+
+Readers that keep a copy of a logbook (the precomputed logbook cache of the
+demo mode) compare User.data_version with the version of their copy to decide
+whether it is stale. The version is bumped once per flush for every user whose
+ascents or pitch ascents were inserted, changed or deleted, and for the users
+with ascents on routes or locations whose displayed fields changed.
+"""
+
+from sqlalchemy import event, select, update, or_
+from sqlalchemy.orm import Session
+
+from climbingdb.models.country import Country
+from climbingdb.models.area import Area
+from climbingdb.models.crag import Crag
+from climbingdb.models.route import Route
+from climbingdb.models.user import User
+from climbingdb.models.ascent import Ascent
+from climbingdb.models.pitchascent import PitchAscent
+from climbingdb.models.sync_helpers import changed
+
+# Fields shown in the logbook (consensus grades and stars are not)
+ROUTE_FIELDS = ('name', 'discipline', 'crag_id', 'length', 'ernsthaftigkeit')
+LOCATION_FIELDS = {
+    Crag: (('name', 'area_id'), Route.crag_id),
+    Area: (('name', 'country_id'), Route.area_id),
+    Country: (('name',), Route.country_id),
+}
+
+
+def bump_data_version(connection, user_ids=None):
+    """
+    Increment the data version of users.
+
+    Args:
+        connection: Connection (or Session) to execute on
+        user_ids: Ids or a SELECT of ids; None bumps all users
+    """
+    statement = update(User.__table__).values(data_version=User.__table__.c.data_version + 1)
+    if user_ids is not None:
+        statement = statement.where(User.__table__.c.id.in_(user_ids))
+    connection.execute(statement)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_logbooks(session, flush_context):
+    user_ids, ascent_ids, route_ids, locations = set(), set(), set(), []
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Ascent):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, PitchAscent):
+            ascent_ids.add(obj.ascent_id)
+        elif obj in session.dirty and isinstance(obj, Route) and changed(obj, *ROUTE_FIELDS):
+            route_ids.add(obj.id)
+        elif obj in session.dirty and type(obj) in LOCATION_FIELDS:
+            fields, route_column = LOCATION_FIELDS[type(obj)]
+            if changed(obj, *fields):
+                locations.append(route_column == obj.id)
+
+    conditions = []
+    if user_ids - {None}:
+        conditions.append(User.id.in_(user_ids - {None}))
+    if ascent_ids - {None}:
+        conditions.append(User.id.in_(select(Ascent.user_id).where(Ascent.id.in_(ascent_ids - {None}))))
+    if route_ids:
+        conditions.append(User.id.in_(select(Ascent.user_id).where(Ascent.route_id.in_(route_ids))))
+    if locations:
+        conditions.append(User.id.in_(select(Ascent.user_id).join(Ascent.route).where(or_(*locations))))
+
+    if conditions:
+        session.connection().execute(
+            update(User.__table__)
+            .where(or_(*conditions))
+            .values(data_version=User.__table__.c.data_version + 1)
+        )
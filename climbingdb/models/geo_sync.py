@@ -0,0 +1,78 @@
+"""
+Keep the geohash columns of routes and crags in sync with their coordinates.
+
+Route.geohash is the geohash of latitude/longitude, Crag.geohash the one of the
+parking coordinates (climbingdb/geo.py). They are set whenever a route or crag
+is inserted or its coordinates change. repair_geohashes() recomputes all of
+them, e.g. after changes made with raw SQL.
+"""
+
+from sqlalchemy import event, select, update, bindparam
+
+from climbingdb.geo import encode
+from climbingdb.models.crag import Crag
+from climbingdb.models.route import Route
+from climbingdb.models.sync_helpers import changed
+
+# Coordinate columns of each table with a geohash
+GEOHASH_COORDINATES = {
+    'routes': ('latitude', 'longitude'),
+    'crags': ('parking_latitude', 'parking_longitude'),
+}
+
+
+def geohash_values(table_name, row):
+    """{'geohash': ...} of a row dict of routes or crags (empty for other tables)."""
+    if table_name not in GEOHASH_COORDINATES:
+        return {}
+    lat, lon = GEOHASH_COORDINATES[table_name]
+    return {'geohash': encode(row.get(lat), row.get(lon))}
+
+
+def _set_geohash(target, lat, lon):
+    target.geohash = encode(getattr(target, lat), getattr(target, lon))
+
+
+@event.listens_for(Route, 'before_insert')
+def _set_route_geohash(mapper, connection, target):
+    _set_geohash(target, *GEOHASH_COORDINATES['routes'])
+
+
+@event.listens_for(Route, 'before_update')
+def _update_route_geohash(mapper, connection, target):
+    if changed(target, *GEOHASH_COORDINATES['routes']):
+        _set_geohash(target, *GEOHASH_COORDINATES['routes'])
+
+
+@event.listens_for(Crag, 'before_insert')
+def _set_crag_geohash(mapper, connection, target):
+    _set_geohash(target, *GEOHASH_COORDINATES['crags'])
+
+
+@event.listens_for(Crag, 'before_update')
+def _update_crag_geohash(mapper, connection, target):
+    if changed(target, *GEOHASH_COORDINATES['crags']):
+        _set_geohash(target, *GEOHASH_COORDINATES['crags'])
+
+
+def repair_geohashes(connection, dry_run=False):
+    """
+    Recompute the geohashes of all routes and crags (computed in Python, one executemany per table).
+
+    Returns:
+        int: number of rows whose geohash was out of sync
+    """
+    count = 0
+    for model in (Route, Crag):
+        table = model.__table__
+        lat, lon = GEOHASH_COORDINATES[table.name]
+        rows = connection.execute(select(table.c.id, table.c[lat], table.c[lon], table.c.geohash)).all()
+        stale = [{'row_id': row.id, 'new_geohash': encode(row[1], row[2])}
+                 for row in rows if encode(row[1], row[2]) != row.geohash]
+        if stale and not dry_run:
+            connection.execute(
+                update(table).where(table.c.id == bindparam('row_id')).values(geohash=bindparam('new_geohash')),
+                stale
+            )
+        count += len(stale)
+    return count
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index
+from datetime import datetime, timezone
+
+from climbingdb.models.base import Base
+
+
+class ImportJob(Base):
+    """An import running in the background (see services/import_jobs.py), polled by the UI."""
+    __tablename__ = 'import_jobs'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    kind = Column(String(20), nullable=False)  # '8anu'
+    filename = Column(String(200))
+    sha256 = Column(String(64))  # Content hash of the file, recognizes re-uploads
+
+    status = Column(String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    total = Column(Integer)  # Rows to import, known once the file is parsed
+    processed = Column(Integer, nullable=False, default=0)
+    message = Column(String(200))  # Current row or reason of the failure
+    owner = Column(String(100))  # Process running the job (host:pid:token)
+    heartbeat_at = Column(DateTime)  # Last sign of life of the owner, refreshed while the job is active
+
+    imported = Column(Integer)
+    skipped = Column(Integer)
+    unchanged = Column(Integer)  # Rows imported by an earlier sync
+    updated = Column(Integer)  # Ascents updated to rows edited on 8a.nu
+    edited = Column(Integer)  # Rows edited on 8a.nu, ascents left as they are
+    errors = Column(JSON)  # List of error messages (truncated)
+
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # Latest and active jobs of a user
+        Index('ix_import_jobs_user_created', 'user_id', 'created_at'),
+        # Earlier imports of the same file
+        Index('ix_import_jobs_user_sha256', 'user_id', 'sha256'),
+    )
+
+    def __repr__(self):
+        return f"<ImportJob(id={self.id}, user_id={self.user_id}, status='{self.status}')>"
+
+    @property
+    def is_active(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def progress(self):
+        """Fraction of processed rows (0 while the file is parsed)."""
+        return self.processed / self.total if self.total else 0
@@ -0,0 +1,114 @@
+"""
+Keep the denormalized location columns of Route in sync with its crag.
+
+Route.crag_name/area_id/area_name/country_id/country_name are copies of the
+route's location, so that list views can filter and display routes without
+joining crags, areas and countries. They are set when a route is inserted or
+moved to another crag, and rewritten in bulk when a crag, area or country is
+renamed or moved. repair_route_locations() recomputes all of them, e.g. after
+changes made with raw SQL.
+"""
+
+from sqlalchemy import event, select, update, or_, func
+
+from climbingdb.models.country import Country
+from climbingdb.models.area import Area
+from climbingdb.models.crag import Crag
+from climbingdb.models.route import Route
+from climbingdb.models.sync_helpers import changed
+
+LOCATION_COLUMNS = ('crag_name', 'area_id', 'area_name', 'country_id', 'country_name')
+
+
+def _area_values(area):
+    country = area.country if area is not None else None
+    return {
+        'area_id': area.id if area is not None else None,
+        'area_name': area.name if area is not None else None,
+        'country_id': country.id if country is not None else None,
+        'country_name': country.name if country is not None else None,
+    }
+
+
+def location_values(crag):
+    """Denormalized location columns of a route in crag."""
+    values = {'crag_name': crag.name if crag is not None else None}
+    values.update(_area_values(crag.area if crag is not None else None))
+    return values
+
+
+@event.listens_for(Route, 'before_insert')
+def _set_route_location(mapper, connection, target):
+    for column, value in location_values(target.crag).items():
+        setattr(target, column, value)
+
+
+@event.listens_for(Route, 'before_update')
+def _update_route_location(mapper, connection, target):
+    if changed(target, 'crag', 'crag_id'):
+        _set_route_location(mapper, connection, target)
+
+
+@event.listens_for(Crag, 'after_update')
+def _propagate_crag(mapper, connection, target):
+    if changed(target, 'name', 'area', 'area_id'):
+        connection.execute(
+            update(Route.__table__)
+            .where(Route.__table__.c.crag_id == target.id)
+            .values(**location_values(target))
+        )
+
+
+@event.listens_for(Area, 'after_update')
+def _propagate_area(mapper, connection, target):
+    if changed(target, 'name', 'country', 'country_id'):
+        connection.execute(
+            update(Route.__table__)
+            .where(Route.__table__.c.area_id == target.id)
+            .values(**_area_values(target))
+        )
+
+
+@event.listens_for(Country, 'after_update')
+def _propagate_country(mapper, connection, target):
+    if changed(target, 'name'):
+        connection.execute(
+            update(Route.__table__)
+            .where(Route.__table__.c.country_id == target.id)
+            .values(country_name=target.name)
+        )
+
+
+def _source_columns():
+    """Correlated subqueries computing each location column from crags/areas/countries."""
+    routes, crags = Route.__table__, Crag.__table__
+    areas, countries = Area.__table__, Country.__table__
+
+    crag_of_route = crags.c.id == routes.c.crag_id
+    area_of_route = (areas.c.id == crags.c.area_id) & crag_of_route
+    country_of_route = (countries.c.id == areas.c.country_id) & area_of_route
+
+    return {
+        'crag_name': select(crags.c.name).where(crag_of_route).scalar_subquery(),
+        'area_id': select(crags.c.area_id).where(crag_of_route).scalar_subquery(),
+        'area_name': select(areas.c.name).where(area_of_route).scalar_subquery(),
+        'country_id': select(areas.c.country_id).where(area_of_route).scalar_subquery(),
+        'country_name': select(countries.c.name).where(country_of_route).scalar_subquery(),
+    }
+
+
+def repair_route_locations(connection, dry_run=False):
+    """
+    Recompute the denormalized location columns of all routes in one UPDATE.
+
+    Returns:
+        int: number of routes whose location columns were out of sync
+    """
+    routes = Route.__table__
+    source = _source_columns()
+    out_of_sync = or_(*[routes.c[column].is_distinct_from(source[column]) for column in LOCATION_COLUMNS])
+
+    count = connection.execute(select(func.count()).select_from(routes).where(out_of_sync)).scalar()
+    if count and not dry_run:
+        connection.execute(update(routes).where(out_of_sync).values(**source))
+    return count
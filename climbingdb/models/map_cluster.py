@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Float
+
+from climbingdb.models.base import Base
+
+
+class MapCluster(Base):
+    """Routes of one geohash cell at one level of the map pyramid (maintained in map_cluster_sync.py)."""
+    __tablename__ = 'map_clusters'
+
+    level = Column(Integer, primary_key=True)  # Geohash precision of the cell
+    cell = Column(String(12), primary_key=True)  # Geohash prefix, len(cell) == level
+
+    n_routes = Column(Integer, nullable=False)
+    latitude = Column(Float, nullable=False)  # Centroid of the routes, marker position
+    longitude = Column(Float, nullable=False)
+    south = Column(Float, nullable=False)  # Bounding box of the routes
+    west = Column(Float, nullable=False)
+    north = Column(Float, nullable=False)
+    east = Column(Float, nullable=False)
+
+    # Hardest route by consensus grade
+    top_route_id = Column(Integer)
+    top_route_name = Column(String(200))
+    top_grade = Column(String)
+    top_ole_grade = Column(Float)
+
+    def __repr__(self):
+        return f"<MapCluster(level={self.level}, cell='{self.cell}', n_routes={self.n_routes})>"
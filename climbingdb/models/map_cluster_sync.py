@@ -0,0 +1,189 @@
+"""
+Keep the map cluster pyramid (map_clusters) in sync with the route positions.
+
+A route sits at its own coordinates, or at the parking of its crag if it has
+none. At the finest level a cluster holds the routes of one geohash cell, every
+coarser level merges the clusters of its child cells (MapCluster), so a map
+gets one marker per cell at any zoom (geo.cluster_level()). A flush that adds,
+moves, deletes or regrades routes with a position, or moves a crag's parking,
+recomputes the finest cells of the old and new positions from their routes and
+then their parent cells from their children: a few range scans per level
+instead of a pass over the catalog; rebuild_map_clusters() recomputes the
+whole pyramid.
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import event, inspect, select, delete, insert, and_, or_
+from sqlalchemy.orm import Session
+
+from climbingdb.geo import CLUSTER_LEVELS
+from climbingdb.models.map_cluster import MapCluster
+from climbingdb.models.route import Route
+from climbingdb.models.crag import Crag
+from climbingdb.models.sync_helpers import chunks, changed
+
+FINEST_LEVEL = CLUSTER_LEVELS[-1]
+REFRESH_CHUNK_SIZE = 250  # Cells per statement (OR-ed ranges, well below the SQLite expression depth limit)
+
+# Fields that move a route on the map or change its cluster's top route
+ROUTE_FIELDS = ('latitude', 'longitude', 'crag_id', 'crag', 'name', 'consensus_grade')
+CRAG_FIELDS = ('parking_latitude', 'parking_longitude')
+
+
+def _in_cells(column, cells):
+    """Geohashes (or cells of a finer level) within one of the cells."""
+    # '~' sorts after every base32 character
+    return or_(*[and_(column >= cell, column < cell + '~') for cell in cells])
+
+
+def _positions(connection, cells=None):
+    """(id, name, consensus_grade, consensus_ole_grade, latitude, longitude, geohash) of the routes in cells."""
+    routes, crags = Route.__table__, Crag.__table__
+    route_columns = [routes.c.id, routes.c.name, routes.c.consensus_grade, routes.c.consensus_ole_grade]
+
+    own = select(*route_columns, routes.c.latitude, routes.c.longitude, routes.c.geohash)
+    at_parking = select(*route_columns, crags.c.parking_latitude, crags.c.parking_longitude, crags.c.geohash) \
+        .join(crags, crags.c.id == routes.c.crag_id).where(routes.c.geohash.is_(None))
+    if cells is None:
+        own = own.where(routes.c.geohash.is_not(None))
+        at_parking = at_parking.where(crags.c.geohash.is_not(None))
+    else:
+        own = own.where(_in_cells(routes.c.geohash, cells))
+        at_parking = at_parking.where(_in_cells(crags.c.geohash, cells))
+    return connection.execute(own).all() + connection.execute(at_parking).all()
+
+
+def _route_cluster(row):
+    route_id, name, grade, ole_grade, lat, lon, geohash = row
+    return {
+        'cell': geohash[:FINEST_LEVEL], 'n_routes': 1, 'latitude': lat, 'longitude': lon,
+        'south': lat, 'west': lon, 'north': lat, 'east': lon,
+        'top_route_id': route_id, 'top_route_name': name, 'top_grade': grade, 'top_ole_grade': ole_grade,
+    }
+
+
+def _top_key(cluster):
+    """Hardest route first, the oldest one among equal grades."""
+    return cluster['top_ole_grade'] is not None, cluster['top_ole_grade'] or 0, -cluster['top_route_id']
+
+
+def _merge(level, clusters):
+    """MapCluster rows (as dicts) of level, merging the finer clusters of each cell."""
+    cells = defaultdict(list)
+    for cluster in clusters:
+        cells[cluster['cell'][:level]].append(cluster)
+
+    merged = []
+    for cell, children in cells.items():
+        n_routes = sum(child['n_routes'] for child in children)
+        top = max(children, key=_top_key)
+        merged.append({
+            'level': level,
+            'cell': cell,
+            'n_routes': n_routes,
+            'latitude': sum(child['latitude'] * child['n_routes'] for child in children) / n_routes,
+            'longitude': sum(child['longitude'] * child['n_routes'] for child in children) / n_routes,
+            # Longitudes of a geohash cell don't wrap around the antimeridian
+            'south': min(child['south'] for child in children),
+            'west': min(child['west'] for child in children),
+            'north': max(child['north'] for child in children),
+            'east': max(child['east'] for child in children),
+            **{key: top[key] for key in ('top_route_id', 'top_route_name', 'top_grade', 'top_ole_grade')},
+        })
+    return merged
+
+
+def _replace(connection, level, cells, rows):
+    table = MapCluster.__table__
+    connection.execute(delete(table).where(table.c.level == level, table.c.cell.in_(cells)))
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+def refresh_map_clusters(connection, geohashes):
+    """
+    Recompute the clusters containing the given positions on every level.
+
+    Args:
+        connection: Connection (or Session) to execute on
+        geohashes: Geohashes of the old and new positions of the changed routes
+
+    Returns:
+        int: number of cluster rows written
+    """
+    table = MapCluster.__table__
+    geohashes = {geohash for geohash in geohashes if geohash}
+
+    written = 0
+    for chunk in chunks(sorted({geohash[:FINEST_LEVEL] for geohash in geohashes}), REFRESH_CHUNK_SIZE):
+        routes = [_route_cluster(row) for row in _positions(connection, chunk)]
+        written += _replace(connection, FINEST_LEVEL, chunk, _merge(FINEST_LEVEL, routes))
+
+    for level in reversed(CLUSTER_LEVELS[:-1]):
+        for chunk in chunks(sorted({geohash[:level] for geohash in geohashes}), REFRESH_CHUNK_SIZE):
+            children = connection.execute(
+                select(table).where(table.c.level == level + 1, _in_cells(table.c.cell, chunk))
+            ).mappings().all()
+            written += _replace(connection, level, chunk, _merge(level, children))
+    return written
+
+
+def rebuild_map_clusters(connection):
+    """
+    Recompute the whole pyramid from the positions of all routes.
+
+    Returns:
+        int: number of cluster rows
+    """
+    clusters = [_route_cluster(row) for row in _positions(connection)]
+    rows = []
+    for level in reversed(CLUSTER_LEVELS):
+        clusters = _merge(level, clusters)
+        rows += clusters
+
+    table = MapCluster.__table__
+    connection.execute(delete(table))
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_changed_clusters(session, flush_context):
+    geohashes, crag_ids = set(), set()
+
+    def add_position(route, state):
+        if route.geohash:
+            geohashes.add(route.geohash)
+        elif 'crag' in state.dict and route.crag is not None:
+            geohashes.add(route.crag.geohash)
+        else:
+            crag_ids.add(route.crag_id)
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Route):
+            add_position(obj, inspect(obj))
+        elif isinstance(obj, Crag):
+            geohashes.add(obj.geohash)
+    for obj in session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, Route) and changed(state, *ROUTE_FIELDS):
+            # Moved: the previous position (own or the previous crag's parking) changes as well
+            add_position(obj, state)
+            geohashes.update(state.attrs.geohash.history.deleted)
+            crag_ids.update(state.attrs.crag_id.history.deleted)
+            crag_ids.update(crag.id for crag in state.attrs.crag.history.deleted if crag is not None)
+        elif isinstance(obj, Crag) and changed(state, *CRAG_FIELDS):
+            geohashes.add(obj.geohash)
+            geohashes.update(state.attrs.geohash.history.deleted)
+
+    crag_ids.discard(None)
+    if crag_ids:
+        crags = Crag.__table__
+        geohashes.update(session.connection().execute(
+            select(crags.c.geohash).where(crags.c.id.in_(crag_ids))
+        ).scalars())
+    if geohashes - {None}:
+        refresh_map_clusters(session.connection(), geohashes)
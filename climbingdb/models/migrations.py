@@ -0,0 +1,405 @@
+"""
+Versioned schema migrations for existing databases.
+
+Databases created with an older version of the models are brought up to date
+by run_migrations(), which applies the pending migrations below in order and
+records each one in the schema_migrations table. Every migration is idempotent,
+so re-running it against a partially migrated database is safe. A new, empty
+database gets the complete schema of the models instead, with all migrations
+recorded as applied. Works for SQLite and PostgreSQL.
+
+Migrations that need the complete schema (final=True) run after all other
+pending migrations, whatever their version. These are the unique natural key
+indexes: rows sharing a key (e.g. "Chateau" and "Château" in one area) are
+first merged with the cleanup script's merge_duplicates(), which re-points
+their ascents and refreshes the derived tables.
+
+Run as:
+    python3 -m climbingdb.scripts.migrate
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, select, func, text
+from sqlalchemy.orm import Session
+
+from climbingdb.models.base import Base, engine
+from climbingdb.models.location_sync import LOCATION_COLUMNS, repair_route_locations
+from climbingdb.models.route_stats_sync import rebuild_route_stats
+from climbingdb.models.monthly_stats_sync import rebuild_monthly_stats
+from climbingdb.models.geo_sync import repair_geohashes
+from climbingdb.models.map_cluster_sync import rebuild_map_clusters
+from climbingdb.models.name_sync import NORMALIZED_TABLES, repair_normalized_names
+from climbingdb.scripts.cleanup import merge_duplicates
+
+
+# Kept out of Base.metadata: it describes the state of the schema, not the climbing data
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+MIGRATIONS = []
+FINAL_MIGRATIONS = set()
+
+
+class MigrationError(Exception):
+    """Raised when the data in the database prevents a migration from being applied."""
+
+
+def migration(version, description, final=False):
+    """
+    Register a migration function(connection) -> list of change descriptions.
+
+    final migrations are applied after all others (see the module docstring).
+    """
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        if final:
+            FINAL_MIGRATIONS.add(version)
+        MIGRATIONS.sort(key=lambda m: (m[0] in FINAL_MIGRATIONS, m[0]))
+        return fn
+    return register
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _model_index(name):
+    """Look up an Index declared on the models by name."""
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f"No index named {name} declared on the models")
+
+
+def create_indexes(connection, names):
+    """Create the named model indexes that don't exist yet. Returns the created names."""
+    inspector = inspect(connection)
+    created = []
+    for name in names:
+        index = _model_index(name)
+        existing = {ix['name'] for ix in inspector.get_indexes(index.table.name)}
+        if name not in existing:
+            index.create(connection)
+            created.append(f"created index {name}")
+    return created
+
+
+def add_columns(connection, table_name, names):
+    """Add the named model columns that don't exist yet (NOT NULL only with a string server_default)."""
+    table = Base.metadata.tables[table_name]
+    existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    added = []
+    for name in names:
+        if name not in existing:
+            column = table.c[name]
+            ddl = f"ALTER TABLE {table_name} ADD COLUMN {name} {column.type.compile(dialect=connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT '{column.server_default.arg}'"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            connection.execute(text(ddl))
+            added.append(f"added column {table_name}.{name}")
+    return added
+
+
+def create_tables(connection, names):
+    """Create the named model tables (with their indexes) that don't exist yet. Returns the created names."""
+    created = []
+    for name in names:
+        table = Base.metadata.tables[name]
+        if not inspect(connection).has_table(name):
+            table.create(connection)
+            created.append(f"created table {name}")
+    return created
+
+
+def drop_indexes(connection, table_name, names):
+    """Drop the named indexes of a table if they exist. Returns the dropped names."""
+    existing = {ix['name'] for ix in inspect(connection).get_indexes(table_name)}
+    dropped = []
+    for name in names:
+        if name in existing:
+            connection.execute(text(f"DROP INDEX {name}"))
+            dropped.append(f"dropped index {name}")
+    return dropped
+
+
+def count_duplicates(connection, table, columns):
+    """Number of groups of rows sharing the same values in columns."""
+    group = select(*[table.c[c] for c in columns]).group_by(*[table.c[c] for c in columns]) \
+        .having(func.count() > 1).subquery()
+    return connection.execute(select(func.count()).select_from(group)).scalar()
+
+
+def _duplicates(connection, natural_keys):
+    """Descriptions of the duplicate groups of each natural key of [(table name, columns)] that has any."""
+    found = []
+    for table_name, columns in natural_keys:
+        duplicates = count_duplicates(connection, Base.metadata.tables[table_name], columns)
+        if duplicates:
+            found.append(f"{duplicates} in {table_name} ({', '.join(columns)})")
+    return found
+
+
+def merge_duplicate_rows(connection, natural_keys):
+    """
+    Merge the rows sharing a natural key of [(table name, columns)] into their oldest row.
+
+    Runs cleanup.merge_duplicates() in the migration's transaction if any key
+    has duplicates. Returns the change descriptions.
+    """
+    if not _duplicates(connection, natural_keys):
+        return []
+    with Session(bind=connection) as session:
+        report = merge_duplicates(session)
+    return [f"merged {level['deleted']} duplicate {level['table']}" for level in report if level['deleted']]
+
+
+def check_duplicates(connection, natural_keys):
+    """Raise MigrationError if rows share a natural key of [(table name, columns)]."""
+    blocking = _duplicates(connection, natural_keys)
+    if blocking:
+        raise MigrationError(
+            f"Duplicate rows prevent the unique natural key indexes: {'; '.join(blocking)}. "
+            f"Inspect them with 'python3 -m climbingdb.scripts.cleanup' and merge them first."
+        )
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+@migration(1, "Single-column indexes (formerly scripts/add_indices.py)")
+def _single_column_indexes(connection):
+    return create_indexes(connection, [
+        'ix_ascents_user_id',
+        'ix_ascents_route_id',
+        'ix_ascents_is_project',
+        'ix_ascents_is_milestone',
+        'ix_ascents_date',
+        'ix_ascents_ole_grade',
+        'ix_pitchascents_ascent_id',
+        'ix_pitchascents_pitch_id',
+        'ix_routes_discipline',
+        'ix_routes_consensus_ole_grade',
+        'ix_routes_crag_id',
+        'ix_pitches_route_id',
+    ])
+
+
+@migration(2, "Composite logbook indexes")
+def _composite_indexes(connection):
+    changes = create_indexes(connection, [
+        'ix_ascents_user_project_grade',
+        'ix_ascents_user_date',
+        'ix_ascents_user_route',
+        'ix_ascents_route_project',
+    ])
+    # Superseded by ix_ascents_user_project_grade (same leading columns)
+    changes += drop_indexes(connection, 'ascents', ['ix_ascents_user_project'])
+    return changes
+
+
+@migration(3, "Denormalized location columns on routes")
+def _route_location_columns(connection):
+    changes = add_columns(connection, 'routes', LOCATION_COLUMNS)
+    changes += create_indexes(connection, [f"ix_routes_{column}" for column in LOCATION_COLUMNS])
+    repaired = repair_route_locations(connection)
+    if repaired:
+        changes.append(f"filled location columns of {repaired} routes")
+    return changes
+
+
+@migration(4, "Unique natural keys of countries, areas, crags, routes and pitches", final=True)
+def _unique_natural_keys(connection):
+    natural_keys = {
+        'ix_countries_name': ('countries', ['name']),
+        'ix_areas_name_country': ('areas', ['name', 'country_id']),
+        'ix_crags_name_area': ('crags', ['name', 'area_id']),
+        'ix_routes_crag_name_discipline': ('routes', ['crag_id', 'name', 'discipline']),
+        'ix_pitches_route_number': ('pitches', ['route_id', 'pitch_number']),
+    }
+
+    changes = merge_duplicate_rows(connection, natural_keys.values())
+    check_duplicates(connection, natural_keys.values())
+    return changes + create_indexes(connection, list(natural_keys))
+
+
+@migration(5, "Per-user data version of logbooks")
+def _user_data_version(connection):
+    return add_columns(connection, 'users', ['data_version'])
+
+
+@migration(6, "Per-route statistics table")
+def _route_stats(connection):
+    changes = create_tables(connection, ['route_stats'])
+    filled = rebuild_route_stats(connection)
+    if filled:
+        changes.append(f"computed statistics of {filled} routes")
+    return changes
+
+
+@migration(7, "Per-user monthly rollups")
+def _monthly_stats(connection):
+    changes = create_tables(connection, ['user_month_stats'])
+    filled = rebuild_monthly_stats(connection)
+    if filled:
+        changes.append(f"computed {filled} monthly rollups")
+    return changes
+
+
+@migration(8, "Geohash columns of route and crag coordinates")
+def _geohashes(connection):
+    changes = add_columns(connection, 'routes', ['geohash']) + add_columns(connection, 'crags', ['geohash'])
+    changes += create_indexes(connection, ['ix_routes_geohash', 'ix_crags_geohash'])
+    filled = repair_geohashes(connection)
+    if filled:
+        changes.append(f"computed geohashes of {filled} routes and crags")
+    return changes
+
+
+@migration(9, "Map cluster pyramid")
+def _map_clusters(connection):
+    changes = create_tables(connection, ['map_clusters'])
+    filled = rebuild_map_clusters(connection)
+    if filled:
+        changes.append(f"computed {filled} map clusters")
+    return changes
+
+
+@migration(10, "Background import jobs")
+def _import_jobs(connection):
+    return create_tables(connection, ['import_jobs'])
+
+
+@migration(11, "Content hash of imported files")
+def _import_hashes(connection):
+    changes = add_columns(connection, 'import_jobs', ['sha256'])
+    return changes + create_indexes(connection, ['ix_import_jobs_user_sha256'])
+
+
+@migration(12, "Source fingerprints of imported ascents")
+def _source_fingerprints(connection):
+    changes = add_columns(connection, 'ascents', ['source_fingerprint'])
+    changes += create_indexes(connection, ['ix_ascents_user_fingerprint'])
+    return changes + add_columns(connection, 'import_jobs', ['unchanged', 'updated', 'edited'])
+
+
+@migration(13, "Normalized names of locations and routes")
+def _normalized_names(connection):
+    changes = []
+    for table_name in NORMALIZED_TABLES:
+        changes += add_columns(connection, table_name, ['normalized_name'])
+    filled = repair_normalized_names(connection)
+    if filled:
+        changes.append(f"computed normalized names of {filled} rows")
+    # Their indexes are unique natural keys, created after merging the duplicates in migration 14
+    return changes
+
+
+@migration(14, "Unique normalized natural keys of countries, areas, crags and routes", final=True)
+def _unique_normalized_keys(connection):
+    # Databases that applied migration 13 before it became unique have plain indexes of the same names
+    natural_keys = {
+        'ix_countries_normalized_name': ('countries', ['normalized_name']),
+        'ix_areas_normalized_country': ('areas', ['normalized_name', 'country_id']),
+        'ix_crags_normalized_area': ('crags', ['normalized_name', 'area_id']),
+        'ix_routes_crag_normalized_discipline': ('routes', ['crag_id', 'normalized_name', 'discipline']),
+    }
+    changes = merge_duplicate_rows(connection, natural_keys.values())
+    check_duplicates(connection, natural_keys.values())
+
+    for name, (table_name, _) in natural_keys.items():
+        existing = {ix['name']: ix for ix in inspect(connection).get_indexes(table_name)}
+        if name in existing and not existing[name]['unique']:
+            changes += drop_indexes(connection, table_name, [name])
+    return changes + create_indexes(connection, list(natural_keys))
+
+
+@migration(15, "Owners and heartbeats of import jobs")
+def _import_job_owners(connection):
+    return add_columns(connection, 'import_jobs', ['owner', 'heartbeat_at'])
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def get_applied_versions(bind=engine):
+    """Versions recorded in schema_migrations (creates the table if missing)."""
+    migration_metadata.create_all(bind=bind, checkfirst=True)
+    with bind.connect() as connection:
+        return {row.version: row.applied_at for row in connection.execute(select(schema_migrations))}
+
+
+def get_pending_migrations(bind=engine):
+    applied = get_applied_versions(bind)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def _has_model_tables(bind):
+    """Whether any table of the models exists, i.e. the database is not new."""
+    inspector = inspect(bind)
+    return any(inspector.has_table(name) for name in Base.metadata.tables)
+
+
+def _record_migration(connection, version, description):
+    connection.execute(schema_migrations.insert().values(
+        version=version,
+        description=description,
+        applied_at=datetime.now(timezone.utc)
+    ))
+
+
+def _create_schema(bind, pending, verbose=False):
+    """Create the current schema in a new database and record the pending migrations as applied."""
+    with bind.begin() as connection:
+        Base.metadata.create_all(bind=connection)
+        for version, description, _ in pending:
+            _record_migration(connection, version, description)
+
+    if verbose:
+        print(f"Created the current schema, recorded migrations {', '.join(str(m[0]) for m in pending)}")
+    return [(version, description, ["created with the schema"]) for version, description, _ in pending]
+
+
+def run_migrations(bind=engine, dry_run=False, verbose=False):
+    """
+    Apply all pending migrations in order, each in its own transaction.
+
+    A database without any of the model tables gets the current schema in one
+    transaction instead (the migrations only alter existing tables).
+
+    Returns:
+        list of (version, description, changes) of the applied migrations
+    """
+    pending = get_pending_migrations(bind)
+    if pending and not dry_run and not _has_model_tables(bind):
+        return _create_schema(bind, pending, verbose=verbose)
+
+    applied = []
+    for version, description, fn in pending:
+        if verbose:
+            print(f"Migration {version}: {description}")
+        if dry_run:
+            applied.append((version, description, []))
+            continue
+
+        with bind.begin() as connection:
+            changes = fn(connection) or []
+            _record_migration(connection, version, description)
+
+        if verbose:
+            for change in changes or ["nothing to do"]:
+                print(f"  - {change}")
+        applied.append((version, description, changes))
+
+    return applied
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date
+
+from climbingdb.models.base import Base
+
+
+class UserMonthStats(Base):
+    """Ascents of a user in one month and discipline (maintained in monthly_stats_sync.py)."""
+    __tablename__ = 'user_month_stats'
+
+    # Primary key order serves the per-user timelines of one or all disciplines
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    discipline = Column(String(20), primary_key=True)
+    month = Column(Date, primary_key=True)  # First day of the month
+    month_index = Column(Integer, nullable=False)  # 12 * year + month - 1, for calendar windows
+
+    n_ascents = Column(Integer, nullable=False, default=0)  # Without projects
+    n_onsight = Column(Integer, nullable=False, default=0)
+    meters = Column(Float, nullable=False, default=0)  # Sum of the route lengths
+    v_points = Column(Integer, nullable=False, default=0)  # Boulders only
+    max_ole_grade = Column(Float)
+    median_ole_grade = Column(Float)
+
+    def __repr__(self):
+        return f"<UserMonthStats(user_id={self.user_id}, {self.discipline}, {self.month:%Y-%m}, n={self.n_ascents})>"
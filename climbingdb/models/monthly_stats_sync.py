@@ -0,0 +1,156 @@
+"""
+Keep the per-user monthly rollups (user_month_stats) in sync with the ascents.
+
+The timeline of a logbook (volume, meters, V-points and grades per month) is
+read from UserMonthStats instead of grouping all ascents on every render.
+Every flush that inserts, deletes or changes dated ascents recomputes the
+touched (user, month) rows from the ascents of just that month; changing the
+discipline or length of a route recomputes the months of its ascents;
+rebuild_monthly_stats() recomputes the whole table.
+"""
+
+from collections import defaultdict
+from datetime import date
+from statistics import median
+
+from sqlalchemy import event, inspect, select, delete, insert, and_, or_, false
+from sqlalchemy.orm import Session
+
+from climbingdb.models.monthly_stats import UserMonthStats
+from climbingdb.models.route import Route
+from climbingdb.models.ascent import Ascent
+from climbingdb.models.route_stats_sync import ONSIGHT_STYLE
+from climbingdb.models.sync_helpers import chunks, changed
+
+REFRESH_CHUNK_SIZE = 100  # (user, month) pairs per statement
+
+# Fields that move an ascent between months or change its month
+ASCENT_FIELDS = ('user_id', 'date', 'route_id', 'route', 'ole_grade', 'style', 'is_project')
+ROUTE_FIELDS = ('discipline', 'length')
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _ascent_rows(connection, condition):
+    """(user_id, date, discipline, ole_grade, style, length) of the dated, climbed ascents matching condition."""
+    ascents, routes = Ascent.__table__, Route.__table__
+    climbed = or_(ascents.c.is_project == false(), ascents.c.is_project.is_(None))
+    statement = select(
+        ascents.c.user_id, ascents.c.date, routes.c.discipline,
+        ascents.c.ole_grade, ascents.c.style, routes.c.length
+    ).join(routes, routes.c.id == ascents.c.route_id).where(climbed, ascents.c.date.is_not(None))
+    if condition is not None:
+        statement = statement.where(condition)
+    return connection.execute(statement).all()
+
+
+def _aggregate(rows):
+    """UserMonthStats rows (as dicts) of ascent rows from _ascent_rows()."""
+    groups = defaultdict(list)
+    for user_id, day, discipline, ole_grade, style, length in rows:
+        groups[(user_id, discipline, month_of(day))].append((ole_grade, style, length))
+
+    stats = []
+    for (user_id, discipline, month), ascents in groups.items():
+        grades = [ole_grade for ole_grade, _, _ in ascents if ole_grade is not None]
+        stats.append({
+            'user_id': user_id,
+            'discipline': discipline,
+            'month': month,
+            'month_index': 12 * month.year + month.month - 1,
+            'n_ascents': len(ascents),
+            'n_onsight': sum(style == ONSIGHT_STYLE for _, style, _ in ascents),
+            'meters': float(sum(length or 0 for _, _, length in ascents)),
+            # ole_grade of boulders is the V-grade
+            'v_points': sum(int(g) for g in grades if g > 0) if discipline == "Boulder" else 0,
+            'max_ole_grade': max(grades) if grades else None,
+            'median_ole_grade': float(median(grades)) if grades else None,
+        })
+    return stats
+
+
+def refresh_monthly_stats(connection, keys):
+    """
+    Recompute the rollups of the given months from their ascents.
+
+    Args:
+        connection: Connection (or Session) to execute on
+        keys: (user_id, month) pairs, month is any date within the month
+
+    Returns:
+        int: number of rollup rows written
+    """
+    table = UserMonthStats.__table__
+    ascents = Ascent.__table__
+    keys = sorted({(user_id, month_of(month)) for user_id, month in keys if user_id and month})
+
+    written = 0
+    for chunk in chunks(keys, REFRESH_CHUNK_SIZE):
+        in_months = or_(*[
+            and_(ascents.c.user_id == user_id, ascents.c.date >= month, ascents.c.date < _next_month(month))
+            for user_id, month in chunk
+        ])
+        rows = _aggregate(_ascent_rows(connection, in_months))
+
+        connection.execute(delete(table).where(or_(*[
+            and_(table.c.user_id == user_id, table.c.month == month) for user_id, month in chunk
+        ])))
+        if rows:
+            connection.execute(insert(table), rows)
+        written += len(rows)
+    return written
+
+
+def rebuild_monthly_stats(connection, user_ids=None):
+    """
+    Recompute all rollups of the given users (all users if None).
+
+    Returns:
+        int: number of rollup rows written
+    """
+    table = UserMonthStats.__table__
+    if user_ids is None:
+        condition, stale = None, delete(table)
+    else:
+        user_ids = list(user_ids)
+        condition = Ascent.__table__.c.user_id.in_(user_ids)
+        stale = delete(table).where(table.c.user_id.in_(user_ids))
+
+    rows = _aggregate(_ascent_rows(connection, condition))
+    connection.execute(stale)
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_changed_months(session, flush_context):
+    keys, route_ids = set(), set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Ascent):
+            keys.add((obj.user_id, obj.date))
+    for obj in session.dirty:
+        if isinstance(obj, Ascent) and changed(obj, *ASCENT_FIELDS):
+            # Moved to another month or user: the previous one changes as well
+            state = inspect(obj)
+            users = {obj.user_id, *state.attrs.user_id.history.deleted}
+            days = {obj.date, *state.attrs.date.history.deleted}
+            keys.update((user_id, day) for user_id in users for day in days)
+        elif isinstance(obj, Route) and changed(obj, *ROUTE_FIELDS):
+            route_ids.add(obj.id)
+
+    connection = session.connection() if keys or route_ids else None
+    if route_ids:
+        ascents = Ascent.__table__
+        keys.update(connection.execute(
+            select(ascents.c.user_id, ascents.c.date).distinct()
+            .where(ascents.c.route_id.in_(route_ids), ascents.c.date.is_not(None))
+        ).all())
+    if keys:
+        refresh_monthly_stats(connection, keys)
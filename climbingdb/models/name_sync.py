@@ -0,0 +1,61 @@
+"""
+Keep the normalized_name columns of countries, areas, crags and routes in sync with their names.
+
+normalized_name is climbingdb.matching.normalize_name() of name, set whenever a
+row is inserted or renamed. repair_normalized_names() recomputes all of them,
+e.g. after changes made with raw SQL or a change of the normalization.
+"""
+
+from sqlalchemy import event, inspect, select, update, bindparam
+
+from climbingdb.matching import normalize_name
+from climbingdb.models.country import Country
+from climbingdb.models.area import Area
+from climbingdb.models.crag import Crag
+from climbingdb.models.route import Route
+
+NORMALIZED_MODELS = (Country, Area, Crag, Route)
+NORMALIZED_TABLES = tuple(model.__tablename__ for model in NORMALIZED_MODELS)
+
+
+def normalized_values(table_name, row):
+    """{'normalized_name': ...} of a row dict of a table with names (empty for other tables)."""
+    if table_name not in NORMALIZED_TABLES:
+        return {}
+    return {'normalized_name': normalize_name(row.get('name'))}
+
+
+def _set_normalized_name(mapper, connection, target):
+    target.normalized_name = normalize_name(target.name)
+
+
+def _update_normalized_name(mapper, connection, target):
+    if inspect(target).attrs.name.history.has_changes():
+        target.normalized_name = normalize_name(target.name)
+
+
+for _model in NORMALIZED_MODELS:
+    event.listen(_model, 'before_insert', _set_normalized_name)
+    event.listen(_model, 'before_update', _update_normalized_name)
+
+
+def repair_normalized_names(connection, dry_run=False):
+    """
+    Recompute the normalized names of all countries, areas, crags and routes (one executemany per table).
+
+    Returns:
+        int: number of rows whose normalized name was out of sync
+    """
+    count = 0
+    for model in NORMALIZED_MODELS:
+        table = model.__table__
+        rows = connection.execute(select(table.c.id, table.c.name, table.c.normalized_name)).all()
+        stale = [{'row_id': row.id, 'new_name': normalize_name(row.name)}
+                 for row in rows if normalize_name(row.name) != row.normalized_name]
+        if stale and not dry_run:
+            connection.execute(
+                update(table).where(table.c.id == bindparam('row_id')).values(normalized_name=bindparam('new_name')),
+                stale
+            )
+        count += len(stale)
+    return count
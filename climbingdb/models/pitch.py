@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from climbingdb.models.base import Base
@@ -18,3 +18,8 @@ class Pitch(Base, RouteMixin, UpdateableMixin):
     pitch_ascents = relationship("PitchAscent", back_populates="pitch")
 
     _excluded_fields = {'id', 'route_id'}
+
+    __table_args__ = (
+        # Natural key of a pitch (upsert target in crud.get_or_create_pitch)
+        Index('ix_pitches_route_number', 'route_id', 'pitch_number', unique=True),
+    )
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
 from climbingdb.models.base import Base
 from climbingdb.models.mixins import RouteMixin, UpdateableMixin
+from climbingdb.geo import GEOHASH_PRECISION
 
 
 class Route(Base, RouteMixin, UpdateableMixin):
@@ -13,12 +14,21 @@ class Route(Base, RouteMixin, UpdateableMixin):
     name = Column(String(200), nullable=False, index=True)
     crag_id = Column(Integer, ForeignKey('crags.id'), nullable=False, index=True)
     discipline = Column(String(20), nullable=False, index=True)  # 'Sportclimb', 'Boulder', 'Multipitch'
+    normalized_name = Column(String(200))  # Of name (synced in name_sync.py)
+
+    # Denormalized location for join-free filtering and display (synced in location_sync.py)
+    crag_name = Column(String(200), index=True)
+    area_id = Column(Integer, index=True)
+    area_name = Column(String(200), index=True)
+    country_id = Column(Integer, index=True)
+    country_name = Column(String(100), index=True)
 
     first_ascent = Column(Date)
     first_ascensionist = Column(String)
 
     latitude = Column(Float)
     longitude = Column(Float)
+    geohash = Column(String(GEOHASH_PRECISION), index=True)  # Of latitude/longitude (synced in geo_sync.py)
 
     # Use DateTime instead of Date (-> with seconds)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -29,9 +39,19 @@ class Route(Base, RouteMixin, UpdateableMixin):
     crag = relationship("Crag", back_populates="routes")
     ascents = relationship("Ascent", back_populates="route", cascade="all, delete-orphan")
     pitches = relationship("Pitch", back_populates="route", cascade="all, delete-orphan")
+    stats = relationship("RouteStats", uselist=False, viewonly=True)  # Maintained in route_stats_sync.py
 
     # Excluded fields when updating in frontend
-    _excluded_fields = {'id', 'crag_id'}  # crag updated via relationship
+    _excluded_fields = {'id', 'crag_id',  # crag updated via relationship
+                        'crag_name', 'area_id', 'area_name', 'country_id', 'country_name', 'geohash',
+                        'normalized_name'}
+
+    __table_args__ = (
+        # Implied by the natural key below, kept from before the normalized names; also serves lookups by crag
+        Index('ix_routes_crag_name_discipline', 'crag_id', 'name', 'discipline', unique=True),
+        # Natural key of a route (upsert target in crud.get_or_create_route)
+        Index('ix_routes_crag_normalized_discipline', 'crag_id', 'normalized_name', 'discipline', unique=True),
+    )
 
     def __repr__(self):
         return f"<Route(id={self.id}, name='{self.name}', grade='{self.consensus_grade}', discipline='{self.discipline}')>"
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, ForeignKey, Date, JSON, Index
+
+from climbingdb.models.base import Base
+
+
+class RouteStats(Base):
+    """Ascent statistics of a route over all users (maintained in route_stats_sync.py)."""
+    __tablename__ = 'route_stats'
+
+    route_id = Column(Integer, ForeignKey('routes.id', ondelete='CASCADE'), primary_key=True)
+
+    n_ascents = Column(Integer, nullable=False, default=0)  # Without projects
+    n_projects = Column(Integer, nullable=False, default=0)
+    n_onsight = Column(Integer, nullable=False, default=0)
+    n_flash = Column(Integer, nullable=False, default=0)
+    n_soft = Column(Integer, nullable=False, default=0)  # Votes from the shortnote
+    n_hard = Column(Integer, nullable=False, default=0)
+    grade_votes = Column(JSON)  # {ole_grade: number of ascents}, keys are strings in JSON
+    last_ascent = Column(Date)
+
+    __table_args__ = (
+        # Search ranking by popularity
+        Index('ix_route_stats_n_ascents', 'n_ascents'),
+    )
+
+    def __repr__(self):
+        return f"<RouteStats(route_id={self.route_id}, n_ascents={self.n_ascents})>"
+
+    @property
+    def onsight_ratio(self):
+        return self.n_onsight / self.n_ascents if self.n_ascents else 0
+
+    @property
+    def flash_ratio(self):
+        return self.n_flash / self.n_ascents if self.n_ascents else 0
@@ -0,0 +1,116 @@
+"""
+Keep the route_stats table in sync with the ascents of each route.
+
+RouteStats holds what the public route pages need beyond the consensus grade
+and stars: number of ascents and projects, onsight/flash counts, soft/hard
+votes and the grade vote histogram. Every flush that inserts, deletes or
+changes ascents recomputes the rows of the touched routes from their ascents
+(one aggregate over ix_ascents_route_project per chunk of routes), so the
+counts cannot drift. Routes without ascents have no row; rebuild_route_stats()
+recomputes the whole table.
+"""
+
+from sqlalchemy import event, inspect, select, delete, insert, func, case, and_, or_, false
+from sqlalchemy.orm import Session
+
+from climbingdb.models.route_stats import RouteStats
+from climbingdb.models.ascent import Ascent
+from climbingdb.models.sync_helpers import chunks
+
+REFRESH_CHUNK_SIZE = 500
+
+# Ascent fields that the statistics depend on
+ASCENT_FIELDS = ('route_id', 'ole_grade', 'style', 'shortnote', 'is_project', 'date')
+
+ONSIGHT_STYLE = "o.s."
+FLASH_STYLE = "F"
+
+
+def _aggregates(connection, route_ids):
+    """RouteStats rows (as dicts) of the routes with ascents among route_ids (None: all routes)."""
+    ascents = Ascent.__table__
+    climbed = or_(ascents.c.is_project == false(), ascents.c.is_project.is_(None))
+    shortnote = func.lower(ascents.c.shortnote)
+
+    def count(condition):
+        return func.count(case((condition, 1)))
+
+    counts = select(
+        ascents.c.route_id,
+        count(climbed).label('n_ascents'),
+        count(~climbed).label('n_projects'),
+        count(and_(climbed, ascents.c.style == ONSIGHT_STYLE)).label('n_onsight'),
+        count(and_(climbed, ascents.c.style == FLASH_STYLE)).label('n_flash'),
+        count(and_(climbed, shortnote.contains('soft'))).label('n_soft'),
+        count(and_(climbed, shortnote.contains('hard'))).label('n_hard'),
+        func.max(case((climbed, ascents.c.date))).label('last_ascent'),
+    ).group_by(ascents.c.route_id)
+
+    votes = select(ascents.c.route_id, ascents.c.ole_grade, func.count()) \
+        .where(climbed, ascents.c.ole_grade.is_not(None)) \
+        .group_by(ascents.c.route_id, ascents.c.ole_grade)
+
+    if route_ids is not None:
+        counts = counts.where(ascents.c.route_id.in_(route_ids))
+        votes = votes.where(ascents.c.route_id.in_(route_ids))
+
+    rows = {row.route_id: dict(row._mapping, grade_votes={}) for row in connection.execute(counts)}
+    for route_id, ole_grade, n in connection.execute(votes):
+        rows[route_id]['grade_votes'][str(ole_grade)] = n
+    return list(rows.values())
+
+
+def refresh_route_stats(connection, route_ids):
+    """
+    Recompute the statistics of the given routes from their ascents.
+
+    Args:
+        connection: Connection (or Session) to execute on
+        route_ids: Ids of the routes (ids of deleted routes just drop their row)
+
+    Returns:
+        int: number of routes that have statistics afterwards
+    """
+    table = RouteStats.__table__
+    refreshed = 0
+    for chunk in chunks(sorted(set(route_ids) - {None}), REFRESH_CHUNK_SIZE):
+        rows = _aggregates(connection, chunk)
+        connection.execute(delete(table).where(table.c.route_id.in_(chunk)))
+        if rows:
+            connection.execute(insert(table), rows)
+        refreshed += len(rows)
+    return refreshed
+
+
+def rebuild_route_stats(connection):
+    """
+    Recompute the whole route_stats table with one aggregate over all ascents.
+
+    Returns:
+        int: number of routes with statistics
+    """
+    table = RouteStats.__table__
+    rows = _aggregates(connection, None)
+    connection.execute(delete(table))
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_changed_routes(session, flush_context):
+    route_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Ascent):
+            route_ids.add(obj.route_id)
+    for obj in session.dirty:
+        if isinstance(obj, Ascent):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in ASCENT_FIELDS + ('route',)):
+                # Moved to another route: the previous one changes as well
+                route_ids.add(obj.route_id)
+                route_ids.update(state.attrs.route_id.history.deleted)
+                route_ids.update(route.id for route in state.attrs.route.history.deleted if route is not None)
+
+    if route_ids - {None}:
+        refresh_route_stats(session.connection(), route_ids)
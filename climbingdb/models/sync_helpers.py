@@ -0,0 +1,18 @@
+"""
+Helpers shared by the sync modules (location_sync, geo_sync, data_version, ...).
+"""
+
+from sqlalchemy import inspect
+
+
+def chunks(values, size):
+    """Consecutive lists of at most size values (in the given order), one per statement."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def changed(target, *attributes):
+    """Whether the pending changes of an instance (or its InstanceState) touch any of attributes."""
+    state = inspect(target)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
@@ -28,6 +28,9 @@ class User(Base):
     show_statistics = Column(Boolean, default=True)
     show_notes = Column(Boolean, default=True)
 
+    # Bumped on every change of the user's logbook (see data_version.py)
+    data_version = Column(Integer, nullable=False, default=0, server_default='0')
+
     # Metadata
     created_at = Column(DateTime, default=datetime.now(timezone.utc))
     last_login = Column(DateTime)
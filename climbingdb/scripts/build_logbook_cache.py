@@ -0,0 +1,41 @@
+"""
+Build the memory-mapped logbook cache of a user (see services/logbook_cache.py).
+
+The app rebuilds a stale cache itself; building it ahead of deployment
+saves the first visitor of the demo logbook the wait.
+
+Run as:
+    python3 -m climbingdb.scripts.build_logbook_cache --username Lauchinger
+    python3 -m climbingdb.scripts.build_logbook_cache --username Lauchinger --cache-dir /tmp/cache/
+"""
+
+import argparse
+import time
+
+from climbingdb.config import LOGBOOK_CACHE_DIR
+from climbingdb.models import init_db
+from climbingdb.services.auth_service import AuthService
+from climbingdb.services.logbook_cache import build_logbook_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped logbook cache of a user")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--cache-dir', default=LOGBOOK_CACHE_DIR, help=f"Default: {LOGBOOK_CACHE_DIR}")
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    init_db()
+    user = AuthService().get_user_by_username(args.username)
+    if not user:
+        parser.exit(1, f"Error: User '{args.username}' not found\n")
+
+    metadata = build_logbook_cache(user.id, args.cache_dir)
+    statistics = metadata['statistics']
+    print(f"Cached '{args.username}' (data version {metadata['data_version']}) in {args.cache_dir}: "
+          f"{statistics['total_routes']} ascents, {statistics['total_projects']} projects")
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,108 +4,149 @@ Find and remove duplicates from database.
 Run as:
     python3 -m climbingdb.scripts.cleanup --dry-run
     python3 -m climbingdb.scripts.cleanup
+    python3 -m climbingdb.scripts.cleanup --merge --dry-run
+    python3 -m climbingdb.scripts.cleanup --merge
 """
 
 import argparse
 from collections import defaultdict
 
-from climbingdb.models import SessionLocal, Route, Country, Area, Crag, Ascent, User
+from sqlalchemy import and_, func, distinct, select, update, delete, case, inspect
+from sqlalchemy.orm import joinedload
+
+from climbingdb.models import SessionLocal, Route, Country, Area, Crag, Ascent, Pitch, PitchAscent
+from climbingdb.models.location_sync import repair_route_locations
+from climbingdb.models.data_version import bump_data_version
+from climbingdb.models.route_stats_sync import refresh_route_stats
+from climbingdb.models.monthly_stats_sync import rebuild_monthly_stats
+from climbingdb.models.map_cluster_sync import rebuild_map_clusters
+from climbingdb.models.sync_helpers import chunks
+from climbingdb.services.crud import update_consensus_fields
+
+
+# Location hierarchy from top to bottom: (model, foreign key to the level above)
+HIERARCHY = [
+    (Country, None),
+    (Area, Area.country_id),
+    (Crag, Crag.area_id),
+    (Route, Route.crag_id),
+    (Ascent, Ascent.route_id),
+]
 
 
 # ---------------------------------------------------------------------------
 # Generic duplicate finder
 # ---------------------------------------------------------------------------
 
-def _find_duplicates(session, model, key_fn):
+def _find_duplicates(session, model, key_columns, options=()):
     """
     Generic duplicate finder for any model.
 
+    Finds the duplicate keys with GROUP BY ... HAVING COUNT(*) > 1 and loads
+    only the members of those groups, so the table is never read into Python.
+
     Args:
         session: SQLAlchemy session
         model: SQLAlchemy model class
-        key_fn: Function that extracts the grouping key from an object
+        key_columns: Columns that identify a duplicate
+        options: Loader options for the group members (e.g. their parent)
 
     Returns:
         dict: {key: [list of objects]} - only includes groups with duplicates
     """
-    all_objects = session.query(model).all()
+    groups = session.query(*key_columns) \
+        .group_by(*key_columns) \
+        .having(func.count() > 1) \
+        .subquery()
+
+    # IS NOT DISTINCT FROM: NULL keys (e.g. areas without country) group like in GROUP BY
+    members = session.query(model) \
+        .join(groups, and_(*[column.is_not_distinct_from(groups.c[column.key]) for column in key_columns])) \
+        .options(*options) \
+        .order_by(model.id) \
+        .all()
 
-    grouped = defaultdict(list)
-    for obj in all_objects:
-        grouped[key_fn(obj)].append(obj)
+    duplicates = defaultdict(list)
+    for obj in members:
+        key = tuple(getattr(obj, column.key) for column in key_columns)
+        duplicates[key[0] if len(key) == 1 else key].append(obj)
+    return dict(duplicates)
 
-    return {key: objs for key, objs in grouped.items() if len(objs) > 1}
 
+# Locations and routes are duplicates if their names normalize alike (models/name_sync.py),
+# the natural keys of the unique indexes
 
 def find_duplicate_countries(session):
-    """Find countries with the same name."""
-    return _find_duplicates(session, Country, key_fn=lambda c: c.name)
+    """Find countries with the same normalized name."""
+    return _find_duplicates(session, Country, [Country.normalized_name])
 
 
 def find_duplicate_areas(session):
-    """Find areas with the same name and country_id."""
-    return _find_duplicates(session, Area, key_fn=lambda a: (a.name, a.country_id))
+    """Find areas with the same normalized name and country_id."""
+    return _find_duplicates(session, Area, [Area.normalized_name, Area.country_id],
+                            options=[joinedload(Area.country)])
 
 
 def find_duplicate_crags(session):
-    """Find crags with the same name and area_id."""
-    return _find_duplicates(session, Crag, key_fn=lambda c: (c.name, c.area_id))
+    """Find crags with the same normalized name and area_id."""
+    return _find_duplicates(session, Crag, [Crag.normalized_name, Crag.area_id],
+                            options=[joinedload(Crag.area)])
 
 
 def find_duplicate_routes(session):
-    return _find_duplicates(session, Route, key_fn=lambda r: (r.name, r.crag_id, r.discipline))
+    return _find_duplicates(session, Route, [Route.normalized_name, Route.crag_id, Route.discipline])
 
 
 def find_duplicate_ascents(session):
-    return _find_duplicates(session, Ascent, key_fn=lambda a: (a.user_id, a.route_id))
+    return _find_duplicates(session, Ascent, [Ascent.user_id, Ascent.route_id],
+                            options=[joinedload(Ascent.user), joinedload(Ascent.route)])
 
 
 # ---------------------------------------------------------------------------
 # Stats helpers
 # ---------------------------------------------------------------------------
 
-def _get_ascent_stats_for_routes(session, route_ids):
-    if not route_ids:
-        return 0, 0
-
-    ascents = session.query(Ascent).filter(
-        Ascent.route_id.in_(route_ids)
-    ).all()
-
-    ascent_count = len(ascents)
+def get_level_stats(session, model, ids=None, group_by=None):
+    """
+    Count everything below each row of a location level in one aggregate query.
 
-    usernames = [
-        u.username for u in
-        session.query(User).join(Ascent).filter(
-            Ascent.route_id.in_(route_ids)
-        ).distinct().all()
-    ] if route_ids else []
+    Outer-joins the levels below model (e.g. crags -> routes -> ascents) and
+    counts the distinct rows of each level plus the distinct users.
 
-    return ascent_count, usernames
+    Args:
+        session: SQLAlchemy session
+        model: Country, Area, Crag or Route
+        ids: Restrict to these rows (default: all rows of the level)
+        group_by: Columns of model to aggregate over instead of its id, e.g.
+                  the key of a duplicate group
 
+    Returns:
+        dict: {id or key tuple: {'areas': n, 'crags': n, 'routes': n, 'ascents': n, 'users': n}},
+              with the counts of the levels below model only
+    """
+    levels = [level for level, _ in HIERARCHY]
+    group_by = group_by or [model.id]
+    query = session.query(*group_by)
+    columns = []
 
-def _get_route_ids_for_crags(session, crag_ids):
-    """Get all route IDs for a list of crag IDs."""
-    return [
-        r.id for r in
-        session.query(Route.id).filter(Route.crag_id.in_(crag_ids)).all()
-    ]
+    parent = model
+    for child, foreign_key in HIERARCHY[levels.index(model) + 1:]:
+        query = query.outerjoin(child, foreign_key == parent.id)
+        columns.append(func.count(distinct(child.id)).label(child.__tablename__))
+        parent = child
+    columns.append(func.count(distinct(Ascent.user_id)).label('users'))
 
+    query = query.add_columns(*columns).group_by(*group_by)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
 
-def _get_crag_ids_for_areas(session, area_ids):
-    """Get all crag IDs for a list of area IDs."""
-    return [
-        c.id for c in
-        session.query(Crag.id).filter(Crag.area_id.in_(area_ids)).all()
-    ]
+    n_keys = len(group_by)
+    return {(row[0] if n_keys == 1 else tuple(row[:n_keys])): dict(zip(row._fields[n_keys:], row[n_keys:]))
+            for row in query.all()}
 
 
-def _get_area_ids_for_countries(session, country_ids):
-    """Get all area IDs for a list of country IDs."""
-    return [
-        a.id for a in
-        session.query(Area.id).filter(Area.country_id.in_(country_ids)).all()
-    ]
+def _format_stats(stats, labels, width=4):
+    return " | ".join(f"{label.capitalize()}: {stats.get(label, 0):{width}}" for label in labels)
 
 
 # ---------------------------------------------------------------------------
@@ -119,7 +160,7 @@ def _print_duplicates(duplicates, label, format_header_fn, format_item_fn):
     Args:
         duplicates: dict from find_duplicate_X()
         label: String label e.g. "countries", "areas", "crags"
-        format_header_fn: fn(key) → header string
+        format_header_fn: fn(key, objects) → header string
         format_item_fn: fn(obj) → item string
     """
     if not duplicates:
@@ -141,134 +182,74 @@ def _print_duplicates(duplicates, label, format_header_fn, format_item_fn):
     print(f"Total duplicate {label} to remove: {total_duplicates}")
 
 
-def print_duplicate_countries(duplicates, session):
-    """Print duplicate countries with ascent and user stats."""
+def _print_location_duplicates(duplicates, session, model, key_columns, label, header_fn, item_fn=None):
+    """Print duplicates of a location level with the stats of everything below them."""
+    ids = [obj.id for objects in duplicates.values() for obj in objects]
+    stats = get_level_stats(session, model, ids) if ids else {}
+    group_stats = get_level_stats(session, model, ids, group_by=key_columns) if ids else {}
+    labels = [level.__tablename__ for level, _ in HIERARCHY[[m for m, _ in HIERARCHY].index(model) + 1:]]
+    labels.append('users')
 
     def format_header(key, objects):
-        country_ids = [o.id for o in objects]
-        area_ids = _get_area_ids_for_countries(session, country_ids)
-        crag_ids = _get_crag_ids_for_areas(session, area_ids)
-        route_ids = _get_route_ids_for_crags(session, crag_ids)
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
+        return f"{header_fn(key, objects)} | {_format_stats(group_stats.get(key, {}), labels, width=0)}"
 
-        return (f"Country: '{key}' | "
-                f"Areas: {len(area_ids)} | "
-                f"Crags: {len(crag_ids)} | "
-                f"Ascents: {ascent_count} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
+    def format_item(obj):
+        prefix = f"ID: {obj.id:6}" + (f" | {item_fn(obj)}" if item_fn else "")
+        return f"{prefix} | {_format_stats(stats.get(obj.id, {}), labels)}"
 
-    def format_item(country):
-        area_ids = _get_area_ids_for_countries(session, [country.id])
-        crag_ids = _get_crag_ids_for_areas(session, area_ids)
-        route_ids = _get_route_ids_for_crags(session, crag_ids)
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
+    _print_duplicates(duplicates, label, format_header, format_item)
 
-        return (f"ID: {country.id:6} | "
-                f"Areas: {len(area_ids):3} | "
-                f"Crags: {len(crag_ids):3} | "
-                f"Ascents: {ascent_count:4} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
 
-    _print_duplicates(duplicates, "countries", format_header, format_item)
+def print_duplicate_countries(duplicates, session):
+    """Print duplicate countries with area, crag, ascent and user counts."""
+    _print_location_duplicates(duplicates, session, Country, [Country.normalized_name], "countries",
+                               header_fn=lambda key, objects: f"Country: '{objects[0].name}'")
 
 
 def print_duplicate_areas(duplicates, session):
-    """Print duplicate areas with ascent and user stats."""
-
-    def format_header(key, objects):
-        area_name, country_id = key
-        country = session.query(Country).filter(Country.id == country_id).first()
-        area_ids = [o.id for o in objects]
-        crag_ids = _get_crag_ids_for_areas(session, area_ids)
-        route_ids = _get_route_ids_for_crags(session, crag_ids)
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
-
-        return (f"Area: '{area_name}' | "
-                f"Country: {country.name if country else 'Unknown'} | "
-                f"Crags: {len(crag_ids)} | "
-                f"Ascents: {ascent_count} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
-
-    def format_item(area):
-        crag_ids = _get_crag_ids_for_areas(session, [area.id])
-        route_ids = _get_route_ids_for_crags(session, crag_ids)
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
+    """Print duplicate areas with crag, ascent and user counts."""
+    def header(key, objects):
+        country = objects[0].country
+        return f"Area: '{objects[0].name}' | Country: {country.name if country else 'Unknown'}"
 
-        return (f"ID: {area.id:6} | "
-                f"Crags: {len(crag_ids):3} | "
-                f"Ascents: {ascent_count:4} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
-
-    _print_duplicates(duplicates, "areas", format_header, format_item)
+    _print_location_duplicates(duplicates, session, Area, [Area.normalized_name, Area.country_id], "areas",
+                               header_fn=header)
 
 
 def print_duplicate_crags(duplicates, session):
-    """Print duplicate crags with ascent and user stats."""
-
-    def format_header(key, objects):
-        crag_name, area_id = key
-        area = session.query(Area).filter(Area.id == area_id).first()
-        crag_ids = [o.id for o in objects]
-        route_ids = _get_route_ids_for_crags(session, crag_ids)
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
-
-        return (f"Crag: '{crag_name}' | "
-                f"Area: {area.name if area else 'Unknown'} | "
-                f"Routes: {len(route_ids)} | "
-                f"Ascents: {ascent_count} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
-
-    def format_item(crag):
-        route_ids = _get_route_ids_for_crags(session, [crag.id])
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
+    """Print duplicate crags with route, ascent and user counts."""
+    def header(key, objects):
+        area = objects[0].area
+        return f"Crag: '{objects[0].name}' | Area: {area.name if area else 'Unknown'}"
 
-        return (f"ID: {crag.id:6} | "
-                f"Routes: {len(route_ids):4} | "
-                f"Ascents: {ascent_count:4} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
-
-    _print_duplicates(duplicates, "crags", format_header, format_item)
+    _print_location_duplicates(duplicates, session, Crag, [Crag.normalized_name, Crag.area_id], "crags",
+                               header_fn=header)
 
 
 def print_duplicate_routes(duplicates, session):
-    """Print duplicate routes with crag, area and user info."""
-    def format_header(key, objects):
-        name, crag_id, discipline = key
-        crag = session.query(Crag).filter(Crag.id == crag_id).first()
-        area = crag.area.name if crag and crag.area else "Unknown"
-        crag_name = crag.name if crag else "Unknown"
-        route_ids = [o.id for o in objects]
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, route_ids)
-
-        return (f"Route: '{name}' [{discipline}] | "
-                f"Crag: {crag_name} ({area}) | "
-                f"Ascents: {ascent_count} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
-
-    def format_item(route):
-        ascent_count, usernames = _get_ascent_stats_for_routes(session, [route.id])
+    """Print duplicate routes with crag, area, ascent and user counts."""
+    def header(key, objects):
+        _, _, discipline = key
+        route = objects[0]
+        return (f"Route: '{route.name}' [{discipline}] | "
+                f"Crag: {route.crag_name or 'Unknown'} ({route.area_name or 'Unknown'})")
 
-        return (f"ID: {route.id:6} | "
-                f"Grade: {route.consensus_grade or 'N/A':8} | "
-                f"Ascents: {ascent_count:3} | "
-                f"Users: {', '.join(usernames) if usernames else 'none'}")
-
-    _print_duplicates(duplicates, "routes", format_header, format_item)
+    _print_location_duplicates(duplicates, session, Route,
+                               [Route.normalized_name, Route.crag_id, Route.discipline],
+                               "routes", header_fn=header,
+                               item_fn=lambda route: f"Grade: {route.consensus_grade or 'N/A':8}")
 
 
 def print_duplicate_ascents(duplicates, session):
     """Print duplicate ascents with route, crag and user info."""
     def format_header(key, objects):
-        user_id, route_id = key
-        user = session.query(User).filter(User.id == user_id).first()
-        route = session.query(Route).filter(Route.id == route_id).first()
-        crag = route.crag if route else None
-        area = crag.area.name if crag and crag.area else "Unknown"
+        user = objects[0].user
+        route = objects[0].route
 
         return (f"User: {user.username if user else 'Unknown'} | "
                 f"Route: '{route.name if route else 'Unknown'}' "
                 f"[{route.discipline if route else 'Unknown'}] | "
-                f"Crag: {crag.name if crag else 'Unknown'} ({area})")
+                f"Crag: {route.crag_name if route else 'Unknown'} ({route.area_name if route else 'Unknown'})")
 
     def format_item(ascent):
         return (f"ID: {ascent.id:6} | "
@@ -280,16 +261,234 @@ def print_duplicate_ascents(duplicates, session):
     _print_duplicates(duplicates, "ascents", format_header, format_item)
 
 
-def cleanup_empty_crags(session, dry_run=True):
-    all_crags = session.query(Crag).order_by(Crag.name).all()
+# ---------------------------------------------------------------------------
+# Merge duplicates
+# ---------------------------------------------------------------------------
 
-    empty_crags = []
-    for crag in all_crags:
-        print("Getting info of crag: ", crag.name)
-        route_ids = _get_route_ids_for_crags(session, [crag.id])
-        ascent_count, _ = _get_ascent_stats_for_routes(session, route_ids)
-        if ascent_count == 0:
-            empty_crags.append((crag, len(route_ids)))
+# Levels in merge order: (model, natural key, [(child model, foreign key to model)]).
+# Merging a level can turn its children into duplicates (e.g. two areas of the
+# same name end up in one country), which the next level then merges.
+MERGE_LEVELS = [
+    (Country, [Country.normalized_name], [(Area, Area.country_id)]),
+    (Area, [Area.normalized_name, Area.country_id], [(Crag, Crag.area_id)]),
+    (Crag, [Crag.normalized_name, Crag.area_id], [(Route, Route.crag_id)]),
+    (Route, [Route.normalized_name, Route.crag_id, Route.discipline],
+     [(Ascent, Ascent.route_id), (Pitch, Pitch.route_id)]),
+    (Pitch, [Pitch.route_id, Pitch.pitch_number], [(PitchAscent, PitchAscent.pitch_id)]),
+]
+
+MERGE_CHUNK_SIZE = 500
+
+
+def _duplicate_id_groups(session, model, key_columns, where=None):
+    """{key: [ids]} of the duplicate groups of a table (optionally of the rows matching where), ids ascending."""
+    groups = select(*key_columns)
+    members = select(model.id, *key_columns)
+    if where is not None:
+        groups, members = groups.where(where), members.where(where)
+    groups = groups.group_by(*key_columns).having(func.count() > 1).subquery()
+    rows = session.execute(
+        members
+        .join(groups, and_(*[column.is_not_distinct_from(groups.c[column.key]) for column in key_columns]))
+        .order_by(model.id)
+    ).all()
+
+    id_groups = defaultdict(list)
+    for row in rows:
+        key = tuple(row[1:])
+        id_groups[key[0] if len(key) == 1 else key].append(row[0])
+    return dict(id_groups)
+
+
+def _merge_level(session, model, key_columns, children):
+    """
+    Merge the duplicate groups of one level into their oldest row (lowest id).
+
+    Re-points the children of the losers with one CASE-mapped UPDATE per child
+    table and chunk, then deletes the losers in bulk.
+
+    Returns:
+        dict: {'table', 'groups': [(key, survivor, losers)], 'repointed': {column: rows}, 'deleted': rows}
+    """
+    groups = _duplicate_id_groups(session, model, key_columns)
+    survivor_of = {loser: ids[0] for ids in groups.values() for loser in ids[1:]}
+    losers = list(survivor_of)
+
+    repointed = {}
+    for child, foreign_key in children:
+        count = 0
+        for chunk in chunks(losers, MERGE_CHUNK_SIZE):
+            result = session.execute(
+                update(child)
+                .where(foreign_key.in_(chunk))
+                .values({foreign_key: case({loser: survivor_of[loser] for loser in chunk}, value=foreign_key)})
+                .execution_options(synchronize_session=False)
+            )
+            count += result.rowcount
+        repointed[f"{child.__tablename__}.{foreign_key.key}"] = count
+
+    deleted = 0
+    for chunk in chunks(losers, MERGE_CHUNK_SIZE):
+        deleted += session.execute(
+            delete(model).where(model.id.in_(chunk)).execution_options(synchronize_session=False)
+        ).rowcount
+
+    return {
+        'table': model.__tablename__,
+        'groups': [(key, ids[0], ids[1:]) for key, ids in sorted(groups.items(), key=lambda x: str(x[0]))],
+        'repointed': repointed,
+        'deleted': deleted,
+    }
+
+
+# Ascents of one user on one route and day, like crud.create_ascent() and the imports treat them
+ASCENT_KEY = [Ascent.user_id, Ascent.route_id, Ascent.date]
+
+
+def _merge_ascents(session, route_ids):
+    """
+    Remove the duplicate ascents that merging routes left on route_ids, keeping the oldest of each group.
+
+    Two routes merged into one can leave a user with an ascent of each on the
+    same day. The newer ones are deleted with their pitch ascents.
+
+    Returns:
+        dict: level report like _merge_level, with the deleted pitch ascents
+    """
+    groups = {}
+    for chunk in chunks(route_ids, MERGE_CHUNK_SIZE):
+        groups.update(_duplicate_id_groups(session, Ascent, ASCENT_KEY, where=Ascent.route_id.in_(chunk)))
+    losers = [loser for ids in groups.values() for loser in ids[1:]]
+
+    pitch_ascents = deleted = 0
+    for chunk in chunks(losers, MERGE_CHUNK_SIZE):
+        pitch_ascents += session.execute(
+            delete(PitchAscent).where(PitchAscent.ascent_id.in_(chunk)).execution_options(synchronize_session=False)
+        ).rowcount
+        deleted += session.execute(
+            delete(Ascent).where(Ascent.id.in_(chunk)).execution_options(synchronize_session=False)
+        ).rowcount
+
+    return {
+        'table': Ascent.__tablename__,
+        'groups': [(key, ids[0], ids[1:]) for key, ids in sorted(groups.items(), key=lambda x: str(x[0]))],
+        'repointed': {},
+        'deleted': deleted,
+        'deleted_children': {PitchAscent.__tablename__: pitch_ascents},
+    }
+
+
+def _drop_natural_key_indexes(session):
+    """
+    Drop the existing unique indexes of the merged tables; returns them to be created again.
+
+    Re-pointing the children of a merged row can make them collide (two routes
+    of the same name in the surviving crag) before the next level merges them.
+    """
+    connection = session.connection()
+    inspector = inspect(connection)
+    dropped = []
+    for model, _, _ in MERGE_LEVELS:
+        existing = {ix['name'] for ix in inspector.get_indexes(model.__tablename__) if ix['unique']}
+        for index in model.__table__.indexes:
+            if index.unique and index.name in existing:
+                index.drop(connection)
+                dropped.append(index)
+    return dropped
+
+
+def merge_duplicates(session, dry_run=False):
+    """
+    Merge duplicate countries, areas, crags, routes and pitches in one transaction.
+
+    Every level is merged into its oldest row with bulk UPDATEs/DELETEs, and
+    the ascents that became duplicates on the merged routes (same user and
+    date) are removed with their pitch ascents. Then the consensus grade/stars of the surviving routes and pitches are recomputed
+    once, the denormalized route locations repaired and the route statistics
+    of the merged routes, the monthly rollups and the map clusters refreshed.
+    The unique natural key indexes are dropped for the merge and created again.
+    In a dry run the same work is done and rolled back, so the report shows
+    the exact diff.
+
+    Returns:
+        list of per-level reports (see _merge_level)
+    """
+    try:
+        indexes = _drop_natural_key_indexes(session)
+        report = [_merge_level(session, model, key_columns, children)
+                  for model, key_columns, children in MERGE_LEVELS]
+        routes = next(level for level in report if level['table'] == Route.__tablename__)
+        report.append(_merge_ascents(session, [survivor for _, survivor, _ in routes['groups']]))
+        for index in indexes:
+            index.create(session.connection())
+
+        survivors = {level['table']: [survivor for _, survivor, _ in level['groups']] for level in report}
+        objects = []
+        for model in [Route, Pitch]:
+            for chunk in chunks(survivors[model.__tablename__], MERGE_CHUNK_SIZE):
+                objects += session.query(model).filter(model.id.in_(chunk)).all()
+        update_consensus_fields(session, objects)
+        session.flush()
+
+        repair_route_locations(session.connection())
+        # Ascents of the merged routes now count for their survivors
+        refresh_route_stats(session, [route_id for _, survivor, losers in routes['groups']
+                                      for route_id in [survivor] + losers])
+        if any(level['deleted'] for level in report):
+            bump_data_version(session)  # Ascents of all users may point to merged rows
+        if routes['deleted']:
+            rebuild_monthly_stats(session)  # Merged routes may differ in length
+        if any(level['deleted'] for level in report if level['table'] in (Route.__tablename__, Crag.__tablename__)):
+            rebuild_map_clusters(session)  # Merged routes and crags may differ in position
+
+        if dry_run:
+            session.rollback()
+        else:
+            session.commit()
+        return report
+
+    except Exception:
+        session.rollback()
+        raise
+
+
+def print_merge_report(report, dry_run=False):
+    """Print the survivors, losers and re-pointed rows of each merged level."""
+    print(f"\n{'=' * 70}")
+    print(f"{'[DRY RUN] ' if dry_run else ''}Merge duplicates")
+    print(f"{'=' * 70}\n")
+
+    for level in report:
+        if not level['groups']:
+            print(f"✅ No duplicate {level['table']} found!")
+            continue
+
+        print(f"{level['table']}: {len(level['groups'])} groups, {level['deleted']} rows merged")
+        for key, survivor, losers in level['groups']:
+            print(f"  {key}: keep #{survivor}, merge {', '.join(f'#{loser}' for loser in losers)}")
+        for column, count in level['repointed'].items():
+            print(f"  - {column}: {count} rows re-pointed")
+        for table, count in level.get('deleted_children', {}).items():
+            print(f"  - {table}: {count} rows deleted")
+        print()
+
+    if dry_run:
+        print("[DRY RUN] No changes made.")
+
+
+def find_empty_crags(session):
+    """Crags without any ascent, as [(crag, route_count)]."""
+    stats = get_level_stats(session, Crag)
+    empty_ids = [crag_id for crag_id, counts in stats.items() if counts['ascents'] == 0]
+    if not empty_ids:
+        return []
+
+    crags = session.query(Crag).options(joinedload(Crag.area)).filter(Crag.id.in_(empty_ids)).all()
+    return [(crag, stats[crag.id]['routes']) for crag in crags]
+
+
+def cleanup_empty_crags(session, dry_run=True):
+    empty_crags = find_empty_crags(session)
 
     print(f"\n{'=' * 70}")
     print(f"Found {len(empty_crags)} crags with zero ascents:")
@@ -320,33 +519,34 @@ def cleanup_empty_crags(session, dry_run=True):
         print("Cleanup cancelled.")
         return 0
 
-    removed_crags = 0
-    removed_routes = 0
-
-    for crag, route_count in empty_crags:
-        print("Removing crag: ", crag.name)
-        # Delete routes first (cascade handles ascents/pitches)
-        route_ids = _get_route_ids_for_crags(session, [crag.id])
-        session.query(Route).filter(Route.id.in_(route_ids)).delete(
-            synchronize_session=False
-        )
-        session.delete(crag)
-        removed_crags += 1
-        removed_routes += route_count
+    # Bulk deletes bypass the ORM cascades: remove pitches and routes explicitly
+    # (there are no ascents or pitch ascents on these crags)
+    crag_ids = [crag.id for crag, _ in empty_crags]
+    route_ids = session.query(Route.id).filter(Route.crag_id.in_(crag_ids))
+    session.query(Pitch).filter(Pitch.route_id.in_(route_ids.scalar_subquery())) \
+        .delete(synchronize_session=False)
+    session.query(Route).filter(Route.crag_id.in_(crag_ids)).delete(synchronize_session=False)
+    session.query(Crag).filter(Crag.id.in_(crag_ids)).delete(synchronize_session=False)
 
     session.commit()
-    print(f"\n Removed {removed_crags} crags and {removed_routes} routes")
-    return removed_crags
+    print(f"\n Removed {len(empty_crags)} crags and {total_routes} routes")
+    return len(empty_crags)
 
 
 def main():
     parser = argparse.ArgumentParser(description='Find and remove duplicates')
     parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--merge', action='store_true',
+                        help='Merge duplicate countries, areas, crags, routes and pitches')
     args = parser.parse_args()
 
     session = SessionLocal()
 
     try:
+        if args.merge:
+            print_merge_report(merge_duplicates(session, dry_run=args.dry_run), dry_run=args.dry_run)
+            return
+
         #print_duplicate_countries(find_duplicate_countries(session), session)
         #print_duplicate_areas(find_duplicate_areas(session), session)
         print_duplicate_crags(find_duplicate_crags(session), session)
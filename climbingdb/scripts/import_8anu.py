@@ -1,12 +1,17 @@
 import pandas as pd
 import argparse
 import getpass
+import hashlib
+import json
+from collections import namedtuple
+from contextlib import nullcontext
 from datetime import datetime
-import country_converter as coco
+from functools import cache
 
 from climbingdb.models.base import get_session, init_db
 from climbingdb.services.crud import (
     load_existing_ascents,
+    load_ascent_fingerprints,
     load_existing_crags,
     load_existing_areas,
     load_existing_countries,
@@ -14,9 +19,15 @@ from climbingdb.services.crud import (
 )
 from climbingdb.services.auth_service import AuthService
 from climbingdb.models import Country, Crag, Area, Route, Ascent
+from climbingdb.matching import FuzzyMatcher, normalize_name
 
 
-COCO = coco.CountryConverter()
+@cache
+def _country_converter():
+    """Created on first use: loading its country table takes ~0.1 s."""
+    import country_converter as coco
+    return coco.CountryConverter()
+
 
 # Map of 8a.nu discipline to climbingdb discipline
 DISCIPLINE_MAP = {
@@ -31,6 +42,18 @@ STYLE_MAP = {
     'rp': ''
 }
 
+# Fields of a parsed row that make up its fingerprint. Not the area: it is
+# looked up in the database, the same row may resolve to another one later.
+FINGERPRINT_FIELDS = ('name', 'discipline', 'grade', 'style', 'date', 'stars', 'is_project',
+                      'shortnote', 'notes', 'country_name', 'crag_name')
+
+# Fields of an ascent taken from a row (the route and date identify the ascent)
+ASCENT_FIELDS = ('grade', 'style', 'stars', 'shortnote', 'notes', 'is_project')
+
+# Outcome of an import: the rows imported, updated, already in the logbook
+# (unchanged) and edited on 8a.nu but left as they are (edited)
+ImportResult = namedtuple('ImportResult', ['imported', 'skipped', 'errors', 'unchanged', 'updated', 'edited'])
+
 # 8a.nu perceived hardness to shortnote
 PERCEIVED_HARDNESS_MAP = {
     'soft': 'soft',
@@ -107,7 +130,7 @@ def _parse_country(row):
     if not country_code or country_code in ('null', ''):
         return None
     else:
-        return COCO.convert(country_code, to="name_short")
+        return _country_converter().convert(country_code, to="name_short")
 
 def _parse_crag(location_name, sector_name):
     crag_name = location_name
@@ -198,6 +221,19 @@ def parse_8anu_dataframe(df, populate_areas_from_database=True, verbose=False):
     return parsed_rows, skipped_rows, errors
 
 
+def row_fingerprint(parsed):
+    """Hash of a parsed row: stored on its ascent, a re-sync skips the rows it finds."""
+    values = json.dumps([parsed[field] for field in FINGERPRINT_FIELDS], default=str)
+    return hashlib.sha256(values.encode()).hexdigest()[:32]
+
+
+def new_or_edited_rows(session, user_id, parsed_rows):
+    """(parsed, fingerprint) of the rows whose fingerprint no ascent of the user has."""
+    known = load_ascent_fingerprints(session, user_id)
+    fingerprinted = ((parsed, row_fingerprint(parsed)) for parsed in parsed_rows)
+    return [(parsed, fingerprint) for parsed, fingerprint in fingerprinted if fingerprint not in known]
+
+
 def _build_crag_to_area_map(verbose=False):
     """Needed to look up the areas because 8a.nu apparently doesn't export the area, only crag."""
     with get_session() as session:
@@ -210,79 +246,112 @@ def _build_crag_to_area_map(verbose=False):
 
 
 def _create_if_missing_country(existing_countries, session, country_name):
-    """Create country if not in pre-loaded dict. Updates cache."""
-    country = existing_countries.get(country_name)
+    """Create country if not in pre-loaded dict (by normalized name). Updates cache."""
+    country = existing_countries.get(normalize_name(country_name))
     if not country:
         country = Country(name=country_name)
         session.add(country)
         session.flush()
-        existing_countries[country_name] = country
+        existing_countries[country.normalized_name] = country
     return country
 
 def _create_if_missing_area(existing_areas, session, area_name, country):
-    area = existing_areas.get(area_name)
+    area = existing_areas.get(normalize_name(area_name))
     if not area:
         area = Area(name=area_name, country=country)
         session.add(area)
         session.flush()
-        existing_areas[area_name] = area
+        existing_areas[area.normalized_name] = area
     return area
 
 def _create_if_missing_crag(existing_crags, session, crag_name, area):
-    crag = existing_crags.get(crag_name)
+    crag = existing_crags.get(normalize_name(crag_name))
     if not crag:
         crag = Crag(name=crag_name, area=area)
         session.add(crag)
         session.flush()
-        existing_crags[crag_name] = crag
+        existing_crags[crag.normalized_name] = crag
     return crag
 
-def _create_if_missing_route(existing_routes, session, name, discipline, crag, grade):
-    route = existing_routes.get((name, crag.id, discipline))
+def _create_if_missing_route(route_matcher, session, name, discipline, crag, grade):
+    """Same or most similar route of the crag and discipline (matching.FuzzyMatcher), else a new one."""
+    route = route_matcher.match((crag.id, discipline), name)
     if not route:
         route = Route(name=name, crag=crag, discipline=discipline, consensus_grade=grade)
         session.add(route)
         session.flush()
-        existing_routes[(name, crag.id, discipline)] = route
+        route_matcher.add((crag.id, discipline), name, route)
     return route
 
 
 def _load_existing_data(session, user_id, parsed_rows):
     """Load all existing data needed for 8a.nu import."""
-    country_names, area_names, crag_names, route_names = set(), set(), set(), set()
+    country_names, area_names, crag_names = set(), set(), set()
     for r in parsed_rows:
         country_names.add(r['country_name'])
         area_names.add(r['area_name'])
         crag_names.add(r['crag_name'])
-        route_names.add(r['name'])
 
     countries = load_existing_countries(session, country_names)
     areas = load_existing_areas(session, area_names)
     crags = load_existing_crags(session, crag_names)
-    routes = load_existing_routes(session, route_names)
     ascents = load_existing_ascents(session, user_id)
 
-    return countries, areas, crags, routes, ascents
+    # Routes are matched within their crag: only the routes of the known crags are candidates
+    route_matcher = FuzzyMatcher()
+    routes = load_existing_routes(session, crag_ids=[crag.id for crag in crags.values()])
+    for route in sorted(routes.values(), key=lambda route: route.id):
+        route_matcher.add((route.crag_id, route.discipline), route.name, route)
+
+    return countries, areas, crags, route_matcher, ascents
 
 
 def import_8a_csv(csv_file, user_id,
                   populate_areas_from_database=True, dry_run=False,
-                  progress_callback=None, verbose=False):
-    """Import 8a.nu CSV export into database."""
-    if verbose and type(csv_file) is str:
-        print(f"\nImporting 8a.nu data from {csv_file}...")
+                  progress_callback=None, verbose=False, session=None, parsed=None,
+                  update_existing=False):
+    """
+    Import 8a.nu CSV export into database.
 
-    df = pd.read_csv(csv_file, sep=',', header=0, keep_default_na=False, dtype=str)
+    Every ascent stores the fingerprint of its row (row_fingerprint()). A
+    re-sync of the full export looks the fingerprints up with one query and
+    only resolves the rows that are new or were edited on 8a.nu. An edited
+    row updates its ascent (same route and date) with update_existing, and
+    is left alone otherwise.
 
-    parsed_rows, skipped_rows, errors = parse_8anu_dataframe(df,
-        populate_areas_from_database=populate_areas_from_database, verbose=verbose)
+    Commits once at the end. A caller passing its own session (background
+    import jobs) keeps it open afterwards; progress_callback(current, total,
+    message) runs before each resolved row, so it may commit the rows
+    imported so far. With parsed, the (parsed_rows, skipped_rows, errors) of
+    a file parsed before (services/import_cache.py), csv_file isn't read.
 
-    with get_session() as session:
-        existing_countries, existing_areas, existing_crags, existing_routes, existing_ascents = (
-            _load_existing_data(session, user_id, parsed_rows))
+    Returns:
+        ImportResult(imported, skipped, errors, unchanged, updated, edited)
+    """
+    if parsed is not None:
+        parsed_rows, skipped_rows, errors = parsed
+        errors = list(errors)  # Import errors are appended, the parsed ones may be shared
+    else:
+        if verbose and type(csv_file) is str:
+            print(f"\nImporting 8a.nu data from {csv_file}...")
 
-        imported_count = 0
-        for ii, parsed in enumerate(parsed_rows):
+        df = pd.read_csv(csv_file, sep=',', header=0, keep_default_na=False, dtype=str)
+
+        parsed_rows, skipped_rows, errors = parse_8anu_dataframe(df,
+            populate_areas_from_database=populate_areas_from_database, verbose=verbose)
+
+    with nullcontext(session) if session is not None else get_session() as session:
+        changed_rows = new_or_edited_rows(session, user_id, parsed_rows)
+        unchanged_count = len(parsed_rows) - len(changed_rows)
+        if verbose:
+            print(f"  {unchanged_count} rows imported before, {len(changed_rows)} new or edited")
+
+        existing_countries, existing_areas, existing_crags, route_matcher, existing_ascents = (
+            _load_existing_data(session, user_id, [parsed for parsed, _ in changed_rows])
+            if changed_rows else ({}, {}, {}, FuzzyMatcher(), {}))
+
+        imported_count = updated_count = edited_count = 0
+        for ii, (parsed, fingerprint) in enumerate(changed_rows):
             try:
                 route_name = parsed['name']
 
@@ -294,19 +363,29 @@ def import_8a_csv(csv_file, user_id,
                     continue
 
                 if progress_callback:
-                    progress_callback(ii + 1, len(parsed_rows), route_name)
+                    progress_callback(ii + 1, len(changed_rows), route_name)
 
                 country = _create_if_missing_country(existing_countries, session, parsed['country_name'])
                 area = _create_if_missing_area(existing_areas, session, parsed['area_name'], country)
                 crag = _create_if_missing_crag(existing_crags, session, parsed['crag_name'], area)
-                route = _create_if_missing_route(existing_routes, session, route_name,
+                route = _create_if_missing_route(route_matcher, session, route_name,
                                                     parsed['discipline'], crag, parsed['grade'])
 
-                # Check for duplicate ascent (in-memory lookup)
+                # Existing ascent (in-memory lookup): imported before the fingerprints, or edited on 8a.nu
                 ascent_key = (route.id, parsed['date'])
-                if ascent_key in existing_ascents:
-                    progress_callback(ii + 1, len(parsed_rows), f"Skipping {route_name}")
-                    continue  # Skip duplicate
+                ascent = existing_ascents.get(ascent_key)
+                if ascent is not None:
+                    if all(getattr(ascent, field) == parsed[field] for field in ASCENT_FIELDS):
+                        ascent.source_fingerprint = fingerprint
+                        unchanged_count += 1
+                    elif update_existing:
+                        for field in ASCENT_FIELDS:
+                            setattr(ascent, field, parsed[field])
+                        ascent.source_fingerprint = fingerprint
+                        updated_count += 1
+                    else:
+                        edited_count += 1
+                    continue
 
                 ascent = Ascent(
                         user_id=user_id,
@@ -317,7 +396,8 @@ def import_8a_csv(csv_file, user_id,
                         stars=parsed['stars'],
                         shortnote=parsed['shortnote'],
                         notes=parsed['notes'],
-                        is_project=parsed['is_project']
+                        is_project=parsed['is_project'],
+                        source_fingerprint=fingerprint
                     )
                 session.add(ascent)
                 existing_ascents[ascent_key] = ascent
@@ -330,7 +410,7 @@ def import_8a_csv(csv_file, user_id,
 
         session.commit()  # ONE commit at the end (pushes everything to the database)
 
-    return imported_count, len(skipped_rows), errors
+    return ImportResult(imported_count, len(skipped_rows), errors, unchanged_count, updated_count, edited_count)
 
 
 def main():
@@ -340,6 +420,7 @@ def main():
     parser.add_argument('--username', required=True, help='Username to import data for')
     parser.add_argument('--email', help='Email for new user (optional)')
     parser.add_argument('--dry-run', action='store_true', help='Parse without writing to database')
+    parser.add_argument('--update', action='store_true', help='Update ascents edited on 8a.nu')
     args = parser.parse_args()
 
     print("=" * 60)
@@ -355,41 +436,45 @@ def main():
 
             auth = AuthService()
 
-            # Check if user exists
+            # Check if user exists (a re-sync imports only the new and edited rows)
             user = auth.get_user_by_username(args.username)
             if user:
                 print(f"  Found existing user: {args.username} (ID: {user.id})")
-                return user
+            else:
+                # Create new user
+                print(f"\nUser '{args.username}' not found. Creating new user...")
+                password = getpass.getpass("Password: ")
+                confirm = getpass.getpass("Confirm: ")
 
-            # Create new user
-            print(f"\nUser '{args.username}' not found. Creating new user...")
-            password = getpass.getpass("Password: ")
-            confirm = getpass.getpass("Confirm: ")
+                if password != confirm:
+                    raise ValueError("Passwords don't match!")
 
-            if password != confirm:
-                raise ValueError("Passwords don't match!")
-
-            success, message, user = auth.create_user(
-                username=args.username,
-                password=password,
-                email=args.email
-            )
+                success, message, user = auth.create_user(
+                    username=args.username,
+                    password=password,
+                    email=args.email
+                )
 
-            if not success:
-                raise ValueError(f"Failed to create user: {message}")
+                if not success:
+                    raise ValueError(f"Failed to create user: {message}")
 
-            print(f"  SUCCESS: {message} (ID: {user.id})")
+                print(f"  SUCCESS: {message} (ID: {user.id})")
 
-            imported, skipped, errors = import_8a_csv(
+            imported, skipped, errors, unchanged, updated, edited = import_8a_csv(
                 csv_file=args.file,
                 user_id=user.id,
-                dry_run=args.dry_run
+                dry_run=args.dry_run,
+                update_existing=args.update
             )
 
             print("\n" + "=" * 60)
             print("Import Summary")
             print("=" * 60)
             print(f"Imported:  {imported}")
+            print(f"Updated:   {updated}")
+            print(f"Unchanged: {unchanged}")
+            if edited:
+                print(f"Edited:    {edited} (on 8a.nu, rerun with --update to update them)")
             print(f"Skipped:   {skipped}")
             print(f"Errors:    {len(errors)}")
 
@@ -0,0 +1,129 @@
+"""
+Bring an existing database up to the current schema.
+
+Applies the pending migrations from climbingdb/models/migrations.py and
+reports the timings of a few representative queries before and after.
+
+Run as:
+    python3 -m climbingdb.scripts.migrate --status
+    python3 -m climbingdb.scripts.migrate --dry-run
+    python3 -m climbingdb.scripts.migrate
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from climbingdb.models import engine
+from climbingdb.models.migrations import (
+    MIGRATIONS,
+    MigrationError,
+    get_applied_versions,
+    run_migrations
+)
+
+
+PROBE_QUERIES = {
+    'Logbook by grade': """
+        SELECT ascents.id FROM ascents JOIN routes ON routes.id = ascents.route_id
+        WHERE ascents.user_id = :user_id AND ascents.is_project = :is_project
+          AND routes.discipline = 'Sportclimb'
+        ORDER BY ascents.ole_grade DESC""",
+    'Ascents by date': """
+        SELECT ascents.date, count(*) FROM ascents
+        WHERE ascents.user_id = :user_id AND ascents.date IS NOT NULL
+        GROUP BY ascents.date""",
+    'Route consensus': """
+        SELECT avg(ascents.ole_grade) FROM ascents
+        WHERE ascents.route_id = :route_id AND ascents.is_project = :is_project""",
+    'Route lookup': """
+        SELECT routes.id FROM routes
+        WHERE routes.crag_id = :crag_id AND routes.name = :name AND routes.discipline = :discipline""",
+}
+
+
+def _probe_parameters(connection):
+    """Parameters for the probe queries: the most active user and the route with most ascents."""
+    user_id = connection.execute(text(
+        "SELECT user_id FROM ascents GROUP BY user_id ORDER BY count(*) DESC LIMIT 1")).scalar()
+    route = connection.execute(text(
+        "SELECT routes.id, routes.crag_id, routes.name, routes.discipline FROM routes "
+        "JOIN ascents ON ascents.route_id = routes.id "
+        "GROUP BY routes.id, routes.crag_id, routes.name, routes.discipline "
+        "ORDER BY count(*) DESC LIMIT 1")).first()
+    if user_id is None or route is None:
+        return None
+    return {'user_id': user_id, 'route_id': route.id, 'crag_id': route.crag_id,
+            'name': route.name, 'discipline': route.discipline, 'is_project': False}
+
+
+def time_probe_queries(bind=engine, repeat=20):
+    """Median time [ms] of each probe query, or None if the database has no ascents."""
+    with bind.connect() as connection:
+        parameters = _probe_parameters(connection)
+        if parameters is None:
+            return None
+
+        timings = {}
+        for label, sql in PROBE_QUERIES.items():
+            query = text(sql)
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.execute(query, parameters).fetchall()
+                runs.append((time.perf_counter() - start) * 1000)
+            timings[label] = statistics.median(runs)
+        return timings
+
+
+def print_status(bind=engine):
+    applied = get_applied_versions(bind)
+    print(f"Database: {bind.url.render_as_string(hide_password=True)}")
+    for version, description, _ in MIGRATIONS:
+        state = f"applied {applied[version]:%Y-%m-%d %H:%M}" if version in applied else "pending"
+        print(f"  {version:3}  {description:60} {state}")
+
+
+def print_timings(before, after):
+    print(f"\n{'Query':24} {'Before [ms]':>12} {'After [ms]':>12} {'Speedup':>8}")
+    for label in PROBE_QUERIES:
+        speedup = before[label] / after[label] if after[label] else float('inf')
+        print(f"{label:24} {before[label]:12.3f} {after[label]:12.3f} {speedup:7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations')
+    parser.add_argument('--status', action='store_true', help='Show applied and pending migrations')
+    parser.add_argument('--dry-run', action='store_true', help='List pending migrations without applying them')
+    parser.add_argument('--no-timings', action='store_true', help='Skip the before/after query timings')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return
+
+    timings = not args.no_timings and not args.dry_run
+    before = time_probe_queries() if timings else None
+
+    try:
+        applied = run_migrations(dry_run=args.dry_run, verbose=True)
+    except MigrationError as e:
+        print(f"\nERROR: {e}")
+        raise SystemExit(1)
+
+    if not applied:
+        print("Database is up to date.")
+        return
+
+    if args.dry_run:
+        print("\n[DRY RUN] No changes made.")
+        return
+
+    if before:
+        print_timings(before, time_probe_queries())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Recompute the map cluster pyramid (map_clusters) from all route positions.
+
+The clusters are kept in sync on every route write; this rebuilds them after
+changes that bypass the ORM (raw SQL, restored backups).
+
+Run as:
+    python3 -m climbingdb.scripts.rebuild_map_clusters
+"""
+
+import argparse
+import time
+
+from climbingdb.models import engine
+from climbingdb.models.map_cluster_sync import rebuild_map_clusters
+
+
+def main():
+    argparse.ArgumentParser(description='Rebuild the map cluster pyramid').parse_args()
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        count = rebuild_map_clusters(connection)
+    print(f"Computed {count} map clusters in {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Recompute the per-user monthly rollups (user_month_stats) from all ascents.
+
+The rollups are kept in sync on every ascent write; this rebuilds them after
+changes that bypass the ORM (raw SQL, restored backups).
+
+Run as:
+    python3 -m climbingdb.scripts.rebuild_monthly_stats
+"""
+
+import argparse
+import time
+
+from climbingdb.models import engine
+from climbingdb.models.monthly_stats_sync import rebuild_monthly_stats
+
+
+def main():
+    argparse.ArgumentParser(description='Rebuild the per-user monthly rollups').parse_args()
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        count = rebuild_monthly_stats(connection)
+    print(f"Computed {count} monthly rollups in {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Recompute the per-route statistics (route_stats) from all ascents.
+
+The table is kept in sync on every ascent write; this rebuilds it after
+changes that bypass the ORM (raw SQL, restored backups).
+
+Run as:
+    python3 -m climbingdb.scripts.rebuild_route_stats
+"""
+
+import argparse
+import time
+
+from climbingdb.models import engine
+from climbingdb.models.route_stats_sync import rebuild_route_stats
+
+
+def main():
+    argparse.ArgumentParser(description='Rebuild the per-route statistics table').parse_args()
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        count = rebuild_route_stats(connection)
+    print(f"Computed statistics of {count} routes in {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
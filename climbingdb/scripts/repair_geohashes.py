@@ -0,0 +1,33 @@
+"""
+Recompute the geohashes of all routes and crags from their coordinates.
+
+The geohashes are kept in sync by ORM events; this repairs them after changes
+that bypass the ORM (raw SQL, restored backups).
+
+Run as:
+    python3 -m climbingdb.scripts.repair_geohashes --dry-run
+    python3 -m climbingdb.scripts.repair_geohashes
+"""
+
+import argparse
+
+from climbingdb.models import engine
+from climbingdb.models.geo_sync import repair_geohashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Repair the geohashes of routes and crags')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        count = repair_geohashes(connection, dry_run=args.dry_run)
+
+    if args.dry_run:
+        print(f"[DRY RUN] {count} routes and crags have out-of-sync geohashes.")
+    else:
+        print(f"Repaired the geohashes of {count} routes and crags.")
+
+
+if __name__ == "__main__":
+    main()
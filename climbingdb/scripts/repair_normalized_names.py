@@ -0,0 +1,33 @@
+"""
+Recompute the normalized names of all countries, areas, crags and routes.
+
+The normalized names are kept in sync by ORM events; this repairs them after
+changes that bypass the ORM (raw SQL) or a change of matching.normalize_name().
+
+Run as:
+    python3 -m climbingdb.scripts.repair_normalized_names --dry-run
+    python3 -m climbingdb.scripts.repair_normalized_names
+"""
+
+import argparse
+
+from climbingdb.models import engine
+from climbingdb.models.name_sync import repair_normalized_names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Repair the normalized names of locations and routes')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        count = repair_normalized_names(connection, dry_run=args.dry_run)
+
+    if args.dry_run:
+        print(f"[DRY RUN] {count} countries, areas, crags and routes have out-of-sync normalized names.")
+    else:
+        print(f"Repaired the normalized names of {count} countries, areas, crags and routes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Recompute the denormalized location columns of all routes.
+
+The columns are kept in sync by ORM events; this repairs them after changes
+that bypass the ORM (raw SQL, restored backups, merges in cleanup).
+
+Run as:
+    python3 -m climbingdb.scripts.repair_route_locations --dry-run
+    python3 -m climbingdb.scripts.repair_route_locations
+"""
+
+import argparse
+
+from climbingdb.models import engine
+from climbingdb.models.location_sync import repair_route_locations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Repair denormalized route location columns')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        count = repair_route_locations(connection, dry_run=args.dry_run)
+
+    if args.dry_run:
+        print(f"[DRY RUN] {count} routes have out-of-sync location columns.")
+    else:
+        print(f"Repaired location columns of {count} routes.")
+
+
+if __name__ == "__main__":
+    main()
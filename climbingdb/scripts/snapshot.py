@@ -0,0 +1,91 @@
+"""
+Export or import a user's logbook as a Parquet snapshot (zip archive).
+
+The database is taken from DATABASE_URL, so a user can be moved between
+instances by exporting from one and importing into the other.
+
+Run as:
+    python3 -m climbingdb.scripts.snapshot export --username ole --output ole.zip
+    python3 -m climbingdb.scripts.snapshot import --username ole --file ole.zip
+    python3 -m climbingdb.scripts.snapshot import --username ole --file ole.zip --replace
+"""
+
+import argparse
+import getpass
+import time
+
+from climbingdb.models import get_session, init_db
+from climbingdb.services.auth_service import AuthService
+from climbingdb.services.snapshot import export_snapshot, import_snapshot, read_snapshot, SnapshotError
+
+
+def _get_or_create_user(auth, username):
+    """Existing user, or a new one after asking for a password."""
+    user = auth.get_user_by_username(username)
+    if user:
+        return user
+
+    print(f"User '{username}' not found. Creating new user...")
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Confirm: "):
+        raise ValueError("Passwords don't match!")
+
+    success, message, user = auth.create_user(username=username, password=password)
+    if not success:
+        raise ValueError(f"Failed to create user: {message}")
+    return user
+
+
+def _print_counts(title, counts):
+    print(title)
+    for table, count in counts.items():
+        print(f"  {table:14} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import a user's logbook as Parquet snapshot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Write the snapshot of a user')
+    export_parser.add_argument('--username', required=True)
+    export_parser.add_argument('--output', required=True, help='Snapshot file (.zip)')
+
+    import_parser = subparsers.add_parser('import', help='Import a snapshot into a user (created if missing)')
+    import_parser.add_argument('--username', required=True)
+    import_parser.add_argument('--file', required=True, help='Snapshot file (.zip)')
+    import_parser.add_argument('--replace', action='store_true', help="Replace the user's existing ascents")
+    import_parser.add_argument('--dry-run', action='store_true', help='Only show the contents of the snapshot')
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    try:
+        if args.command == 'import' and args.dry_run:
+            manifest, _ = read_snapshot(args.file)
+            _print_counts(f"[DRY RUN] Snapshot of '{manifest['username']}' from {manifest['created_at']}:",
+                          manifest['counts'])
+            return
+
+        init_db()
+        auth = AuthService()
+        with get_session() as session:
+            if args.command == 'export':
+                user = auth.get_user_by_username(args.username)
+                if not user:
+                    raise SnapshotError(f"User '{args.username}' not found")
+                counts = export_snapshot(session, user.id, args.output)
+                _print_counts(f"Exported '{args.username}' to {args.output}:", counts)
+            else:
+                user = _get_or_create_user(auth, args.username)
+                report = import_snapshot(session, args.file, user.id, replace=args.replace)
+                print(f"Imported {args.file} into '{args.username}':")
+                for table, result in report.items():
+                    print(f"  {table:14} {result['inserted']} new, {result['existing']} existing")
+    except (SnapshotError, ValueError) as e:
+        parser.exit(1, f"Error: {e}\n")
+
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
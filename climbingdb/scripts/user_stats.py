@@ -1,57 +1,138 @@
-from climbingdb.models import SessionLocal, User, Route, Ascent
-import pandas as pd
+"""
+Admin table of all users with their ascent counts per discipline.
+
+The whole table comes from one grouped query (conditional aggregation for the
+counts, ROW_NUMBER() for the hardest ascent), streamed in chunks if requested.
 
+Run as:
+    python3 -m climbingdb.scripts.user_stats
+    python3 -m climbingdb.scripts.user_stats --output users.csv
+    python3 -m climbingdb.scripts.user_stats --output users.parquet --stream
+"""
 
-def get_user_statistics():
+import argparse
+import os
+
+import pandas as pd
+from sqlalchemy import select, func, case, and_
+
+from climbingdb.models import engine, User, Route, Ascent
+
+COLUMNS = ['User ID', 'Username', 'Email', 'Total Routes', 'Sport', 'Boulder', 'Multipitch',
+           'Hardest Grade', 'Created']
+
+
+def user_statistics_query():
+    """Select one row per user with counts per discipline and the hardest ascent."""
+    def discipline_count(discipline):
+        return func.sum(case((Route.discipline == discipline, 1), else_=0))
+
+    counts = select(
+        Ascent.user_id,
+        discipline_count("Sportclimb").label('sport'),
+        discipline_count("Boulder").label('boulder'),
+        discipline_count("Multipitch").label('multipitch')
+    ).join(Ascent.route).group_by(Ascent.user_id).subquery('counts')
+
+    ranked = select(
+        Ascent.user_id,
+        Ascent.grade,
+        func.row_number().over(
+            partition_by=Ascent.user_id,
+            order_by=[Route.consensus_ole_grade.desc().nullslast(), Ascent.id]
+        ).label('rank')
+    ).join(Ascent.route).subquery('ranked')
+
+    sport = func.coalesce(counts.c.sport, 0)
+    boulder = func.coalesce(counts.c.boulder, 0)
+    multipitch = func.coalesce(counts.c.multipitch, 0)
+
+    return select(
+        User.id.label('user_id'),
+        User.username,
+        User.email,
+        (sport + boulder + multipitch).label('total'),
+        sport.label('sport'),
+        boulder.label('boulder'),
+        multipitch.label('multipitch'),
+        ranked.c.grade.label('hardest_grade'),
+        User.created_at
+    ).outerjoin(counts, counts.c.user_id == User.id) \
+     .outerjoin(ranked, and_(ranked.c.user_id == User.id, ranked.c.rank == 1)) \
+     .order_by(User.id)
+
+
+def _to_frame(rows):
+    return pd.DataFrame([{
+        'User ID': row.user_id,
+        'Username': row.username,
+        'Email': row.email if row.email else '',
+        'Total Routes': row.total,
+        'Sport': row.sport,
+        'Boulder': row.boulder,
+        'Multipitch': row.multipitch,
+        'Hardest Grade': row.hardest_grade if row.hardest_grade else '',
+        'Created': row.created_at.strftime('%Y-%m-%d') if row.created_at else ''
+    } for row in rows], columns=COLUMNS)
+
+
+def iter_user_statistics(bind=engine, chunk_size=10000):
+    """Yield the user statistics as DataFrames of at most chunk_size users (server-side cursor)."""
+    with bind.connect() as connection:
+        result = connection.execution_options(yield_per=chunk_size).execute(user_statistics_query())
+        for rows in result.partitions():
+            yield _to_frame(rows)
+
+
+def get_user_statistics(bind=engine):
     """Query user statistics including route counts per discipline."""
-    session = SessionLocal()
+    with bind.connect() as connection:
+        return _to_frame(connection.execute(user_statistics_query()).all())
 
-    try:
-        # Get all users with route counts
-        users = session.query(User).all()
-
-        user_data = []
-        for user in users:
-            # Count routes per discipline
-            sportclimb_count = session.query(Ascent).join(Ascent.route).filter(
-                Ascent.user_id == user.id,
-                Route.discipline == "Sportclimb"
-            ).count()
-
-            boulder_count = session.query(Ascent).join(Ascent.route).filter(
-                Ascent.user_id == user.id,
-                Route.discipline == "Boulder"
-            ).count()
-
-            multipitch_count = session.query(Ascent).join(Ascent.route).filter(
-                Ascent.user_id == user.id,
-                Route.discipline == "Multipitch"
-            ).count()
-
-            total_routes = sportclimb_count + boulder_count + multipitch_count
-
-            # Get hardest route
-            hardest = session.query(Ascent).join(Ascent.route).filter(
-                Ascent.user_id == user.id
-            ).order_by(Route.consensus_ole_grade.desc()).first()
-
-            user_data.append({
-                'User ID': user.id,
-                'Username': user.username,
-                'Email': user.email if user.email else '',
-                'Total Routes': total_routes,
-                'Sport': sportclimb_count,
-                'Boulder': boulder_count,
-                'Multipitch': multipitch_count,
-                'Hardest Grade': hardest.grade if hardest else '',
-                'Created': user.created_at.strftime('%Y-%m-%d') if user.created_at else ''
-            })
-
-        df = pd.DataFrame(user_data)
-        return df
 
+def export_user_statistics(path, fmt=None, stream=False, chunk_size=10000, bind=engine):
+    """
+    Write the user statistics to CSV or Parquet.
+
+    Args:
+        path: Output file
+        fmt: 'csv' or 'parquet' (default: from the file extension)
+        stream: Write chunk by chunk instead of building the whole table in memory
+
+    Returns:
+        int: number of users written
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    chunks = iter_user_statistics(bind, chunk_size) if stream else [get_user_statistics(bind)]
+
+    n_users = 0
+    if fmt == 'csv':
+        for ii, df in enumerate(chunks):
+            df.to_csv(path, mode='w' if ii == 0 else 'a', header=ii == 0, index=False)
+            n_users += len(df)
+        if n_users == 0:
+            pd.DataFrame(columns=COLUMNS).to_csv(path, index=False)
+        return n_users
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for df in chunks:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            n_users += len(df)
+        if writer is None:
+            pd.DataFrame(columns=COLUMNS).to_parquet(path, index=False)
     finally:
-        session.close()
+        if writer is not None:
+            writer.close()
+    return n_users
 
 
 def print_user_stats():
@@ -77,5 +158,22 @@ def print_user_stats():
     print("\n" + "=" * 80)
 
 
+def main():
+    parser = argparse.ArgumentParser(description='User statistics for admins')
+    parser.add_argument('--output', help='Write the table to a .csv or .parquet file instead of printing it')
+    parser.add_argument('--format', choices=['csv', 'parquet'], help='Output format (default: from file extension)')
+    parser.add_argument('--stream', action='store_true', help='Stream the table in chunks (large user bases)')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Users per chunk when streaming')
+    args = parser.parse_args()
+
+    if not args.output:
+        print_user_stats()
+        return
+
+    n_users = export_user_statistics(args.output, fmt=args.format, stream=args.stream,
+                                     chunk_size=args.chunk_size)
+    print(f"Wrote statistics of {n_users} users to {args.output}")
+
+
 if __name__ == "__main__":
-    print_user_stats()
\ No newline at end of file
+    main()
@@ -4,6 +4,9 @@ Authentication service for user management.
 
 import bcrypt
 from climbingdb.models import SessionLocal, User, Ascent, PitchAscent
+from climbingdb.models.data_version import bump_data_version
+from climbingdb.models.route_stats_sync import refresh_route_stats
+from climbingdb.models.monthly_stats_sync import rebuild_monthly_stats
 
 
 class AuthService:
@@ -103,6 +106,10 @@ class AuthService:
             a.id for a in
             self.session.query(Ascent.id).filter(Ascent.user_id == user_id).all()
         ]
+        route_ids = {
+            a.route_id for a in
+            self.session.query(Ascent.route_id).filter(Ascent.user_id == user_id).distinct()
+        }
 
         if not ascent_ids:
             return 0
@@ -117,6 +124,9 @@ class AuthService:
             Ascent.user_id == user_id
         ).delete(synchronize_session=False)
 
+        bump_data_version(self.session, [user_id])
+        refresh_route_stats(self.session, route_ids)
+        rebuild_monthly_stats(self.session, [user_id])
         self.session.commit()
         return count
 
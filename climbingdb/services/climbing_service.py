@@ -2,24 +2,149 @@
 Climbing database service layer with Route/Ascent separation.
 """
 
-from sqlalchemy import and_, or_, func
-from sqlalchemy.orm import joinedload, contains_eager
+from sqlalchemy import and_, or_, func, distinct
+from sqlalchemy.orm import selectinload, contains_eager, raiseload
 import pandas as pd
 from datetime import datetime
 
-from climbingdb.models import SessionLocal, Route, Crag, Area, Country, Ascent, Pitch, PitchAscent
-from climbingdb.grade import Grade
+from climbingdb.config import STRICT_LOADING
+from climbingdb.models import (
+    SessionLocal, Route, Ascent, Pitch, PitchAscent, RouteStats, UserMonthStats, Crag, Area, MapCluster
+)
+from climbingdb.grade import Grade, grade_filter_range
+from climbingdb.geo import cover, bounding_box, haversine_km, cluster_level
 from climbingdb.services.crud import (
     get_or_create_location,
     get_or_create_route,
     create_ascent,
-    create_pitches_and_ascents
+    create_pitches_and_ascents,
+    update_consensus_fields
 )
 
+# Compact schema of the ascent DataFrames: categories for the few distinct
+# location/style values, float32 grades (all ole_grades are exact in float32, the
+# soft/hard offset of sort_grade is not) and nullable integers.
+# Pitches live in a separate long-format frame, see ClimbingService.get_pitch_ascents.
+ASCENT_DTYPES = {
+    'id': 'int64',
+    'route_id': 'int64',
+    'name': 'str',
+    'grade': 'str',
+    'ole_grade': 'float32',
+    'sort_grade': 'float64',
+    'discipline': 'category',
+    'style': 'category',
+    'date': 'datetime64[s]',
+    'stars': 'Int8',
+    'shortnote': 'str',
+    'notes': 'str',
+    'gear': 'str',
+    'crag': 'category',
+    'area': 'category',
+    'country': 'category',
+    'ernsthaftigkeit': 'category',
+    'length': 'float32',
+    'ascent_time': 'float32',
+    'pitch_number': 'Int16',
+    'is_project': 'bool',
+    'is_milestone': 'bool',
+}
+
+PITCH_ASCENT_DTYPES = {
+    'ascent_id': 'int64',
+    'pitch_number': 'Int16',
+    'led': 'boolean',
+    'grade': 'str',
+    'ole_grade': 'float32',
+}
+
+
+# Timeline frames, read from the monthly rollups (UserMonthStats)
+MONTHLY_STATS_DTYPES = {
+    'month': 'datetime64[s]',
+    'discipline': 'category',
+    'n_ascents': 'int64',
+    'n_onsight': 'int64',
+    'meters': 'float64',
+    'v_points': 'int64',
+    'max_ole_grade': 'float64',
+    'median_ole_grade': 'float64',
+}
+
+GRADE_PROGRESSION_DTYPES = {
+    'month': 'datetime64[s]',
+    'max_ole_grade': 'float64',
+    'rolling_max': 'float64',
+    'best': 'float64',
+}
+
+# Map frames of routes and crags with coordinates (over all users)
+MAP_ROUTE_DTYPES = {
+    'id': 'int64',
+    'name': 'str',
+    'discipline': 'category',
+    'grade': 'str',
+    'crag': 'category',
+    'area': 'category',
+    'latitude': 'float64',
+    'longitude': 'float64',
+}
+
+MAP_CLUSTER_DTYPES = {
+    'cell': 'str',
+    'n_routes': 'int64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'south': 'float64',
+    'west': 'float64',
+    'north': 'float64',
+    'east': 'float64',
+    'top_route_id': 'Int64',
+    'top_route_name': 'str',
+    'top_grade': 'str',
+}
+
+NEARBY_CRAG_DTYPES = {
+    'id': 'int64',
+    'name': 'str',
+    'area': 'str',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'distance_km': 'float64',
+}
+
+
+def _in_bbox(geohash, latitude, longitude, south, west, north, east):
+    """
+    Condition for coordinates inside a bounding box (west > east: across the antimeridian).
+
+    The geohash prefix ranges select the candidates on the index, the
+    coordinates cut them to the exact box.
+    """
+    in_cells = or_(*[and_(geohash >= low, geohash < high) for low, high in cover(south, west, north, east)])
+    in_longitudes = longitude.between(west, east) if west <= east else or_(longitude >= west, longitude <= east)
+    return and_(in_cells, latitude.between(south, north), in_longitudes)
+
+
+def _pitch_frame(rows):
+    """DataFrame with the PITCH_ASCENT_DTYPES schema from (ascent_id, pitch_number, led, grade, ole_grade) rows."""
+    df = pd.DataFrame(rows, columns=list(PITCH_ASCENT_DTYPES)).astype(PITCH_ASCENT_DTYPES)
+    return df.sort_values(['ascent_id', 'pitch_number'], ignore_index=True)
+
+
+# Keyset pagination orders of ClimbingService.get_ascents_page (ties broken by ascent id)
+PAGE_ORDERS = {
+    'grade': (Ascent.ole_grade, Ascent.sort_grade),
+    'date': (Ascent.date,),
+}
+
 
 class ClimbingService:
     """Service class to query climbing database."""
 
+    # Raise instead of lazy loading in the ascent list queries (tests, STRICT_LOADING=true)
+    strict_loading = STRICT_LOADING
+
     def __init__(self, user_id=None):
         self.session = SessionLocal()
         self.user_id = user_id
@@ -35,57 +160,33 @@ class ClimbingService:
             query = query.filter(Ascent.user_id == self.user_id)
         return query
 
+    def _with_frame_loaders(self, query):
+        """
+        Eager load everything _ascents_to_dataframe touches on a query of _base_query.
+
+        The route comes with the join of the base query (location is denormalized
+        on it), the pitch ascents with one SELECT ... IN, which keeps LIMIT applying
+        to ascents. In strict mode every other relationship raises when accessed.
+        """
+        route = contains_eager(Ascent.route)
+        pitch_ascents = selectinload(Ascent.pitch_ascents)
+        if self.strict_loading:
+            return query.options(route.raiseload('*'), pitch_ascents.raiseload('*'), raiseload('*'))
+        return query.options(route, pitch_ascents)
+
     @staticmethod
     def _ascents_to_dataframe(ascents) -> pd.DataFrame:
-        """Convert list of Ascent objects to DataFrame."""
-        if not ascents:
-            return pd.DataFrame({
-                'id': pd.Series(dtype='int64'),
-                'name': pd.Series(dtype='str'),
-                'grade': pd.Series(dtype='str'),
-                'ole_grade': pd.Series(dtype='float64'),
-                'discipline': pd.Series(dtype='str'),
-                'style': pd.Series(dtype='str'),
-                'date': pd.Series(dtype='datetime64[D]'),
-                'stars': pd.Series(dtype='int64'),
-                'shortnote': pd.Series(dtype='str'),
-                'notes': pd.Series(dtype='str'),
-                'gear': pd.Series(dtype='str'),
-                'crag': pd.Series(dtype='str'),
-                'area': pd.Series(dtype='str'),
-                'country': pd.Series(dtype='str'),
-                'ernsthaftigkeit': pd.Series(dtype='str'),
-                'length': pd.Series(dtype='float64'),
-                'ascent_time': pd.Series(dtype='float64'),
-                'pitch_number': pd.Series(dtype='int64'),
-                'is_project': pd.Series(dtype='bool'),
-                'is_milestone': pd.Series(dtype='bool'),
-                'pitches_data': pd.Series(dtype='object')
-            })
-
-        data = []
+        """Convert list of Ascent objects to a DataFrame with the ASCENT_DTYPES schema."""
+        columns = {column: [] for column in ASCENT_DTYPES}
         for ascent in ascents:
             route = ascent.route
-
-            # Get pitch ascent data
-            pitches_data = None
-            if route.discipline == "Multipitch":
-                if ascent.pitch_ascents:
-                    sorted_pitch_ascents = sorted(ascent.pitch_ascents, key=lambda pa: pa.pitch.pitch_number)
-                    pitches_data = {
-                        'led': [pa.led for pa in sorted_pitch_ascents],
-                        'grade': [pa.grade for pa in sorted_pitch_ascents],
-                        'ole_grade': [pa.ole_grade for pa in sorted_pitch_ascents]
-                    }
-                else:
-                    pitches_data = {'ole_grade': [ascent.ole_grade]}
-
             row = {
                 'id': ascent.id,  # Ascent ID
                 'route_id': route.id,  # Route ID
                 'name': route.name,
                 'grade': ascent.grade,  # User's grade
                 'ole_grade': ascent.ole_grade,
+                'sort_grade': ascent.sort_grade,
                 'discipline': route.discipline,
                 'style': ascent.style if ascent.style else '',
                 'date': ascent.date,
@@ -93,48 +194,50 @@ class ClimbingService:
                 'shortnote': ascent.shortnote if ascent.shortnote else '',
                 'notes': ascent.notes if ascent.notes else '',
                 'gear': ascent.gear if ascent.gear else '',
-                'crag': route.crag.name if route.crag else '',
-                'area': route.crag.area.name if route.crag and route.crag.area else '',
-                'country': route.crag.area.country.name if route.crag and route.crag.area and route.crag.area.country else '',
+                'crag': route.crag_name or '',
+                'area': route.area_name or '',
+                'country': route.country_name or '',
                 'ernsthaftigkeit': route.ernsthaftigkeit if route.ernsthaftigkeit else '',
                 'length': route.length,
                 'ascent_time': ascent.ascent_time,
                 'pitch_number': len(ascent.pitch_ascents) if ascent.pitch_ascents else None,
-                'is_project': ascent.is_project,
-                'is_milestone': ascent.is_milestone,
-                'pitches_data': pitches_data
+                'is_project': bool(ascent.is_project),
+                'is_milestone': bool(ascent.is_milestone)
             }
-            data.append(row)
+            for column, value in row.items():
+                columns[column].append(value)
 
-        return pd.DataFrame(data)
+        return pd.DataFrame(columns).astype(ASCENT_DTYPES)
+
+
+    @staticmethod
+    def _pitch_ascents_to_dataframe(ascents) -> pd.DataFrame:
+        """Long-format pitch ascents (one row per pitch) of a list of Ascent objects."""
+        rows = [
+            (ascent.id, pa.pitch.pitch_number, pa.led, pa.grade, pa.ole_grade)
+            for ascent in ascents
+            for pa in ascent.pitch_ascents
+        ]
+        return _pitch_frame(rows)
 
 
     @staticmethod
     def _filter_query_for_location(query, area, crag):
-        query = query.join(Route.crag).join(Crag.area)
-        query = query.options(
-            contains_eager(Ascent.route).contains_eager(Route.crag).contains_eager(Crag.area)
-        )
+        # Denormalized location columns on Route: no joins to crags/areas needed
         if area:
-            query = query.filter(Area.name == area)
+            query = query.filter(Route.area_name == area)
         if crag:
-            query = query.filter(Crag.name == crag)
+            query = query.filter(Route.crag_name == crag)
         return query
 
 
-    def get_filtered_routes(self, discipline="Sportclimb",
-                            crag=None, area=None, grade=None, style=None,
-                            stars=None, operation="=="):
-        """Return filtered ascents as DataFrame."""
-        query = self._base_query().filter(Ascent.is_project == False)
+    def _filtered_query(self, discipline=None, crag=None, area=None, grade=None, style=None,
+                        stars=None, operation="==", is_project=False):
+        """User's ascents (or projects) matching the filters, route joined."""
+        query = self._base_query().filter(Ascent.is_project == is_project)
 
-        # Eager load route and location
-        if area or crag:
-            query = self._filter_query_for_location(query, area=area, crag=crag)
-        else:
-            query = query.options(
-                joinedload(Ascent.route).joinedload(Route.crag).joinedload(Crag.area)
-            )
+        # Route is already joined by the base query, location is denormalized on it
+        query = self._filter_query_for_location(query, area=area, crag=crag)
 
         if discipline:
             query = query.filter(Route.discipline == discipline)
@@ -146,28 +249,159 @@ class ClimbingService:
             query = query.filter(Ascent.stars >= stars)
 
         if grade:
-            ole_grade = Grade(grade).conv_grade()
-            if operation == ">=":
-                query = query.filter(Ascent.ole_grade >= ole_grade)
-            else:
-                query = query.filter(
-                    or_(Ascent.ole_grade == ole_grade, Ascent.ole_grade == ole_grade + 0.5)
-                )
-
-        # Eager load pitch ascents for multipitches
-        query = query.options(joinedload(Ascent.pitch_ascents).joinedload(PitchAscent.pitch))
-
-        ascents = query.order_by(Ascent.ole_grade.desc()).all()
+            # Grade bucket as one range on ole_grade (ix_ascents_user_project_grade)
+            low, high = grade_filter_range(grade, operation)
+            if low is not None:
+                query = query.filter(Ascent.ole_grade >= low)
+            if high is not None:
+                query = query.filter(Ascent.ole_grade < high)
+
+        return query
+
+
+    def get_filtered_routes(self, discipline="Sportclimb",
+                            crag=None, area=None, grade=None, style=None,
+                            stars=None, operation="=="):
+        """Return filtered ascents as DataFrame."""
+        query = self._filtered_query(discipline=discipline, crag=crag, area=area, grade=grade,
+                                     style=style, stars=stars, operation=operation)
+
+        query = self._with_frame_loaders(query)
+        ascents = query.order_by(Ascent.ole_grade.desc(), Ascent.sort_grade.desc()).all()
         return self._ascents_to_dataframe(ascents)
 
 
+    @staticmethod
+    def _after_cursor(columns, cursor):
+        """Keyset condition: rows after cursor in descending order of columns, NULLs last."""
+        conditions = []
+        for ii, (column, value) in enumerate(zip(columns, cursor)):
+            if value is None:
+                continue  # NULLs come last, nothing sorts after them at this position
+            conditions.append(and_(
+                *[c.is_(None) if v is None else c == v for c, v in zip(columns[:ii], cursor[:ii])],
+                or_(column < value, column.is_(None))
+            ))
+        return or_(*conditions)
+
+
+    def get_ascents_page(self, order_by="grade", after=None, page_size=50, **filters):
+        """
+        One page of the filtered ascents, hardest (or most recent) first.
+
+        Keyset pagination on (ole_grade, sort_grade, id) or (date, id): the next page starts
+        after the last row of the previous one, so every page costs the same
+        index range scan, however deep the user pages.
+
+        Args:
+            order_by: "grade" or "date"
+            after: Cursor returned with the previous page (None for the first page)
+            page_size: Ascents per page
+            **filters: Filters of _filtered_query (discipline, area, grade, is_project, ...)
+
+        Returns:
+            tuple: (DataFrame of the page, cursor of the next page or None on the last page)
+        """
+        if order_by not in PAGE_ORDERS:
+            raise ValueError(f"Cannot page by {order_by}, use one of {list(PAGE_ORDERS)}")
+        columns = PAGE_ORDERS[order_by] + (Ascent.id,)
+
+        query = self._filtered_query(**filters)
+        if after is not None:
+            query = query.filter(self._after_cursor(columns, after))
+
+        query = self._with_frame_loaders(query)
+        ascents = query.order_by(*[column.desc().nullslast() for column in columns]) \
+            .limit(page_size + 1).all()
+
+        next_cursor = None
+        if len(ascents) > page_size:
+            ascents = ascents[:page_size]
+            next_cursor = tuple(getattr(ascents[-1], column.key) for column in columns)
+
+        return self._ascents_to_dataframe(ascents), next_cursor
+
+
+    def count_filtered_ascents(self, **filters):
+        """Number of ascents matching the filters of get_ascents_page."""
+        return self._filtered_query(**filters).order_by(None).count()
+
+
+    def get_pitch_ascents(self, ascent_ids):
+        """
+        Pitch ascents of the given ascents in long format, one row per pitch.
+
+        Join to the ascent frames on demand via ascent_id (e.g. for the multipitch plot).
+
+        Returns:
+            DataFrame: ascent_id, pitch_number, led, grade, ole_grade
+        """
+        ascent_ids = [int(ascent_id) for ascent_id in ascent_ids]
+        if not ascent_ids:
+            return _pitch_frame([])
+
+        rows = self.session.query(
+            PitchAscent.ascent_id, Pitch.pitch_number, PitchAscent.led, PitchAscent.grade, PitchAscent.ole_grade
+        ).join(PitchAscent.pitch).filter(PitchAscent.ascent_id.in_(ascent_ids)).all()
+        return _pitch_frame(rows)
+
+
+    def get_grade_histogram(self, discipline):
+        """Number of ascents (without projects) per ole_grade of a discipline, ascending grades."""
+        rows = self._base_query().filter(
+            Ascent.is_project == False, Route.discipline == discipline, Ascent.ole_grade != None
+        ).with_entities(Ascent.ole_grade, func.count()).group_by(Ascent.ole_grade).order_by(Ascent.ole_grade).all()
+        return pd.Series([count for _, count in rows], dtype='int64', name='count',
+                         index=pd.Index([grade for grade, _ in rows], dtype='float64', name='ole_grade'))
+
+
+    def get_monthly_stats(self, discipline=None):
+        """
+        The user's ascents per month and discipline from the monthly rollups, oldest month first.
+
+        Returns:
+            DataFrame with the MONTHLY_STATS_DTYPES schema
+        """
+        query = self.session.query(*[getattr(UserMonthStats, column) for column in MONTHLY_STATS_DTYPES])
+        if self.user_id:
+            query = query.filter(UserMonthStats.user_id == self.user_id)
+        if discipline:
+            query = query.filter(UserMonthStats.discipline == discipline)
+        rows = query.order_by(UserMonthStats.month, UserMonthStats.discipline).all()
+        return pd.DataFrame(rows, columns=list(MONTHLY_STATS_DTYPES)).astype(MONTHLY_STATS_DTYPES)
+
+
+    def get_grade_progression(self, discipline, window_months=12):
+        """
+        Hardest grade per month of a discipline with its rolling and all-time maximum.
+
+        Window functions over the monthly rollups: rolling_max covers the calendar
+        months [month - window_months + 1, month] (also across months without
+        ascents), best all months up to the current one.
+
+        Returns:
+            DataFrame with the GRADE_PROGRESSION_DTYPES schema, months with ascents only
+        """
+        stats = UserMonthStats
+        query = self.session.query(
+            stats.month,
+            stats.max_ole_grade,
+            func.max(stats.max_ole_grade).over(
+                order_by=stats.month_index, range_=(-(window_months - 1), 0)).label('rolling_max'),
+            func.max(stats.max_ole_grade).over(order_by=stats.month_index, rows=(None, 0)).label('best'),
+        ).filter(stats.discipline == discipline)
+        if self.user_id:
+            query = query.filter(stats.user_id == self.user_id)
+        rows = query.order_by(stats.month_index).all()
+        return pd.DataFrame(rows, columns=list(GRADE_PROGRESSION_DTYPES)).astype(GRADE_PROGRESSION_DTYPES)
+
+
     def get_multipitches(self):
         """Get all multipitch ascents."""
         query = self._base_query().filter(
             and_(Route.discipline == "Multipitch", Ascent.is_project == False)
         )
-        query = query.join(Route.crag).join(Crag.area)
-        query = query.options(joinedload(Ascent.pitch_ascents).joinedload(PitchAscent.pitch))
+        query = self._with_frame_loaders(query)
         ascents = query.order_by(Ascent.ole_grade.asc()).all()
         return self._ascents_to_dataframe(ascents)
 
@@ -177,18 +411,15 @@ class ClimbingService:
         query = self._base_query().filter(
             and_(Route.discipline == "Boulder", Ascent.is_project == False)
         )
-        query = query.join(Route.crag).join(Crag.area)
+        query = self._with_frame_loaders(query)
         ascents = query.order_by(Ascent.ole_grade.asc()).all()
         return self._ascents_to_dataframe(ascents)
 
 
     def get_projects(self, crag=None, area=None):
         """Get project ascents."""
-        query = self._base_query().filter(Ascent.is_project == True)
-
-        if area or crag:
-            query = self._filter_query_for_location(query, area=area, crag=crag)
-
+        query = self._filtered_query(crag=crag, area=area, is_project=True)
+        query = self._with_frame_loaders(query)
         ascents = query.order_by(Ascent.ole_grade.asc()).all()
         return self._ascents_to_dataframe(ascents)
 
@@ -196,7 +427,7 @@ class ClimbingService:
     def get_milestones(self):
         """Get milestone ascents."""
         query = self._base_query().filter(Ascent.is_milestone == True)
-        query = query.join(Route.crag).join(Crag.area)
+        query = self._with_frame_loaders(query)
         ascents = query.order_by(Ascent.ole_grade.asc()).all()
         return self._ascents_to_dataframe(ascents)
 
@@ -232,10 +463,8 @@ class ClimbingService:
             self.session.commit()  # Commit the ascent first
 
             # Update consensus fields (grade, stars)
-            self.update_consensus_fields(route)
-            if discipline == "Multipitch":
-                for pitch in route.pitches:
-                    self.update_consensus_fields(pitch)
+            pitches = list(route.pitches) if discipline == "Multipitch" else []
+            update_consensus_fields(self.session, [route] + pitches)
             self.session.commit()  # Single commit for all consensus updates
 
             return ascent
@@ -266,11 +495,8 @@ class ClimbingService:
 
         # Update consensus fields
         route = self.session.query(Route).filter(Route.id == route_id).first()
-        self.update_consensus_fields(route)
-
-        if 'grade' in kwargs and ascent.route.discipline == "Multipitch":
-            for pitch in ascent.route.pitches:
-                self.update_consensus_fields(pitch)
+        pitches = list(route.pitches) if 'grade' in kwargs and route.discipline == "Multipitch" else []
+        update_consensus_fields(self.session, [route] + pitches)
 
         self.session.commit()
 
@@ -292,11 +518,8 @@ class ClimbingService:
 
         # Update the consensus fields
         route = self.session.query(Route).filter(Route.id == route_id).first()
-        self.update_consensus_fields(route)
-
-        for pitch_id in pitch_ids:
-            pitch = self.session.query(Pitch).filter(Pitch.id == pitch_id).first()
-            self.update_consensus_fields(pitch)
+        pitches = self.session.query(Pitch).filter(Pitch.id.in_(pitch_ids)).all() if pitch_ids else []
+        update_consensus_fields(self.session, [route] + pitches)
 
         self.session.commit()
 
@@ -332,61 +555,19 @@ class ClimbingService:
         self.session.commit()
 
         # Update the consensus fields (grade, stars)
-        for pitch_id in updated_pitch_ids:
-            pitch = self.session.query(Pitch).filter(Pitch.id == pitch_id).first()
-            self.update_consensus_fields(pitch)
+        if updated_pitch_ids:
+            pitches = self.session.query(Pitch).filter(Pitch.id.in_(updated_pitch_ids)).all()
+            update_consensus_fields(self.session, pitches)
         self.session.commit()
 
     def update_consensus_fields(self, obj) -> None:
         """
         Update consensus grade and stars for a Route or Pitch.
-        Works for both because they share RouteMixin fields.
 
         Args:
             obj: Route or Pitch object (both have RouteMixin fields)
         """
-        # Determine correct table for averaging
-        if isinstance(obj, Route):
-            avg_ole_grade = self.session.query(
-                func.avg(Ascent.ole_grade)
-            ).filter(
-                Ascent.route_id == obj.id,
-                Ascent.is_project == False
-            ).scalar()
-
-            avg_stars = self.session.query(
-                func.avg(Ascent.stars)
-            ).filter(
-                Ascent.route_id == obj.id,
-                Ascent.is_project == False,
-                Ascent.stars > 0
-            ).scalar()
-
-        elif isinstance(obj, Pitch):
-            avg_ole_grade = self.session.query(
-                func.avg(PitchAscent.ole_grade)
-            ).filter(
-                PitchAscent.pitch_id == obj.id
-            ).scalar()
-
-            avg_stars = self.session.query(
-                func.avg(PitchAscent.stars)
-            ).filter(
-                PitchAscent.pitch_id == obj.id,
-                PitchAscent.stars > 0
-            ).scalar()
-
-        else:
-            raise ValueError(f"Expected Route or Pitch, got {type(obj)}")
-
-        # Update shared RouteMixin fields (same for both)
-        if avg_ole_grade:
-            obj.consensus_ole_grade = avg_ole_grade
-            scale = Grade(obj.consensus_grade).get_scale() if obj.consensus_grade else 'French'
-            obj.consensus_grade = Grade.from_ole_grade(avg_ole_grade, scale, nearest=True)
-
-        if avg_stars:
-            obj.consensus_stars = avg_stars
+        update_consensus_fields(self.session, [obj])
 
 
     def get_ascent_by_id(self, ascent_id: int):
@@ -399,6 +580,114 @@ class ClimbingService:
         return self.session.query(Route).filter(Route.id == route_id).first()
 
 
+    def get_route_detail(self, route_id, user_id=None):
+        """
+        Route with location, pitches and the user's ascent for the route detail page.
+
+        Returns:
+            RouteDetail (frozen, fully loaded; cached briefly per route and user) or None
+        """
+        from climbingdb.services.route_detail import get_cached_route_detail
+
+        try:
+            route_id = int(route_id)
+        except (TypeError, ValueError):
+            return None
+        return get_cached_route_detail(SessionLocal, route_id, user_id)
+
+
+    def get_classic_routes(self, crag_id, limit=10):
+        """
+        Best rated and most climbed routes of a crag (over all users), statistics eager loaded.
+
+        Returns:
+            list of Route, only routes with at least one ascent
+        """
+        return self.session.query(Route).join(Route.stats).options(contains_eager(Route.stats)).filter(
+            Route.crag_id == crag_id,
+            RouteStats.n_ascents > 0
+        ).order_by(
+            Route.consensus_stars.desc().nullslast(),
+            RouteStats.n_ascents.desc(),
+            Route.id
+        ).limit(limit).all()
+
+
+    def routes_in_bbox(self, south, west, north, east, discipline=None, limit=None):
+        """
+        Routes (over all users) with coordinates inside a bounding box, most climbed first.
+
+        Args:
+            south, west, north, east: Box in degrees (west > east: across the antimeridian)
+            discipline: Only routes of this discipline
+            limit: At most this many routes
+
+        Returns:
+            DataFrame with the MAP_ROUTE_DTYPES schema
+        """
+        query = self.session.query(
+            Route.id, Route.name, Route.discipline, Route.consensus_grade, Route.crag_name, Route.area_name,
+            Route.latitude, Route.longitude
+        ).outerjoin(Route.stats).filter(
+            _in_bbox(Route.geohash, Route.latitude, Route.longitude, south, west, north, east)
+        )
+        if discipline:
+            query = query.filter(Route.discipline == discipline)
+        rows = query.order_by(func.coalesce(RouteStats.n_ascents, 0).desc(), Route.id).limit(limit).all()
+        return pd.DataFrame(rows, columns=list(MAP_ROUTE_DTYPES)).astype(MAP_ROUTE_DTYPES)
+
+
+    def get_map_clusters(self, south, west, north, east, zoom):
+        """
+        Route markers of a map viewport: one cluster per geohash cell of the zoom's pyramid level.
+
+        Reads the precomputed map_clusters (MapCluster), so the number of
+        markers depends on the viewport and zoom, not on the catalog size.
+
+        Args:
+            south, west, north, east: Viewport in degrees (west > east: across the antimeridian)
+            zoom: Web map zoom level
+
+        Returns:
+            DataFrame with the MAP_CLUSTER_DTYPES schema, clusters centered in the viewport
+        """
+        level = cluster_level(zoom)
+        in_cells = or_(*[and_(MapCluster.cell >= low, MapCluster.cell < high)
+                         for low, high in cover(south, west, north, east, max_precision=level)])
+        in_longitudes = MapCluster.longitude.between(west, east) if west <= east \
+            else or_(MapCluster.longitude >= west, MapCluster.longitude <= east)
+
+        rows = self.session.query(*[getattr(MapCluster, column) for column in MAP_CLUSTER_DTYPES]).filter(
+            MapCluster.level == level, in_cells, MapCluster.latitude.between(south, north), in_longitudes
+        ).order_by(MapCluster.n_routes.desc(), MapCluster.cell).all()
+        return pd.DataFrame(rows, columns=list(MAP_CLUSTER_DTYPES)).astype(MAP_CLUSTER_DTYPES)
+
+
+    def crags_near(self, lat, lon, radius_km=25, limit=None):
+        """
+        Crags whose parking lies within radius_km of a point, nearest first.
+
+        The bounding box of the circle is queried on the geohash index, the
+        great-circle distances of the candidates are computed in one go.
+
+        Returns:
+            DataFrame with the NEARBY_CRAG_DTYPES schema
+        """
+        south, west, north, east = bounding_box(lat, lon, radius_km)
+        rows = self.session.query(
+            Crag.id, Crag.name, Area.name, Crag.parking_latitude, Crag.parking_longitude
+        ).join(Crag.area).filter(
+            _in_bbox(Crag.geohash, Crag.parking_latitude, Crag.parking_longitude, south, west, north, east)
+        ).all()
+
+        crags = pd.DataFrame(rows, columns=list(NEARBY_CRAG_DTYPES)[:-1])
+        crags['distance_km'] = haversine_km(lat, lon, crags['latitude'], crags['longitude'])
+        crags = crags[crags['distance_km'] <= radius_km].sort_values(['distance_km', 'id'], ignore_index=True)
+        if limit:
+            crags = crags.head(limit)
+        return crags.astype(NEARBY_CRAG_DTYPES)
+
+
     def get_statistics(self):
         """Get overall statistics for the user."""
         base = self._base_query()
@@ -409,18 +698,14 @@ class ClimbingService:
         boulders = ascents_with_routes.filter(Route.discipline == "Boulder")
 
         total_ascents = ascents.count()
-        total_countries = self.session.query(Country).join(Area).join(Crag).join(Route).join(Ascent).filter(
-            Ascent.user_id == self.user_id,
-            Ascent.is_project == False
-        ).distinct().count()
-        total_areas = self.session.query(Area).join(Crag).join(Route).join(Ascent).filter(
-            Ascent.user_id == self.user_id,
-            Ascent.is_project == False
-        ).distinct().count()
-        total_crags = self.session.query(Crag).join(Route).join(Ascent).filter(
+        total_crags, total_areas, total_countries = self.session.query(
+            func.count(distinct(Route.crag_id)),
+            func.count(distinct(Route.area_id)),
+            func.count(distinct(Route.country_id))
+        ).join(Route.ascents).filter(
             Ascent.user_id == self.user_id,
             Ascent.is_project == False
-        ).distinct().count()
+        ).one()
 
         hardest_rp = sportclimbs.order_by(Ascent.ole_grade.desc()).first()
         hardest_os = sportclimbs.filter(Ascent.style == "o.s.").order_by(Ascent.ole_grade.desc()).first()
@@ -3,20 +3,76 @@ Shared CRUD operations for location and route/ascent creation.
 Used by both climbing_service.py and csv_to_sqlalchemy.py.
 """
 
+from sqlalchemy import func, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm.attributes import set_committed_value
+
 from climbingdb.models import Country, Area, Crag, Route, Pitch, Ascent, PitchAscent
+from climbingdb.models.location_sync import location_values
+from climbingdb.models.geo_sync import geohash_values
+from climbingdb.models.name_sync import normalized_values
+from climbingdb.models.map_cluster_sync import refresh_map_clusters
+from climbingdb.grade import Grade
+from climbingdb.matching import normalize_name
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def upsert(session, model, values, index_elements, parents=None):
+    """
+    Insert a row unless one with the same natural key exists; return the row either way.
+
+    Uses INSERT ... ON CONFLICT (index_elements) DO NOTHING RETURNING, so an
+    existing row is never written (no row lock or dead tuple per lookup); on a
+    conflict nothing is returned and the row is selected by the same key.
+    index_elements must be covered by a unique index. Core inserts bypass
+    validators and mapper events: computed columns have to be part of values.
+    parents ({relationship: instance}) are attached to the result as loaded,
+    saving a lazy load each.
+
+    Returns:
+        tuple: (instance of model attached to the session, whether it was inserted)
+    """
+    insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if insert is None:
+        instance, created = _select_or_insert(session, model, values, index_elements)
+    else:
+        stmt = insert(model).values(**values).on_conflict_do_nothing(index_elements=index_elements)
+        instance = session.execute(stmt.returning(model)).scalar_one_or_none()
+        created = instance is not None
+        if not created:
+            instance = _select_by_key(session, model, values, index_elements)
+
+    for key, parent in (parents or {}).items():
+        set_committed_value(instance, key, parent)
+    return instance, created
+
+
+def _select_by_key(session, model, values, index_elements):
+    return session.query(model).filter_by(**{key: values[key] for key in index_elements}).first()
+
+
+def _select_or_insert(session, model, values, index_elements):
+    """Fallback for databases without INSERT ... ON CONFLICT."""
+    instance = _select_by_key(session, model, values, index_elements)
+    if instance:
+        return instance, False
+    instance = model(**values)
+    session.add(instance)
+    session.flush()
+    return instance, True
 
 
+# The natural keys are normalized names (see models/name_sync.py): a variant
+# spelling ("Atresie" for "Atrésie") conflicts with the existing row and returns it
 def get_or_create_country(session, country_name, verbose=False):
     if not country_name:
         raise ValueError("Country is required")
 
-    country = session.query(Country).filter(Country.name == country_name).first()
-    if not country:
-        country = Country(name=country_name)
-        session.add(country)
-        session.flush()
-        if verbose:
-            print(f"  Created country: {country_name}")
+    values = {'name': country_name, **normalized_values('countries', {'name': country_name})}
+    country, created = upsert(session, Country, values, ['normalized_name'])
+    if verbose and created:
+        print(f"  Created country: {country_name}")
 
     return country
 
@@ -25,17 +81,20 @@ def get_or_create_area(session, area_name, country, verbose=False):
     if not area_name:
         raise ValueError("Area is required")
 
-    query = session.query(Area).filter(Area.name == area_name)
-    if country:
-        query = query.filter(Area.country_id == country.id)
-
-    area = query.first()
-    if not area:
-        area = Area(name=area_name, country=country)
-        session.add(area)
-        session.flush()
-        if verbose:
-            print(f"  Created area: {area_name}, {country.name if country else ''}")
+    if not country:
+        # NULLs never conflict in a unique index: match by name only
+        area = session.query(Area).filter(Area.normalized_name == normalize_name(area_name)) \
+            .order_by(Area.id).first()
+        if not area:
+            area = Area(name=area_name)
+            session.add(area)
+            session.flush()
+        return area
+
+    values = {'name': area_name, 'country_id': country.id, **normalized_values('areas', {'name': area_name})}
+    area, created = upsert(session, Area, values, ['normalized_name', 'country_id'], parents={'country': country})
+    if verbose and created:
+        print(f"  Created area: {area_name}, {country.name}")
 
     return area
 
@@ -45,17 +104,10 @@ def get_or_create_crag(session, crag_name, area, verbose=False):
     if not crag_name:
         raise ValueError("Crag is required")
 
-    crag = session.query(Crag).filter(
-        Crag.name == crag_name,
-        Crag.area_id == area.id
-    ).first()
-
-    if not crag:
-        crag = Crag(name=crag_name, area=area)
-        session.add(crag)
-        session.flush()
-        if verbose:
-            print(f"  Created crag: {crag_name}")
+    values = {'name': crag_name, 'area_id': area.id, **normalized_values('crags', {'name': crag_name})}
+    crag, created = upsert(session, Crag, values, ['normalized_name', 'area_id'], parents={'area': area})
+    if verbose and created:
+        print(f"  Created crag: {crag_name}")
 
     return crag
 
@@ -72,30 +124,30 @@ def get_or_create_route(session, name, discipline, crag, grade,
                         length=None, ernsthaftigkeit=None,
                         latitude=None, longitude=None, verbose=False):
     """Get existing route or create new universal route."""
-    route = session.query(Route).filter(
-        Route.name == name,
-        Route.crag_id == crag.id,
-        Route.discipline == discipline
-    ).first()
+    values = {
+        'name': name,
+        'crag_id': crag.id,
+        'discipline': discipline,
+        'consensus_grade': grade,
+        'consensus_ole_grade': Grade(grade).conv_grade() if grade else None,
+        'length': length,
+        'ernsthaftigkeit': ernsthaftigkeit,
+        'latitude': latitude,
+        'longitude': longitude,
+        **location_values(crag)
+    }
+    values.update(geohash_values('routes', values))
+    values.update(normalized_values('routes', values))
+    route, created = upsert(session, Route, values, ['crag_id', 'normalized_name', 'discipline'],
+                            parents={'crag': crag})
+
+    # The insert bypasses the flush events that maintain the map clusters (existing routes are unchanged)
+    position = route.geohash or crag.geohash
+    if created and position:
+        refresh_map_clusters(session, [position])
 
-    if route and verbose:
-        print(f"  Route {name} already exists")
-
-    if not route:
-        route = Route(
-            name=name,
-            crag=crag,
-            discipline=discipline,
-            consensus_grade=grade,
-            length=length,
-            ernsthaftigkeit=ernsthaftigkeit,
-            latitude=latitude,
-            longitude=longitude
-        )
-        session.add(route)
-        session.flush()
-        if verbose:
-            print(f"  Created route: {name}")
+    if verbose:
+        print(f"  Created route: {name}" if created else f"  Route {name} already exists")
 
     return route
 
@@ -136,23 +188,17 @@ def create_ascent(session, user_id, route, grade, style=None, date=None,
 
 def get_or_create_pitch(session, route, pitch_number, pitch_data):
     """Get existing pitch or create new universal pitch."""
-    pitch = session.query(Pitch).filter(
-        Pitch.route_id == route.id,
-        Pitch.pitch_number == pitch_number
-    ).first()
-
-    if not pitch:
-        pitch = Pitch(
-            route=route,
-            pitch_number=pitch_number,
-            consensus_grade=pitch_data.get('grade'),
-            length=pitch_data.get('length'),
-            pitch_name=pitch_data.get('pitch_name'),
-            ernsthaftigkeit=pitch_data.get('ernsthaftigkeit')
-        )
-        session.add(pitch)
-        session.flush()
-
+    grade = pitch_data.get('grade')
+    values = {
+        'route_id': route.id,
+        'pitch_number': pitch_number,
+        'consensus_grade': grade,
+        'consensus_ole_grade': Grade(grade).conv_grade() if grade else None,
+        'length': pitch_data.get('length'),
+        'pitch_name': pitch_data.get('pitch_name'),
+        'ernsthaftigkeit': pitch_data.get('ernsthaftigkeit')
+    }
+    pitch, _ = upsert(session, Pitch, values, ['route_id', 'pitch_number'], parents={'route': route})
     return pitch
 
 
@@ -191,28 +237,80 @@ def load_existing_ascents(session, user_id):
         session.query(Ascent).filter(Ascent.user_id == user_id).all()
     }
 
-def load_existing_routes(session, route_names=None):
-    """Load existing routes into memory, optionally filtered by name."""
+def load_ascent_fingerprints(session, user_id):
+    """Source fingerprints of a user's imported ascents (one index-only query)."""
+    query = session.query(Ascent.source_fingerprint).filter(
+        Ascent.user_id == user_id, Ascent.source_fingerprint.is_not(None))
+    return {fingerprint for fingerprint, in query}
+
+# Ordered by id descending: of the rows with the same normalized name the oldest one is kept
+def load_existing_routes(session, crag_ids=None):
+    """Load existing routes into memory, optionally of some crags, by (normalized name, crag_id, discipline)."""
     query = session.query(Route)
-    if route_names:
-        query = query.filter(Route.name.in_(route_names))
-    return {(r.name, r.crag_id, r.discipline): r for r in query.all()}
+    if crag_ids is not None:
+        query = query.filter(Route.crag_id.in_(crag_ids))
+    return {(r.normalized_name, r.crag_id, r.discipline): r for r in query.order_by(Route.id.desc()).all()}
 
 def load_existing_countries(session, country_names=None):
     query = session.query(Country)
     if country_names:
-        query = query.filter(Country.name.in_(country_names))
-    return {c.name: c for c in query.all()}
+        query = query.filter(Country.normalized_name.in_({normalize_name(name) for name in country_names}))
+    return {c.normalized_name: c for c in query.order_by(Country.id.desc()).all()}
 
 def load_existing_areas(session, area_names=None):
     query = session.query(Area)
     if area_names:
-        query = query.filter(Area.name.in_(area_names))
-    return {a.name: a for a in query.all()}
+        query = query.filter(Area.normalized_name.in_({normalize_name(name) for name in area_names}))
+    return {a.normalized_name: a for a in query.order_by(Area.id.desc()).all()}
 
 def load_existing_crags(session, crag_names=None):
     query = session.query(Crag)
     if crag_names:
-        query = query.filter(Crag.name.in_(crag_names))
-    return {c.name: c for c in query.all()}
-
+        query = query.filter(Crag.normalized_name.in_({normalize_name(name) for name in crag_names}))
+    return {c.normalized_name: c for c in query.order_by(Crag.id.desc()).all()}
+
+
+def _consensus_averages(session, ascent_model, foreign_key, ids, *filters):
+    """{id: (average ole_grade, average stars > 0)} of the ascents of routes or pitches."""
+    rows = session.query(
+        foreign_key,
+        func.avg(ascent_model.ole_grade),
+        func.avg(case((ascent_model.stars > 0, ascent_model.stars)))
+    ).filter(foreign_key.in_(ids), *filters).group_by(foreign_key).all()
+    return {key: (avg_ole_grade, avg_stars) for key, avg_ole_grade, avg_stars in rows}
+
+
+def update_consensus_fields(session, objects):
+    """
+    Update consensus grade and stars of Routes and/or Pitches from their ascents.
+    Works for both because they share RouteMixin fields. Uses one aggregate
+    query per table, however many objects are passed.
+
+    Args:
+        session: SQLAlchemy session
+        objects: Route or Pitch objects (both have RouteMixin fields)
+    """
+    routes = [obj for obj in objects if isinstance(obj, Route)]
+    pitches = [obj for obj in objects if isinstance(obj, Pitch)]
+    if len(routes) + len(pitches) != len(objects):
+        other = next(obj for obj in objects if not isinstance(obj, (Route, Pitch)))
+        raise ValueError(f"Expected Route or Pitch, got {type(other)}")
+
+    averages = {}
+    if routes:
+        averages[Route] = _consensus_averages(session, Ascent, Ascent.route_id, [r.id for r in routes],
+                                              Ascent.is_project == False)
+    if pitches:
+        averages[Pitch] = _consensus_averages(session, PitchAscent, PitchAscent.pitch_id, [p.id for p in pitches])
+
+    for obj in routes + pitches:
+        avg_ole_grade, avg_stars = averages[type(obj)].get(obj.id, (None, None))
+
+        # Update shared RouteMixin fields (same for both)
+        if avg_ole_grade:
+            obj.consensus_ole_grade = avg_ole_grade
+            scale = Grade(obj.consensus_grade).get_scale() if obj.consensus_grade else 'French'
+            obj.consensus_grade = Grade.from_ole_grade(avg_ole_grade, scale, nearest=True)
+
+        if avg_stars:
+            obj.consensus_stars = avg_stars
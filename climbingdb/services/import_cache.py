@@ -0,0 +1,168 @@
+"""
+Parse-once cache of uploaded 8a.nu exports, keyed by the SHA-256 of the file.
+
+The preview of an upload and its import (a background job, see
+import_jobs.py) need the same parsed rows. parse_8anu_upload() parses a file
+once and keeps the result in an in-process LRU (PARSE_CACHE_SIZE files), so
+confirming the preview and re-uploading an identical file skip reading the
+CSV and rebuilding the crag-to-area map. With PARSE_CACHE_DIR set the parsed
+rows are also written to a Parquet file per hash (typed by PARSED_8ANU_SCHEMA)
+and survive a restart.
+
+The areas of the crags are looked up when a file is parsed first: crags
+added to the database later are not reflected in the cached rows.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+import pyarrow as pa
+
+from climbingdb.config import PARSE_CACHE_DIR
+
+PARSE_CACHE_SIZE = 16  # Parsed files kept in memory
+CACHE_FORMAT_VERSION = 1
+METADATA_KEY = b'climbingdb'
+
+# Typed columns of the parsed rows (parse_8anu_dataframe())
+PARSED_8ANU_SCHEMA = pa.schema([
+    ('name', pa.string()),
+    ('discipline', pa.string()),
+    ('grade', pa.string()),
+    ('style', pa.string()),
+    ('date', pa.date32()),
+    ('stars', pa.int64()),
+    ('is_project', pa.bool_()),
+    ('shortnote', pa.string()),
+    ('notes', pa.string()),
+    ('country_name', pa.string()),
+    ('area_name', pa.string()),
+    ('crag_name', pa.string()),
+])
+
+ParsedUpload = namedtuple('ParsedUpload', ['sha256', 'parsed_rows', 'skipped_rows', 'errors'])
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def content_hash(data):
+    """SHA-256 (hex) of the content of a file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_key(sha256, populate_areas_from_database):
+    return f"{sha256}-areas" if populate_areas_from_database else sha256
+
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, f"8anu_{key}.parquet")
+
+
+def _remember(key, parsed):
+    with _lock:
+        _cache[key] = parsed
+        _cache.move_to_end(key)
+        while len(_cache) > PARSE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _write_parquet(parsed, path):
+    """Write the parsed rows atomically, the skipped rows and errors go into the metadata."""
+    import pyarrow.parquet as pq
+
+    metadata = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'skipped_rows': parsed.skipped_rows,
+        'errors': parsed.errors,
+    }
+    table = pa.Table.from_pylist(parsed.parsed_rows, schema=PARSED_8ANU_SCHEMA)
+    table = table.replace_schema_metadata({METADATA_KEY: json.dumps(metadata)})
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read_parquet(sha256, path):
+    """The parsed upload of a Parquet file, None if it is missing, unreadable or outdated."""
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pq.read_table(path)
+        metadata = json.loads(table.schema.metadata[METADATA_KEY])
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+        return None
+    if (metadata.get('format_version') != CACHE_FORMAT_VERSION
+            or table.schema.remove_metadata() != PARSED_8ANU_SCHEMA):
+        return None
+    return ParsedUpload(sha256, table.to_pylist(), metadata['skipped_rows'], metadata['errors'])
+
+
+def get_cached(sha256, populate_areas_from_database=True, cache_dir=PARSE_CACHE_DIR):
+    """The parsed upload of a file hash, None if it wasn't parsed yet."""
+    key = _cache_key(sha256, populate_areas_from_database)
+    with _lock:
+        parsed = _cache.get(key)
+        if parsed is not None:
+            _cache.move_to_end(key)
+            return parsed
+
+    if cache_dir:
+        parsed = _read_parquet(sha256, _cache_path(key, cache_dir))
+        if parsed is not None:
+            _remember(key, parsed)
+        return parsed
+    return None
+
+
+def parse_8anu_upload(data, populate_areas_from_database=True, cache_dir=PARSE_CACHE_DIR):
+    """
+    Parsed rows of an 8a.nu CSV export, parsing it only if its hash isn't cached.
+
+    Args:
+        data: Content of the CSV file (bytes)
+        populate_areas_from_database: Look up the areas of known crags
+        cache_dir: Directory of the Parquet files, None to cache in memory only
+
+    Returns:
+        ParsedUpload: (sha256, parsed_rows, skipped_rows, errors) as returned
+        by parse_8anu_dataframe(). The lists are shared by the cache: copy
+        them before changing them.
+    """
+    sha256 = content_hash(data)
+    parsed = get_cached(sha256, populate_areas_from_database, cache_dir)
+    if parsed is not None:
+        return parsed
+
+    import pandas as pd
+    from climbingdb.scripts.import_8anu import parse_8anu_dataframe
+
+    df = pd.read_csv(io.BytesIO(data), sep=',', header=0, keep_default_na=False, dtype=str)
+    parsed = ParsedUpload(sha256, *parse_8anu_dataframe(
+        df, populate_areas_from_database=populate_areas_from_database))
+
+    key = _cache_key(sha256, populate_areas_from_database)
+    _remember(key, parsed)
+    if cache_dir:
+        _write_parquet(parsed, _cache_path(key, cache_dir))
+    return parsed
+
+
+def clear_cache():
+    """Forget the parsed files kept in memory (the Parquet files stay)."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,251 @@
+"""
+Background import jobs: 8a.nu imports run in a worker pool instead of the request.
+
+submit_8anu_import() records an ImportJob and hands the file to a bounded
+thread pool (IMPORT_WORKERS threads), so the page that started it returns at
+once and several users can import at the same time. The worker writes its
+progress to the job row at most every PROGRESS_INTERVAL seconds, committing
+the rows imported so far with it (a crash loses at most one interval of
+work), and the UI polls the row (get_job(), get_latest_job()). The file is
+parsed through the parse-once cache (import_cache.py): an upload previewed
+before is not parsed again, and get_imported_job() finds an earlier import
+of the same file by its content hash.
+
+SQLite allows one writer at a time: there the pool has a single worker and
+further jobs wait in its queue (status 'queued').
+
+Several app processes (e.g. Streamlit workers on PostgreSQL) share the job
+table, so every job records the process that owns its queue (OWNER) and a
+heartbeat, which a thread of that process refreshes every HEARTBEAT_INTERVAL
+seconds while the job is active. Jobs whose heartbeat is older than
+STALE_AFTER seconds belong to a stopped process: they are marked failed when
+the next job is submitted.
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update, func
+
+from climbingdb.config import IMPORT_WORKERS
+from climbingdb.models import SessionLocal, ImportJob
+from climbingdb.services.import_cache import content_hash, parse_8anu_upload
+
+PROGRESS_INTERVAL = 1.0  # seconds between two progress writes of a job
+HEARTBEAT_INTERVAL = 30.0  # seconds between two heartbeats of the active jobs of a process
+STALE_AFTER = 5 * HEARTBEAT_INTERVAL  # seconds without heartbeat after which a job's owner is gone
+MAX_ERRORS = 100  # error messages kept on a job
+
+# This process; the token tells a restarted process with a reused pid apart
+OWNER = f"{socket.gethostname()[:80]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_executor = None
+_heartbeat_stop = None
+_executor_lock = threading.Lock()
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _n_workers():
+    bind = SessionLocal.kw['bind']
+    return 1 if bind.dialect.name == 'sqlite' else max(IMPORT_WORKERS, 1)
+
+
+def _get_executor():
+    global _executor, _heartbeat_stop
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_n_workers(), thread_name_prefix='import-job')
+            _heartbeat_stop = threading.Event()
+            threading.Thread(target=_heartbeat, args=(_heartbeat_stop,), name='import-job-heartbeat',
+                             daemon=True).start()
+        return _executor
+
+
+def _heartbeat(stop, interval=HEARTBEAT_INTERVAL):
+    while not stop.wait(interval):
+        try:
+            beat()
+        except Exception:
+            pass  # E.g. the database is briefly unreachable: the next beat tries again
+
+
+def beat():
+    """Refresh the heartbeat of the active jobs of this process. Returns their number."""
+    with SessionLocal() as session:
+        result = session.execute(
+            update(ImportJob)
+            .where(ImportJob.owner == OWNER, ImportJob.status.in_(['queued', 'running']))
+            .values(heartbeat_at=_now())
+        )
+        session.commit()
+        return result.rowcount
+
+
+def fail_interrupted_jobs(session=None):
+    """
+    Mark the queued or running jobs whose owner is gone (no heartbeat for
+    STALE_AFTER seconds) as failed. Jobs of other live processes are left
+    alone. Returns their number.
+    """
+    if session is None:
+        with SessionLocal() as session:
+            return fail_interrupted_jobs(session)
+
+    cutoff = datetime.fromtimestamp(time.time() - STALE_AFTER, timezone.utc)
+    result = session.execute(
+        update(ImportJob)
+        .where(ImportJob.status.in_(['queued', 'running']),
+               ImportJob.owner.is_distinct_from(OWNER),
+               # Jobs from before the heartbeats only have their creation time
+               func.coalesce(ImportJob.heartbeat_at, ImportJob.created_at) < cutoff)
+        .values(status='failed', message="Interrupted: the process running it stopped", finished_at=_now())
+    )
+    session.commit()
+    return result.rowcount
+
+
+class ProgressThrottle:
+    """Lets a progress update through at most every interval seconds (and always the last one)."""
+
+    def __init__(self, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.last = None
+
+    def due(self, current, total):
+        now = self.clock()
+        if self.last is None or now - self.last >= self.interval or current >= total:
+            self.last = now
+            return True
+        return False
+
+
+def submit_8anu_import(csv_bytes, user_id, filename=None, update_existing=False):
+    """
+    Queue an import of an 8a.nu CSV export for a user.
+
+    A user has at most one active job: while one is queued or running it is
+    returned instead of starting another.
+
+    Args:
+        csv_bytes: Content of the CSV file
+        user_id: ID of the user importing
+        filename: Name of the uploaded file (shown in the UI)
+        update_existing: Update the ascents of rows edited on 8a.nu
+
+    Returns:
+        int: ID of the ImportJob
+    """
+    executor = _get_executor()
+
+    with SessionLocal() as session:
+        fail_interrupted_jobs(session)
+        active = get_active_job(user_id, session=session)
+        if active is not None:
+            return active.id
+
+        job = ImportJob(user_id=user_id, kind='8anu', filename=filename, sha256=content_hash(csv_bytes),
+                        status='queued', owner=OWNER, heartbeat_at=_now())
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    executor.submit(_run_8anu_import, job_id, csv_bytes, user_id, update_existing)
+    return job_id
+
+
+def _run_8anu_import(job_id, csv_bytes, user_id, update_existing=False):
+    from climbingdb.scripts.import_8anu import import_8a_csv
+
+    throttle = ProgressThrottle()
+    # Imported objects are looked up again after the progress commits
+    session = SessionLocal(expire_on_commit=False)
+    try:
+        job = session.get(ImportJob, job_id)
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = _now()
+        session.commit()
+
+        def progress_callback(current, total, message):
+            if throttle.due(current, total):
+                job.processed, job.total, job.message = current - 1, total, message
+                job.heartbeat_at = _now()
+                session.commit()
+
+        parsed = parse_8anu_upload(csv_bytes)
+        result = import_8a_csv(None, user_id, progress_callback=progress_callback, session=session,
+                               parsed=parsed[1:], update_existing=update_existing)
+
+        job.status = 'done'
+        job.processed = job.total = len(parsed.parsed_rows) + len(parsed.skipped_rows)
+        job.imported, job.skipped = result.imported, result.skipped
+        job.unchanged, job.updated, job.edited = result.unchanged, result.updated, result.edited
+        job.errors = result.errors[:MAX_ERRORS]
+        job.message = None
+        job.finished_at = _now()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        session.execute(
+            update(ImportJob).where(ImportJob.id == job_id)
+            .values(status='failed', message=str(e)[:200], finished_at=_now())
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def get_job(job_id):
+    """ImportJob by ID (detached), or None."""
+    with SessionLocal() as session:
+        return session.get(ImportJob, job_id)
+
+
+def get_active_job(user_id, session=None):
+    """The queued or running job of a user, or None."""
+    query = select(ImportJob).where(
+        ImportJob.user_id == user_id, ImportJob.status.in_(['queued', 'running'])
+    ).order_by(ImportJob.created_at.desc()).limit(1)
+    if session is not None:
+        return session.scalars(query).first()
+    with SessionLocal() as session:
+        return session.scalars(query).first()
+
+
+def get_latest_job(user_id):
+    """The most recent job of a user, or None."""
+    with SessionLocal() as session:
+        return session.scalars(
+            select(ImportJob).where(ImportJob.user_id == user_id)
+            .order_by(ImportJob.created_at.desc(), ImportJob.id.desc()).limit(1)
+        ).first()
+
+
+def get_imported_job(user_id, sha256):
+    """The latest finished import of a file (by its content hash) of a user, or None."""
+    with SessionLocal() as session:
+        return session.scalars(
+            select(ImportJob).where(ImportJob.user_id == user_id, ImportJob.sha256 == sha256,
+                                    ImportJob.status == 'done')
+            .order_by(ImportJob.created_at.desc(), ImportJob.id.desc()).limit(1)
+        ).first()
+
+
+def wait_for_jobs():
+    """Block until the queued jobs are done (tests and scripts)."""
+    global _executor, _heartbeat_stop
+    with _executor_lock:
+        executor, _executor = _executor, None
+        heartbeat_stop, _heartbeat_stop = _heartbeat_stop, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    if heartbeat_stop is not None:
+        heartbeat_stop.set()
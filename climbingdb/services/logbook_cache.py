@@ -0,0 +1,340 @@
+"""
+Read-only logbook cache: a user's logbook precompiled into memory-mapped Arrow files.
+
+build_logbook_cache() writes the user's ascents and projects (ASCENT_DTYPES
+schema), their pitch ascents, the statistics and the grade histograms into
+uncompressed Arrow IPC files. CachedClimbingService serves the logbook reads
+from them: the files are memory mapped (zero-copy load), filtered, sorted and
+paged on the mapped columns, and only the result is converted to pandas.
+
+The cache of a user is current as long as User.data_version didn't change
+(asked at most every REFRESH_INTERVAL seconds) and rebuilt otherwise.
+Used for the public demo logbook (REQUIRE_AUTH=false), which is read a lot
+and rarely written.
+
+Build ahead of deployment with:
+    python3 -m climbingdb.scripts.build_logbook_cache --username Lauchinger
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+from functools import reduce
+from operator import or_
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import select
+
+from climbingdb.config import LOGBOOK_CACHE_DIR
+from climbingdb.grade import grade_filter_range
+from climbingdb.models import SessionLocal, User
+from climbingdb.services.climbing_service import (
+    ClimbingService,
+    ASCENT_DTYPES,
+    PITCH_ASCENT_DTYPES,
+    PAGE_ORDERS
+)
+
+# Bump when the layout of the files (or ASCENT_DTYPES) changes: old files get rebuilt
+CACHE_FORMAT_VERSION = 1
+METADATA_KEY = b'climbingdb'
+
+REFRESH_INTERVAL = 30  # seconds between two data version checks
+DISCIPLINES = ["Sportclimb", "Boulder", "Multipitch"]
+
+
+def _cache_paths(user_id, cache_dir):
+    base = os.path.join(cache_dir, f"logbook_{user_id}")
+    return f"{base}.arrow", f"{base}.pitches.arrow"
+
+
+def _write_arrow(table, path):
+    """Write an uncompressed Arrow IPC file atomically (readers keep their old mapping)."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read_arrow(path):
+    """Zero-copy table of an Arrow IPC file: the buffers point into the memory map."""
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _grade_histograms(ascents):
+    """[[ole_grade, count], ...] per discipline, like ClimbingService.get_grade_histogram."""
+    done = ascents[~ascents['is_project']]
+    histograms = {}
+    for discipline in DISCIPLINES:
+        counts = done.loc[done['discipline'] == discipline, 'ole_grade'].value_counts().sort_index()
+        histograms[discipline] = [[float(grade), int(count)] for grade, count in counts.items()]
+    return histograms
+
+
+def build_logbook_cache(user_id, cache_dir=LOGBOOK_CACHE_DIR):
+    """
+    Compile the user's logbook into the cache files.
+
+    Args:
+        user_id: User whose logbook is cached
+        cache_dir: Directory of the cache files (created if missing)
+
+    Returns:
+        dict: metadata of the cache (data version, statistics, histograms)
+    """
+    service = ClimbingService(user_id=user_id)
+    user = service.session.get(User, user_id)
+    if user is None:
+        raise ValueError(f"User {user_id} not found")
+
+    # Version first: a write during the build leaves a stale (rebuilt later), never a wrong cache
+    data_version = user.data_version
+
+    ascents = pd.concat([service.get_filtered_routes(discipline=None), service.get_projects()],
+                        ignore_index=True).astype(ASCENT_DTYPES)
+    pitches = service.get_pitch_ascents(ascents['id'])
+
+    metadata = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'user_id': user_id,
+        'data_version': data_version,
+        'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'statistics': service.get_statistics(),
+        'histograms': _grade_histograms(ascents),
+    }
+    service.session.close()
+
+    table = pa.Table.from_pandas(ascents, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, METADATA_KEY: json.dumps(metadata)})
+
+    os.makedirs(cache_dir, exist_ok=True)
+    ascents_path, pitches_path = _cache_paths(user_id, cache_dir)
+    _write_arrow(pa.Table.from_pandas(pitches, preserve_index=False), pitches_path)
+    _write_arrow(table, ascents_path)  # Last: carries the version of the pair
+    return metadata
+
+
+class LogbookCache:
+    """The memory-mapped cache files of one user."""
+
+    def __init__(self, user_id, cache_dir=LOGBOOK_CACHE_DIR):
+        ascents_path, pitches_path = _cache_paths(user_id, cache_dir)
+        self.ascents = _read_arrow(ascents_path)
+        self.pitches = _read_arrow(pitches_path)
+        self.metadata = json.loads(self.ascents.schema.metadata[METADATA_KEY])
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def load(cls, user_id, cache_dir=LOGBOOK_CACHE_DIR):
+        """The cache of the files on disk, None if they are missing or unreadable."""
+        try:
+            return cls(user_id, cache_dir)
+        except (OSError, pa.ArrowInvalid, KeyError, ValueError):
+            return None
+
+    def is_current(self, data_version):
+        return (self.metadata.get('format_version') == CACHE_FORMAT_VERSION
+                and self.metadata.get('data_version') == data_version)
+
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def _current_data_version(user_id):
+    with SessionLocal() as session:
+        return session.scalar(select(User.data_version).where(User.id == user_id))
+
+
+def get_logbook_cache(user_id, cache_dir=LOGBOOK_CACHE_DIR, refresh_interval=REFRESH_INTERVAL):
+    """
+    The current cache of a user, loaded or (re)built as needed.
+
+    The database is asked for the user's data version at most every
+    refresh_interval seconds; in between the loaded cache is served as is.
+    Files that another process already rebuilt are picked up before building.
+    """
+    key = (user_id, os.path.abspath(cache_dir))
+    with _lock:
+        cache = _caches.get(key)
+        if cache is not None and time.monotonic() - cache.checked_at < refresh_interval:
+            return cache
+
+        data_version = _current_data_version(user_id)
+        if cache is None or not cache.is_current(data_version):
+            cache = LogbookCache.load(user_id, cache_dir)
+        if cache is None or not cache.is_current(data_version):
+            build_logbook_cache(user_id, cache_dir)
+            cache = LogbookCache(user_id, cache_dir)
+
+        cache.checked_at = time.monotonic()
+        _caches[key] = cache
+        return cache
+
+
+def expire_logbook_cache(user_id):
+    """Check the data version of the user's caches on their next read."""
+    with _lock:
+        for (cached_user_id, _), cache in _caches.items():
+            if cached_user_id == user_id:
+                cache.checked_at = float('-inf')
+
+
+def _arrow_value(value):
+    """Cursor value as Arrow scalar (dates of the database cursors become timestamps)."""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if isinstance(value, datetime):
+        return pa.scalar(value, type=pa.timestamp('s'))
+    return value
+
+
+def _after_cursor(columns, cursor):
+    """Keyset condition of ClimbingService._after_cursor as Arrow expression."""
+    conditions = []
+    for ii, (column, value) in enumerate(zip(columns, cursor)):
+        if value is None:
+            continue  # NULLs come last, nothing sorts after them at this position
+        condition = (pc.field(column) < _arrow_value(value)) | pc.field(column).is_null()
+        for previous, previous_value in zip(columns[:ii], cursor[:ii]):
+            condition &= (pc.field(previous).is_null() if previous_value is None
+                          else pc.field(previous) == _arrow_value(previous_value))
+        conditions.append(condition)
+    return reduce(or_, conditions, pc.scalar(False))
+
+
+def _cursor_value(value):
+    """Python value of a frame cell, as in the cursors of ClimbingService.get_ascents_page."""
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.date()
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _to_frame(table):
+    """Ascent frame (ASCENT_DTYPES) of a cache table, with the categories of its rows only."""
+    df = table.to_pandas().astype(ASCENT_DTYPES)
+    for column in df.select_dtypes('category'):
+        df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+class CachedClimbingService(ClimbingService):
+    """
+    ClimbingService serving the logbook reads of one user from the logbook cache.
+
+    Writes and all other queries (search, route details, ...) use the database.
+    Writes through this service expire the cache, so they are visible on the next read.
+    """
+
+    def __init__(self, user_id, cache_dir=LOGBOOK_CACHE_DIR, refresh_interval=REFRESH_INTERVAL):
+        super().__init__(user_id=user_id)
+        self.cache_dir = cache_dir
+        self.refresh_interval = refresh_interval
+
+    def _cache(self):
+        return get_logbook_cache(self.user_id, self.cache_dir, self.refresh_interval)
+
+    def _filtered_table(self, discipline=None, crag=None, area=None, grade=None, style=None,
+                        stars=None, operation="==", is_project=False):
+        """Cached ascents matching the filters of ClimbingService._filtered_query."""
+        condition = pc.field('is_project') == is_project
+        if area:
+            condition &= pc.field('area') == area
+        if crag:
+            condition &= pc.field('crag') == crag
+        if discipline:
+            condition &= pc.field('discipline') == discipline
+        if style:
+            condition &= pc.field('style') == style
+        if stars is not None:
+            condition &= pc.field('stars') >= stars
+
+        if grade:
+            low, high = grade_filter_range(grade, operation)
+            if low is not None:
+                condition &= pc.field('ole_grade') >= low
+            if high is not None:
+                condition &= pc.field('ole_grade') < high
+
+        return self._cache().ascents.filter(condition)
+
+    def get_filtered_routes(self, discipline="Sportclimb",
+                            crag=None, area=None, grade=None, style=None,
+                            stars=None, operation="=="):
+        table = self._filtered_table(discipline=discipline, crag=crag, area=area, grade=grade,
+                                     style=style, stars=stars, operation=operation)
+        table = table.sort_by([('ole_grade', 'descending', 'at_end'), ('sort_grade', 'descending', 'at_end')])
+        return _to_frame(table)
+
+    def get_projects(self, crag=None, area=None):
+        table = self._filtered_table(crag=crag, area=area, is_project=True)
+        return _to_frame(table.sort_by([('ole_grade', 'ascending', 'at_start')]))
+
+    def get_ascents_page(self, order_by="grade", after=None, page_size=50, **filters):
+        if order_by not in PAGE_ORDERS:
+            raise ValueError(f"Cannot page by {order_by}, use one of {list(PAGE_ORDERS)}")
+        columns = [column.key for column in PAGE_ORDERS[order_by]] + ['id']
+
+        table = self._filtered_table(**filters)
+        if after is not None:
+            table = table.filter(_after_cursor(columns, after))
+        table = table.sort_by([(column, 'descending', 'at_end') for column in columns])
+
+        page = _to_frame(table.slice(0, page_size))
+        next_cursor = None
+        if table.num_rows > page_size:
+            next_cursor = tuple(_cursor_value(page[column].iloc[-1]) for column in columns)
+        return page, next_cursor
+
+    def count_filtered_ascents(self, **filters):
+        return self._filtered_table(**filters).num_rows
+
+    def get_pitch_ascents(self, ascent_ids):
+        ascent_ids = pa.array([int(ascent_id) for ascent_id in ascent_ids], type=pa.int64())
+        table = self._cache().pitches.filter(pc.field('ascent_id').isin(ascent_ids))
+        return table.to_pandas().astype(PITCH_ASCENT_DTYPES)
+
+    def get_statistics(self):
+        return dict(self._cache().metadata['statistics'])
+
+    def get_grade_histogram(self, discipline):
+        rows = self._cache().metadata['histograms'].get(discipline, [])
+        return pd.Series([count for _, count in rows], dtype='int64', name='count',
+                         index=pd.Index([grade for grade, _ in rows], dtype='float64', name='ole_grade'))
+
+    def add_ascent(self, *args, **kwargs):
+        try:
+            return super().add_ascent(*args, **kwargs)
+        finally:
+            expire_logbook_cache(self.user_id)
+
+    def update_ascent(self, *args, **kwargs):
+        try:
+            return super().update_ascent(*args, **kwargs)
+        finally:
+            expire_logbook_cache(self.user_id)
+
+    def delete_ascent(self, *args, **kwargs):
+        try:
+            return super().delete_ascent(*args, **kwargs)
+        finally:
+            expire_logbook_cache(self.user_id)
+
+    def update_pitch_ascents(self, *args, **kwargs):
+        try:
+            return super().update_pitch_ascents(*args, **kwargs)
+        finally:
+            expire_logbook_cache(self.user_id)
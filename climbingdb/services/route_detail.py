@@ -0,0 +1,241 @@
+"""
+Route detail page data: fully loaded, immutable snapshots of a route.
+
+load_route_detail() reads a route with its statistics and pitches and a user's
+ascent with its pitch ascents in two queries (selectinload for the collections; the pitches
+of the pitch ascents come from the identity map) and copies them into frozen
+dataclasses, so rendering never triggers a lazy load.
+
+Shared route links make single routes hot, so the snapshots are cached per
+(route, user) for ROUTE_DETAIL_TTL seconds. Flushes that change a route, its
+pitches or its ascents evict the route's entries in this process; the TTL
+bounds how stale a page written to by another process can be.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload, joinedload
+
+from climbingdb.models import Country, Area, Crag, Route, Pitch, Ascent, PitchAscent
+from climbingdb.services.climbing_service import ClimbingService
+
+ROUTE_DETAIL_TTL = 60  # seconds
+ROUTE_DETAIL_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class PitchDetail:
+    id: int
+    pitch_number: int
+    pitch_name: Optional[str]
+    consensus_grade: Optional[str]
+    consensus_stars: Optional[float]
+    length: Optional[float]
+    bolts: Optional[int]
+    ernsthaftigkeit: Optional[str]
+    description: Optional[str]
+
+
+@dataclass(frozen=True)
+class PitchAscentDetail:
+    id: int
+    pitch: PitchDetail
+    grade: str
+    ole_grade: float
+    style: Optional[str]
+    stars: Optional[int]
+    led: Optional[bool]
+    shortnote: Optional[str]
+    notes: Optional[str]
+    gear: Optional[str]
+    is_project: bool
+
+
+@dataclass(frozen=True)
+class AscentDetail:
+    id: int
+    grade: str
+    ole_grade: float
+    style: Optional[str]
+    stars: Optional[int]
+    date: Optional[date]
+    shortnote: Optional[str]
+    notes: Optional[str]
+    gear: Optional[str]
+    is_project: bool
+    is_milestone: bool
+    ascent_time: Optional[float]
+    pitch_ascents: tuple
+    # One-row ascent frame and its pitch ascents (ClimbingService schemas) for the multipitch plot
+    frame: pd.DataFrame = field(compare=False, repr=False)
+    pitch_frame: pd.DataFrame = field(compare=False, repr=False)
+
+
+@dataclass(frozen=True)
+class RouteStatsDetail:
+    n_ascents: int
+    n_projects: int
+    n_onsight: int
+    n_flash: int
+    n_soft: int
+    n_hard: int
+    grade_votes: tuple  # (ole_grade, number of ascents), ascending grades
+    last_ascent: Optional[date]
+
+    @property
+    def onsight_ratio(self):
+        return self.n_onsight / self.n_ascents if self.n_ascents else 0
+
+    @property
+    def flash_ratio(self):
+        return self.n_flash / self.n_ascents if self.n_ascents else 0
+
+
+@dataclass(frozen=True)
+class RouteDetail:
+    id: int
+    name: str
+    discipline: str
+    crag_id: int
+    consensus_grade: Optional[str]
+    consensus_stars: Optional[float]
+    crag_name: Optional[str]
+    area_name: Optional[str]
+    country_name: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    length: Optional[float]
+    bolts: Optional[int]
+    ernsthaftigkeit: Optional[str]
+    first_ascensionist: Optional[str]
+    first_ascent: Optional[date]
+    description: Optional[str]
+    pitches: tuple
+    stats: Optional[RouteStatsDetail] = None  # None if nobody logged the route yet
+    ascent: Optional[AscentDetail] = None  # Of the user the detail was loaded for
+
+
+def _copy(cls, obj, **values):
+    """Dataclass instance from the same-named attributes of an ORM object."""
+    names = [name for name in cls.__dataclass_fields__ if name not in values]
+    return cls(**{name: getattr(obj, name) for name in names}, **values)
+
+
+def _ascent_detail(ascent, pitches):
+    pitch_ascents = sorted(ascent.pitch_ascents, key=lambda pa: pitches[pa.pitch_id].pitch_number)
+    return _copy(
+        AscentDetail, ascent,
+        is_project=bool(ascent.is_project),
+        is_milestone=bool(ascent.is_milestone),
+        pitch_ascents=tuple(_copy(PitchAscentDetail, pa, pitch=pitches[pa.pitch_id],
+                                  is_project=bool(pa.is_project))
+                            for pa in pitch_ascents),
+        frame=ClimbingService._ascents_to_dataframe([ascent]),
+        pitch_frame=ClimbingService._pitch_ascents_to_dataframe([ascent])
+    )
+
+
+def load_route_detail(session, route_id, user_id=None):
+    """
+    Route with pitches (and the user's ascent with pitch ascents) as RouteDetail.
+
+    Returns:
+        RouteDetail, or None if the route doesn't exist
+    """
+    route = session.query(Route).options(
+        joinedload(Route.stats),
+        selectinload(Route.pitches)
+    ).filter(Route.id == route_id).first()
+    if route is None:
+        return None
+
+    pitches = {pitch.id: _copy(PitchDetail, pitch)
+               for pitch in sorted(route.pitches, key=lambda pitch: pitch.pitch_number or 0)}
+
+    ascent = None
+    if user_id:
+        ascent = session.query(Ascent).options(selectinload(Ascent.pitch_ascents)).filter(
+            Ascent.route_id == route.id,
+            Ascent.user_id == user_id
+        ).first()
+
+    stats = None
+    if route.stats is not None:
+        votes = sorted((float(grade), n) for grade, n in (route.stats.grade_votes or {}).items())
+        stats = _copy(RouteStatsDetail, route.stats, grade_votes=tuple(votes))
+
+    return _copy(RouteDetail, route,
+                 pitches=tuple(pitches.values()),
+                 stats=stats,
+                 ascent=_ascent_detail(ascent, pitches) if ascent else None)
+
+
+_details = OrderedDict()  # (route_id, user_id) -> (loaded_at, RouteDetail or None)
+_lock = threading.Lock()
+
+
+def get_cached_route_detail(session_factory, route_id, user_id=None, ttl=ROUTE_DETAIL_TTL):
+    """load_route_detail() in a new session of session_factory, cached per (route, user) for ttl seconds."""
+    key = (route_id, user_id)
+    with _lock:
+        cached = _details.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            _details.move_to_end(key)
+            return cached[1]
+
+    with session_factory() as session:
+        detail = load_route_detail(session, route_id, user_id)
+
+    with _lock:
+        _details[key] = (time.monotonic(), detail)
+        _details.move_to_end(key)
+        while len(_details) > ROUTE_DETAIL_CACHE_SIZE:
+            _details.popitem(last=False)
+    return detail
+
+
+def invalidate_route_details(route_ids=None):
+    """Evict the cached details of the given routes (all routes if None)."""
+    with _lock:
+        if route_ids is None:
+            _details.clear()
+            return
+        for key in [key for key in _details if key[0] in route_ids]:
+            del _details[key]
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_routes(session, flush_context):
+    """Routes whose details change with this flush (None: too costly to tell, evict all)."""
+    changed = session.info.setdefault('changed_route_details', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Route):
+            changed.add(obj.id)
+        elif isinstance(obj, (Pitch, Ascent)):
+            changed.add(obj.route_id)
+        elif isinstance(obj, PitchAscent):
+            pitch = obj.__dict__.get('pitch')  # Only if loaded, no queries inside the flush
+            changed.add(pitch.route_id if pitch is not None else None)
+        elif isinstance(obj, (Crag, Area, Country)) and obj in session.dirty:
+            changed.add(None)  # Renamed location
+
+
+@event.listens_for(Session, 'after_commit')
+def _evict_changed_routes(session):
+    # Evicted on commit: a load between flush and commit would cache the old state
+    changed = session.info.pop('changed_route_details', None)
+    if changed:
+        invalidate_route_details(None if None in changed else changed)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_changed_routes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('changed_route_details', None)
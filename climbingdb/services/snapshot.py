@@ -0,0 +1,335 @@
+"""
+Columnar snapshots of a user's logbook.
+
+A snapshot is a zip archive with one Parquet file per table (the user's
+ascents and pitch ascents plus the routes, pitches, crags, areas and countries
+they reference) and a manifest.json. Export reads every table with one query,
+import writes every table with one bulk INSERT and remaps the ids,
+so backups and moves between SQLite and PostgreSQL instances don't go through
+the ORM row by row.
+
+Locations, routes and pitches that already exist in the target database
+(same natural key with the normalized name, see models/name_sync.py) are
+reused, not duplicated.
+"""
+
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, insert, delete, types
+
+from climbingdb.models import Country, Area, Crag, Route, Pitch, Ascent, PitchAscent, User
+from climbingdb.models.data_version import bump_data_version
+from climbingdb.models.geo_sync import geohash_values
+from climbingdb.models.name_sync import normalized_values
+from climbingdb.models.map_cluster_sync import refresh_map_clusters
+from climbingdb.models.route_stats_sync import refresh_route_stats
+from climbingdb.models.monthly_stats_sync import rebuild_monthly_stats
+from climbingdb.models.sync_helpers import chunks
+from climbingdb.services.crud import update_consensus_fields
+
+SNAPSHOT_FORMAT = 'climbingdb-snapshot'
+SNAPSHOT_VERSION = 1
+
+# Shared tables in insertion order: natural key and the id columns that point to
+# earlier tables (routes also carry the denormalized area_id/country_id)
+SHARED_TABLES = [
+    (Country, ('normalized_name',), {}),
+    (Area, ('normalized_name', 'country_id'), {'country_id': 'countries'}),
+    (Crag, ('normalized_name', 'area_id'), {'area_id': 'areas'}),
+    (Route, ('crag_id', 'normalized_name', 'discipline'),
+     {'crag_id': 'crags', 'area_id': 'areas', 'country_id': 'countries'}),
+    (Pitch, ('route_id', 'pitch_number'), {'route_id': 'routes'}),
+]
+
+# The user's own rows, always inserted
+USER_TABLES = [Ascent, PitchAscent]
+
+CHUNK_SIZE = 500
+
+
+class SnapshotError(Exception):
+    """Raised if a snapshot cannot be read or imported."""
+
+
+def _arrow_type(column_type):
+    """Arrow type of a SQLAlchemy column type (JSON is stored as text)."""
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, types.Integer):
+        return pa.int64()
+    if isinstance(column_type, types.Float):
+        return pa.float64()
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _is_json(column):
+    return isinstance(column.type, types.JSON)
+
+
+def _to_arrow(table, rows):
+    """Arrow table with one column per database column."""
+    columns = {column.name: [] for column in table.columns}
+    for row in rows:
+        for column in table.columns:
+            value = row[column.name]
+            if _is_json(column) and value is not None:
+                value = json.dumps(value)
+            columns[column.name].append(value)
+
+    schema = pa.schema([(column.name, _arrow_type(column.type)) for column in table.columns])
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _from_arrow(table, arrow_table):
+    """Row dicts of an Arrow table, restricted to the columns the database knows."""
+    known = {column.name: column for column in table.columns}
+    names = [name for name in arrow_table.column_names if name in known]
+    json_columns = [name for name in names if _is_json(known[name])]
+
+    rows = arrow_table.select(names).to_pylist()
+    for row in rows:
+        for name in json_columns:
+            if row[name] is not None:
+                row[name] = json.loads(row[name])
+    return rows
+
+
+def _user_selects(user_id):
+    """One SELECT per table for the user's rows and everything they reference."""
+    ascent_ids = select(Ascent.id).where(Ascent.user_id == user_id)
+    route_ids = select(Ascent.route_id).where(Ascent.user_id == user_id)
+    crag_ids = select(Route.crag_id).where(Route.id.in_(route_ids))
+    area_ids = select(Crag.area_id).where(Crag.id.in_(crag_ids))
+    country_ids = select(Area.country_id).where(Area.id.in_(area_ids))
+
+    return [
+        (Country, Country.id.in_(country_ids)),
+        (Area, Area.id.in_(area_ids)),
+        (Crag, Crag.id.in_(crag_ids)),
+        (Route, Route.id.in_(route_ids)),
+        (Pitch, Pitch.route_id.in_(route_ids)),
+        (Ascent, Ascent.user_id == user_id),
+        (PitchAscent, PitchAscent.ascent_id.in_(ascent_ids)),
+    ]
+
+
+def export_snapshot(session, user_id, destination):
+    """
+    Write a snapshot of the user's logbook.
+
+    Args:
+        session: SQLAlchemy session
+        user_id: User to export
+        destination: Path or binary file object for the zip archive
+
+    Returns:
+        dict: number of rows per table
+    """
+    user = session.get(User, user_id)
+    if user is None:
+        raise SnapshotError(f"User {user_id} not found")
+
+    tables = {}
+    for model, condition in _user_selects(user_id):
+        table = model.__table__
+        rows = session.execute(select(table).where(condition).order_by(table.c.id)).mappings().all()
+        tables[table.name] = _to_arrow(table, rows)
+
+    counts = {name: table.num_rows for name, table in tables.items()}
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'username': user.username,
+        'counts': counts,
+    }
+
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+        for name, table in tables.items():
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer, compression='zstd')
+            archive.writestr(f"{name}.parquet", buffer.getvalue())
+
+    return counts
+
+
+def read_snapshot(source):
+    """
+    Read a snapshot archive.
+
+    Args:
+        source: Path or binary file object
+
+    Returns:
+        tuple: (manifest dict, dict of table name -> Arrow table)
+    """
+    try:
+        with zipfile.ZipFile(source) as archive:
+            manifest = json.loads(archive.read('manifest.json'))
+            if manifest.get('format') != SNAPSHOT_FORMAT:
+                raise SnapshotError("Not a climbingdb snapshot")
+            if manifest.get('version', 0) > SNAPSHOT_VERSION:
+                raise SnapshotError(f"Snapshot version {manifest['version']} is newer than this app supports")
+
+            tables = {}
+            for model in [model for model, *_ in SHARED_TABLES] + USER_TABLES:
+                name = model.__tablename__
+                tables[name] = pq.read_table(io.BytesIO(archive.read(f"{name}.parquet")))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise SnapshotError(f"Invalid snapshot: {e}") from e
+
+    return manifest, tables
+
+
+def _remap(rows, id_columns, id_maps):
+    """Point the id columns of snapshot rows to the target database ids."""
+    for row in rows:
+        for column, table_name in id_columns.items():
+            if column in row and row[column] is not None:
+                row[column] = id_maps[table_name][row[column]]
+
+
+def _existing_ids(session, model, key, rows):
+    """Ids of existing rows by natural key, looked up by name or by parent id in chunks."""
+    table = model.__table__
+    lookup = key[0] if len(key) == 1 else next(column for column in key if column.endswith('_id'))
+    values = {row[lookup] for row in rows}
+
+    existing = {}
+    for chunk in chunks((value for value in values if value is not None), CHUNK_SIZE):
+        statement = select(table.c.id, *[table.c[column] for column in key]).where(table.c[lookup].in_(chunk))
+        for row in session.execute(statement):
+            existing[tuple(row[1:])] = row.id
+    if None in values:
+        statement = select(table.c.id, *[table.c[column] for column in key]).where(table.c[lookup].is_(None))
+        for row in session.execute(statement):
+            existing[tuple(row[1:])] = row.id
+    return existing
+
+
+def _insert_rows(session, table, rows, returning=False):
+    """
+    Bulk insert rows (executemany) without their snapshot ids.
+
+    With returning, the new ids in the order of rows are returned (RETURNING,
+    batched by SQLAlchemy's insertmanyvalues).
+    """
+    if not rows:
+        return []
+    statement = insert(table)
+    if returning:
+        statement = statement.returning(table.c.id, sort_by_parameter_order=True)
+    result = session.execute(statement, [{column: value for column, value in row.items() if column != 'id'}
+                                         for row in rows])
+    return result.scalars().all() if returning else None
+
+
+def _import_shared(session, model, key, rows):
+    """
+    Insert the rows whose natural key doesn't exist yet.
+
+    Returns:
+        tuple: ({snapshot id: target id}, number of inserted rows)
+    """
+    existing = _existing_ids(session, model, key, rows)
+
+    # Snapshots of databases without unique keys may repeat a key: insert it once
+    missing = {}
+    for row in rows:
+        row_key = tuple(row[column] for column in key)
+        if row_key not in existing:
+            missing.setdefault(row_key, row)
+
+    if missing:
+        _insert_rows(session, model.__table__, list(missing.values()))
+        existing = _existing_ids(session, model, key, rows)
+
+    id_map = {row['id']: existing[tuple(row[column] for column in key)] for row in rows}
+    return id_map, len(missing)
+
+
+def import_snapshot(session, source, user_id, replace=False):
+    """
+    Import a snapshot into a user's logbook in one transaction.
+
+    Args:
+        session: SQLAlchemy session
+        source: Path or binary file object of the snapshot
+        user_id: User that receives the ascents
+        replace: Delete the user's existing ascents first (restore a backup)
+
+    Returns:
+        dict: per table, number of inserted rows and of reused existing rows
+    """
+    _, tables = read_snapshot(source)
+
+    if session.get(User, user_id) is None:
+        raise SnapshotError(f"User {user_id} not found")
+
+    try:
+        has_ascents = session.execute(select(Ascent.id).where(Ascent.user_id == user_id).limit(1)).first()
+        if has_ascents and not replace:
+            raise SnapshotError("User already has ascents; import with replace to overwrite them")
+        replaced_routes = set()
+        if has_ascents:
+            replaced_routes = set(session.scalars(select(Ascent.route_id).where(Ascent.user_id == user_id)))
+            user_ascents = select(Ascent.id).where(Ascent.user_id == user_id)
+            session.execute(delete(PitchAscent).where(PitchAscent.ascent_id.in_(user_ascents)))
+            session.execute(delete(Ascent).where(Ascent.user_id == user_id))
+
+        id_maps = {}
+        report = {}
+        positions = set()  # Geohashes of the imported routes and crags
+        for model, key, id_columns in SHARED_TABLES:
+            name = model.__tablename__
+            rows = _from_arrow(model.__table__, tables[name])
+            _remap(rows, id_columns, id_maps)
+            for row in rows:
+                # Also for snapshots from before the geohash and normalized name columns
+                row.update(geohash_values(name, row))
+                row.update(normalized_values(name, row))
+                positions.add(row.get('geohash'))
+            id_maps[name], n_inserted = _import_shared(session, model, key, rows)
+            report[name] = {'inserted': n_inserted, 'existing': len(rows) - n_inserted}
+
+        ascents = _from_arrow(Ascent.__table__, tables['ascents'])
+        ascents.sort(key=lambda row: row['id'])
+        _remap(ascents, {'route_id': 'routes'}, id_maps)
+        for row in ascents:
+            row['user_id'] = user_id
+        # Ascents committed meanwhile (e.g. by an import job) don't shift the mapping
+        new_ids = _insert_rows(session, Ascent.__table__, ascents, returning=True)
+        id_maps['ascents'] = dict(zip([row['id'] for row in ascents], new_ids))
+
+        pitch_ascents = _from_arrow(PitchAscent.__table__, tables['pitchascents'])
+        _remap(pitch_ascents, {'ascent_id': 'ascents', 'pitch_id': 'pitches'}, id_maps)
+        _insert_rows(session, PitchAscent.__table__, pitch_ascents)
+
+        report['ascents'] = {'inserted': len(ascents), 'existing': 0}
+        report['pitchascents'] = {'inserted': len(pitch_ascents), 'existing': 0}
+
+        # Consensus of the touched routes and pitches now includes the imported ascents
+        for model in [Route, Pitch]:
+            for chunk in chunks(set(id_maps[model.__tablename__].values()), CHUNK_SIZE):
+                update_consensus_fields(session, session.query(model).filter(model.id.in_(chunk)).all())
+
+        refresh_route_stats(session, replaced_routes | {row['route_id'] for row in ascents})
+        refresh_map_clusters(session, positions)
+        rebuild_monthly_stats(session, [user_id])
+        bump_data_version(session, [user_id])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return report
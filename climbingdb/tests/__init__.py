@@ -0,0 +1,44 @@
+import unittest
+
+from climbingdb.models import Base, SessionLocal
+from climbingdb.benchmarks import bind_sessions, create_benchmark_engine, generate_logbook
+
+
+class LogbookTestCase(unittest.TestCase):
+    """
+    Tests sharing one generated logbook, created once per class.
+
+    SessionLocal (and with it the services) is bound to the database for the
+    tests of the class. Subclasses set LOGBOOK_SIZES (keyword arguments of
+    generate_logbook) and can override prepare_logbook(); DATABASE_URL and
+    create_bind() choose another database. The generate_logbook() context is
+    cls.context.
+    """
+
+    DATABASE_URL = 'sqlite://'
+    LOGBOOK_SIZES = {}
+
+    @classmethod
+    def create_bind(cls):
+        return create_benchmark_engine(cls.DATABASE_URL)
+
+    @classmethod
+    def prepare_logbook(cls, session):
+        """Adjust or look up rows of the generated logbook before the tests (committed afterwards)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bind = cls.create_bind()
+        Base.metadata.create_all(bind=cls.bind)
+        cls.bound = bind_sessions(cls.bind)
+        cls.bound.__enter__()
+
+        session = SessionLocal()
+        cls.context = generate_logbook(session, **cls.LOGBOOK_SIZES)
+        cls.prepare_logbook(session)
+        session.commit()
+        session.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.bound.__exit__(None, None, None)
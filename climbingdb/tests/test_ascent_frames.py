@@ -0,0 +1,77 @@
+"""
+Test the compact DataFrame schema of the service results and the long-format pitch frame.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_ascent_frames
+"""
+
+import math
+import unittest
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from climbingdb.models import Ascent
+from climbingdb.grade import grade_filter_range
+from climbingdb.services import ClimbingService
+from climbingdb.services.climbing_service import ASCENT_DTYPES, PITCH_ASCENT_DTYPES
+from climbingdb.visualizations import plot_multipitches
+from climbingdb.benchmarks import QueryCounter
+from climbingdb.tests import LogbookTestCase
+
+
+class TestAscentFrames(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=10, n_routes=300, ascents_per_user=50, main_user_ascents=200)
+
+    def setUp(self):
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def assertSchema(self, df, dtypes):
+        self.assertEqual(list(df.columns), list(dtypes))
+        for column, dtype in dtypes.items():
+            self.assertEqual(df[column].dtype.name, dtype, column)
+
+    def test_schema(self):
+        self.assertSchema(self.db.get_filtered_routes(discipline=None), ASCENT_DTYPES)
+        self.assertSchema(self.db.get_filtered_routes(area="Nowhere"), ASCENT_DTYPES)
+        self.assertSchema(self.db.get_pitch_ascents([]), PITCH_ASCENT_DTYPES)
+
+    def test_pitch_ascents(self):
+        multipitches = self.db.get_multipitches()
+        self.assertGreater(len(multipitches), 0)
+
+        with QueryCounter(self.bind) as counter:
+            pitches = self.db.get_pitch_ascents(multipitches['id'])
+        self.assertEqual(counter.count, 1)
+        self.assertSchema(pitches, PITCH_ASCENT_DTYPES)
+
+        ascents = self.db.session.query(Ascent).filter(Ascent.id.in_([int(i) for i in multipitches['id']])).all()
+        expected = ClimbingService._pitch_ascents_to_dataframe(ascents)
+        self.assertEqual(pitches.values.tolist(), expected.values.tolist())
+
+        counts = pitches.groupby('ascent_id').size()
+        with_pitches = multipitches[multipitches['pitch_number'].notna()]
+        self.assertEqual(dict(zip(with_pitches['id'], with_pitches['pitch_number'])), counts.to_dict())
+
+    def test_grade_filters(self):
+        everything = self.db.get_filtered_routes(discipline=None)
+        for grade, operation in [("7a", "=="), ("6b", "<="), ("7a", ">="), (("6a", "7a"), "between")]:
+            low, high = grade_filter_range(grade, operation)
+            expected = everything[(everything['ole_grade'] >= (low if low is not None else -math.inf)) &
+                                  (everything['ole_grade'] < (high if high is not None else math.inf))]
+            actual = self.db.get_filtered_routes(discipline=None, grade=grade, operation=operation)
+            self.assertGreater(len(actual), 0, operation)
+            self.assertEqual(sorted(actual['id']), sorted(expected['id']), operation)
+
+    def test_plot_multipitches(self):
+        multipitches = self.db.get_multipitches()
+        pitches = self.db.get_pitch_ascents(multipitches['id'])
+        fig = plot_multipitches(multipitches, pitches)
+        self.assertGreaterEqual(len(fig.axes[0].patches), len(multipitches))
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    unittest.main()
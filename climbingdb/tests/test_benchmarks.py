@@ -0,0 +1,62 @@
+"""
+Smoke test of the benchmark suite on a tiny in-memory logbook.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_benchmarks
+"""
+
+import unittest
+
+from climbingdb.models import Base, SessionLocal, Route
+from climbingdb.benchmarks import (
+    SCENARIOS,
+    bind_sessions,
+    create_benchmark_engine,
+    generate_logbook,
+    run_benchmarks,
+    compare_results
+)
+
+TINY_SCALE = {
+    'n_users': 3,
+    'n_crags': 10,
+    'n_routes': 200,
+    'ascents_per_user': 30,
+    'main_user_ascents': 60,
+}
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def _generate(self, seed):
+        bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=bind)
+        with bind_sessions(bind):
+            session = SessionLocal()
+            context = generate_logbook(session, seed=seed, **TINY_SCALE)
+            names = [name for (name,) in session.query(Route.name).order_by(Route.id)]
+            session.close()
+        return context, names
+
+    def test_generator_is_deterministic(self):
+        context_a, names_a = self._generate(seed=7)
+        context_b, names_b = self._generate(seed=7)
+        self.assertEqual(context_a, context_b)
+        self.assertEqual(names_a, names_b)
+        self.assertEqual(context_a['ascents'], 60 + 2 * 30)
+
+    def test_all_scenarios_report_timings(self):
+        results = run_benchmarks(create_benchmark_engine('sqlite://'), scale=TINY_SCALE,
+                                 repeat=2, warmup=0, import_rows=20)
+
+        self.assertEqual(set(results['scenarios']), set(SCENARIOS))
+        for name, result in results['scenarios'].items():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'], name)
+        self.assertGreater(results['scenarios']['get_filtered_routes']['queries'], 0)
+
+        comparison = compare_results(results, results)
+        self.assertFalse(any(row['regressed'] for row in comparison))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Test duplicate detection of the cleanup script on a database without unique natural keys.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_cleanup
+"""
+
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from sqlalchemy import text, func
+from sqlalchemy.orm import sessionmaker
+
+from climbingdb.models import Base, Country, Area, Crag, Route, Ascent, User, Pitch, PitchAscent
+from climbingdb.scripts import cleanup
+from climbingdb.benchmarks import QueryCounter, create_benchmark_engine
+
+
+class TestCleanup(unittest.TestCase):
+
+    def setUp(self):
+        """Legacy schema (no unique natural keys) with duplicate crags and routes."""
+        self.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=self.bind)
+        with self.bind.begin() as connection:
+            for name in ['ix_countries_name', 'ix_areas_name_country', 'ix_crags_name_area',
+                         'ix_routes_crag_name_discipline', 'ix_pitches_route_number',
+                         'ix_countries_normalized_name', 'ix_areas_normalized_country', 'ix_crags_normalized_area',
+                         'ix_routes_crag_normalized_discipline']:
+                connection.execute(text(f"DROP INDEX {name}"))
+
+        self.session = sessionmaker(bind=self.bind)()
+        users = [User(username=f"user{ii}", password_hash="x") for ii in range(3)]
+        area = Area(name="Frankenjura", country=Country(name="Germany"))
+        self.crags = [Crag(name="Waldkopf", area=area), Crag(name="Waldkopf", area=area),
+                      Crag(name="Rabenfels", area=area)]
+
+        routes = []
+        for crag in self.crags:
+            for name in ["Sautanz", "Sautanz", "Chasin' the Trane"]:
+                route = Route(name=name, crag=crag, discipline="Sportclimb", consensus_grade="7a")
+                route.ascents = [Ascent(user=user, grade="7a") for user in users[:len(routes) % 3 + 1]]
+                routes.append(route)
+
+        self.session.add_all(users + routes + [Crag(name="Empty", area=area)])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_find_duplicates(self):
+        crags = cleanup.find_duplicate_crags(self.session)
+        self.assertEqual(list(crags), [("waldkopf", self.crags[0].area_id)])
+        self.assertEqual(len(crags[("waldkopf", self.crags[0].area_id)]), 2)
+
+        routes = cleanup.find_duplicate_routes(self.session)
+        self.assertEqual(len(routes), 3)  # Sautanz twice in every crag
+        self.assertTrue(all(len(group) == 2 for group in routes.values()))
+
+        self.assertEqual(cleanup.find_duplicate_countries(self.session), {})
+        self.assertEqual(cleanup.find_duplicate_areas(self.session), {})
+
+    def test_variant_spellings_are_duplicates(self):
+        self.session.add(Route(name="sautanz ", crag=self.crags[2], discipline="Sportclimb"))
+        self.session.commit()
+
+        routes = cleanup.find_duplicate_routes(self.session)
+        group = routes[("sautanz", self.crags[2].id, "Sportclimb")]
+        self.assertEqual([route.name for route in group], ["Sautanz", "Sautanz", "sautanz "])
+
+        cleanup.merge_duplicates(self.session)
+        names = self.session.query(Route.name).filter_by(crag_id=self.crags[2].id).all()
+        self.assertEqual(sorted(name for name, in names), ["Chasin' the Trane", "Sautanz"])
+
+    def test_level_stats(self):
+        stats = cleanup.get_level_stats(self.session, Crag, [self.crags[0].id])
+        self.assertEqual(stats, {self.crags[0].id: {'routes': 3, 'ascents': 6, 'users': 3}})
+
+        area_stats = cleanup.get_level_stats(self.session, Area)
+        self.assertEqual(list(area_stats.values()), [{'crags': 4, 'routes': 9, 'ascents': 18, 'users': 3}])
+
+    def test_constant_number_of_queries(self):
+        with QueryCounter(self.bind) as counter, redirect_stdout(io.StringIO()) as output:
+            cleanup.print_duplicate_crags(cleanup.find_duplicate_crags(self.session), self.session)
+            cleanup.print_duplicate_routes(cleanup.find_duplicate_routes(self.session), self.session)
+        # Per level: find the groups, stats per member, stats per group
+        self.assertEqual(counter.count, 2 * 3)
+        self.assertIn("Total duplicate routes to remove: 3", output.getvalue())
+
+    def _add_duplicate_country(self):
+        """A second 'Germany' with the same area/crag/multipitch as the first one."""
+        user = self.session.query(User).first()
+        country = Country(name="Germany")
+        crag = Crag(name="Waldkopf", area=Area(name="Frankenjura", country=country))
+        route = Route(name="Ostwand", crag=crag, discipline="Multipitch", consensus_grade="6a")
+        for number, grade in [(1, "5c"), (2, "6b")]:
+            pitch = Pitch(route=route, pitch_number=number, consensus_grade=grade)
+            pitch.pitch_ascents = [PitchAscent(grade=grade, ascent=Ascent(user=user, route=route, grade="6b"))]
+        other = Route(name="Ostwand", crag=self.crags[0], discipline="Multipitch", consensus_grade="6a")
+        other.pitches = [Pitch(pitch_number=1, consensus_grade="5c")]
+        self.session.add_all([country, other])
+        self.session.commit()
+
+    def _counts(self):
+        return {model.__tablename__: self.session.query(model).count()
+                for model in [Country, Area, Crag, Route, Pitch, Ascent, PitchAscent]}
+
+    def test_merge_dry_run(self):
+        self._add_duplicate_country()
+        before = self._counts()
+
+        report = cleanup.merge_duplicates(self.session, dry_run=True)
+
+        self.assertEqual(self._counts(), before)
+        deleted = {level['table']: level['deleted'] for level in report}
+        self.assertEqual(deleted, {'countries': 1, 'areas': 1, 'crags': 2, 'routes': 6, 'pitches': 1, 'ascents': 9})
+
+        with redirect_stdout(io.StringIO()) as output:
+            cleanup.print_merge_report(report, dry_run=True)
+        self.assertIn("ascents: 7 groups, 9 rows merged", output.getvalue())
+        self.assertIn("- pitchascents: 1 rows deleted", output.getvalue())
+
+    def test_merge(self):
+        self._add_duplicate_country()
+        before = self._counts()
+
+        report = cleanup.merge_duplicates(self.session)
+
+        after = self._counts()
+        self.assertEqual(after['countries'], 1)
+        self.assertEqual(after['crags'], 3)  # Waldkopf, Rabenfels, Empty
+        self.assertEqual(after['routes'], 5)  # Sautanz, Chasin' the Trane, Ostwand; Sautanz, Chasin' the Trane
+        self.assertEqual(after['pitches'], 2)
+        # Of the ascents of one user on the merged routes (all undated) the oldest is kept
+        self.assertEqual(after['ascents'], before['ascents'] - 9)
+        self.assertEqual(after['pitchascents'], before['pitchascents'] - 1)
+        self.assertEqual(report[0]['repointed'], {'areas.country_id': 1})
+        self.assertEqual(report[-1]['deleted_children'], {'pitchascents': 1})
+        duplicate_ascents = self.session.query(*cleanup.ASCENT_KEY).group_by(*cleanup.ASCENT_KEY) \
+            .having(func.count() > 1).all()
+        self.assertEqual(duplicate_ascents, [])
+
+        for finder in [cleanup.find_duplicate_countries, cleanup.find_duplicate_areas,
+                       cleanup.find_duplicate_crags, cleanup.find_duplicate_routes]:
+            self.assertEqual(finder(self.session), {}, finder.__name__)
+
+        # Survivors keep consistent location columns and get the merged consensus
+        ostwand = self.session.query(Route).filter(Route.name == "Ostwand").one()
+        self.assertEqual((ostwand.crag_id, ostwand.country_name), (self.crags[0].id, "Germany"))
+        self.assertEqual(ostwand.area_id, self.crags[0].area_id)
+        self.assertEqual(ostwand.consensus_grade, "6b")
+
+    def test_empty_crags(self):
+        empty = cleanup.find_empty_crags(self.session)
+        self.assertEqual([(crag.name, routes) for crag, routes in empty], [("Empty", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
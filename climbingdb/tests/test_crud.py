@@ -0,0 +1,128 @@
+"""
+Test the upsert-based get_or_create functions on an in-memory database.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_crud
+"""
+
+import unittest
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from climbingdb.models import Base, Country, Area, Crag, Route, Pitch
+from climbingdb.services.crud import (
+    get_or_create_location,
+    get_or_create_route,
+    get_or_create_area,
+    get_or_create_pitch
+)
+from climbingdb.benchmarks import QueryCounter, create_benchmark_engine
+
+
+class TestCrud(unittest.TestCase):
+
+    def setUp(self):
+        self.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=self.bind)
+        self.session = sessionmaker(bind=self.bind)()
+
+    def tearDown(self):
+        self.session.close()
+
+    def _add_route(self):
+        crag = get_or_create_location(self.session, "USA", "Yosemite", "El Capitan")
+        return get_or_create_route(self.session, "The Nose", "Multipitch", crag, "8b", length=900.0)
+
+    def test_one_statement_per_level(self):
+        with QueryCounter(self.bind) as counter:
+            route = self._add_route()
+        self.assertEqual(counter.count, 4)
+
+        # Existing rows: the insert does nothing and returns no row, then one SELECT each
+        with QueryCounter(self.bind) as counter:
+            same = self._add_route()
+        self.assertEqual(counter.count, 8)
+        self.assertIs(route, same)
+        self.assertFalse(any(statement.lstrip().upper().startswith('UPDATE') for statement, _ in counter.statements))
+        self.assertTrue(all('DO NOTHING' in statement for statement, _ in counter.statements
+                            if statement.lstrip().upper().startswith('INSERT')))
+
+        for model in [Country, Area, Crag, Route]:
+            self.assertEqual(self.session.query(model).count(), 1, model.__name__)
+
+    def test_map_clusters_refreshed_for_new_routes_only(self):
+        crag = get_or_create_location(self.session, "Germany", "Frankenjura", "Waldkopf")
+        with QueryCounter(self.bind) as counter:
+            get_or_create_route(self.session, "Eule", "Sportclimb", crag, "7a", latitude=49.7, longitude=11.3)
+        self.assertTrue(any('map_clusters' in statement for statement, _ in counter.statements))
+
+        with QueryCounter(self.bind) as counter:
+            get_or_create_route(self.session, "Eule", "Sportclimb", crag, "7a", latitude=49.7, longitude=11.3)
+        self.assertFalse(any('map_clusters' in statement for statement, _ in counter.statements))
+
+    def test_computed_columns_are_set(self):
+        route = self._add_route()
+        self.session.commit()
+        self.session.expire_all()
+
+        route = self.session.get(Route, route.id)
+        self.assertIsNotNone(route.consensus_ole_grade)
+        self.assertIsNotNone(route.created_at)
+        self.assertEqual((route.crag_name, route.area_name, route.country_name),
+                         ("El Capitan", "Yosemite", "USA"))
+
+    def test_variant_spellings_resolve_to_existing_rows(self):
+        route = get_or_create_route(self.session, "Atrésie", "Sportclimb",
+                                    get_or_create_location(self.session, "France", "Gorges du Tarn", "Tennessee"), "7a")
+        crag = get_or_create_location(self.session, "france", "Gorges-du-Tarn", " TENNESSEE ")
+        self.assertIs(crag, route.crag)
+        self.assertIs(get_or_create_route(self.session, "atresie", "Sportclimb", crag, "7a"), route)
+        self.assertIsNot(get_or_create_route(self.session, "atresie", "Boulder", crag, "7a"), route)
+
+        self.session.commit()
+        self.assertEqual(self.session.query(Route).filter_by(discipline="Sportclimb").count(), 1)
+        self.assertEqual(self.session.query(Crag).count(), 1)
+        self.assertEqual(route.normalized_name, "atresie")
+
+    def test_existing_route_is_not_modified(self):
+        route = self._add_route()
+        crag = route.crag
+        get_or_create_route(self.session, "The Nose", "Multipitch", crag, "5.9", length=1.0)
+        self.session.commit()
+        self.session.expire_all()
+
+        route = self.session.get(Route, route.id)
+        self.assertEqual(route.consensus_grade, "8b")
+        self.assertEqual(route.length, 900.0)
+
+    def test_pitches(self):
+        route = self._add_route()
+        first = get_or_create_pitch(self.session, route, 1, {'grade': '6a'})
+        again = get_or_create_pitch(self.session, route, 1, {'grade': '7a'})
+        get_or_create_pitch(self.session, route, 2, {'grade': '6b'})
+
+        self.assertIs(first, again)
+        self.assertEqual(first.consensus_grade, '6a')
+        self.assertIsNotNone(first.consensus_ole_grade)
+        self.assertEqual(self.session.query(Pitch).count(), 2)
+
+    def test_area_without_country(self):
+        first = get_or_create_area(self.session, "Nowhere", None)
+        self.assertIs(get_or_create_area(self.session, "Nowhere", None), first)
+
+    def test_duplicates_are_rejected(self):
+        crag = self._add_route().crag
+        self.session.add(Crag(name="El Capitan", area_id=crag.area_id))
+        with self.assertRaises(IntegrityError):
+            self.session.flush()
+
+    def test_variant_spellings_are_rejected(self):
+        crag = self._add_route().crag
+        self.session.add(Crag(name="el capitán", area_id=crag.area_id))
+        with self.assertRaises(IntegrityError):
+            self.session.flush()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Test the column-wise formatting of the routes table.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_display
+"""
+
+import unittest
+
+import pandas as pd
+
+from climbingdb.ui.display import format_routes_for_display
+
+
+class TestDisplay(unittest.TestCase):
+
+    def setUp(self):
+        self.routes = pd.DataFrame({
+            'name': ["Ostwand", "Südkante", "Nordpfeiler", "Project"],
+            'grade': ["6a", "7b", "5c", ""],
+            'ole_grade': [6.0, 8.0, 5.5, 0.0],
+            'sort_grade': [6.0, 8.0, 5.5, 0.0],
+            'style': ["o.s."] * 4,
+            'area': ["Dolomites"] * 4,
+            'crag': ["Tofana"] * 4,
+            'notes': [""] * 4,
+            'date': pd.to_datetime(["2024-07-01"] * 4),
+            'stars': [1, 2, 3, 0],
+            'shortnote': ["soft", "", None, "hard"],
+            'ernsthaftigkeit': ["R", "", "X", "R"],
+            'length': [350.0, None, 0.0, 99.6],
+            'pitch_number': [10, 3, 2, 1],
+        })
+
+    def test_grade_labels(self):
+        formatted, columns = format_routes_for_display(self.routes, "Sportclimb")
+        self.assertEqual(list(formatted['grade']), ["6a (soft)", "7b", "5c", "No grade"])
+        self.assertNotIn('length', columns)
+        self.assertEqual(list(self.routes['grade']), ["6a", "7b", "5c", ""])  # input untouched
+
+    def test_multipitch_columns(self):
+        formatted, columns = format_routes_for_display(self.routes, "Multipitch")
+        self.assertEqual(list(formatted['grade']), ["6a R (soft)", "7b", "5c X", "No grade"])
+        self.assertEqual(list(formatted['length']), ["350m", "", "", "100m"])
+        self.assertEqual(columns[2:4], ['length', 'pitch_number'])
+
+
+if __name__ == "__main__":
+    unittest.main()
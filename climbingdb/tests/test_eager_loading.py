@@ -0,0 +1,61 @@
+"""
+Test that the ascent list methods of ClimbingService never lazy load.
+
+The service runs in strict mode here: any relationship access that isn't
+eager loaded raises, so a new lazy load in these paths fails the tests.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_eager_loading
+"""
+
+import unittest
+from unittest import mock
+
+from sqlalchemy.exc import InvalidRequestError
+
+from climbingdb.services import ClimbingService
+from climbingdb.benchmarks import QueryCounter
+from climbingdb.tests import LogbookTestCase
+
+
+class TestEagerLoading(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=10, n_routes=300, ascents_per_user=50, main_user_ascents=200)
+
+    def setUp(self):
+        strict = mock.patch.object(ClimbingService, 'strict_loading', True)
+        strict.start()
+        self.addCleanup(strict.stop)
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def test_list_methods_use_two_queries(self):
+        area = self.context['busiest_area']
+        methods = {
+            'get_filtered_routes': lambda: self.db.get_filtered_routes(),
+            'get_filtered_routes(area)': lambda: self.db.get_filtered_routes(discipline=None, area=area),
+            'get_ascents_page': lambda: self.db.get_ascents_page(discipline=None, page_size=20)[0],
+            'get_multipitches': self.db.get_multipitches,
+            'get_boulders': self.db.get_boulders,
+            'get_projects': self.db.get_projects,
+            'get_milestones': self.db.get_milestones,
+        }
+        for name, method in methods.items():
+            with self.subTest(name):
+                self.db.session.expunge_all()  # Nothing left over in the identity map
+                with QueryCounter(self.bind) as counter:
+                    df = method()
+                self.assertGreater(len(df), 0)
+                # Ascents with their routes, pitch ascents of all of them
+                self.assertEqual(counter.count, 2)
+
+    def test_lazy_load_raises(self):
+        ascent = self.db._with_frame_loaders(self.db._base_query()).first()
+        self.assertEqual(ascent.route.id, ascent.route_id)
+        with self.assertRaises(InvalidRequestError):
+            ascent.user
+        with self.assertRaises(InvalidRequestError):
+            ascent.route.crag
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Test the geohash cover, the distance helpers and the spatial queries of ClimbingService.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_geo
+"""
+
+import random
+import unittest
+
+import pandas as pd
+
+from climbingdb import geo
+from climbingdb.models import SessionLocal, Route, Crag
+from climbingdb.models.geo_sync import repair_geohashes
+from climbingdb.services import ClimbingService
+from climbingdb.tests import LogbookTestCase
+
+
+def _in_box(lat, lon, south, west, north, east):
+    in_longitudes = west <= lon <= east if west <= east else lon >= west or lon <= east
+    return south <= lat <= north and in_longitudes
+
+
+class TestGeohash(unittest.TestCase):
+
+    def test_encode(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, precision=11), "u4pruydqqvj")
+        self.assertEqual(len(geo.encode(49.7, 11.3)), geo.GEOHASH_PRECISION)
+        self.assertIsNone(geo.encode(None, 11.3))
+
+    def test_cover_contains_every_point_in_the_box(self):
+        rng = random.Random(7)
+        points = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(5000)]
+        boxes = [(49.5, 11.0, 49.9, 11.6), (-10.0, 170.0, 10.0, -170.0), (0.0, -1.0, 0.001, 1.0)]
+        boxes += [(s, w, s + rng.uniform(0, 20), (w + rng.uniform(0, 40) + 180) % 360 - 180)
+                  for s, w in [(rng.uniform(-80, 60), rng.uniform(-180, 180)) for _ in range(50)]]
+
+        for box in boxes:
+            ranges = geo.cover(*box)
+            self.assertLessEqual(len(ranges), geo.MAX_COVER_CELLS * 2)
+            for lat, lon in points:
+                if _in_box(lat, lon, *box):
+                    geohash = geo.encode(lat, lon)
+                    self.assertTrue(any(low <= geohash < high for low, high in ranges), (box, lat, lon))
+
+    def test_bounding_box_contains_the_circle(self):
+        for lat, lon, radius in [(49.7, 11.3, 25), (0.0, 179.9, 50), (-33.9, 18.4, 500), (89.9, 0.0, 30)]:
+            box = geo.bounding_box(lat, lon, radius)
+            rng = random.Random(3)
+            lats = [rng.uniform(max(box[0] - 1, -90), min(box[2] + 1, 90)) for _ in range(2000)]
+            lons = [(lon + rng.uniform(-20, 20) + 180) % 360 - 180 for _ in range(2000)]
+            distances = geo.haversine_km(lat, lon, lats, lons)
+            self.assertTrue((distances <= radius).any())
+            for point_lat, point_lon, distance in zip(lats, lons, distances):
+                if distance <= radius:
+                    self.assertTrue(_in_box(point_lat, point_lon, *box), (lat, lon, point_lat, point_lon))
+
+    def test_haversine(self):
+        # Munich - Berlin
+        distance, = geo.haversine_km(48.1374, 11.5755, [52.5200], [13.4050])
+        self.assertAlmostEqual(distance, 504.2, delta=1)
+
+
+class TestSpatialQueries(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=60, n_routes=1000, ascents_per_user=50, main_user_ascents=100)
+
+    def setUp(self):
+        self.db = ClimbingService()
+
+    def _frame(self, *columns):
+        return pd.DataFrame(self.db.session.query(*columns).all(), columns=['id', 'latitude', 'longitude'])
+
+    def test_routes_in_bbox(self):
+        routes = self._frame(Route.id, Route.latitude, Route.longitude).dropna()
+        for box in [(45.0, 5.0, 50.0, 15.0), (36.0, -5.0, 62.0, 25.0), (40.0, 10.0, 40.5, 10.5)]:
+            with self.subTest(box):
+                expected = {row.id for row in routes.itertuples() if _in_box(row.latitude, row.longitude, *box)}
+                found = self.db.routes_in_bbox(*box)
+                self.assertEqual(set(found['id']), expected)
+
+        limited = self.db.routes_in_bbox(36.0, -5.0, 62.0, 25.0, discipline="Boulder", limit=5)
+        self.assertEqual(len(limited), 5)
+        self.assertTrue((limited['discipline'] == "Boulder").all())
+
+    def test_crags_near(self):
+        crags = self._frame(Crag.id, Crag.parking_latitude, Crag.parking_longitude)
+        lat, lon, radius = 48.0, 11.0, 300
+        distances = geo.haversine_km(lat, lon, crags['latitude'], crags['longitude'])
+        expected = crags.assign(distance_km=distances).query("distance_km <= @radius")
+
+        near = self.db.crags_near(lat, lon, radius_km=radius)
+        self.assertGreater(len(near), 0)
+        self.assertEqual(set(near['id']), set(expected['id']))
+        self.assertTrue(near['distance_km'].is_monotonic_increasing)
+        self.assertEqual(list(self.db.crags_near(lat, lon, radius_km=radius, limit=2)['id']), list(near['id'][:2]))
+
+    def test_geohash_follows_coordinates(self):
+        session = SessionLocal()
+        try:
+            route = session.query(Route).filter(Route.latitude.is_(None)).first()
+            self.assertIsNone(route.geohash)
+            route.latitude, route.longitude = 49.7, 11.3
+            session.commit()
+            self.assertEqual(route.geohash, geo.encode(49.7, 11.3))
+            self.assertIn(route.id, set(self.db.routes_in_bbox(49.6, 11.2, 49.8, 11.4)['id']))
+
+            route.latitude = route.longitude = None
+            session.commit()
+            self.assertIsNone(route.geohash)
+        finally:
+            session.close()
+
+        with self.bind.begin() as connection:
+            self.assertEqual(repair_geohashes(connection, dry_run=True), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
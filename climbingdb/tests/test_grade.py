@@ -3,9 +3,10 @@ Run as
 python3 -m unittest tests/test_grade.py
 """
 
+import math
 import unittest
 
-from ..grade import Grade
+from ..grade import Grade, grade_filter_range
 
 class TestGrades(unittest.TestCase):
     def test_sportclimbs(self):
@@ -21,7 +22,36 @@ class TestGrades(unittest.TestCase):
         self.assertEqual(Grade("7B trav").conv_grade(), Grade("7A+").conv_grade())
         self.assertEqual(Grade("7C+").get_scale(), "Font")
         self.assertEqual(Grade("V10").conv_grade(), Grade("7C+").conv_grade())
-    
+
+    def test_bucket_range(self):
+        # Slash grades belong to the bucket of the lower grade
+        self.assertEqual(Grade.bucket_range("6a"), (Grade("6a").conv_grade(), Grade("6a+").conv_grade()))
+        low, high = Grade.bucket_range("7c+")
+        self.assertTrue(low <= Grade("7c+/8a").conv_grade() < high)
+        self.assertEqual(high, Grade("8a").conv_grade())
+        self.assertEqual(Grade.bucket_range("5.10c"), (Grade("5.10c").conv_grade(), Grade("5.10d").conv_grade()))
+        self.assertEqual(Grade.bucket_range("V3"), (3, 4))
+        # Traverses fall into the bucket one grade below
+        self.assertEqual(Grade.bucket_range("7B trav")[0], Grade("7A+").conv_grade())
+        self.assertEqual(Grade.bucket_range("9a"), (Grade("9a").conv_grade(), math.inf))
+        # Buckets of another system
+        self.assertEqual(Grade.bucket_range("7", "French"), (Grade("6b").conv_grade(), Grade("6b+").conv_grade()))
+        with self.assertRaises(ValueError):
+            Grade.bucket_range("foo")
+        with self.assertRaises(ValueError):
+            Grade.bucket_range("5.99")
+
+    def test_grade_filter_range(self):
+        low, high = Grade.bucket_range("7a")
+        self.assertEqual(grade_filter_range("7a"), (low, high))
+        self.assertEqual(grade_filter_range("7a", ">="), (low, None))
+        self.assertEqual(grade_filter_range("7a", "<="), (None, high))
+        self.assertEqual(grade_filter_range(("6a", "7a"), "between"), (Grade("6a").conv_grade(), high))
+        self.assertEqual(grade_filter_range(("7a", "6a"), "between"), (Grade("6a").conv_grade(), high))
+        self.assertEqual(grade_filter_range("9a", "=="), (Grade("9a").conv_grade(), None))
+        with self.assertRaises(ValueError):
+            grade_filter_range("7a", "<")
+
 if __name__ == "__main__":
     unittest.main()
     
@@ -0,0 +1,158 @@
+"""
+Test the incremental re-sync of 8a.nu exports (row fingerprints).
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_import_8anu
+"""
+
+import csv
+import io
+import unittest
+
+from sqlalchemy import update
+
+from climbingdb.models import Base, SessionLocal, User, Ascent, Route
+from climbingdb.scripts.import_8anu import import_8a_csv
+from climbingdb.benchmarks import QueryCounter, bind_sessions, create_benchmark_engine, generate_8anu_csv
+
+
+def _edit_row(csv_text, index, **values):
+    """The CSV with the fields of one row replaced."""
+    rows = list(csv.DictReader(io.StringIO(csv_text)))
+    rows[index].update(values)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+class TestIncrementalResync(unittest.TestCase):
+
+    def setUp(self):
+        self.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=self.bind)
+        self.bound = bind_sessions(self.bind)
+        self.bound.__enter__()
+
+        with SessionLocal() as session:
+            user = User(username="ole", password_hash="x")
+            session.add(user)
+            session.commit()
+            self.user_id = user.id
+
+        self.csv_text = generate_8anu_csv(n_rows=100)
+        self.first = self._import(self.csv_text)
+
+    def tearDown(self):
+        self.bound.__exit__(None, None, None)
+
+    def _import(self, csv_text, **kwargs):
+        return import_8a_csv(io.StringIO(csv_text), self.user_id, populate_areas_from_database=False, **kwargs)
+
+    def _ascents(self):
+        with SessionLocal() as session:
+            return session.query(Ascent).filter_by(user_id=self.user_id).order_by(Ascent.id).all()
+
+    def test_first_import_stores_fingerprints(self):
+        ascents = self._ascents()
+        self.assertEqual(len(ascents), self.first.imported)
+        self.assertEqual(self.first.imported + self.first.unchanged, 100)
+        self.assertTrue(all(ascent.source_fingerprint for ascent in ascents))
+
+    def test_identical_resync_is_one_query(self):
+        with QueryCounter(self.bind) as counter:
+            result = self._import(self.csv_text)
+        self.assertEqual((result.imported, result.unchanged, result.updated, result.edited), (0, 100, 0, 0))
+        selects = [statement for statement, _ in counter.statements if statement.lstrip().startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+
+    def test_new_rows(self):
+        lines = self.csv_text.splitlines(keepends=True)
+        extended = self.csv_text + ''.join(generate_8anu_csv(n_rows=10, seed=3).splitlines(keepends=True)[1:])
+        self.assertEqual(len(extended.splitlines()), len(lines) + 10)
+
+        result = self._import(extended)
+        self.assertEqual(result.imported, 10)
+        self.assertEqual(result.unchanged, 100)
+        self.assertEqual(len(self._ascents()), self.first.imported + 10)
+
+    def test_edited_rows(self):
+        row = next(csv.DictReader(io.StringIO(self.csv_text)))
+        stars = (int(row['rating']) + 1) % 6
+        edited = _edit_row(self.csv_text, 0, rating=str(stars), comment="Polished now")
+
+        result = self._import(edited)
+        self.assertEqual((result.imported, result.updated, result.edited), (0, 0, 1))
+        self.assertNotEqual(self._ascents()[0].stars, stars)
+
+        result = self._import(edited, update_existing=True)
+        self.assertEqual((result.imported, result.updated, result.edited), (0, 1, 0))
+        ascent = self._ascents()[0]
+        self.assertEqual((ascent.stars, ascent.notes), (stars, "Polished now"))
+
+        # Synced: nothing left to resolve
+        result = self._import(edited)
+        self.assertEqual((result.unchanged, result.updated, result.edited), (100, 0, 0))
+
+    def test_ascents_imported_before_fingerprints(self):
+        with self.bind.begin() as connection:
+            connection.execute(update(Ascent.__table__).values(source_fingerprint=None))
+
+        result = self._import(self.csv_text)
+        self.assertEqual((result.imported, result.unchanged, result.updated, result.edited), (0, 100, 0, 0))
+        self.assertTrue(all(ascent.source_fingerprint for ascent in self._ascents()))
+
+    def test_dry_run_lists_the_delta(self):
+        lines = self.csv_text.splitlines(keepends=True)
+        edited = _edit_row(self.csv_text, len(lines) - 2, comment="Changed")
+
+        result = self._import(edited, dry_run=True)
+        self.assertEqual((result.imported, result.unchanged), (1, 99))
+        self.assertEqual(len(self._ascents()), self.first.imported)
+
+
+class TestRouteResolution(unittest.TestCase):
+
+    def setUp(self):
+        self.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=self.bind)
+        self.bound = bind_sessions(self.bind)
+        self.bound.__enter__()
+
+        with SessionLocal() as session:
+            users = [User(username="ole", password_hash="x"), User(username="anna", password_hash="x")]
+            session.add_all(users)
+            session.commit()
+            self.user_ids = [user.id for user in users]
+
+        self.csv_text = generate_8anu_csv(n_rows=1)
+        import_8a_csv(io.StringIO(self.csv_text), self.user_ids[0], populate_areas_from_database=False)
+
+    def tearDown(self):
+        self.bound.__exit__(None, None, None)
+
+    def _routes(self):
+        with SessionLocal() as session:
+            return session.query(Route).all()
+
+    def test_variant_spellings_resolve_to_the_route(self):
+        row = next(csv.DictReader(io.StringIO(self.csv_text)))
+        [route] = self._routes()
+
+        variants = [row['name'].upper() + " ", row['name'].replace("e", "é"), row['name'][1:]]
+        for day, name in enumerate(variants, 1):
+            with self.subTest(name=name):
+                variant = _edit_row(self.csv_text, 0, name=name, date=f"2024-05-0{day}T00:00:00")
+                result = import_8a_csv(io.StringIO(variant), self.user_ids[1], populate_areas_from_database=False)
+                self.assertEqual(result.imported, 1)
+                self.assertEqual([r.id for r in self._routes()], [route.id])
+
+    def test_other_route_is_created(self):
+        other = _edit_row(self.csv_text, 0, name="Silbergeier 2", date="2024-05-01T00:00:00")
+        import_8a_csv(io.StringIO(other), self.user_ids[1], populate_areas_from_database=False)
+        self.assertEqual(len(self._routes()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Test the parse-once cache of uploaded 8a.nu exports.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_import_cache
+"""
+
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from climbingdb.scripts import import_8anu
+from climbingdb.services import import_cache
+from climbingdb.services.import_cache import parse_8anu_upload, get_cached, clear_cache, content_hash
+from climbingdb.benchmarks import generate_8anu_csv
+
+
+class TestImportCache(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        self.data = generate_8anu_csv(n_rows=80).encode()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.parse = mock.patch.object(import_8anu, 'parse_8anu_dataframe',
+                                       wraps=import_8anu.parse_8anu_dataframe)
+        self.parse_calls = self.parse.start()
+
+    def tearDown(self):
+        self.parse.stop()
+        self.tmpdir.cleanup()
+        clear_cache()
+
+    def _parse(self, data=None, cache_dir=None):
+        return parse_8anu_upload(data or self.data, populate_areas_from_database=False, cache_dir=cache_dir)
+
+    def test_parses_once(self):
+        parsed = self._parse()
+        self.assertEqual(parsed.sha256, content_hash(self.data))
+        self.assertEqual(len(parsed.parsed_rows) + len(parsed.skipped_rows), 80)
+
+        self.assertIs(self._parse(), parsed)
+        self.assertEqual(self.parse_calls.call_count, 1)
+
+        # A different file is parsed
+        other = self._parse(generate_8anu_csv(n_rows=80, seed=7).encode())
+        self.assertNotEqual(other.sha256, parsed.sha256)
+        self.assertEqual(self.parse_calls.call_count, 2)
+
+    def test_same_as_import_parser(self):
+        import io
+        import pandas as pd
+
+        df = pd.read_csv(io.BytesIO(self.data), sep=',', header=0, keep_default_na=False, dtype=str)
+        expected = import_8anu.parse_8anu_dataframe(df, populate_areas_from_database=False)
+        self.assertEqual(tuple(self._parse()[1:]), expected)
+
+    def test_lru_eviction(self):
+        files = [generate_8anu_csv(n_rows=10, seed=seed).encode() for seed in range(3)]
+        with mock.patch.object(import_cache, 'PARSE_CACHE_SIZE', 2):
+            for data in files:
+                self._parse(data)
+            self._parse(files[1])  # Most recently used
+            self._parse(files[2])
+            self.assertEqual(self.parse_calls.call_count, 3)
+
+            self._parse(files[0])  # Evicted
+            self.assertEqual(self.parse_calls.call_count, 4)
+
+    def test_parquet_round_trip(self):
+        parsed = self._parse(cache_dir=self.tmpdir.name)
+        self.assertEqual(len(os.listdir(self.tmpdir.name)), 1)
+
+        clear_cache()  # A restart
+        cached = get_cached(parsed.sha256, populate_areas_from_database=False, cache_dir=self.tmpdir.name)
+        self.assertEqual(cached, parsed)
+        self.assertTrue(all(isinstance(row['date'], datetime.date) for row in cached.parsed_rows
+                            if row['date'] is not None))
+        self.assertIs(self._parse(cache_dir=self.tmpdir.name), cached)
+        self.assertEqual(self.parse_calls.call_count, 1)
+
+    def test_unreadable_parquet_is_parsed_again(self):
+        parsed = self._parse(cache_dir=self.tmpdir.name)
+        [name] = os.listdir(self.tmpdir.name)
+        with open(os.path.join(self.tmpdir.name, name), 'wb') as f:
+            f.write(b"garbage")
+
+        clear_cache()
+        self.assertIsNone(get_cached(parsed.sha256, populate_areas_from_database=False,
+                                     cache_dir=self.tmpdir.name))
+        self.assertEqual(self._parse(cache_dir=self.tmpdir.name), parsed)
+        self.assertEqual(self.parse_calls.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
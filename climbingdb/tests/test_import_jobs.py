@@ -0,0 +1,168 @@
+"""
+Test the background 8a.nu import jobs.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_import_jobs
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from climbingdb.models import Base, SessionLocal, User, Ascent, ImportJob
+from climbingdb.services import import_jobs
+from climbingdb.services.import_jobs import (
+    ProgressThrottle,
+    submit_8anu_import,
+    get_job,
+    get_latest_job,
+    get_imported_job,
+    wait_for_jobs
+)
+from climbingdb.services.import_cache import content_hash
+from climbingdb.benchmarks import bind_sessions, create_benchmark_engine, generate_8anu_csv
+
+
+class TestImportJobs(unittest.TestCase):
+
+    def setUp(self):
+        # A file database: the workers write through their own connections
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.bind = create_benchmark_engine(f"sqlite:///{self.path}")
+        Base.metadata.create_all(bind=self.bind)
+        self.bound = bind_sessions(self.bind)
+        self.bound.__enter__()
+
+        with SessionLocal() as session:
+            users = [User(username=f"user{ii}", password_hash="x") for ii in range(3)]
+            session.add_all(users)
+            session.commit()
+            self.user_ids = [user.id for user in users]
+
+    def tearDown(self):
+        wait_for_jobs()
+        self.bound.__exit__(None, None, None)
+        self.bind.dispose()
+        os.remove(self.path)
+
+    def _n_ascents(self, user_id):
+        with SessionLocal() as session:
+            return session.query(Ascent).filter_by(user_id=user_id).count()
+
+    def test_job_lifecycle(self):
+        user_id = self.user_ids[0]
+        csv_bytes = generate_8anu_csv(n_rows=120).encode()
+        job_id = submit_8anu_import(csv_bytes, user_id, filename="export.csv")
+        wait_for_jobs()
+
+        job = get_job(job_id)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.filename, "export.csv")
+        self.assertEqual(job.imported, self._n_ascents(user_id))
+        self.assertGreater(job.imported, 0)
+        self.assertEqual(job.processed, job.total)
+        self.assertEqual(job.progress, 1)
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(get_latest_job(user_id).id, job_id)
+        self.assertEqual(get_imported_job(user_id, content_hash(csv_bytes)).id, job_id)
+        self.assertIsNone(get_imported_job(self.user_ids[1], content_hash(csv_bytes)))
+
+        # Importing the same file again skips the existing ascents
+        second_id = submit_8anu_import(csv_bytes, user_id)
+        wait_for_jobs()
+        self.assertEqual(get_job(second_id).imported, 0)
+        self.assertEqual(get_job(second_id).unchanged, job.imported + job.unchanged)
+        self.assertEqual(get_latest_job(user_id).id, second_id)
+        self.assertEqual(get_imported_job(user_id, content_hash(csv_bytes)).id, second_id)
+
+    def test_concurrent_users(self):
+        csv_files = [generate_8anu_csv(n_rows=60, seed=seed).encode() for seed in range(3)]
+        job_ids = [submit_8anu_import(csv_bytes, user_id)
+                   for csv_bytes, user_id in zip(csv_files, self.user_ids)]
+        self.assertEqual(len(set(job_ids)), 3)
+        wait_for_jobs()
+
+        for job_id, user_id in zip(job_ids, self.user_ids):
+            job = get_job(job_id)
+            self.assertEqual(job.status, 'done')
+            self.assertEqual(job.imported, self._n_ascents(user_id))
+
+    def test_one_active_job_per_user(self):
+        import_jobs._get_executor()
+        with SessionLocal() as session:
+            job = ImportJob(user_id=self.user_ids[0], kind='8anu', status='running')
+            session.add(job)
+            session.commit()
+            running_id = job.id
+
+        self.assertEqual(submit_8anu_import(b"", self.user_ids[0]), running_id)
+        self.assertNotEqual(submit_8anu_import(b"", self.user_ids[1]), running_id)
+
+    def test_failed_job(self):
+        job_id = submit_8anu_import(b"", self.user_ids[0])  # No CSV at all
+        wait_for_jobs()
+
+        job = get_job(job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.message)
+        self.assertFalse(job.is_active)
+        self.assertEqual(self._n_ascents(self.user_ids[0]), 0)
+
+    def test_jobs_of_stopped_processes_fail(self):
+        long_ago = datetime.now(timezone.utc) - timedelta(seconds=2 * import_jobs.STALE_AFTER)
+        jobs = {
+            'stopped': ImportJob(owner="other:1:dead", heartbeat_at=long_ago),
+            'alive': ImportJob(owner="other:2:live", heartbeat_at=datetime.now(timezone.utc)),
+            'before heartbeats': ImportJob(created_at=long_ago),
+            'own': ImportJob(owner=import_jobs.OWNER, heartbeat_at=long_ago),
+        }
+        with SessionLocal() as session:
+            for job in jobs.values():
+                job.user_id, job.kind, job.status = self.user_ids[0], '8anu', 'running'
+            session.add_all(jobs.values())
+            session.commit()
+            job_ids = {name: job.id for name, job in jobs.items()}
+
+        self.assertEqual(import_jobs.fail_interrupted_jobs(), 2)
+        statuses = {name: get_job(job_id).status for name, job_id in job_ids.items()}
+        self.assertEqual(statuses, {'stopped': 'failed', 'alive': 'running', 'before heartbeats': 'failed',
+                                    'own': 'running'})
+
+        # The heartbeat keeps the own job alive for other processes
+        self.assertEqual(import_jobs.beat(), 1)
+        self.assertGreater(get_job(job_ids['own']).heartbeat_at, long_ago.replace(tzinfo=None))
+
+    def test_submit_takes_over_from_a_stopped_process(self):
+        long_ago = datetime.now(timezone.utc) - timedelta(seconds=2 * import_jobs.STALE_AFTER)
+        with SessionLocal() as session:
+            job = ImportJob(user_id=self.user_ids[0], kind='8anu', status='running', owner="other:1:dead",
+                            heartbeat_at=long_ago)
+            session.add(job)
+            session.commit()
+            stale_id = job.id
+
+        job_id = submit_8anu_import(generate_8anu_csv(n_rows=10).encode(), self.user_ids[0])
+        wait_for_jobs()
+        self.assertNotEqual(job_id, stale_id)
+        self.assertEqual(get_job(stale_id).status, 'failed')
+        self.assertEqual(get_job(job_id).status, 'done')
+        self.assertEqual(get_job(job_id).owner, import_jobs.OWNER)
+
+    def test_progress_throttle(self):
+        now = [0.0]
+        throttle = ProgressThrottle(interval=1.0, clock=lambda: now[0])
+
+        updates = []
+        for current in range(1, 101):
+            now[0] += 0.25
+            if throttle.due(current, 100):
+                updates.append(current)
+        # The first update, one every 4 rows, and the last one
+        self.assertEqual(updates, list(range(1, 100, 4)) + [100])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Test the memory-mapped logbook cache and the per-user data version.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_logbook_cache
+"""
+
+import tempfile
+import unittest
+
+import pandas as pd
+
+from climbingdb.models import SessionLocal, User, Crag, Ascent
+from climbingdb.services import ClimbingService
+from climbingdb.services.logbook_cache import CachedClimbingService, build_logbook_cache
+from climbingdb.benchmarks import QueryCounter
+from climbingdb.tests import LogbookTestCase
+
+
+class TestLogbookCache(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=10, n_routes=300, ascents_per_user=50, main_user_ascents=250)
+
+    @classmethod
+    def prepare_logbook(cls, session):
+        ascents = session.query(Ascent).filter(Ascent.user_id == cls.context['main_user_id'])
+        for ascent in ascents.limit(5):
+            ascent.date = None
+        for ascent in ascents.offset(5).limit(40):
+            ascent.shortnote = ["Soft", "hard", None][ascent.id % 3]
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.user_id = self.context['main_user_id']
+        self.db = ClimbingService(user_id=self.user_id)
+        self.cached = CachedClimbingService(user_id=self.user_id, cache_dir=self.cache_dir.name)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def _data_version(self, user_id=None):
+        with SessionLocal() as session:
+            return session.get(User, user_id or self.user_id).data_version
+
+    def _assert_same_frames(self, expected, actual):
+        pd.testing.assert_frame_equal(expected.sort_values('id', ignore_index=True),
+                                      actual.sort_values('id', ignore_index=True))
+
+    def test_reads_match_database(self):
+        area = self.context['busiest_area']
+        for filters in [{}, {'discipline': None}, {'discipline': "Boulder"}, {'area': area, 'stars': 1},
+                        {'discipline': None, 'grade': "7a", 'operation': ">="},
+                        {'discipline': None, 'grade': "7a", 'operation': "=="},
+                        {'discipline': None, 'grade': "6b", 'operation': "<="},
+                        {'discipline': None, 'grade': ("6a", "7a"), 'operation': "between"}]:
+            expected = self.db.get_filtered_routes(**filters)
+            actual = self.cached.get_filtered_routes(**filters)
+            self.assertGreater(len(expected), 0, filters)
+            self._assert_same_frames(expected, actual)
+            self.assertEqual(list(actual['ole_grade']), list(expected['ole_grade']), filters)
+
+        self._assert_same_frames(self.db.get_projects(), self.cached.get_projects())
+        self.assertEqual(self.cached.get_statistics(), self.db.get_statistics())
+        for discipline in ["Sportclimb", "Boulder", "Multipitch"]:
+            pd.testing.assert_series_equal(self.cached.get_grade_histogram(discipline),
+                                           self.db.get_grade_histogram(discipline))
+
+        ids = self.db.get_filtered_routes(discipline="Multipitch")['id']
+        pd.testing.assert_frame_equal(self.cached.get_pitch_ascents(ids), self.db.get_pitch_ascents(ids))
+
+    def test_pages_match_database(self):
+        for order_by in ["grade", "date"]:
+            expected_cursor = actual_cursor = None
+            while True:
+                expected, expected_cursor = self.db.get_ascents_page(order_by, expected_cursor, 40, discipline=None)
+                actual, actual_cursor = self.cached.get_ascents_page(order_by, actual_cursor, 40, discipline=None)
+                pd.testing.assert_frame_equal(actual, expected)
+                self.assertEqual(actual_cursor, expected_cursor)
+                if expected_cursor is None:
+                    break
+        self.assertEqual(self.cached.count_filtered_ascents(discipline=None),
+                         self.db.count_filtered_ascents(discipline=None))
+
+    def test_no_queries_within_refresh_interval(self):
+        self.cached.get_filtered_routes()
+        with QueryCounter(self.bind) as counter:
+            self.cached.get_filtered_routes(discipline="Boulder")
+            self.cached.get_ascents_page(discipline=None)
+            self.cached.get_statistics()
+        self.assertEqual(counter.count, 0)
+
+    def test_writes_bump_data_version(self):
+        with SessionLocal() as session:
+            other_user = session.query(User.id).filter(User.id != self.user_id).scalar()
+        version, other_version = self._data_version(), self._data_version(other_user)
+
+        ascent = self.db.add_ascent("Cache Buster", "7a", "Sportclimb", "New Crag", "New Area", "Germany",
+                                    date="2024-05-01")
+        self.assertEqual(self._data_version(), version + 1)
+        self.db.update_ascent(ascent.id, stars=2)
+        self.assertEqual(self._data_version(), version + 2)
+
+        # Renaming a crag changes the logbooks of everyone with ascents there
+        with SessionLocal() as session:
+            crag = session.query(Crag).filter(Crag.name == "New Crag").one()
+            crag.name = "Renamed Crag"
+            session.commit()
+        self.assertEqual(self._data_version(), version + 3)
+
+        self.db.delete_ascent(ascent.id)
+        self.assertEqual(self._data_version(), version + 4)
+        self.assertEqual(self._data_version(other_user), other_version)
+
+    def test_stale_cache_is_rebuilt(self):
+        metadata = build_logbook_cache(self.user_id, self.cache_dir.name)
+        polling = CachedClimbingService(user_id=self.user_id, cache_dir=self.cache_dir.name, refresh_interval=0)
+        n_ascents = len(polling.get_filtered_routes(discipline=None))
+
+        # Written by another service: noticed by the data version check
+        ascent = self.db.add_ascent("Fresh Route", "6b", "Sportclimb", "New Crag", "New Area", "Germany")
+        try:
+            routes = polling.get_filtered_routes(discipline=None)
+            self.assertEqual(len(routes), n_ascents + 1)
+            self.assertIn("Fresh Route", set(routes['name']))
+            self.assertGreater(self._data_version(), metadata['data_version'])
+        finally:
+            # Written through the cached service: expires the cache right away
+            self.cached.delete_ascent(ascent.id)
+        self.assertEqual(len(self.cached.get_filtered_routes(discipline=None)), n_ascents)
+
+if __name__ == "__main__":
+    unittest.main()
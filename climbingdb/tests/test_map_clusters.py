@@ -0,0 +1,99 @@
+"""
+Test the map cluster pyramid and its incremental maintenance.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_map_clusters
+"""
+
+import unittest
+
+from sqlalchemy import select
+
+from climbingdb.geo import CLUSTER_LEVELS, cluster_level
+from climbingdb.models import SessionLocal, Route, Crag, MapCluster
+from climbingdb.models.map_cluster_sync import rebuild_map_clusters
+from climbingdb.services import ClimbingService
+from climbingdb.benchmarks import QueryCounter
+from climbingdb.tests import LogbookTestCase
+
+
+class TestMapClusters(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=40, n_routes=600, ascents_per_user=50, main_user_ascents=100)
+
+    def setUp(self):
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def _clusters(self):
+        # Centroids are float sums, their last digits depend on the merge order
+        with self.bind.connect() as connection:
+            return {(row.level, row.cell): tuple(round(value, 9) if isinstance(value, float) else value
+                                                 for value in row)
+                    for row in connection.execute(select(MapCluster.__table__))}
+
+    def _assert_consistent(self):
+        """The incrementally maintained pyramid equals a rebuild from scratch."""
+        maintained = self._clusters()
+        with self.bind.begin() as connection:
+            rebuild_map_clusters(connection)
+        self.assertEqual(maintained, self._clusters())
+
+    def _n_positioned_routes(self):
+        with SessionLocal() as session:
+            return session.query(Route).join(Route.crag).filter(
+                (Route.geohash.is_not(None)) | (Crag.geohash.is_not(None))).count()
+
+    def test_maintained_by_generator(self):
+        clusters = self._clusters()
+        n_routes = self._n_positioned_routes()
+        for level in CLUSTER_LEVELS:
+            self.assertEqual(sum(row[2] for key, row in clusters.items() if key[0] == level), n_routes)
+        self._assert_consistent()
+
+    def test_route_writes(self):
+        ascent = self.db.add_ascent("Map Route", "9a", "Sportclimb", "Map Crag", "Map Area", "Germany",
+                                    latitude=49.7, longitude=11.3)
+        cluster = self.db.get_map_clusters(49.0, 11.0, 50.0, 12.0, zoom=15)
+        self.assertEqual(list(cluster['top_route_id']), [ascent.route_id])
+        self._assert_consistent()
+
+        # Moved and regraded
+        self.db.update_ascent(ascent.id, latitude=47.1, longitude=10.2, consensus_grade="5a")
+        self.assertEqual(len(self.db.get_map_clusters(49.0, 11.0, 50.0, 12.0, zoom=15)), 0)
+        self._assert_consistent()
+
+        with SessionLocal() as session:
+            session.delete(session.get(Route, ascent.route_id))
+            session.commit()
+        self._assert_consistent()
+
+    def test_crag_parking_moves_its_routes(self):
+        with SessionLocal() as session:
+            crag = session.query(Crag).join(Crag.routes).filter(Route.geohash.is_(None)).first()
+            crag.parking_latitude, crag.parking_longitude = -33.9, 18.4
+            session.commit()
+        self.assertGreater(self.db.get_map_clusters(-34.5, 18.0, -33.5, 19.0, zoom=10)['n_routes'].sum(), 0)
+        self._assert_consistent()
+
+    def test_viewport_queries(self):
+        world = self.db.get_map_clusters(-90.0, -180.0, 90.0, 180.0, zoom=0)
+        self.assertEqual(world['n_routes'].sum(), self._n_positioned_routes())
+        self.assertLessEqual(len(world), 32)
+
+        south, west, north, east = 45.0, 5.0, 50.0, 15.0
+        for zoom in [5, 8, 12]:
+            with self.subTest(zoom=zoom):
+                with QueryCounter(self.bind) as counter:
+                    clusters = self.db.get_map_clusters(south, west, north, east, zoom)
+                self.assertEqual(counter.count, 1)
+                self.assertTrue(clusters['cell'].str.len().eq(cluster_level(zoom)).all())
+                self.assertTrue(clusters['latitude'].between(south, north).all())
+                self.assertTrue(clusters['longitude'].between(west, east).all())
+
+        # Finer levels split the same routes into more clusters
+        counts = [len(self.db.get_map_clusters(south, west, north, east, zoom)) for zoom in [3, 7, 12]]
+        self.assertEqual(counts, sorted(counts))
+
+
+if __name__ == "__main__":
+    unittest.main()
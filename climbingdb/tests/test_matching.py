@@ -0,0 +1,100 @@
+"""
+Test the normalized names and the blocked fuzzy matching of route names.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_matching
+"""
+
+import unittest
+from unittest import mock
+
+from climbingdb import matching
+from climbingdb.matching import normalize_name, trigrams, edit_distance, FuzzyMatcher
+
+
+class TestNormalizeName(unittest.TestCase):
+
+    def test_folds_spellings(self):
+        for name in ["Atrésie", "atresie", " ATRESIE ", "Atrèsie"]:
+            self.assertEqual(normalize_name(name), "atresie")
+
+    def test_punctuation_and_whitespace(self):
+        self.assertEqual(normalize_name("Chasin' the  Trane"), "chasin the trane")
+        self.assertEqual(normalize_name("Chasin’ the Trane"), "chasin the trane")
+        self.assertEqual(normalize_name("Kamasutra (Direkt)-Ausstieg"), "kamasutra direkt ausstieg")
+        self.assertEqual(normalize_name("Straße"), "strasse")
+
+    def test_transliterations(self):
+        self.assertEqual(normalize_name("Bjørnstad"), "bjornstad")
+        self.assertEqual(normalize_name("Kłodzko"), "klodzko")
+        self.assertEqual(normalize_name("Ænima"), "aenima")
+
+    def test_punctuation_only_and_none(self):
+        self.assertEqual(normalize_name("?!"), "?!")
+        self.assertIsNone(normalize_name(None))
+
+
+class TestEditDistance(unittest.TestCase):
+
+    def test_distance(self):
+        self.assertEqual(edit_distance("kitten", "sitting"), 3)
+        self.assertEqual(edit_distance("", "abc"), 3)
+        self.assertEqual(edit_distance("abc", "abc"), 0)
+
+    def test_cutoff(self):
+        self.assertEqual(edit_distance("kitten", "sitting", max_distance=1), 2)
+        self.assertEqual(edit_distance("a", "abcdef", max_distance=2), 3)
+        self.assertEqual(edit_distance("kitten", "sitting", max_distance=3), 3)
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams("ab"), {"  a", " ab", "ab "})
+        self.assertEqual(trigrams("a b"), {"  a", " a ", "  b", " b "})
+
+
+class TestFuzzyMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = FuzzyMatcher()
+        for i, name in enumerate(["Action Directe", "Wallstreet", "Projekt 1", "Chasin' the Trane", "Ohne"]):
+            self.matcher.add('crag', name, i)
+
+    def test_exact(self):
+        self.assertEqual(self.matcher.match('crag', "ACTION DIRECTE"), 0)
+        self.assertEqual(self.matcher.match('crag', "Chasin the Trane"), 3)
+        self.assertEqual(self.matcher.match('crag', "ohne"), 4)
+
+    def test_typos(self):
+        self.assertEqual(self.matcher.match('crag', "Action Direct"), 0)
+        self.assertEqual(self.matcher.match('crag', "Wall Street"), 1)
+        self.assertEqual(self.matcher.match('crag', "Chasing the Trane"), 3)
+
+    def test_no_match(self):
+        self.assertIsNone(self.matcher.match('crag', "Silbergeier"))
+        self.assertIsNone(self.matcher.match('crag', "Projekt 2"))  # Different numbers
+        self.assertIsNone(self.matcher.match('crag', "Ohnee"))  # Short names only match exactly
+
+    def test_blocks(self):
+        self.assertIsNone(self.matcher.match('other crag', "Action Directe"))
+        self.matcher.add('other crag', "Action Directe", 'other')
+        self.assertEqual(self.matcher.match('other crag', "Action Direct"), 'other')
+        self.assertEqual(self.matcher.match('crag', "Action Direct"), 0)
+
+    def test_first_value_is_kept(self):
+        self.matcher.add('crag', "action directe", 'duplicate')
+        self.assertEqual(self.matcher.match('crag', "Action Directe"), 0)
+
+    def test_bulk_matching_scores_few_candidates(self):
+        matcher = FuzzyMatcher()
+        names = [f"Route {word}{i}" for i, word in enumerate(["Alpha", "Beta", "Gamma", "Delta"] * 250)]
+        for name in names:
+            matcher.add('crag', name, name)
+
+        queries = [name.replace("Route", "Rute") for name in names[:200]]
+        with mock.patch.object(matching, 'edit_distance', wraps=matching.edit_distance) as scored:
+            for query, name in zip(queries, names):
+                self.assertEqual(matcher.match('crag', query), name)
+        self.assertLessEqual(scored.call_count, len(queries) * matching.MAX_CANDIDATES)
+
+
+if __name__ == "__main__":
+    unittest.main()
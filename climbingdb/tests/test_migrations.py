@@ -0,0 +1,285 @@
+"""
+Test the schema migrations on an in-memory database with the old schema.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_migrations
+"""
+
+import unittest
+
+from sqlalchemy import inspect, text
+
+from climbingdb.geo import encode, CLUSTER_LEVELS
+from climbingdb.models import Base
+from climbingdb.models.location_sync import LOCATION_COLUMNS
+from climbingdb.models.migrations import MIGRATIONS, FINAL_MIGRATIONS, get_applied_versions, run_migrations
+from climbingdb.benchmarks import create_benchmark_engine
+
+NEW_INDEXES = {
+    'ascents': ['ix_ascents_user_project_grade', 'ix_ascents_user_date',
+                'ix_ascents_user_route', 'ix_ascents_route_project', 'ix_ascents_user_fingerprint'],
+    'routes': ['ix_routes_crag_name_discipline', 'ix_routes_crag_normalized_discipline'],
+    'areas': ['ix_areas_name_country', 'ix_areas_normalized_country'],
+    'crags': ['ix_crags_name_area', 'ix_crags_normalized_area'],
+    'countries': ['ix_countries_normalized_name'],
+    'pitches': ['ix_pitches_route_number'],
+}
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        """Create the current schema, then drop the indexes introduced by the migrations."""
+        self.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=self.bind)
+        with self.bind.begin() as connection:
+            for names in NEW_INDEXES.values():
+                for name in names:
+                    connection.execute(text(f"DROP INDEX {name}"))
+            connection.execute(text("DROP INDEX ix_ascents_user_id"))
+            connection.execute(text("CREATE INDEX ix_ascents_user_project ON ascents (user_id, is_project)"))
+            for column in LOCATION_COLUMNS:
+                connection.execute(text(f"DROP INDEX ix_routes_{column}"))
+                connection.execute(text(f"ALTER TABLE routes DROP COLUMN {column}"))
+            connection.execute(text("ALTER TABLE users DROP COLUMN data_version"))
+            connection.execute(text("DROP TABLE route_stats"))
+            connection.execute(text("DROP TABLE user_month_stats"))
+            connection.execute(text("DROP TABLE map_clusters"))
+            connection.execute(text("DROP TABLE import_jobs"))
+            connection.execute(text("ALTER TABLE ascents DROP COLUMN source_fingerprint"))
+            for table in ('routes', 'crags'):
+                connection.execute(text(f"DROP INDEX ix_{table}_geohash"))
+                connection.execute(text(f"ALTER TABLE {table} DROP COLUMN geohash"))
+            for table in ('countries', 'areas', 'crags', 'routes'):
+                connection.execute(text(f"ALTER TABLE {table} DROP COLUMN normalized_name"))
+
+            connection.execute(text("INSERT INTO countries (id, name) VALUES (1, 'Germany')"))
+            connection.execute(text("INSERT INTO areas (id, name, country_id) VALUES (1, 'Frankenjura', 1)"))
+            connection.execute(text("INSERT INTO crags (id, name, area_id) VALUES (1, 'Waldkopf', 1)"))
+
+    def _indexes(self, table):
+        return {ix['name'] for ix in inspect(self.bind).get_indexes(table)}
+
+    def test_creates_indexes_and_records_versions(self):
+        applied = run_migrations(self.bind)
+
+        self.assertEqual([m[0] for m in applied], [m[0] for m in MIGRATIONS])
+        for table, names in NEW_INDEXES.items():
+            self.assertTrue(set(names) <= self._indexes(table), table)
+        self.assertIn('ix_ascents_user_id', self._indexes('ascents'))
+        self.assertNotIn('ix_ascents_user_project', self._indexes('ascents'))
+        self.assertEqual(set(get_applied_versions(self.bind)), {m[0] for m in MIGRATIONS})
+
+    def test_fills_route_location_columns(self):
+        with self.bind.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO routes (name, discipline, crag_id) VALUES ('Sautanz', 'Sportclimb', 1)"))
+        run_migrations(self.bind)
+
+        with self.bind.connect() as connection:
+            row = connection.execute(text(
+                "SELECT crag_name, area_id, area_name, country_id, country_name FROM routes")).one()
+        self.assertEqual(tuple(row), ('Waldkopf', 1, 'Frankenjura', 1, 'Germany'))
+
+    def test_adds_user_data_version(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO users (username, password_hash) VALUES ('ole', 'x')"))
+        run_migrations(self.bind)
+
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO users (username, password_hash) VALUES ('new', 'x')"))
+            versions = connection.execute(text("SELECT data_version FROM users ORDER BY id")).scalars().all()
+        self.assertEqual(versions, [0, 0])
+
+    def test_final_migrations_run_last(self):
+        self.assertIn(4, FINAL_MIGRATIONS)
+        versions = [m[0] for m in MIGRATIONS]
+        n_schema = len(versions) - len(FINAL_MIGRATIONS)
+        self.assertEqual(set(versions[n_schema:]), FINAL_MIGRATIONS)
+        self.assertEqual(versions[:n_schema], sorted(versions[:n_schema]))
+
+    def test_second_run_is_a_no_op(self):
+        run_migrations(self.bind)
+        self.assertEqual(run_migrations(self.bind), [])
+
+    def test_new_database_gets_current_schema(self):
+        bind = create_benchmark_engine('sqlite://')
+        applied = run_migrations(bind)
+
+        self.assertEqual([m[0] for m in applied], [m[0] for m in MIGRATIONS])
+        self.assertEqual(set(get_applied_versions(bind)), {m[0] for m in MIGRATIONS})
+        self.assertTrue(set(Base.metadata.tables) <= set(inspect(bind).get_table_names()))
+        indexes = {ix['name'] for ix in inspect(bind).get_indexes('routes')}
+        self.assertTrue(set(NEW_INDEXES['routes']) <= indexes)
+        self.assertEqual(run_migrations(bind), [])
+
+    def test_dry_run_changes_nothing(self):
+        applied = run_migrations(self.bind, dry_run=True)
+        self.assertEqual(len(applied), len(MIGRATIONS))
+        self.assertEqual(get_applied_versions(self.bind), {})
+        self.assertNotIn('ix_ascents_user_date', self._indexes('ascents'))
+
+    def _merge_changes(self, applied, version):
+        return [change for v, _, changes in applied if v == version for change in changes
+                if change.startswith("merged")]
+
+    def test_duplicate_routes_are_merged(self):
+        with self.bind.begin() as connection:
+            for _ in range(2):
+                connection.execute(text(
+                    "INSERT INTO routes (name, discipline, crag_id) VALUES ('Twin', 'Sportclimb', 1)"))
+
+        applied = run_migrations(self.bind)
+        self.assertEqual(self._merge_changes(applied, 4), ["merged 1 duplicate routes"])
+        self.assertEqual(set(get_applied_versions(self.bind)), {m[0] for m in MIGRATIONS})
+        self.assertIn('ix_routes_crag_name_discipline', self._indexes('routes'))
+        with self.bind.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT count(*) FROM routes")).scalar(), 1)
+
+    def test_merged_routes_keep_their_ascents(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'ole', 'x')"))
+            for route_id in (1, 2):
+                connection.execute(text(
+                    "INSERT INTO routes (id, name, discipline, crag_id) VALUES (:id, 'Twin', 'Sportclimb', 1)"),
+                    {'id': route_id})
+                connection.execute(text(
+                    "INSERT INTO ascents (user_id, route_id, grade, ole_grade, is_project, date) "
+                    "VALUES (1, :id, '7a', 17, 0, :date)"), {'id': route_id, 'date': f"2024-05-0{route_id}"})
+        run_migrations(self.bind)
+
+        with self.bind.connect() as connection:
+            route_ids = connection.execute(text("SELECT route_id FROM ascents")).scalars().all()
+            n_ascents = connection.execute(text("SELECT n_ascents FROM route_stats WHERE route_id = 1")).scalar()
+        self.assertEqual(route_ids, [1, 1])
+        self.assertEqual(n_ascents, 2)
+
+    def test_merges_variant_spellings_of_migrated_databases(self):
+        """Databases that applied migration 13 with plain indexes can hold variant spellings."""
+        run_migrations(self.bind)
+        with self.bind.begin() as connection:
+            connection.execute(text("DROP INDEX ix_routes_crag_normalized_discipline"))
+            connection.execute(text("CREATE INDEX ix_routes_crag_normalized_discipline "
+                                    "ON routes (crag_id, normalized_name, discipline)"))
+            connection.execute(text("DELETE FROM schema_migrations WHERE version = 14"))
+            for name, normalized_name in [('Chateau', 'chateau'), ('Château', 'chateau')]:
+                connection.execute(text(
+                    "INSERT INTO routes (name, normalized_name, discipline, crag_id) "
+                    "VALUES (:name, :normalized_name, 'Sportclimb', 1)"),
+                    {'name': name, 'normalized_name': normalized_name})
+
+        applied = run_migrations(self.bind)
+        self.assertEqual(self._merge_changes(applied, 14), ["merged 1 duplicate routes"])
+        unique = {ix['name']: ix['unique'] for ix in inspect(self.bind).get_indexes('routes')}
+        self.assertTrue(unique['ix_routes_crag_normalized_discipline'])
+        with self.bind.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT name FROM routes")).scalars().all(), ['Chateau'])
+
+    def test_merges_children_of_merged_locations(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO crags (id, name, area_id) VALUES (2, 'waldkopf', 1)"))
+            for route_id, crag_id in [(1, 1), (2, 2)]:
+                connection.execute(text(
+                    "INSERT INTO routes (id, name, discipline, crag_id) VALUES (:id, 'Sautanz', 'Multipitch', :crag)"),
+                    {'id': route_id, 'crag': crag_id})
+                connection.execute(text("INSERT INTO pitches (route_id, pitch_number) VALUES (:id, 1)"),
+                                   {'id': route_id})
+
+        # Re-pointing the routes and pitches of the merged crag collides with the unique indexes until merged
+        applied = run_migrations(self.bind)
+        self.assertEqual(self._merge_changes(applied, 4), [])
+        self.assertEqual(self._merge_changes(applied, 14), ["merged 1 duplicate crags", "merged 1 duplicate routes",
+                                                            "merged 1 duplicate pitches"])
+        self.assertIn('ix_pitches_route_number', self._indexes('pitches'))
+        self.assertIn('ix_crags_normalized_area', self._indexes('crags'))
+
+    def test_plain_normalized_indexes_become_unique(self):
+        run_migrations(self.bind)
+        with self.bind.begin() as connection:
+            connection.execute(text("DROP INDEX ix_crags_normalized_area"))
+            connection.execute(text("CREATE INDEX ix_crags_normalized_area ON crags (normalized_name, area_id)"))
+            connection.execute(text("DELETE FROM schema_migrations WHERE version = 14"))
+
+        self.assertEqual([m[0] for m in run_migrations(self.bind)], [14])
+        unique = {ix['name']: ix['unique'] for ix in inspect(self.bind).get_indexes('crags')}
+        self.assertTrue(unique['ix_crags_normalized_area'])
+
+    def test_duplicate_areas_are_merged(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO areas (name, country_id) VALUES ('Frankenjura', 1)"))
+
+        applied = run_migrations(self.bind)
+        self.assertEqual(self._merge_changes(applied, 4), ["merged 1 duplicate areas"])
+        with self.bind.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT count(*) FROM areas")).scalar(), 1)
+
+    def test_creates_route_stats(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'ole', 'x')"))
+            connection.execute(text(
+                "INSERT INTO routes (id, name, discipline, crag_id) VALUES (1, 'Sautanz', 'Sportclimb', 1)"))
+            for style, is_project in [("o.s.", 0), ("F", 0), (None, 1)]:
+                connection.execute(text(
+                    "INSERT INTO ascents (user_id, route_id, grade, ole_grade, style, is_project) "
+                    "VALUES (1, 1, '7a', 17, :style, :is_project)"), {'style': style, 'is_project': is_project})
+        run_migrations(self.bind)
+
+        with self.bind.connect() as connection:
+            row = connection.execute(text(
+                "SELECT n_ascents, n_projects, n_onsight, n_flash FROM route_stats WHERE route_id = 1")).one()
+        self.assertEqual(tuple(row), (2, 1, 1, 1))
+
+    def test_creates_monthly_stats(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'ole', 'x')"))
+            connection.execute(text(
+                "INSERT INTO routes (id, name, discipline, crag_id, length) "
+                "VALUES (1, 'Sautanz', 'Sportclimb', 1, 25)"))
+            for day, ole_grade in [('2020-06-03', 17), ('2020-06-28', 19), ('2020-08-01', 18)]:
+                connection.execute(text(
+                    "INSERT INTO ascents (user_id, route_id, grade, ole_grade, date, is_project) "
+                    "VALUES (1, 1, '7a', :ole_grade, :day, 0)"), {'ole_grade': ole_grade, 'day': day})
+        run_migrations(self.bind)
+
+        with self.bind.connect() as connection:
+            rows = connection.execute(text(
+                "SELECT month, n_ascents, meters, max_ole_grade FROM user_month_stats ORDER BY month")).all()
+        self.assertEqual([tuple(row) for row in rows],
+                         [('2020-06-01', 2, 50.0, 19.0), ('2020-08-01', 1, 25.0, 18.0)])
+
+    def test_adds_geohashes_and_map_clusters(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("UPDATE crags SET parking_latitude = 49.7, parking_longitude = 11.3"))
+            connection.execute(text(
+                "INSERT INTO routes (name, discipline, crag_id, latitude, longitude) "
+                "VALUES ('Sautanz', 'Sportclimb', 1, 57.64911, 10.40744)"))
+        run_migrations(self.bind)
+
+        self.assertIn('ix_routes_geohash', self._indexes('routes'))
+        self.assertIn('ix_crags_geohash', self._indexes('crags'))
+        with self.bind.connect() as connection:
+            route_geohash = connection.execute(text("SELECT geohash FROM routes")).scalar()
+            crag_geohash = connection.execute(text("SELECT geohash FROM crags")).scalar()
+        self.assertEqual(route_geohash, "u4pruydqq")
+        self.assertEqual(crag_geohash, encode(49.7, 11.3))
+
+        with self.bind.connect() as connection:
+            clusters = connection.execute(text(
+                "SELECT level, cell, n_routes FROM map_clusters ORDER BY level")).all()
+        self.assertEqual([tuple(row) for row in clusters],
+                         [(level, "u4pruydqq"[:level], 1) for level in CLUSTER_LEVELS])
+
+    def test_fills_normalized_names(self):
+        with self.bind.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO routes (name, discipline, crag_id) VALUES ('Chasin'' the Trane', 'Sportclimb', 1)"))
+        run_migrations(self.bind)
+
+        with self.bind.connect() as connection:
+            names = [connection.execute(text(f"SELECT normalized_name FROM {table}")).scalar()
+                     for table in ('countries', 'areas', 'crags', 'routes')]
+        self.assertEqual(names, ['germany', 'frankenjura', 'waldkopf', 'chasin the trane'])
+
+
+if __name__ == "__main__":
+    unittest.main()
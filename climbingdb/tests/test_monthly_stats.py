@@ -0,0 +1,109 @@
+"""
+Test the per-user monthly rollups and the grade progression read from them.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_monthly_stats
+"""
+
+import unittest
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import select
+
+from climbingdb.models import SessionLocal, User, UserMonthStats
+from climbingdb.models.monthly_stats_sync import rebuild_monthly_stats
+from climbingdb.services import ClimbingService
+from climbingdb.services.auth_service import AuthService
+from climbingdb.tests import LogbookTestCase
+
+
+class TestMonthlyStats(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=3, n_crags=10, n_routes=200, ascents_per_user=80, main_user_ascents=300)
+
+    def setUp(self):
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def _stats(self):
+        with self.bind.connect() as connection:
+            return {(row.user_id, row.discipline, row.month): tuple(row)
+                    for row in connection.execute(select(UserMonthStats.__table__))}
+
+    def _assert_consistent(self):
+        """The incrementally maintained rollups equal a rebuild from scratch."""
+        maintained = self._stats()
+        with self.bind.begin() as connection:
+            rebuild_monthly_stats(connection)
+        self.assertEqual(maintained, self._stats())
+
+    def _month(self, month, discipline="Sportclimb"):
+        return self._stats().get((self.db.user_id, discipline, month))
+
+    def test_maintained_by_generator(self):
+        monthly = self.db.get_monthly_stats()
+        self.assertGreater(len(monthly), 0)
+        self.assertTrue(monthly['month'].is_monotonic_increasing)
+        self.assertTrue((monthly['month'].dt.day == 1).all())
+        self._assert_consistent()
+
+    def test_ascent_writes(self):
+        ascent = self.db.add_ascent("Timeline Route", "7a", "Sportclimb", "Timeline Crag", "Timeline Area",
+                                    "Germany", style="o.s.", date="1999-05-17", length=30)
+        row = self._month(date(1999, 5, 1))
+        self.assertEqual(row[4:8], (1, 1, 30.0, 0))  # n_ascents, n_onsight, meters, v_points
+
+        # Moving the ascent to another month empties the previous one
+        self.db.update_ascent(ascent.id, date=date(1999, 7, 2), style="F")
+        self.assertIsNone(self._month(date(1999, 5, 1)))
+        self.assertEqual(self._month(date(1999, 7, 1))[4:6], (1, 0))
+
+        # Changing the route updates the months of its ascents
+        self.db.update_ascent(ascent.id, length=45)
+        self.assertEqual(self._month(date(1999, 7, 1))[6], 45.0)
+        self._assert_consistent()
+
+        self.db.delete_ascent(ascent.id)
+        self.assertIsNone(self._month(date(1999, 7, 1)))
+
+    def test_boulder_v_points(self):
+        ascents = [self.db.add_ascent(f"Timeline Boulder {grade}", grade, "Boulder", "Timeline Block",
+                                      "Timeline Area", "Germany", date="1999-03-0" + str(day))
+                   for day, grade in enumerate(["V4", "V6", "V7"], start=1)]
+        try:
+            row = self._month(date(1999, 3, 1), discipline="Boulder")
+            self.assertEqual(row[4], 3)
+            self.assertEqual(row[7], sum(int(ascent.ole_grade) for ascent in ascents))
+            self.assertEqual(row[8], max(ascent.ole_grade for ascent in ascents))
+        finally:
+            for ascent in ascents:
+                self.db.delete_ascent(ascent.id)
+
+    def test_bulk_delete_of_a_users_ascents(self):
+        with SessionLocal() as session:
+            user_id = session.query(User.id).filter(User.id != self.context['main_user_id']) \
+                .order_by(User.id.desc()).limit(1).scalar()
+        self.assertTrue(any(key[0] == user_id for key in self._stats()))
+        AuthService().delete_all_ascents(user_id)
+        self.assertFalse(any(key[0] == user_id for key in self._stats()))
+        self._assert_consistent()
+
+    def test_grade_progression(self):
+        window = 6
+        progression = self.db.get_grade_progression("Sportclimb", window_months=window)
+        self.assertGreater(len(progression), 0)
+
+        # Same values with pandas over a calendar month index (empty months included)
+        monthly = self.db.get_monthly_stats("Sportclimb").set_index('month')['max_ole_grade']
+        calendar = monthly.reindex(pd.date_range(monthly.index.min(), monthly.index.max(), freq='MS'))
+        expected_rolling = calendar.rolling(window, min_periods=1).max().loc[monthly.index]
+        expected_best = monthly.cummax()
+
+        self.assertEqual(list(progression['max_ole_grade']), list(monthly))
+        self.assertEqual(list(progression['rolling_max']), list(expected_rolling))
+        self.assertEqual(list(progression['best']), list(expected_best))
+        self.assertTrue((progression['rolling_max'] <= progression['best']).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
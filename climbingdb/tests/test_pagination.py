@@ -0,0 +1,86 @@
+"""
+Test the keyset pagination of the ascents table.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_pagination
+"""
+
+import unittest
+
+from climbingdb.models import Ascent
+from climbingdb.services import ClimbingService
+from climbingdb.benchmarks import QueryCounter
+from climbingdb.tests import LogbookTestCase
+
+
+class TestPagination(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=10, n_routes=300, ascents_per_user=50, main_user_ascents=230)
+
+    @classmethod
+    def prepare_logbook(cls, session):
+        ascents = session.query(Ascent).filter(Ascent.user_id == cls.context['main_user_id'])
+        # Missing dates are sorted last
+        for ascent in ascents.limit(7):
+            ascent.date = None
+        # Soft and hard ascents sort below and above their grade
+        for ascent in ascents.offset(7).limit(40):
+            ascent.shortnote = ["Soft", "hard", "FA", None][ascent.id % 4]
+
+    def setUp(self):
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def _all_pages(self, page_size, **kwargs):
+        pages, cursor = [], None
+        while True:
+            page, cursor = self.db.get_ascents_page(after=cursor, page_size=page_size, **kwargs)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_all_ascents_in_order(self):
+        full = self.db.get_filtered_routes()
+        pages = self._all_pages(page_size=20, discipline="Sportclimb")
+
+        ids = [ascent_id for page in pages for ascent_id in page['id']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), set(full['id']))
+        self.assertTrue(all(len(page) == 20 for page in pages[:-1]))
+
+        grades = [grade for page in pages for grade in page['sort_grade']]
+        self.assertEqual(grades, sorted(grades, reverse=True))
+        self.assertEqual(ids, list(full.sort_values(['sort_grade', 'id'], ascending=False)['id']))
+
+    def test_date_order(self):
+        pages = self._all_pages(page_size=25, order_by="date", discipline=None)
+        ids = [ascent_id for page in pages for ascent_id in page['id']]
+
+        expected = self.db.session.query(Ascent.id) \
+            .filter(Ascent.user_id == self.context['main_user_id'], Ascent.is_project == False) \
+            .order_by(Ascent.date.desc().nullslast(), Ascent.id.desc())
+        self.assertEqual(ids, [row.id for row in expected])
+
+    def test_filters_and_count(self):
+        filters = {'discipline': "Sportclimb", 'grade': "7a", 'operation': ">="}
+        ids = {ascent_id for page in self._all_pages(page_size=10, **filters) for ascent_id in page['id']}
+        self.assertEqual(ids, set(self.db.get_filtered_routes(**filters)['id']))
+        self.assertEqual(self.db.count_filtered_ascents(**filters), len(ids))
+
+        projects = self._all_pages(page_size=10, is_project=True)
+        self.assertEqual(sum(len(page) for page in projects), len(self.db.get_projects()))
+
+    def test_constant_queries_per_page(self):
+        _, cursor = self.db.get_ascents_page(page_size=20, discipline="Multipitch")
+        for after in [None, cursor]:
+            with QueryCounter(self.bind) as counter:
+                self.db.get_ascents_page(after=after, page_size=20, discipline="Multipitch")
+            # Ascents with routes, pitch ascents with pitches
+            self.assertLessEqual(counter.count, 2)
+
+    def test_unknown_order(self):
+        with self.assertRaises(ValueError):
+            self.db.get_ascents_page(order_by="stars")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Query-plan regression tests: the hot queries must not read ascents or routes completely.
+
+Runs on an in-memory SQLite database by default. Point QUERY_PLAN_DATABASE_URL
+at an empty PostgreSQL database to check the Postgres plans as well.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_query_plans
+"""
+
+import os
+import unittest
+
+from climbingdb.models import Base
+from climbingdb.benchmarks.runner import database_is_empty
+from climbingdb.benchmarks.query_plans import find_full_scans
+from climbingdb.services import ClimbingService
+from climbingdb.ui.search import _search_routes
+from climbingdb.ui.filters import get_discipline_areas
+from climbingdb.ui import location_selector
+from climbingdb.ui import achievement_helpers
+from climbingdb.tests import LogbookTestCase
+
+QUERY_PLAN_DATABASE_URL = os.getenv('QUERY_PLAN_DATABASE_URL', 'sqlite://')
+
+# Full scans that are inherent to a query and not a regression:
+# substring search (ILIKE '%term%') cannot use a B-tree index on routes.name.
+KNOWN_SCANS = {
+    'search_routes': {'routes'},
+}
+
+
+class TestQueryPlans(LogbookTestCase):
+
+    DATABASE_URL = QUERY_PLAN_DATABASE_URL
+    LOGBOOK_SIZES = dict(n_users=3, n_crags=30, n_routes=600, ascents_per_user=100, main_user_ascents=200)
+
+    @classmethod
+    def create_bind(cls):
+        bind = super().create_bind()
+        if not database_is_empty(bind):
+            raise unittest.SkipTest("Query plan tests require an empty database")
+        return bind
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        Base.metadata.drop_all(bind=cls.bind)
+
+    def setUp(self):
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def assertNoFullScans(self, name, fn):
+        allowed = KNOWN_SCANS.get(name, set())
+        offenders = [(statement, plan, scanned - allowed)
+                     for statement, plan, scanned in find_full_scans(self.bind, fn)
+                     if scanned - allowed]
+
+        message = "\n\n".join(
+            f"Full scan on {', '.join(sorted(scanned))}:\n{statement}\nPlan:\n  " + "\n  ".join(plan)
+            for statement, plan, scanned in offenders
+        )
+        self.assertFalse(offenders, f"{name} degraded to a full table scan\n{message}")
+
+    def test_get_filtered_routes(self):
+        area = self.context['busiest_area']
+        self.assertNoFullScans('get_filtered_routes', lambda: self.db.get_filtered_routes())
+        self.assertNoFullScans('get_filtered_routes', lambda: self.db.get_filtered_routes(area=area))
+        self.assertNoFullScans('get_filtered_routes',
+                               lambda: self.db.get_filtered_routes(grade="7a", operation=">="))
+        self.assertNoFullScans('get_filtered_routes',
+                               lambda: self.db.get_filtered_routes(grade=("6a", "7a"), operation="between"))
+
+    def test_get_ascents_page(self):
+        _, cursor = self.db.get_ascents_page(page_size=20)
+        self.assertNoFullScans('get_ascents_page', lambda: self.db.get_ascents_page(after=cursor, page_size=20))
+        self.assertNoFullScans('get_ascents_page', lambda: self.db.get_ascents_page(order_by="date", page_size=20))
+
+    def test_spatial_queries(self):
+        self.assertNoFullScans('routes_in_bbox', lambda: self.db.routes_in_bbox(47.0, 9.0, 49.0, 12.0))
+        self.assertNoFullScans('crags_near', lambda: self.db.crags_near(48.0, 11.0, radius_km=100))
+        self.assertNoFullScans('get_map_clusters', lambda: self.db.get_map_clusters(47.0, 9.0, 49.0, 12.0, zoom=8))
+
+    def test_get_projects(self):
+        area = self.context['busiest_area']
+        self.assertNoFullScans('get_projects', lambda: self.db.get_projects())
+        self.assertNoFullScans('get_projects', lambda: self.db.get_projects(area=area))
+
+    def test_search_routes(self):
+        self.assertNoFullScans('search_routes', lambda: _search_routes(self.db, self.context['search_term']))
+
+    def test_get_discipline_areas(self):
+        for discipline in ["Sportclimb", "Boulder", "Multipitch", "Projects"]:
+            self.assertNoFullScans('get_discipline_areas', lambda: get_discipline_areas(self.db, discipline))
+
+    def test_location_selector(self):
+        area = self.context['busiest_area']
+        self.assertNoFullScans('location_selector', lambda: (
+            location_selector.get_existing_countries(self.db, "Sportclimb"),
+            location_selector.get_existing_areas(self.db, "Sportclimb", "Germany"),
+            location_selector.get_existing_crags(self.db, "Sportclimb", "Germany", area),
+            location_selector.get_existing_route_names(self.db, "Sportclimb", "Germany", area),
+        ))
+
+    def test_achievement_helpers(self):
+        helpers = [
+            achievement_helpers.get_max_daily_length,
+            achievement_helpers.get_max_boulders_in_area,
+            achievement_helpers.get_max_daily_v_points,
+            achievement_helpers.has_font_big_5,
+            achievement_helpers.has_alpine_triology,
+            achievement_helpers.is_local,
+            achievement_helpers.is_bleaussard,
+            achievement_helpers.is_epicing,
+            achievement_helpers.is_sandbagger,
+            achievement_helpers.is_grade_inflator,
+        ]
+        for helper in helpers:
+            self.assertNoFullScans(helper.__name__, lambda: helper(self.db))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Test the route detail loader and its per-route cache.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_route_detail
+"""
+
+import unittest
+
+from climbingdb.models import SessionLocal, User, Route, Ascent
+from climbingdb.services import ClimbingService
+from climbingdb.services.route_detail import RouteDetail, invalidate_route_details
+from climbingdb.benchmarks import QueryCounter
+from climbingdb.tests import LogbookTestCase
+
+
+class TestRouteDetail(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=2, n_crags=10, n_routes=300, ascents_per_user=50, main_user_ascents=200)
+
+    @classmethod
+    def prepare_logbook(cls, session):
+        multipitch = session.query(Ascent).join(Ascent.route).filter(
+            Ascent.user_id == cls.context['main_user_id'],
+            Route.discipline == "Multipitch",
+            Ascent.pitch_ascents.any()
+        ).first()
+        cls.route_id = multipitch.route_id
+        cls.ascent_id = multipitch.id
+        cls.other_user_id = session.query(User.id).filter(User.id != cls.context['main_user_id']).scalar()
+
+    def setUp(self):
+        invalidate_route_details()
+        self.db = ClimbingService(user_id=None)
+
+    def test_fully_loaded_in_two_queries(self):
+        with QueryCounter(self.bind) as counter:
+            detail = self.db.get_route_detail(self.route_id, user_id=self.context['main_user_id'])
+        # Route + pitches, ascent + pitch ascents
+        self.assertLessEqual(counter.count, 4)
+        self.assertIsInstance(detail, RouteDetail)
+
+        session = SessionLocal()
+        route = session.get(Route, self.route_id)
+        ascent = session.get(Ascent, self.ascent_id)
+        self.assertEqual((detail.name, detail.crag_name, detail.area_name, detail.country_name),
+                         (route.name, route.crag.name, route.area.name, route.country.name))
+        self.assertEqual([pitch.pitch_number for pitch in detail.pitches],
+                         sorted(pitch.pitch_number for pitch in route.pitches))
+
+        self.assertEqual((detail.ascent.id, detail.ascent.grade), (ascent.id, ascent.grade))
+        numbers = [pa.pitch.pitch_number for pa in detail.ascent.pitch_ascents]
+        self.assertEqual(numbers, sorted(pa.pitch.pitch_number for pa in ascent.pitch_ascents))
+        self.assertEqual(list(detail.ascent.pitch_frame['pitch_number']), numbers)
+        self.assertEqual(detail.ascent.frame['name'].item(), route.name)
+        session.close()
+
+    def test_public_page_has_no_ascent(self):
+        with QueryCounter(self.bind) as counter:
+            detail = self.db.get_route_detail(str(self.route_id))
+        self.assertEqual(counter.count, 2)
+        self.assertIsNone(detail.ascent)
+        self.assertIsNone(self.db.get_route_detail(10**9))
+        self.assertIsNone(self.db.get_route_detail("not-a-route"))
+
+    def test_cached_until_the_route_changes(self):
+        detail = self.db.get_route_detail(self.route_id)
+        with QueryCounter(self.bind) as counter:
+            self.assertIs(self.db.get_route_detail(self.route_id), detail)
+        self.assertEqual(counter.count, 0)
+
+        # Another route's change keeps the entry
+        writer = ClimbingService(user_id=self.other_user_id)
+        with SessionLocal() as session:
+            elsewhere = session.query(Ascent.id).filter(Ascent.user_id == self.other_user_id,
+                                                        Ascent.route_id != self.route_id).limit(1).scalar()
+        writer.update_ascent(elsewhere, stars=1)
+        self.assertIs(self.db.get_route_detail(self.route_id), detail)
+
+        ascent = writer.add_ascent(detail.name, "5a", detail.discipline, detail.crag_name, detail.area_name,
+                                   detail.country_name, stars=3)
+        try:
+            self.assertEqual(ascent.route_id, self.route_id)
+            changed = self.db.get_route_detail(self.route_id, user_id=self.other_user_id)
+            self.assertEqual(changed.ascent.id, ascent.id)
+            self.assertIsNot(self.db.get_route_detail(self.route_id), detail)
+        finally:
+            writer.delete_ascent(ascent.id)
+        self.assertIsNone(self.db.get_route_detail(self.route_id, user_id=self.other_user_id).ascent)
+
+
+if __name__ == "__main__":
+    unittest.main()
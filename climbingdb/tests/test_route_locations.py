@@ -0,0 +1,80 @@
+"""
+Test that the denormalized location columns of routes stay in sync.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_route_locations
+"""
+
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from climbingdb.models import Base, Route, Area
+from climbingdb.models.location_sync import repair_route_locations
+from climbingdb.services.crud import get_or_create_location, get_or_create_route
+from climbingdb.benchmarks import create_benchmark_engine
+
+
+class TestRouteLocations(unittest.TestCase):
+
+    def setUp(self):
+        self.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=self.bind)
+        self.session = sessionmaker(bind=self.bind)()
+
+        crag = get_or_create_location(self.session, "Germany", "Frankenjura", "Krottenseer Turm")
+        self.route = get_or_create_route(self.session, "Action Directe", "Sportclimb", crag, "9a")
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def _location(self):
+        self.session.expire_all()
+        route = self.session.get(Route, self.route.id)
+        return route.crag_name, route.area_name, route.country_name
+
+    def test_set_on_insert(self):
+        self.assertEqual(self._location(), ("Krottenseer Turm", "Frankenjura", "Germany"))
+        self.assertEqual(self.route.area_id, self.route.crag.area_id)
+        self.assertEqual(self.route.country_id, self.route.crag.area.country_id)
+
+    def test_renames_propagate(self):
+        self.route.crag.name = "Waldkopf"
+        self.route.crag.area.name = "Frankenjura Nord"
+        self.route.crag.area.country.name = "Deutschland"
+        self.session.commit()
+        self.assertEqual(self._location(), ("Waldkopf", "Frankenjura Nord", "Deutschland"))
+
+    def test_moves_propagate(self):
+        other = get_or_create_location(self.session, "France", "Céüse", "Biographie")
+
+        self.route.crag.area = other.area
+        self.session.commit()
+        self.assertEqual(self._location(), ("Krottenseer Turm", "Céüse", "France"))
+
+        self.route.crag = other
+        self.session.commit()
+        self.assertEqual(self._location(), ("Biographie", "Céüse", "France"))
+        self.assertEqual(self.session.get(Route, self.route.id).area_id, other.area_id)
+
+    def test_repair(self):
+        with self.bind.begin() as connection:
+            connection.execute(text("UPDATE routes SET crag_name = NULL, area_name = 'Wrong'"))
+
+        with self.bind.begin() as connection:
+            self.assertEqual(repair_route_locations(connection, dry_run=True), 1)
+            self.assertEqual(repair_route_locations(connection), 1)
+            self.assertEqual(repair_route_locations(connection), 0)
+        self.assertEqual(self._location(), ("Krottenseer Turm", "Frankenjura", "Germany"))
+
+    def test_area_without_country(self):
+        area = Area(name="Nowhere")
+        self.route.crag.area = area
+        self.session.commit()
+        self.assertEqual(self._location(), ("Krottenseer Turm", "Nowhere", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
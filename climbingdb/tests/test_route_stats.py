@@ -0,0 +1,116 @@
+"""
+Test the per-route statistics table and its incremental maintenance.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_route_stats
+"""
+
+import unittest
+
+from sqlalchemy import select
+
+from climbingdb.models import SessionLocal, User, Route, Ascent, RouteStats
+from climbingdb.models.route_stats_sync import rebuild_route_stats
+from climbingdb.services import ClimbingService
+from climbingdb.services.auth_service import AuthService
+from climbingdb.services.route_detail import invalidate_route_details
+from climbingdb.tests import LogbookTestCase
+
+
+class TestRouteStats(LogbookTestCase):
+
+    LOGBOOK_SIZES = dict(n_users=3, n_crags=10, n_routes=200, ascents_per_user=80, main_user_ascents=150)
+
+    def setUp(self):
+        invalidate_route_details()
+        self.db = ClimbingService(user_id=self.context['main_user_id'])
+
+    def _stats(self):
+        with self.bind.connect() as connection:
+            return {row.route_id: tuple(row) for row in connection.execute(select(RouteStats.__table__))}
+
+    def _assert_consistent(self):
+        """The incrementally maintained table equals a rebuild from scratch."""
+        maintained = self._stats()
+        with self.bind.begin() as connection:
+            rebuild_route_stats(connection)
+        self.assertEqual(maintained, self._stats())
+
+    def _route_stats(self, route_id):
+        with SessionLocal() as session:
+            return session.get(RouteStats, route_id)
+
+    def test_maintained_by_generator(self):
+        stats = self._stats()
+        self.assertGreater(len(stats), 0)
+        with SessionLocal() as session:
+            n_ascents = session.query(Ascent).filter(Ascent.is_project == False).count()
+        self.assertEqual(sum(row[1] for row in stats.values()), n_ascents)
+        self._assert_consistent()
+
+    def test_ascent_writes(self):
+        ascent = self.db.add_ascent("Stats Route", "7a", "Sportclimb", "Stats Crag", "Stats Area", "Germany",
+                                    style="o.s.", shortnote="soft", date="2024-05-01")
+        stats = self._route_stats(ascent.route_id)
+        self.assertEqual((stats.n_ascents, stats.n_onsight, stats.n_flash, stats.n_soft), (1, 1, 0, 1))
+        self.assertEqual(stats.grade_votes, {str(ascent.ole_grade): 1})
+        self.assertEqual(stats.onsight_ratio, 1)
+
+        other = ClimbingService(user_id=self._other_user())
+        second = other.add_ascent("Stats Route", "7a+", "Sportclimb", "Stats Crag", "Stats Area", "Germany",
+                                  style="F", shortnote="hard")
+        self.db.update_ascent(ascent.id, style="2. Go", shortnote=None)
+        stats = self._route_stats(ascent.route_id)
+        self.assertEqual((stats.n_ascents, stats.n_onsight, stats.n_flash, stats.n_soft, stats.n_hard),
+                         (2, 0, 1, 0, 1))
+        self.assertEqual(len(stats.grade_votes), 2)
+        self._assert_consistent()
+
+        other.delete_ascent(second.id)
+        self.db.delete_ascent(ascent.id)
+        self.assertIsNone(self._route_stats(ascent.route_id))
+
+    def test_projects_are_counted_separately(self):
+        project = self.db.add_ascent("Stats Project", "8b", "Sportclimb", "Stats Crag", "Stats Area", "Germany",
+                                     is_project=True)
+        try:
+            stats = self._route_stats(project.route_id)
+            self.assertEqual((stats.n_ascents, stats.n_projects, stats.grade_votes), (0, 1, {}))
+            self.db.update_ascent(project.id, is_project=False, style="F")
+            stats = self._route_stats(project.route_id)
+            self.assertEqual((stats.n_ascents, stats.n_projects, stats.n_flash), (1, 0, 1))
+        finally:
+            self.db.delete_ascent(project.id)
+
+    def test_bulk_delete_of_a_users_ascents(self):
+        user_id = self._other_user()
+        n_ascents = sum(row[1] for row in self._stats().values())
+        deleted = AuthService().delete_all_ascents(user_id)
+        self.assertGreater(deleted, 0)
+        self.assertLess(sum(row[1] for row in self._stats().values()), n_ascents)
+        self._assert_consistent()
+
+    def test_classics_and_route_detail(self):
+        with SessionLocal() as session:
+            crag_id = session.query(Route.crag_id).join(Route.stats) \
+                .order_by(RouteStats.n_ascents.desc()).limit(1).scalar()
+
+        classics = self.db.get_classic_routes(crag_id, limit=5)
+        self.assertGreater(len(classics), 0)
+        self.assertTrue(all(route.crag_id == crag_id and route.stats.n_ascents > 0 for route in classics))
+        keys = [(route.consensus_stars is None, -(route.consensus_stars or 0), -route.stats.n_ascents)
+                for route in classics]
+        self.assertEqual(keys, sorted(keys))
+
+        detail = self.db.get_route_detail(classics[0].id)
+        self.assertEqual(detail.stats.n_ascents, classics[0].stats.n_ascents)
+        self.assertEqual(sum(n for _, n in detail.stats.grade_votes), detail.stats.n_ascents)
+
+    def _other_user(self):
+        with SessionLocal() as session:
+            return session.query(User.id).filter(User.id != self.context['main_user_id']) \
+                .order_by(User.id.desc()).limit(1).scalar()
+
+
+if __name__ == "__main__":
+    unittest.main()
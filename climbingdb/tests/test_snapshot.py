@@ -0,0 +1,153 @@
+"""
+Test the Parquet snapshot export/import of a user's logbook.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_snapshot
+"""
+
+import io
+import unittest
+from unittest import mock
+
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+
+from climbingdb.models import Base, SessionLocal, User, Route, Crag, Ascent, PitchAscent
+from climbingdb.services import ClimbingService, snapshot
+from climbingdb.services.snapshot import export_snapshot, import_snapshot, read_snapshot, SnapshotError
+from climbingdb.benchmarks import QueryCounter, bind_sessions, create_benchmark_engine, generate_logbook
+
+LOGBOOK_COLUMNS = ['name', 'grade', 'ole_grade', 'discipline', 'style', 'date', 'stars', 'shortnote',
+                   'crag', 'area', 'country', 'length', 'pitch_number', 'is_project']
+
+
+def _create_database():
+    bind = create_benchmark_engine('sqlite://')
+    Base.metadata.create_all(bind=bind)
+    return bind
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.source = _create_database()
+        with bind_sessions(self.source):
+            session = SessionLocal()
+            self.context = generate_logbook(session, n_users=2, n_crags=10, n_routes=200,
+                                            ascents_per_user=40, main_user_ascents=120)
+            session.close()
+
+        self.snapshot = io.BytesIO()
+        session = sessionmaker(bind=self.source)()
+        self.counts = export_snapshot(session, self.context['main_user_id'], self.snapshot)
+        session.close()
+        self.snapshot.seek(0)
+
+    def _logbook(self, bind, user_id, projects=False):
+        with bind_sessions(bind):
+            db = ClimbingService(user_id=user_id)
+            df = db.get_projects() if projects else db.get_filtered_routes(discipline=None)
+            pitches = db.get_pitch_ascents(df['id'])
+        df = df.sort_values(['date', 'name', 'grade', 'id'], ignore_index=True)
+        return df, pitches
+
+    def test_manifest(self):
+        manifest, tables = read_snapshot(self.snapshot)
+        self.assertEqual(manifest['counts'], self.counts)
+        self.assertEqual(self.counts['ascents'], 120)
+        self.assertEqual(tables['ascents'].num_rows, 120)
+
+    def test_roundtrip_into_empty_database(self):
+        target = _create_database()
+        session = sessionmaker(bind=target)()
+        user = User(username="restored", password_hash="x")
+        session.add(user)
+        session.commit()
+
+        with QueryCounter(target) as counter:
+            report = import_snapshot(session, self.snapshot, user.id)
+        # Independent of the number of rows: lookups, one bulk insert per table, the route
+        # statistics/monthly rollup refresh and a few statements per map cluster level for the
+        # imported positions and the regraded routes (only the consensus updates of the ORM flush are per route)
+        # SQLite can't return the ids of a multi-row INSERT in parameter order: one INSERT per
+        # ascent there (batched on PostgreSQL)
+        ascent_inserts = [statement for statement, _ in counter.statements
+                          if statement.startswith("INSERT INTO ascents")]
+        self.assertEqual(len(ascent_inserts), 120)
+        statements = [statement for statement, _ in counter.statements
+                      if not statement.startswith("UPDATE") and statement not in ascent_inserts]
+        self.assertLess(len(statements), 80)
+        self.assertEqual(report['ascents']['inserted'], 120)
+        self.assertEqual(report['routes']['existing'], 0)
+
+        for projects in [False, True]:
+            before, pitches_before = self._logbook(self.source, self.context['main_user_id'], projects)
+            after, pitches_after = self._logbook(target, user.id, projects)
+            pd.testing.assert_frame_equal(before[LOGBOOK_COLUMNS], after[LOGBOOK_COLUMNS])
+            self.assertEqual(len(pitches_before), len(pitches_after))
+
+        # Denormalized location columns and consensus come along
+        route = session.query(Route).first()
+        self.assertEqual(route.crag_name, route.crag.name)
+        self.assertIsNotNone(route.consensus_ole_grade)
+        session.close()
+
+    def test_import_into_same_database_reuses_routes(self):
+        session = sessionmaker(bind=self.source)()
+        n_routes, n_crags = session.query(Route).count(), session.query(Crag).count()
+        user = User(username="copy", password_hash="x")
+        session.add(user)
+        session.commit()
+
+        report = import_snapshot(session, self.snapshot, user.id)
+
+        self.assertEqual(report['routes']['inserted'], 0)
+        self.assertEqual((session.query(Route).count(), session.query(Crag).count()), (n_routes, n_crags))
+        self.assertEqual(session.query(Ascent).filter(Ascent.user_id == user.id).count(), 120)
+        session.close()
+
+    def test_existing_ascents_need_replace(self):
+        session = sessionmaker(bind=self.source)()
+        user_id = self.context['main_user_id']
+        n_pitch_ascents = session.query(PitchAscent).count()
+
+        with self.assertRaises(SnapshotError):
+            import_snapshot(session, self.snapshot, user_id)
+
+        self.snapshot.seek(0)
+        import_snapshot(session, self.snapshot, user_id, replace=True)
+        self.assertEqual(session.query(Ascent).filter(Ascent.user_id == user_id).count(), 120)
+        self.assertEqual(session.query(PitchAscent).count(), n_pitch_ascents)
+        session.close()
+
+    def test_concurrent_ascents_keep_pitch_ascents_in_place(self):
+        session = sessionmaker(bind=self.source)()
+        user = User(username="copy", password_hash="x")
+        session.add(user)
+        session.commit()
+        insert_rows = snapshot._insert_rows
+
+        def insert_with_concurrent_ascent(session, table, rows, **kwargs):
+            ids = insert_rows(session, table, rows, **kwargs)
+            if table is Ascent.__table__:
+                # E.g. an import job committing an ascent of the user in the meantime
+                session.execute(Ascent.__table__.insert().values(id=0, user_id=user.id, route_id=1,
+                                                                    grade="6a", ole_grade=14))
+            return ids
+
+        with mock.patch.object(snapshot, '_insert_rows', insert_with_concurrent_ascent):
+            import_snapshot(session, self.snapshot, user.id)
+
+        pitch_ascents = session.query(PitchAscent).join(PitchAscent.ascent).filter(Ascent.user_id == user.id).all()
+        self.assertTrue(pitch_ascents)
+        for pitch_ascent in pitch_ascents:
+            self.assertEqual(pitch_ascent.pitch.route_id, pitch_ascent.ascent.route_id)
+        session.close()
+
+    def test_invalid_file(self):
+        with self.assertRaises(SnapshotError):
+            read_snapshot(io.BytesIO(b"name;grade\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
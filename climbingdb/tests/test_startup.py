@@ -0,0 +1,32 @@
+"""
+Test that the Streamlit app starts without the modules it loads lazily.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_startup
+"""
+
+import unittest
+
+from climbingdb.benchmarks.startup import LAZY_MODULES, eagerly_loaded, probe_import
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_app_import_skips_lazy_modules(self):
+        import_ms, modules = probe_import('app')
+
+        self.assertIn('climbingdb.ui', modules)
+        self.assertGreater(import_ms, 0)
+        self.assertEqual(eagerly_loaded(modules), [])
+
+    def test_lazy_modules_load_on_first_use(self):
+        _, modules = probe_import('climbingdb.ui.dashboard')
+        self.assertEqual(eagerly_loaded(modules), [])
+
+        _, modules = probe_import('climbingdb.visualizations')
+        self.assertIn('matplotlib', eagerly_loaded(modules))
+        self.assertEqual(eagerly_loaded({'mpl_toolkits.axes_grid1'}, LAZY_MODULES), ['mpl_toolkits'])
+
+
+if __name__ == "__main__":
+    unittest.main()
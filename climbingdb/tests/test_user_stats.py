@@ -0,0 +1,79 @@
+"""
+Test the single-query user statistics on a small in-memory logbook.
+
+Run as:
+    python3 -m unittest climbingdb.tests.test_user_stats
+"""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from climbingdb.models import Base, SessionLocal, User, Ascent
+from climbingdb.scripts.user_stats import get_user_statistics, iter_user_statistics, export_user_statistics
+from climbingdb.benchmarks import QueryCounter, bind_sessions, create_benchmark_engine, generate_logbook
+
+
+class TestUserStats(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bind = create_benchmark_engine('sqlite://')
+        Base.metadata.create_all(bind=cls.bind)
+        with bind_sessions(cls.bind):
+            session = SessionLocal()
+            generate_logbook(session, n_users=4, n_crags=10, n_routes=200,
+                             ascents_per_user=30, main_user_ascents=60)
+            session.add(User(username="newbie", password_hash="x"))
+            session.commit()
+            cls.expected = cls._expected_statistics(session)
+            session.close()
+
+    @staticmethod
+    def _expected_statistics(session):
+        """The statistics computed per user from the ORM objects."""
+        expected = {}
+        for user in session.query(User).all():
+            ascents = session.query(Ascent).filter(Ascent.user_id == user.id).all()
+            counts = {d: sum(a.route.discipline == d for a in ascents)
+                      for d in ["Sportclimb", "Boulder", "Multipitch"]}
+            hardest = max(ascents, key=lambda a: (a.route.consensus_ole_grade or -1, -a.id), default=None)
+            expected[user.id] = (counts["Sportclimb"], counts["Boulder"], counts["Multipitch"],
+                                 hardest.grade if hardest else '')
+        return expected
+
+    def test_matches_per_user_computation(self):
+        with QueryCounter(self.bind) as counter:
+            df = get_user_statistics(self.bind)
+        self.assertEqual(counter.count, 1)
+
+        self.assertEqual(len(df), len(self.expected))
+        for row in df.itertuples(index=False):
+            sport, boulder, multipitch, hardest = self.expected[row[0]]
+            self.assertEqual((row.Sport, row.Boulder, row.Multipitch), (sport, boulder, multipitch))
+            self.assertEqual(row[3], sport + boulder + multipitch)
+            self.assertEqual(row[7], hardest)
+
+        newbie = df[df['Username'] == "newbie"].iloc[0]
+        self.assertEqual((newbie['Total Routes'], newbie['Hardest Grade']), (0, ''))
+
+    def test_streaming_and_export(self):
+        full = get_user_statistics(self.bind)
+        streamed = pd.concat(list(iter_user_statistics(self.bind, chunk_size=2)), ignore_index=True)
+        pd.testing.assert_frame_equal(streamed, full)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in ['csv', 'parquet']:
+                path = os.path.join(directory, f"users.{fmt}")
+                n_users = export_user_statistics(path, stream=True, chunk_size=2, bind=self.bind)
+                self.assertEqual(n_users, len(full))
+
+                df = pd.read_csv(path, keep_default_na=False) if fmt == 'csv' else pd.read_parquet(path)
+                self.assertEqual(list(df['User ID']), list(full['User ID']), fmt)
+                self.assertEqual(list(df['Hardest Grade']), list(full['Hardest Grade']), fmt)
+
+
+if __name__ == "__main__":
+    unittest.main()
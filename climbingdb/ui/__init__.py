@@ -5,8 +5,8 @@ UI components for Streamlit frontend.
 from .constants import CUSTOM_CSS
 from .navigation import render_navigation_buttons
 from .filters import render_sidebar_filters, render_filter_summary
-from .dashboard import render_dashboard
-from .display import render_routes_table, convert_grades
+from .dashboard import render_dashboard, render_timeline
+from .display import render_routes_table, render_paged_routes_table, format_routes_for_display, convert_grades
 from .forms import render_add_route_form, render_edit_delete_form
 from .auth import require_authentication, render_user_menu, render_settings_page
 from .route_details import render_route_details_page
@@ -18,7 +18,10 @@ __all__ = [
     'render_sidebar_filters',
     'render_filter_summary',
     'render_dashboard',
+    'render_timeline',
     'render_routes_table',
+    'render_paged_routes_table',
+    'format_routes_for_display',
     'convert_grades',
     'render_add_route_form',
     'render_edit_delete_form',
@@ -140,6 +140,11 @@ BADGES = {
 @st.cache_data(ttl=3600)
 def get_earned_badges_cached(_user_id):
     db = ClimbingService(user_id=_user_id)
+    return get_earned_badges(db)
+
+
+def get_earned_badges(db):
+    """Evaluate all badge checks for the user of the given ClimbingService."""
     stats = db.get_statistics()
 
     ole_grade_8a = Grade("8a").conv_grade()
@@ -8,12 +8,14 @@ from climbingdb.ui.sync_8anu import (
     render_8a_sync_form,
     get_8anu_csv_file,
     submit_8anu_upload,
-    show_preview_of_8anu_import
+    show_preview_of_8anu_import,
+    render_import_job
 )
 from climbingdb.ui.settings import (
     render_delete_account,
     render_password_settings,
-    render_delete_all_ascents
+    render_delete_all_ascents,
+    render_snapshot_settings
 )
 from climbingdb.ui.achievements import render_achievements
 
@@ -144,30 +146,37 @@ def render_settings_page():
 
     st.markdown("---")
 
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
         ":material/sync: 8a.nu Sync",
+        ":material/backup: Backup",
         ":material/lock: Password",
         ":material/delete_sweep: Delete Ascents",
         ":material/person_remove: Delete Account"
     ])
 
     with tab1:
+        render_import_job(st.session_state.user_id)
         uploaded_file = get_8anu_csv_file()
         if uploaded_file:
-            show_preview_of_8anu_import(uploaded_file)
+            show_preview_of_8anu_import(uploaded_file, user_id=st.session_state.user_id)
 
             # Confirm button
             st.markdown("---")
+            update_existing = st.checkbox("Update edited ascents", key="update_8a_ascents",
+                help="Take over the changes of ascents you edited on 8a.nu since the last sync")
             confirmed = st.button(":material/check: Confirm Import",
                 type="primary", width="stretch", key="confirm_8a_import")
 
             if confirmed:
-                submit_8anu_upload(uploaded_file, st.session_state.user_id)
+                submit_8anu_upload(uploaded_file, st.session_state.user_id, update_existing=update_existing)
+                st.rerun()  # Shows the progress of the job
     with tab2:
-        render_password_settings(auth)
+        render_snapshot_settings()
     with tab3:
-        render_delete_all_ascents(auth)
+        render_password_settings(auth)
     with tab4:
+        render_delete_all_ascents(auth)
+    with tab5:
         render_delete_account(auth)
     st.markdown("---")
 
@@ -3,16 +3,14 @@ Dashboard components - metrics and visualizations.
 """
 
 import streamlit as st
-import matplotlib.pyplot as plt
-from climbingdb.visualizations import plot_grade_pyramid, plot_multipitches
 from .constants import GRADE_OPTIONS_ROUTES, GRADE_OPTIONS_BOULDERS
 
 
-def render_dashboard(routes):
-    """Render complete dashboard with metrics and visualizations."""
+def render_dashboard(routes, pitches=None):
+    """Render complete dashboard with metrics and visualizations (pitches: multipitch view only)."""
     render_area_metrics(routes)
     st.markdown("---")
-    render_visualizations(routes)
+    render_visualizations(routes, pitches)
     render_grade_metrics(routes)
     st.markdown("---")
 
@@ -62,23 +60,28 @@ def render_grade_metrics(routes):
             st.metric("Hardest Flash", hardest_flash)
 
 
-def render_visualizations(routes):
+def render_visualizations(routes, pitches=None):
     """Render grade pyramid or multipitch visualization."""
+    # matplotlib is imported with the first chart, it would double the app start time
+    import matplotlib.pyplot as plt
+
     with st.spinner("Generating visualization..."):
-        fig = _create_visualization(routes)
+        fig = _create_visualization(routes, pitches)
         if fig:
             st.pyplot(fig, dpi=250)
             plt.close(fig)
     st.markdown("---")
 
 
-def _create_visualization(routes):
+def _create_visualization(routes, pitches=None):
     """Create appropriate visualization based on current view."""
+    from climbingdb.visualizations import plot_grade_pyramid, plot_multipitches
+
     view = st.session_state.view
     sandbaggers = st.session_state.get('sandbaggers_choice', 'Round down')
     
-    if view == 'Multipitch':
-        return plot_multipitches(routes)
+    if view == 'Multipitch' and pitches is not None:
+        return plot_multipitches(routes, pitches)
     elif view == 'Sportclimb':
         return plot_grade_pyramid(
             routes, 
@@ -94,3 +97,22 @@ def _create_visualization(routes):
             title="My Boulder Grade Pyramid"
         )
     return None
+
+
+def render_timeline(db, discipline, grade_system="Original"):
+    """Render ascents per month and the grade progression of a discipline from the monthly rollups."""
+    import matplotlib.pyplot as plt
+    from climbingdb.visualizations import plot_timeline
+
+    monthly = db.get_monthly_stats(discipline)
+    if len(monthly) == 0:
+        return
+    if grade_system == "Original":
+        grade_system = "Vermin" if discipline == "Boulder" else "French"
+
+    with st.spinner("Generating timeline..."):
+        fig = plot_timeline(monthly, db.get_grade_progression(discipline), grade_system=grade_system,
+                            title=f"My {discipline} Timeline")
+        st.pyplot(fig, dpi=250)
+        plt.close(fig)
+    st.markdown("---")
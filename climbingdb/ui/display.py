@@ -2,79 +2,126 @@
 Route display components.
 """
 
+import numpy as np
 import streamlit as st
 from .constants import DISPLAY_COLUMNS
 from climbingdb.grade import Grade
 
 
-def render_routes_table(routes):
+TABLE_PAGE_SIZE = 50
+
+
+def render_routes_table(routes, sort=True):
     """Render routes as a data table."""
-    routes = _adjust_grades_for_soft_hard(routes)
-    routes = routes.sort_values(by="ole_grade", ascending=False)
-    
-    display_cols = _prepare_display_columns(routes)
-    routes = _format_display_fields(routes)
-    
-    column_config = _get_column_config()
-    
+    if sort:
+        routes = routes.sort_values(by="sort_grade", ascending=False)
+
+    routes, display_cols = format_routes_for_display(routes, st.session_state.view)
+
     st.dataframe(
         routes[display_cols],
         width='stretch',
         height=600,
         hide_index=True,
-        column_config=column_config
+        column_config=_get_column_config()
     )
 
 
-def _adjust_grades_for_soft_hard(routes):
-    """Adjust ole_grade slightly for soft/hard routes to affect sort order."""
-    routes['ole_grade'] = routes.apply(
-        lambda row: row['ole_grade'] - 1e-6 if 'soft' in str(row['shortnote']).lower()
-        else row['ole_grade'] + 1e-6 if 'hard' in str(row['shortnote']).lower()
-        else row['ole_grade'],
-        axis=1
+def render_paged_routes_table(db, query_filters, grade_system, page_size=TABLE_PAGE_SIZE):
+    """
+    Render the ascents table one page at a time.
+
+    Pages are loaded from the database with keyset pagination, so a rerun only
+    queries, formats and sends page_size rows to the browser. The cursors of
+    the visited pages live in the session state and are reset when the
+    filters or the sort order change.
+
+    Args:
+        db: ClimbingService instance
+        query_filters: Filters for ClimbingService.get_ascents_page
+        grade_system: Grade system of the sidebar filters
+        page_size: Ascents per page
+    """
+    order_by = st.radio(
+        "Sort by", ["grade", "date"],
+        format_func=str.capitalize,
+        horizontal=True,
+        key="table_order"
     )
-    return routes
+
+    table_key = repr((sorted(query_filters.items()), order_by, page_size))
+    if st.session_state.get('table_key') != table_key:
+        st.session_state.table_key = table_key
+        st.session_state.table_cursors = [None]
+    cursors = st.session_state.table_cursors
+
+    routes, next_cursor = db.get_ascents_page(
+        order_by=order_by, after=cursors[-1], page_size=page_size, **query_filters
+    )
+    routes = convert_grades(routes, grade_system)
+    render_routes_table(routes, sort=False)  # Pages come ordered by the query
+
+    n_ascents = db.count_filtered_ascents(**query_filters)
+    n_pages = max(1, -(-n_ascents // page_size))
+
+    col_previous, col_page, col_next = st.columns([1, 4, 1])
+    with col_previous:
+        st.button(":material/chevron_left: Previous", key="table_previous",
+                  disabled=len(cursors) == 1, on_click=_previous_page)
+    with col_page:
+        st.caption(f"Page {len(cursors)} of {n_pages} · {n_ascents} ascents")
+    with col_next:
+        st.button("Next :material/chevron_right:", key="table_next",
+                  disabled=next_cursor is None, on_click=_next_page, args=(next_cursor,))
+
+
+def _previous_page():
+    st.session_state.table_cursors.pop()
 
 
-def _prepare_display_columns(routes):
-    """Prepare list of columns to display based on discipline."""
+def _next_page(cursor):
+    st.session_state.table_cursors.append(cursor)
+
+
+def format_routes_for_display(routes, discipline):
+    """
+    Format the routes table column-wise (no row-wise apply).
+
+    Args:
+        routes: DataFrame of ascents from ClimbingService
+        discipline: Current view, multipitches show ernsthaftigkeit, length and pitches
+
+    Returns:
+        tuple: (formatted copy of routes, columns to display)
+    """
+    routes = routes.copy()
     display_cols = DISPLAY_COLUMNS.copy()
-    
-    if st.session_state.view == "Multipitch":
-        display_cols.insert(2, 'length')
-        routes['length'] = routes.apply(
-            lambda row: f"{row.get('length', 0):.0f}m" if row.get('length') else "",
-            axis=1
+
+    grade = _text(routes['grade'])
+    label = grade
+
+    if discipline == 'Multipitch':
+        ernsthaftigkeit = _text(routes['ernsthaftigkeit'])
+        label = label.where(ernsthaftigkeit == '', label + ' ' + ernsthaftigkeit)
+
+        length = routes['length'].astype('float64')
+        has_length = length.notna() & (length != 0)
+        routes['length'] = np.where(
+            has_length, length.round().astype('Int64').astype(str) + 'm', ''
         )
+        display_cols.insert(2, 'length')
         display_cols.insert(3, 'pitch_number')
-    
-    return display_cols
 
+    shortnote = _text(routes['shortnote'])
+    label = label.where(shortnote == '', label + ' (' + shortnote + ')')
 
-def _format_display_fields(routes):
-    """Format grade and other display fields."""
-    routes['grade'] = routes.apply(
-        lambda row: _format_grade_display(row, st.session_state.view),
-        axis=1
-    )
-    return routes
+    routes['grade'] = np.where(grade == '', "No grade", label)
+    return routes, display_cols
 
 
-def _format_grade_display(row, discipline):
-    """Format grade with optional ernsthaftigkeit and shortnote."""
-    result = str(row.get('grade'))
-    
-    if not result:
-        return "No grade"
-    
-    if discipline == 'Multipitch' and row.get('ernsthaftigkeit'):
-        result += f" {row['ernsthaftigkeit']}"
-    
-    if row.get('shortnote'):
-        result += f" ({row['shortnote']})"
-    
-    return result
+def _text(series):
+    """Column as plain strings, missing values (also of categoricals) as ''."""
+    return series.astype(object).fillna('').astype(str)
 
 
 def _get_column_config():
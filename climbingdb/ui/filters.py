@@ -3,9 +3,8 @@ Sidebar filter components.
 """
 
 import streamlit as st
-from sqlalchemy import distinct
 
-from climbingdb.models import Area, Crag, Route, Ascent
+from climbingdb.models import Route, Ascent
 from .constants import (
     GRADE_OPTIONS_ROUTES,
     GRADE_OPTIONS_BOULDERS,
@@ -26,15 +25,15 @@ def get_grade_system_options(view):
 def get_discipline_areas(db, discipline):
     """Get areas that have routes in the specified discipline."""
     if discipline == "Projects":
-        areas = db.session.query(distinct(Area.name)).join(Area.crags).join(Crag.routes).join(Route.ascents).filter(
+        areas = db.session.query(Route.area_name).join(Route.ascents).filter(
             Ascent.is_project == True
-        ).all()
+        ).distinct().all()
     else:
-        areas = db.session.query(distinct(Area.name)).join(Area.crags).join(Crag.routes).filter(
+        areas = db.session.query(Route.area_name).filter(
             Route.discipline == discipline
-        ).all()
+        ).distinct().all()
 
-    return sorted([name for (name,) in areas])
+    return sorted([name for (name,) in areas if name])
 
 
 def render_sidebar_filters(db):
@@ -71,6 +70,7 @@ def _render_filter_header():
             st.session_state.selected_area = "All"
             st.session_state.grade_operation_select = ">="
             st.session_state.grade_select = "All"
+            st.session_state.grade_select_to = "All"
             st.session_state.grade_system_select = "Original"
             st.session_state.sandbaggers_choice = "Round down"
             st.session_state.stars_select = 0
@@ -95,9 +95,9 @@ def _render_grade_filters():
     with col_op:
         grade_operation = st.selectbox(
             "Op",
-            [">=", "=="],
+            [">=", "==", "<=", "between"],
             index=0,
-            help="≥: at or above\n==: exact grade",
+            help="≥: at or above\n==: exact grade (incl. slash grades)\n≤: at or below\nbetween: grade range",
             key='grade_operation_select'
         )
     
@@ -110,7 +110,14 @@ def _render_grade_filters():
             index=0,
             key='grade_select'
         )
-    
+
+    if grade_operation == "between":
+        upper_grade = st.sidebar.selectbox("To grade", grade_options, index=0, key='grade_select_to')
+        if upper_grade == "All":
+            grade_operation = ">="
+        elif selected_grade != "All":
+            selected_grade = (selected_grade, upper_grade)
+
     return grade_operation, selected_grade
 
 
@@ -158,7 +165,10 @@ def render_filter_summary(filters):
         st.sidebar.write(f":material/location_on: Area: {filters['selected_area']}")
     
     if filters['selected_grade'] != "All":
-        st.sidebar.write(f":material/show_chart: Grade: {filters['grade_operation']} {filters['selected_grade']}")
+        grade = filters['selected_grade']
+        if isinstance(grade, tuple):
+            grade = " and ".join(grade)
+        st.sidebar.write(f":material/show_chart: Grade: {filters['grade_operation']} {grade}")
     
     if filters['grade_system'] != "Original":
         st.sidebar.write(f":material/grading: Grade System: {filters['grade_system']}")
@@ -4,10 +4,55 @@ Location selection widgets with autocomplete and filtering.
 
 import streamlit as st
 from sqlalchemy import and_
-from climbingdb.models import Country, Area, Crag, Route
+from climbingdb.models import Route
 from climbingdb.grade import Grade
 
 
+def get_existing_countries(db, discipline):
+    """Names of countries that have routes in the discipline."""
+    query = db.session.query(Route.country_name).filter(
+        Route.discipline == discipline,
+        Route.country_name != None
+    )
+    return [name for (name,) in query.distinct().order_by(Route.country_name).all()]
+
+
+def get_existing_areas(db, discipline, country_filter=None):
+    """Names of areas that have routes in the discipline, optionally within a country."""
+    filters = [Route.discipline == discipline, Route.area_name != None]
+    if country_filter:
+        filters.append(Route.country_name == country_filter)
+
+    query = db.session.query(Route.area_name).filter(and_(*filters))
+    return [name for (name,) in query.distinct().order_by(Route.area_name).all()]
+
+
+def get_existing_crags(db, discipline, country_filter=None, area_filter=None):
+    """Names of crags that have routes in the discipline, optionally within a country/area."""
+    filters = [Route.discipline == discipline, Route.crag_name != None]
+    if area_filter:
+        filters.append(Route.area_name == area_filter)
+    if country_filter:
+        filters.append(Route.country_name == country_filter)
+
+    query = db.session.query(Route.crag_name).filter(and_(*filters))
+    return [name for (name,) in query.distinct().order_by(Route.crag_name).all()]
+
+
+def get_existing_route_names(db, discipline, country_filter=None, area_filter=None, crag_filter=None):
+    """Names of routes in the discipline, optionally within a country/area/crag."""
+    filters = [Route.discipline == discipline]
+    if country_filter:
+        filters.append(Route.country_name == country_filter)
+    if area_filter:
+        filters.append(Route.area_name == area_filter)
+    if crag_filter:
+        filters.append(Route.crag_name == crag_filter)
+
+    query = db.session.query(Route.name).filter(and_(*filters))
+    return [name for (name,) in query.distinct().order_by(Route.name).all()]
+
+
 def render_location_selector(db, discipline):
     country = _render_country_selector(db, discipline)
     area = _render_area_selector(db, discipline, country)
@@ -22,13 +67,7 @@ def _render_country_selector(db, discipline):
     col1, col2 = st.columns(2)
 
     with col1:
-        existing_countries = [name for (name,) in db.session.query(Country.name)
-            .join(Country.areas)
-            .join(Area.crags)
-            .join(Crag.routes)
-            .filter(Route.discipline == discipline)
-            .distinct()
-            .order_by(Country.name).all()]
+        existing_countries = get_existing_countries(db, discipline)
         country_select = st.selectbox("Country", [""] + existing_countries, key="country_select_existing")
 
     with col2:
@@ -42,14 +81,7 @@ def _render_area_selector(db, discipline, country_filter):
     col1, col2 = st.columns(2)
     
     with col1:
-        query = db.session.query(Area.name).join(Crag.area).join(Crag.routes)
-        filters = [Route.discipline == discipline]
-        
-        if country_filter:
-            query = query.join(Area.country)
-            filters.append(Country.name == country_filter)
-        
-        existing_areas = [name for (name,) in query.filter(and_(*filters)).distinct().order_by(Area.name).all()]
+        existing_areas = get_existing_areas(db, discipline, country_filter)
         area_select = st.selectbox("Area", [""] + existing_areas, key="area_select_existing")
     
     with col2:
@@ -63,16 +95,7 @@ def _render_crag_selector(db, discipline, country_filter, area_filter):
     col1, col2 = st.columns(2)
     
     with col1:
-        query = db.session.query(Crag.name).join(Crag.area).join(Crag.routes)
-        filters = [Route.discipline == discipline]
-        
-        if area_filter:
-            filters.append(Area.name == area_filter)
-        if country_filter:
-            query = query.join(Area.country)
-            filters.append(Country.name == country_filter)
-        
-        existing_crags = [name for (name,) in query.filter(and_(*filters)).distinct().order_by(Crag.name).all()]
+        existing_crags = get_existing_crags(db, discipline, country_filter, area_filter)
         crag_select = st.selectbox("Crag", [""] + existing_crags, key="crag_select_existing")
     
     with col2:
@@ -86,20 +109,7 @@ def _render_route_selector(db, discipline, country_filter, area_filter, crag_fil
     col1, col2 = st.columns(2)
     
     with col1:
-        query = db.session.query(Route.name).distinct()
-        filters = [Route.discipline == discipline]
-        
-        if crag_filter:
-            query = query.join(Route.crag)
-            filters.append(Crag.name == crag_filter)
-        if area_filter:
-            query = query.join(Route.crag).join(Crag.area)
-            filters.append(Area.name == area_filter)
-        if country_filter:
-            query = query.join(Route.crag).join(Crag.area).join(Area.country)
-            filters.append(Country.name == country_filter)
-
-        existing_routes = [name for (name,) in query.filter(and_(*filters)).distinct().order_by(Route.name).all()]
+        existing_routes = get_existing_route_names(db, discipline, country_filter, area_filter, crag_filter)
         route_select = st.selectbox("Route", [""] + existing_routes, key="route_select_existing")
     
     with col2:
@@ -113,9 +123,9 @@ def get_existing_route_data(db, route_name, crag_name, discipline):
     if not route_name or not crag_name:
         return None
 
-    route = db.session.query(Route).join(Route.crag).filter(
+    route = db.session.query(Route).filter(
         Route.name == route_name,
-        Crag.name == crag_name,
+        Route.crag_name == crag_name,
         Route.discipline == discipline
     ).first()
 
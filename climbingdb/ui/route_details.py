@@ -1,17 +1,14 @@
 import streamlit as st
 import urllib.parse
-import matplotlib.pyplot as plt
 
-from climbingdb.models import Route, Ascent
 from climbingdb.config import APP_BASE_URL
+from climbingdb.grade import Grade
 from climbingdb.ui.navigation import DISCIPLINE_ICONS
-from climbingdb.visualizations import plot_multipitches
-from climbingdb.services import ClimbingService
 
 
 def render_route_details_page(public_db, route_id, user_id=None):
     """Render route detail page."""
-    route = public_db.session.query(Route).filter(Route.id == route_id).first()
+    route = public_db.get_route_detail(route_id, user_id=user_id)
 
     if not route:
         st.error("Route not found!")
@@ -20,17 +17,11 @@ def render_route_details_page(public_db, route_id, user_id=None):
             st.rerun()
         return
 
-    # Look up user's ascent if logged in
-    ascent = None
-    if user_id:
-        ascent = public_db.session.query(Ascent).filter(
-            Ascent.route_id == route.id,
-            Ascent.user_id == user_id
-        ).first()
-
+    ascent = route.ascent  # Only if logged in
     _render_navigation_header()
     _render_share_button(route)
     _render_route_properties(route)
+    _render_classics(public_db, route)
 
     st.markdown("---")
     if ascent:
@@ -51,10 +42,44 @@ def _render_grade_stars(obj):
         st.markdown(f"**Average stars:** {stars}")
 
 
+def _render_route_stats(route):
+    """Ascents of all users (route_stats), nothing if nobody logged the route yet."""
+    stats = route.stats
+    if not stats:
+        return
+
+    ascents = f"**Ascents:** {stats.n_ascents}"
+    if stats.n_projects:
+        ascents += f" (+{stats.n_projects} projects)"
+    st.markdown(ascents)
+    if stats.n_ascents:
+        st.markdown(f"**Onsight / Flash:** {stats.onsight_ratio:.0%} / {stats.flash_ratio:.0%}")
+    if stats.n_soft or stats.n_hard:
+        st.markdown(f"**Soft / Hard:** {stats.n_soft} / {stats.n_hard}")
+    if stats.grade_votes:
+        scale = Grade(route.consensus_grade).get_scale() if route.consensus_grade else 'French'
+        votes = ", ".join(f"{Grade.from_ole_grade(ole_grade, scale) or ole_grade}: {n}"
+                          for ole_grade, n in stats.grade_votes)
+        st.caption(f"Grade votes: {votes}")
+
+
+def _render_classics(public_db, route, limit=5):
+    """Best rated and most climbed other routes of the crag."""
+    classics = [r for r in public_db.get_classic_routes(route.crag_id, limit=limit + 1) if r.id != route.id]
+    if not classics:
+        return
+
+    st.markdown(f"#### :material/star: Classics at {route.crag_name}")
+    for classic in classics[:limit]:
+        stars = ":material/star:" * int(classic.consensus_stars or 0)
+        st.markdown(f"[{classic.name}](?route_id={classic.id}) ({classic.consensus_grade or '?'}) "
+                    f"{stars} · {classic.stats.n_ascents} ascents")
+
+
 def _render_location(route):
-    st.write(f"**Country:** {route.country.name if route.country else 'N/A'}")
-    st.write(f"**Area:** {route.area.name if route.area else 'N/A'}")
-    st.write(f"**Crag:** {route.crag.name if route.crag else 'N/A'}")
+    st.write(f"**Country:** {route.country_name or 'N/A'}")
+    st.write(f"**Area:** {route.area_name or 'N/A'}")
+    st.write(f"**Crag:** {route.crag_name or 'N/A'}")
 
     if route.latitude and route.longitude:
         st.write(f"**GPS:** {route.latitude:.6f}, {route.longitude:.6f}")
@@ -93,6 +118,7 @@ def _render_route_properties(route):
     with col1:
         st.markdown("#### :material/target: Rating")
         _render_grade_stars(route)
+        _render_route_stats(route)
     with col2:
         st.markdown("#### :material/location_on: Location")
         _render_location(route)
@@ -102,7 +128,7 @@ def _render_route_properties(route):
 
 
 def _render_ascent_properties(ascent):
-    """Render ascent properties - works for Ascent and PitchAscent."""
+    """Render ascent properties - works for AscentDetail and PitchAscentDetail."""
     if hasattr(ascent, 'is_project') and ascent.is_project:
         st.info(":material/strategy: Project")
     if hasattr(ascent, 'is_milestone') and ascent.is_milestone:
@@ -144,8 +170,11 @@ def _render_ascent_properties(ascent):
             _render_pitch_details(ascent)
         with col2:
             with st.spinner("Generating visualization..."):
-                df = ClimbingService._ascents_to_dataframe([ascent])
-                fig = plot_multipitches(df, title=df["name"].item(), xwidth=6, ywidth=6)
+                import matplotlib.pyplot as plt
+                from climbingdb.visualizations import plot_multipitches
+
+                df = ascent.frame
+                fig = plot_multipitches(df, ascent.pitch_frame, title=df["name"].item(), xwidth=6, ywidth=6)
                 if fig:
                     st.pyplot(fig, dpi=250)
                     plt.close(fig)
@@ -178,9 +207,7 @@ def _render_pitch_details(ascent):
 
     st.markdown(f"#### {DISCIPLINE_ICONS['Pitches']} Detailed Pitch Information")
 
-    sorted_pitch_ascents = sorted(ascent.pitch_ascents, key=lambda pa: pa.pitch.pitch_number)
-
-    for pa in sorted_pitch_ascents:
+    for pa in ascent.pitch_ascents:  # Sorted by pitch number
         pitch = pa.pitch
 
         pitch_number = pitch.pitch_number
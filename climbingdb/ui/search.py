@@ -3,8 +3,8 @@ Route search functionality with autocomplete.
 """
 
 import streamlit as st
-from sqlalchemy import or_
-from climbingdb.models import Route, Crag, Area, Ascent
+from sqlalchemy import or_, func
+from climbingdb.models import Route, RouteStats
 from climbingdb.ui.navigation import DISCIPLINE_ICONS
 
 
@@ -12,16 +12,15 @@ def _search_routes(db, search_term, limit=20):
     if not search_term or len(search_term) < 2:
         return [], 0
 
-    base_query = db.session.query(Route) \
-        .join(Route.crag) \
-        .join(Crag.area) \
-        .filter(
+    # Most climbed routes first (routes without ascents have no statistics row)
+    base_query = db.session.query(Route).outerjoin(Route.stats).filter(
         or_(
             Route.name.ilike(f"%{search_term}%"),
-            Crag.name.ilike(f"%{search_term}%"),
-            Area.name.ilike(f"%{search_term}%")
+            Route.crag_name.ilike(f"%{search_term}%"),
+            Route.area_name.ilike(f"%{search_term}%")
         )
     ).order_by(
+        func.coalesce(RouteStats.n_ascents, 0).desc(),
         Route.consensus_ole_grade.desc().nullslast()
     )
 
@@ -36,8 +35,8 @@ def _search_routes(db, search_term, limit=20):
 
 def _format_route_option(route):
     """Format route for display in selectbox."""
-    crag = route.crag.name if route.crag else "Unknown"
-    area = route.crag.area.name if route.crag and route.crag.area else "Unknown"
+    crag = route.crag_name or "Unknown"
+    area = route.area_name or "Unknown"
     grade = route.consensus_grade or "?"
     return f"{route.discipline.upper()}: {route.name} ({grade}) - {crag}, {area}"
 
@@ -1,5 +1,10 @@
+from datetime import date
+import io
+
 import streamlit as st
 
+from climbingdb.models import get_session
+
 
 def render_password_settings(auth):
     st.subheader("Change Password")
@@ -92,4 +97,49 @@ def render_delete_account(auth):
                 del st.session_state[key]
             st.rerun()
         except Exception as e:
-            st.error(f"Error: {e}")
\ No newline at end of file
+            st.error(f"Error: {e}")
+
+def render_snapshot_settings():
+    """Render backup download and restore of the user's logbook (Parquet snapshot)."""
+    from climbingdb.services.snapshot import export_snapshot, import_snapshot, SnapshotError
+
+    st.subheader(":material/backup: Backup")
+    st.write("Download your ascents with their routes and locations as a snapshot file "
+             "and restore it here or on another instance.")
+
+    if st.button(":material/archive: Create Backup", key="create_snapshot_btn"):
+        buffer = io.BytesIO()
+        with get_session() as session:
+            counts = export_snapshot(session, st.session_state.user_id, buffer)
+        st.session_state.snapshot = buffer.getvalue()
+        st.success(f":material/check: Backup of {counts['ascents']} ascents ready.")
+
+    if st.session_state.get('snapshot'):
+        st.download_button(
+            ":material/download: Download Backup",
+            data=st.session_state.snapshot,
+            file_name=f"climbingdb-{st.session_state.get('username', 'logbook')}-{date.today()}.zip",
+            mime="application/zip",
+            key="download_snapshot_btn"
+        )
+
+    st.markdown("---")
+    st.subheader(":material/settings_backup_restore: Restore")
+    st.warning(":material/warning: Restoring **replaces all your ascents** with the ones in the backup.")
+
+    uploaded_file = st.file_uploader("Backup file", type=["zip"], key="restore_snapshot_file")
+    confirm = st.text_input("Type **RESTORE** to confirm:", key="restore_snapshot_confirm")
+
+    if st.button(
+            ":material/settings_backup_restore: Restore Backup",
+            type="primary",
+            disabled=(uploaded_file is None or confirm != "RESTORE"),
+            key="restore_snapshot_btn"
+    ):
+        try:
+            with get_session() as session:
+                report = import_snapshot(session, uploaded_file, st.session_state.user_id, replace=True)
+            st.success(f":material/check: Restored {report['ascents']['inserted']} ascents "
+                       f"({report['routes']['inserted']} new routes).")
+        except SnapshotError as e:
+            st.error(f"Error: {e}")
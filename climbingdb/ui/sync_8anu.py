@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 
-from climbingdb.scripts.import_8anu import import_8a_csv, parse_8anu_dataframe
 from climbingdb.config import EIGHTANU_EXPORT_URL
 
 
@@ -48,16 +47,33 @@ def get_8anu_csv_file():
     return uploaded_file
 
 
-def show_preview_of_8anu_import(uploaded_file):
+def show_preview_of_8anu_import(uploaded_file, user_id=None):
     """
     Show preview of how 8a.nu data will be imported.
     Returns True if user confirms, False otherwise.
     """
-    df = pd.read_csv(uploaded_file, sep=',', header=0, keep_default_na=False, dtype=str)
-    uploaded_file.seek(0)
+    # The importer (and its country converter) is only loaded once a file is uploaded
+    from climbingdb.services.import_cache import parse_8anu_upload
 
-    # Parse using shared function
-    parsed_rows, skipped_rows, errors = parse_8anu_dataframe(df)
+    # Parsed once per file content: the import of the previewed file reuses it
+    sha256, parsed_rows, skipped_rows, errors = parse_8anu_upload(uploaded_file.getvalue())
+
+    if user_id is not None:
+        from climbingdb.models import get_session
+        from climbingdb.scripts.import_8anu import new_or_edited_rows
+        from climbingdb.services.import_jobs import get_imported_job
+
+        imported_job = get_imported_job(user_id, sha256)
+        if imported_job is not None:
+            st.info(f":material/history: You imported this file on "
+                    f"{imported_job.created_at.strftime('%B %d, %Y')} already, "
+                    "its ascents in your logbook will be skipped.")
+
+        with get_session() as session:
+            n_changed = len(new_or_edited_rows(session, user_id, parsed_rows))
+        if n_changed < len(parsed_rows):
+            st.info(f":material/sync: {len(parsed_rows) - n_changed} ascents were synced before, "
+                    f"{n_changed} are new or edited on 8a.nu.")
 
     # Summary metrics
     n_routes = sum(1 for r in parsed_rows if r['discipline'] == 'Sportclimb')
@@ -120,37 +136,72 @@ def show_preview_of_8anu_import(uploaded_file):
             )
 
 
-def submit_8anu_upload(uploaded_file, user_id):
-    """Run 8a.nu import with progress feedback."""
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+def submit_8anu_upload(uploaded_file, user_id, update_existing=False):
+    """Start the 8a.nu import as a background job (progress: render_import_job())."""
+    from climbingdb.services.import_jobs import submit_8anu_import
 
-    def progress_callback(current, total, message):
-        progress_bar.progress(current / total)
-        status_text.text(f"{message} ({current}/{total})")
+    job_id = submit_8anu_import(uploaded_file.getvalue(), user_id, filename=uploaded_file.name,
+                                update_existing=update_existing)
+    st.session_state.import_job_id = job_id
+    st.info(":material/hourglass_top: Import started, it continues while you use the app.")
+    return job_id
 
-    try:
-        with st.spinner("Importing..."):
-            imported, skipped, errors = import_8a_csv(
-                csv_file=uploaded_file,
-                user_id=user_id,
-                progress_callback=progress_callback
-            )
 
-        progress_bar.empty()
-        status_text.empty()
+@st.fragment(run_every=1)
+def _poll_import_job(job_id):
+    """Re-render the progress every second until the job has finished."""
+    from climbingdb.services.import_jobs import get_job
+
+    job = get_job(job_id)
+    if job is None or not job.is_active:
+        st.rerun()  # Full rerun: shows the result and the imported ascents
+
+    if job.status == 'queued':
+        st.progress(0, text=":material/hourglass_top: Waiting for other imports to finish...")
+    elif job.total:
+        st.progress(job.progress, text=f"{job.message or 'Importing'} ({job.processed}/{job.total})")
+    else:
+        st.progress(0, text="Reading the file...")
+
+
+def render_import_job(user_id):
+    """Progress of the user's running import, or the result of the last one."""
+    from climbingdb.services.import_jobs import get_latest_job
+
+    job = get_latest_job(user_id)
+    if job is None:
+        return
+
+    if job.is_active:
+        _poll_import_job(job.id)
+        return
+
+    # Results are shown once, after the job started from this browser session
+    if st.session_state.get('import_job_id') != job.id:
+        return
+
+    if job.status == 'failed':
+        st.error(f":material/error: Import failed: {job.message}")
+        return
+
+    st.success(f":material/check: Successfully imported {job.imported} ascents!")
 
-        st.success(f":material/check: Successfully imported {imported} ascents!")
+    delta = []
+    if job.updated:
+        delta.append(f"{job.updated} updated")
+    if job.unchanged:
+        delta.append(f"{job.unchanged} already in your logbook")
+    if delta:
+        st.info(f":material/sync: {', '.join(delta).capitalize()}")
 
-        if skipped > 0:
-            st.warning(f":material/warning: {skipped} ascents skipped")
+    if job.edited:
+        st.info(f":material/edit: {job.edited} ascents were edited on 8a.nu, "
+                "import again with 'Update edited ascents' to take over the changes")
 
-        if errors:
-            with st.expander(f":material/error: {len(errors)} errors"):
-                for error in errors:
-                    st.write(f"- {error}")
+    if job.skipped:
+        st.warning(f":material/warning: {job.skipped} ascents skipped")
 
-    except Exception as e:
-        progress_bar.empty()
-        status_text.empty()
-        st.error(f":material/error: Import failed: {e}")
+    if job.errors:
+        with st.expander(f":material/error: {len(job.errors)} errors"):
+            for error in job.errors:
+                st.write(f"- {error}")
@@ -1,4 +1,6 @@
 import shutil
+from functools import cache
+
 import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
@@ -6,22 +8,35 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 
 from climbingdb.grade import Grade
 
-if shutil.which("latex"):
-    plt.rcParams['text.usetex'] = True
 
+@cache
+def _use_latex_if_available():
+    """Typeset with LaTeX if installed (looked up on the first plot, not on import)."""
+    if shutil.which("latex"):
+        plt.rcParams['text.usetex'] = True
+
+
+def plot_multipitches(mp_dataframe, pitches, title="My multipitch distribution", xwidth=None, ywidth=None):
+    """
+    Plot multipitch ascents as stacked pitches colored by grade.
 
-def plot_multipitches(mp_dataframe, title="My multipitch distribution", xwidth=None, ywidth=None):
+    Args:
+        mp_dataframe: Multipitch ascents (ClimbingService DataFrame)
+        pitches: Long-format pitch ascents of these ascents (ClimbingService.get_pitch_ascents)
+    """
+    _use_latex_if_available()
     mp = mp_dataframe.sort_values(by=["ole_grade"], ascending=False)
+    pitches_by_ascent = {ascent_id: group for ascent_id, group in pitches.groupby('ascent_id', sort=False)}
 
-    if len(mp['ole_grade']) > 1:
+    if len(mp['ole_grade']) > 1 or len(pitches) == 0:
         # Plotting multiple multipitches in multipitch dashboard
         grades = mp['ole_grade']
     else:
         # Plotting only one route for route detail page
-        grades = mp['pitches_data'].iloc[0]['ole_grade']
+        grades = pitches['ole_grade']
 
-    min_grade = min(grades)
-    max_grade = max(grades)
+    min_grade = float(min(grades))
+    max_grade = float(max(grades))
 
     # to define own cmap, see https://stackoverflow.com/questions/53754012/create-a-gradient-colormap-matplotlib
     norm = matplotlib.colors.Normalize(vmin=min_grade, vmax=max_grade, clip=True)
@@ -34,11 +49,19 @@ def plot_multipitches(mp_dataframe, title="My multipitch distribution", xwidth=N
 
     fig, ax = plt.subplots(figsize=(xwidth, ywidth))
 
-    for index, row in mp.iterrows():
-        avg_pitch_length = row.length / row.pitch_number
+    for row in mp.itertuples(index=False):
+        route_pitches = pitches_by_ascent.get(row.id)
+        if route_pitches is None:
+            # No pitch ascents logged: the whole route as one pitch
+            pitch_grades = [row.ole_grade]
+            followed = [False]
+        else:
+            pitch_grades = list(route_pitches['ole_grade'])
+            followed = list((route_pitches['led'] == False).fillna(False))
+        avg_pitch_length = row.length / len(pitch_grades)
 
-        for c, pitch in enumerate(row.pitches_data["ole_grade"]):
-            color = mapper.to_rgba(row.pitches_data["ole_grade"][c])
+        for c, pitch_grade in enumerate(pitch_grades):
+            color = mapper.to_rgba(pitch_grade)
 
             kwargs = {'bottom': c * avg_pitch_length,
                       'color': color,
@@ -47,14 +70,14 @@ def plot_multipitches(mp_dataframe, title="My multipitch distribution", xwidth=N
                       'hatch': None
                       }
 
-            if row.pitch_number > 1 and row.pitches_data["led"][c] == False:
+            if len(pitch_grades) > 1 and followed[c]:
                 # kwargs['alpha'] = 0.2
                 kwargs['hatch'] = "oo"
 
             kwargs['alpha'] = 0.2 if row.is_project else 1
 
-            grade = row['grade'] if row['style'] == "" else "{} {}".format(row['grade'], row['style'])
-            subtitle = '{} ({})\n {}'.format(row['name'], grade, row['area'])
+            grade = row.grade if row.style == "" else "{} {}".format(row.grade, row.style)
+            subtitle = '{} ({})\n {}'.format(row.name, grade, row.area)
 
             ax.bar(subtitle, avg_pitch_length, **kwargs)
             # plt.text(subtitle, c*avg_pitch_length+avg_pitch_length//2, pitch, ha = 'center')
@@ -84,6 +107,8 @@ def plot_multipitches(mp_dataframe, title="My multipitch distribution", xwidth=N
 
 def plot_grade_pyramid(routes, grades, sandbaggers_choice="Round down",
                        title="Grade Distribution", figsize=(15, 5)):
+    _use_latex_if_available()
+
     # Get min and max ole_grade from the filtered routes
     min_ole = routes['ole_grade'].min()
     max_ole = routes['ole_grade'].max()
@@ -140,6 +165,51 @@ def plot_grade_pyramid(routes, grades, sandbaggers_choice="Round down",
     return fig
 
 
+def plot_timeline(monthly, progression, grade_system="French",
+                  title="My Climbing Timeline", figsize=(15, 5)):
+    """
+    Plot the ascents per month with the hardest grade over time.
+
+    Args:
+        monthly: Monthly rollups of one discipline (ClimbingService.get_monthly_stats)
+        progression: Grade progression of the discipline (ClimbingService.get_grade_progression)
+    """
+    _use_latex_if_available()
+    fig, ax = plt.subplots(figsize=figsize)
+
+    # Bars one month wide, dates are the first of the month
+    ax.bar(monthly['month'], monthly['n_ascents'], width=25, align='edge',
+           color='lightgray', edgecolor='gray', linewidth=0.5, label='Ascents')
+    ax.set_ylabel('Ascents per Month', fontsize=12, fontweight='bold')
+    ax.spines['top'].set_visible(False)
+
+    grade_ax = ax.twinx()
+    grade_ax.plot(progression['month'], progression['max_ole_grade'], 'o', color='tab:red',
+                  markersize=3, alpha=0.5, label='Hardest of the month')
+    grade_ax.step(progression['month'], progression['rolling_max'], where='post', color='tab:red',
+                  label='Hardest of the last 12 months')
+    grade_ax.step(progression['month'], progression['best'], where='post', color='black',
+                  linewidth=1, label='Hardest overall')
+
+    grades = progression['max_ole_grade'].dropna()
+    if len(grades) > 0:
+        tics = range(int(grades.min()), int(grades.max()) + 1)
+        grade_ax.set_yticks(tics)
+        grade_ax.set_yticklabels([Grade.from_ole_grade(float(x), grade_system) for x in tics])
+    grade_ax.set_ylabel('Grade', fontsize=12, fontweight='bold')
+    grade_ax.spines['top'].set_visible(False)
+
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    ax.yaxis.grid(True, linestyle='--', alpha=0.3)
+    ax.set_axisbelow(True)
+    handles, labels = ax.get_legend_handles_labels()
+    grade_handles, grade_labels = grade_ax.get_legend_handles_labels()
+    ax.legend(handles + grade_handles, labels + grade_labels, loc='upper left', fontsize=9)
+
+    plt.tight_layout()
+    return fig
+
+
 if __name__ == "__main__":
     from climbingdb.services.climbing_service import ClimbingService
 
@@ -158,5 +228,8 @@ if __name__ == "__main__":
     fig_boulder.savefig("boulder_pyramid.pdf", dpi=300, bbox_inches='tight')
 
     mp = db.get_multipitches()
-    fig = plot_multipitches(mp)
+    fig = plot_multipitches(mp, db.get_pitch_ascents(mp['id']))
     plt.savefig("multipitches.pdf")
+
+    fig = plot_timeline(db.get_monthly_stats("Sportclimb"), db.get_grade_progression("Sportclimb"))
+    fig.savefig("timeline.pdf", dpi=300, bbox_inches='tight')